@@ -0,0 +1,80 @@
+"""
+    Benchmark that measures the memory used by a fleet of :class:`EventedVariableSink` instances.  The
+    default :class:`EventedVariable` is compared with the :class:`CompactEventedVariable` and with lazy
+    variable creation where only a few variables of each sink are ever used.
+
+    usage: python bench_eventedvariable_memory.py [sink_count] [variable_count]
+"""
+
+import gc
+import sys
+import tracemalloc
+
+from mojo.xmods.eventing.compacteventedvariable import CompactEventedVariable
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+SINK_COUNT = 10000
+VARIABLE_COUNT = 100
+USED_VARIABLE_COUNT = 10
+
+
+def create_variable_descriptions(variable_count: int):
+    descriptions = {}
+    for index in range(variable_count):
+        descriptions["Variable{}".format(index)] = { "data_type": "int", "default": 0 }
+    return descriptions
+
+
+class DefaultSink(EventedVariableSink):
+    pass
+
+
+class CompactSink(EventedVariableSink):
+    SINK_VARIABLE_TYPE = CompactEventedVariable
+
+
+class CompactLazySink(EventedVariableSink):
+    SINK_VARIABLE_TYPE = CompactEventedVariable
+    SINK_LAZY_VARIABLES = True
+
+
+def measure_fleet(sink_type, descriptions, sink_count: int):
+
+    gc.collect()
+    tracemalloc.start()
+
+    used_names = list(descriptions.keys())[:USED_VARIABLE_COUNT]
+
+    fleet = []
+    for index in range(sink_count):
+        sink = sink_type(descriptions, sink_prefix="device{}".format(index))
+        for event_name in used_names:
+            sink.update_event_variable(event_name, index)
+        fleet.append(sink)
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del fleet
+    gc.collect()
+
+    return current
+
+
+if __name__ == "__main__":
+
+    sink_count = SINK_COUNT
+    variable_count = VARIABLE_COUNT
+
+    if len(sys.argv) > 1:
+        sink_count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        variable_count = int(sys.argv[2])
+
+    descriptions = create_variable_descriptions(variable_count)
+
+    print("sinks={} variables={} used_variables={}".format(sink_count, variable_count, USED_VARIABLE_COUNT))
+
+    for sink_type in [DefaultSink, CompactSink, CompactLazySink]:
+        used = measure_fleet(sink_type, descriptions, sink_count)
+        print("{}: {:.1f} MiB".format(sink_type.__name__, used / (1024 * 1024)))
@@ -0,0 +1,113 @@
+"""
+    Benchmark that measures the throughput of concurrent `sync_read` calls on an :class:`EventedVariable`
+    while a producer thread updates the variable as fast as it can.  The lock free snapshot read is compared
+    with a read that takes the state lock of the sink, which is how `sync_read` was implemented before the
+    snapshot was introduced.  Every update changes the value, so a consistent read always has matching
+    updated and changed timestamps.
+"""
+
+import sys
+import threading
+import time
+
+from mojo.xmods.eventing.eventedvariable import EventedVariable
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+VARIABLE_DESCRIPTIONS = {
+    "Volume": { "data_type": "int", "default": 0 }
+}
+
+DEFAULT_READER_COUNT = 4
+DEFAULT_DURATION = 2.0
+
+
+class LockedReadVariable(EventedVariable):
+
+    __slots__ = ()
+
+    def sync_read(self):
+        for _ in self.sink.yield_state_lock():
+            rtnval = super().sync_read()
+        return rtnval
+
+
+class SnapshotSink(EventedVariableSink):
+
+    def __init__(self):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="bench")
+        return
+
+
+class LockedReadSink(SnapshotSink):
+
+    SINK_VARIABLE_TYPE = LockedReadVariable
+
+
+def measure_reads(sink_type: type, reader_count: int, duration: float):
+
+    sink = sink_type()
+    volume = sink.lookup_event_variable("Volume")
+
+    running = threading.Event()
+    running.set()
+
+    update_count = [0]
+    read_counts = [0] * reader_count
+    inconsistent_counts = [0] * reader_count
+
+    def producer():
+        index = 0
+        while running.is_set():
+            index += 1
+            sink.update_event_variable("Volume", index)
+        update_count[0] = index
+        return
+
+    def reader(reader_index: int):
+        reads = 0
+        inconsistent = 0
+        while running.is_set():
+            _, updated, changed, _ = volume.sync_read()
+            if updated != changed:
+                inconsistent += 1
+            reads += 1
+        read_counts[reader_index] = reads
+        inconsistent_counts[reader_index] = inconsistent
+        return
+
+    threads = [threading.Thread(target=producer, daemon=True)]
+    threads.extend([threading.Thread(target=reader, args=(ridx,), daemon=True) for ridx in range(reader_count)])
+
+    for th in threads:
+        th.start()
+
+    time.sleep(duration)
+    running.clear()
+
+    for th in threads:
+        th.join()
+
+    return update_count[0], sum(read_counts), sum(inconsistent_counts)
+
+
+def main():
+
+    reader_count = DEFAULT_READER_COUNT
+    duration = DEFAULT_DURATION
+    if len(sys.argv) > 1:
+        reader_count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        duration = float(sys.argv[2])
+
+    print("readers={} duration={}s".format(reader_count, duration))
+
+    for sink_type in [LockedReadSink, SnapshotSink]:
+        updates, reads, inconsistent = measure_reads(sink_type, reader_count, duration)
+        print("{}: updates/s={:.0f} reads/s={:.0f} inconsistent={}".format(
+            sink_type.__name__, updates / duration, reads / duration, inconsistent))
+
+    return
+
+
+if __name__ == "__main__":
+    main()
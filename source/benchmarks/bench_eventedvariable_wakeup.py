@@ -0,0 +1,79 @@
+"""
+    Benchmark that measures the latency between an :class:`EventedVariable` update and the wakeup of a
+    thread waiting in `wait_for_update`.  The condition based wakeup is compared with the polling fallback
+    that is used when the sink does not provide a state condition.
+"""
+
+import statistics
+import threading
+import time
+
+from datetime import datetime
+
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+VARIABLE_DESCRIPTIONS = {
+    "Volume": { "data_type": "int", "default": 0 }
+}
+
+ITERATIONS = 50
+POLL_INTERVAL = 0.1
+
+
+class BenchmarkSink(EventedVariableSink):
+
+    def __init__(self):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="bench")
+        return
+
+
+class PollingBenchmarkSink(BenchmarkSink):
+
+    @property
+    def state_condition(self):
+        return None
+
+
+def measure_wakeup_latency(sink: EventedVariableSink, iterations: int, interval: float):
+
+    latencies = []
+
+    volume = sink.lookup_event_variable("Volume")
+
+    for index in range(iterations):
+        moment = datetime.now()
+        updated_at = []
+
+        def delayed_update():
+            time.sleep(0.005)
+            updated_at.append(time.perf_counter())
+            sink.update_event_variable("Volume", index)
+            return
+
+        updater = threading.Thread(target=delayed_update, daemon=True)
+        updater.start()
+
+        volume.wait_for_update(moment, timeout=10, interval=interval)
+        woke_at = time.perf_counter()
+
+        updater.join()
+
+        latencies.append(woke_at - updated_at[0])
+
+    return latencies
+
+
+def report(title: str, latencies):
+    latencies_ms = [lat * 1000 for lat in latencies]
+    print("{}: mean={:.3f}ms median={:.3f}ms max={:.3f}ms".format(
+        title, statistics.mean(latencies_ms), statistics.median(latencies_ms), max(latencies_ms)))
+    return
+
+
+if __name__ == "__main__":
+
+    condition_latencies = measure_wakeup_latency(BenchmarkSink(), ITERATIONS, POLL_INTERVAL)
+    report("condition wakeup", condition_latencies)
+
+    polling_latencies = measure_wakeup_latency(PollingBenchmarkSink(), ITERATIONS, POLL_INTERVAL)
+    report("polling (interval={}s)".format(POLL_INTERVAL), polling_latencies)
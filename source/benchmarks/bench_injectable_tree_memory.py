@@ -0,0 +1,126 @@
+"""
+    Benchmark that measures the memory used by a tree of injectable references and groups after the metadata
+    of the tree is resolved.  The slotted :class:`InjectableRef` and :class:`InjectableGroup` nodes, which share
+    the metadata of their parents with metadata chains, are compared with nodes that have an instance dictionary,
+    create their moniker list and subscriptions up front and merge the metadata of their parents into a copy.
+
+    usage: python bench_injectable_tree_memory.py [module_count] [injectables_per_module]
+"""
+
+import gc
+import sys
+import tracemalloc
+import types
+
+from mojo.xmods.injection.injectablegroup import InjectableGroup
+from mojo.xmods.injection.injectableref import InjectableRef
+
+MODULE_COUNT = 1000
+INJECTABLES_PER_MODULE = 100
+
+CATEGORIES = [["smoke"], ["regression"], ["regression", "nightly"], ["stress"]]
+
+
+def merge_metadata(node, parent_metadata):
+    reference_metadata = node._reference_metadata()
+
+    metadata = reference_metadata
+    if parent_metadata is not None:
+        metadata = parent_metadata
+        if reference_metadata is not None:
+            metadata = {}
+            metadata.update(parent_metadata)
+            metadata.update(reference_metadata)
+
+    return metadata
+
+
+class DictInjectableRef(InjectableRef):
+    """
+        An injectable reference with an instance dictionary that merges the metadata of its parent.
+    """
+
+    def __init__(self, injfunc):
+        InjectableRef.__init__(self, injfunc, monikers=[])
+        self._subscriptions = {}
+        return
+
+    def resolve_metadata(self, parent_metadata=None):
+        self._metadata = merge_metadata(self, parent_metadata)
+        return
+
+
+class DictInjectableGroup(InjectableGroup):
+    """
+        An injectable group with an instance dictionary that merges the metadata of its parent.
+    """
+
+    def resolve_metadata(self, parent_metadata=None):
+        self._metadata = merge_metadata(self, parent_metadata)
+        for child in self._children.values():
+            child.resolve_metadata(self._metadata)
+        return
+
+
+def create_injectable_functions(module_count: int, injectables_per_module: int):
+
+    inj_functions = []
+
+    for midx in range(module_count):
+        module_name = "synthmem.package{}.module{}".format(midx // 10, midx)
+
+        module = types.ModuleType(module_name)
+        module._metadata_ = {"categories": CATEGORIES[midx % len(CATEGORIES)], "priority": str(1 + midx % 3)}
+        sys.modules[module_name] = module
+
+        for iidx in range(injectables_per_module):
+            namespace = {}
+            exec("def test_{}():\n    return None\n".format(iidx), namespace)
+            inj_func = namespace["test_{}".format(iidx)]
+            inj_func.__module__ = module_name
+
+            if iidx % 10 == 0:
+                inj_func._metadata_ = {"keywords": ["wifi"]}
+
+            inj_functions.append(inj_func)
+
+    return inj_functions
+
+
+def measure_tree(ref_type, group_type, inj_functions):
+
+    gc.collect()
+    tracemalloc.start()
+
+    root = group_type("root")
+    for inj_func in inj_functions:
+        root.add_descendent(ref_type(inj_func), group_type=group_type)
+    root.resolve_metadata()
+
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del root
+    gc.collect()
+
+    return current
+
+
+if __name__ == "__main__":
+
+    module_count = MODULE_COUNT
+    injectables_per_module = INJECTABLES_PER_MODULE
+
+    if len(sys.argv) > 1:
+        module_count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        injectables_per_module = int(sys.argv[2])
+
+    inj_functions = create_injectable_functions(module_count, injectables_per_module)
+
+    print("modules={} injectables={}".format(module_count, len(inj_functions)))
+
+    for ref_type, group_type in [(DictInjectableRef, DictInjectableGroup), (InjectableRef, InjectableGroup)]:
+        used = measure_tree(ref_type, group_type, inj_functions)
+        print("{}/{}: {:.1f} MiB, {:.0f} bytes per injectable".format(
+            ref_type.__name__, group_type.__name__, used / (1024 * 1024), used / len(inj_functions)))
@@ -0,0 +1,167 @@
+"""
+    Benchmark that compares a cold startup, where every injectable module of a synthetic suite is imported
+    so the decorators register the resource sources and parameter origins, with a warm startup, where the
+    discovery of the unchanged modules is restored from a `DiscoveryCache`.  Each startup runs in its own
+    process because the injection registry is a singleton.  Both startups end with
+    `InjectionRegistry.finalize_startup`.
+
+    usage: python bench_injection_discovery_cache.py [module_count] [injectables_per_module]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODULE_COUNT = 200
+INJECTABLES_PER_MODULE = 50
+
+PACKAGE_NAME = "synthdisc"
+
+TYPES_MODULE_CONTENT = """
+class SyntheticResource:
+    pass
+"""
+
+MODULE_HEADER = """
+from typing import Generator
+
+from mojo.xmods.injection.decorators.factory import resource
+from mojo.xmods.injection.origination import originate_parameter
+from mojo.xmods.markers import mark_priority
+
+from synthdisc.synthtypes import SyntheticResource
+
+
+@resource()
+def module_resource{midx}(constraints=None) -> Generator[SyntheticResource, None, None]:
+    yield SyntheticResource()
+
+originate_parameter(module_resource{midx}, identifier="module_resource{midx}")
+
+"""
+
+INJECTABLE_TEMPLATE = """
+@mark_priority(priority={iidx})
+def test_{iidx}(module_resource{midx}):
+    return
+"""
+
+
+def create_synthetic_package(root_dir: str, module_count: int, injectables_per_module: int):
+
+    package_dir = os.path.join(root_dir, PACKAGE_NAME)
+    os.makedirs(package_dir)
+
+    with open(os.path.join(package_dir, "__init__.py"), 'w') as pf:
+        pf.write("")
+
+    with open(os.path.join(package_dir, "synthtypes.py"), 'w') as tf:
+        tf.write(TYPES_MODULE_CONTENT)
+
+    for midx in range(module_count):
+        lines = [MODULE_HEADER.format(midx=midx)]
+        for iidx in range(injectables_per_module):
+            lines.append(INJECTABLE_TEMPLATE.format(midx=midx, iidx=iidx))
+
+        with open(os.path.join(package_dir, "module{}.py".format(midx)), 'w') as mf:
+            mf.write("".join(lines))
+
+    return
+
+
+def run_startup(root_dir: str, cache_filename: str):
+    """
+        Runs a single startup of the synthetic suite, restoring modules from the cache when they are
+        unchanged and importing and recording them when they are not.
+    """
+
+    sys.path.insert(0, root_dir)
+
+    from mojo.xmods.injection.discoverycache import DiscoveryCache
+    from mojo.xmods.injection.injectableref import InjectableRef
+    from mojo.xmods.injection.injectionregistry import injection_registry
+    from mojo.xmods.ximport import import_file
+
+    start = time.perf_counter()
+
+    cache = DiscoveryCache(cache_filename)
+    cache.load()
+
+    package_dir = os.path.join(root_dir, PACKAGE_NAME)
+    module_files = sorted(fname for fname in os.listdir(package_dir) if fname.startswith("module"))
+
+    inj_references = {}
+
+    for module_fname in module_files:
+        module_name = "{}.{}".format(PACKAGE_NAME, module_fname[:-3])
+        module_file = os.path.join(package_dir, module_fname)
+
+        record = cache.lookup_module(module_name, module_file)
+        if record is not None:
+            cache.restore_module(record)
+            inj_references.update(cache.restore_injectables(record))
+        else:
+            injection_registry.begin_module_discovery(module_name)
+            try:
+                module = import_file(module_name, module_file)
+            finally:
+                origins = injection_registry.end_module_discovery()
+
+            injectables = {}
+            for member_name, member in vars(module).items():
+                if member_name.startswith("test_") and callable(member):
+                    inj_ref = InjectableRef(member)
+                    inj_references[inj_ref.name] = inj_ref
+                    injectables[inj_ref.name] = getattr(member, "_metadata_", None)
+
+            cache.store_module(module_name, module_file, origins, injectables)
+
+    discovered = time.perf_counter()
+
+    injection_registry.finalize_startup(inj_references)
+
+    finalized = time.perf_counter()
+
+    if cache.modified:
+        cache.save()
+
+    print("hits={} misses={} injectables={} unknown={}".format(cache.hits, cache.misses, len(inj_references),
+                                                               len(injection_registry.unknown_parameters)))
+    print("discovery: {:.3f}s finalize: {:.3f}s total: {:.3f}s".format(discovered - start, finalized - discovered,
+                                                                        finalized - start))
+
+    return
+
+
+def main():
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run_startup(sys.argv[2], sys.argv[3])
+        return
+
+    module_count = MODULE_COUNT
+    injectables_per_module = INJECTABLES_PER_MODULE
+    if len(sys.argv) > 1:
+        module_count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        injectables_per_module = int(sys.argv[2])
+
+    print("modules={} injectables={}".format(module_count, module_count * injectables_per_module))
+
+    with tempfile.TemporaryDirectory() as root_dir:
+        create_synthetic_package(root_dir, module_count, injectables_per_module)
+
+        cache_filename = os.path.join(root_dir, "discovery.cache")
+
+        for label in ["cold", "warm"]:
+            print("{} startup".format(label))
+            sys.stdout.flush()
+            subprocess.run([sys.executable, "-B", os.path.abspath(__file__), "--run", root_dir, cache_filename], check=True)
+
+    return
+
+
+if __name__ == "__main__":
+    main()
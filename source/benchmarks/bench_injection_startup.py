@@ -0,0 +1,130 @@
+"""
+    Benchmark that measures the startup cost of the scope tree of the injection registry for a synthetic
+    suite of injectables.  The suite has a session resource, a package resource per module and a number
+    of injectables per module.  The time taken by each of the scope tree operations that are performed
+    for every parameter origin or injectable during startup is reported, followed by the time taken by
+    `InjectionRegistry.finalize_startup` for the whole suite and the number of signature introspections
+    and the time spent in them during startup.
+
+    usage: python bench_injection_startup.py [module_count] [injectables_per_module]
+"""
+
+import sys
+import time
+
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.injection.injectionregistry import injection_registry
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+from mojo.xmods.injection.resourcescope import ResourceScope
+from mojo.xmods.injection.resourcesource import ResourceSource
+from mojo.xmods.xinspect import signature_profiler
+
+MODULE_COUNT = 500
+INJECTABLES_PER_MODULE = 100
+MODULES_PER_PACKAGE = 10
+
+
+class SyntheticResource:
+    pass
+
+
+def create_function(module_name: str, func_name: str, param_names):
+
+    namespace = {}
+    code = "def {}({}):\n    return None\n".format(func_name, ", ".join(param_names))
+    exec(code, namespace)
+
+    func = namespace[func_name]
+    func.__module__ = module_name
+    return func
+
+
+def create_synthetic_suite(module_count: int, injectables_per_module: int):
+
+    session_func = create_function("synth.session", "session_resource", [])
+    session_source = ResourceSource(session_func, None, SyntheticResource, None)
+    session_origin = ParameterOrigin("<session>", "session_resource", ResourceLifespan.Session, session_source)
+
+    package_origins = []
+    inj_references = {}
+
+    for midx in range(module_count):
+        module_name = "synth.package{}.module{}".format(midx // MODULES_PER_PACKAGE, midx)
+
+        resource_name = "module_resource{}".format(midx)
+        resource_func = create_function(module_name, resource_name, ["session_resource"])
+        resource_source = ResourceSource(resource_func, None, SyntheticResource, None)
+        package_origins.append(ParameterOrigin(module_name, resource_name, ResourceLifespan.Package, resource_source))
+
+        for iidx in range(injectables_per_module):
+            inj_func = create_function(module_name, "test_{}".format(iidx), ["session_resource", resource_name])
+            inj_ref = InjectableRef(inj_func)
+            inj_references[inj_ref.name] = inj_ref
+
+    return session_origin, package_origins, inj_references
+
+
+def main():
+
+    module_count = MODULE_COUNT
+    injectables_per_module = INJECTABLES_PER_MODULE
+    if len(sys.argv) > 1:
+        module_count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        injectables_per_module = int(sys.argv[2])
+
+    signature_profiler.enable()
+
+    session_origin, package_origins, inj_references = create_synthetic_suite(module_count, injectables_per_module)
+
+    print("modules={} injectables={}".format(module_count, len(inj_references)))
+
+    root = ResourceScope()
+
+    start = time.perf_counter()
+    for origin in [session_origin] + package_origins:
+        if not root.has_descendent_parameter(origin.originating_scope, origin.identifier):
+            root.add_descendent_parameter_origination(origin.originating_scope, origin)
+    register_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for inj_ref in inj_references.values():
+        root.ensure_parameter_scopes_for_injectable(inj_ref)
+    ensure_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    root.prune_unreference_scopes()
+    prune_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for inj_name in inj_references.keys():
+        root.lookup_scope(inj_name)
+    lookup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for inj_ref in inj_references.values():
+        root.has_descendent_parameter(inj_ref.module_name, "module_resource0")
+    has_param_time = time.perf_counter() - start
+
+    print("register parameter origins: {:.3f}s".format(register_time))
+    print("ensure_parameter_scopes_for_injectable: {:.3f}s".format(ensure_time))
+    print("prune_unreference_scopes: {:.3f}s".format(prune_time))
+    print("lookup_scope: {:.3f}s".format(lookup_time))
+    print("has_descendent_parameter: {:.3f}s".format(has_param_time))
+
+    for origin in [session_origin] + package_origins:
+        injection_registry.register_parameter_origin(origin.identifier, origin)
+
+    start = time.perf_counter()
+    injection_registry.finalize_startup(inj_references)
+    finalize_time = time.perf_counter() - start
+
+    print("finalize_startup: {:.3f}s".format(finalize_time))
+    print(signature_profiler.report())
+
+    return
+
+
+if __name__ == "__main__":
+    main()
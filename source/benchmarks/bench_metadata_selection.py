@@ -0,0 +1,107 @@
+"""
+    Benchmark that measures the selection of injectables with marker expressions for a synthetic suite.  The
+    suite has modules with descendent categories and priorities, and a fraction of the injectables are marked
+    individually with keywords.  The time taken to select the injectables by evaluating the filters of each
+    injectable with `InjectableRef.is_member_of_metaset` is compared with the time taken to select them with
+    the predicate created by `create_predicate` and with a :class:`MetadataIndex` of the suite.
+
+    usage: python bench_metadata_selection.py [module_count] [injectables_per_module]
+"""
+
+import sys
+import time
+import types
+
+from mojo.xmods.injection.injectablegroup import InjectableGroup
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.markers import MetaFilterAnd, parse_marker_expression
+
+MODULE_COUNT = 500
+INJECTABLES_PER_MODULE = 100
+
+CATEGORIES = [["smoke"], ["regression"], ["regression", "nightly"], ["stress"]]
+KEYWORDS = [["wifi"], ["audio"], ["audio", "bluetooth"], ["update"]]
+
+SELECTIONS = [
+    ["+categories~=smoke", "+priority==1", "+keywords~=bluetooth"],
+    ["+categories~=nightly", "-keywords~=audio", "+priority!=3"],
+    ["+keywords~=update", "-categories~=stress"],
+    ["(categories ~= smoke or keywords in [bluetooth, update]) and not priority == 3 and categories =~ '^(smoke|stress)$'"]
+]
+
+
+def create_synthetic_suite(module_count: int, injectables_per_module: int) -> InjectableGroup:
+
+    root = InjectableGroup("root")
+
+    for midx in range(module_count):
+        module_name = "synth.package{}.module{}".format(midx // 10, midx)
+        module_metadata = {"categories": CATEGORIES[midx % len(CATEGORIES)], "priority": str(1 + midx % 3)}
+
+        for iidx in range(injectables_per_module):
+            namespace = {}
+            exec("def test_{}():\n    return None\n".format(iidx), namespace)
+            inj_func = namespace["test_{}".format(iidx)]
+            inj_func.__module__ = module_name
+
+            if iidx % 10 == 0:
+                inj_func._metadata_ = {"keywords": KEYWORDS[(midx + iidx) % len(KEYWORDS)]}
+
+            root.add_descendent(InjectableRef(inj_func))
+
+        # Register a module for the group of the module as if the module declared descendent markers
+        module = types.ModuleType(module_name)
+        module._metadata_ = module_metadata
+        sys.modules[module_name] = module
+
+    return root
+
+
+def main():
+
+    module_count = MODULE_COUNT
+    injectables_per_module = INJECTABLES_PER_MODULE
+    if len(sys.argv) > 1:
+        module_count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        injectables_per_module = int(sys.argv[2])
+
+    root = create_synthetic_suite(module_count, injectables_per_module)
+    root.resolve_metadata()
+
+    inj_refs = list(root.iterate_injectables())
+    print("modules={} injectables={}".format(module_count, len(inj_refs)))
+
+    start = time.perf_counter()
+    index = root.create_metadata_index()
+    build_time = time.perf_counter() - start
+    print("create_metadata_index: {:.3f}s".format(build_time))
+
+    for expressions in SELECTIONS:
+        metafilters = [parse_marker_expression(expr) for expr in expressions]
+
+        start = time.perf_counter()
+        scanned = [inj_ref for inj_ref in inj_refs if inj_ref.is_member_of_metaset(metafilters)]
+        scan_time = time.perf_counter() - start
+
+        predicate = MetaFilterAnd(metafilters).create_predicate()
+
+        start = time.perf_counter()
+        predicated = [inj_ref for inj_ref in inj_refs if predicate(inj_ref.metadata)]
+        predicate_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        selected = index.select(metafilters)
+        select_time = time.perf_counter() - start
+
+        if selected != scanned or predicated != scanned:
+            raise RuntimeError("The selections do not match the scan selection. expressions={}".format(expressions))
+
+        print("{}: selected={} scan={:.4f}s predicate={:.4f}s index={:.4f}s".format(
+            " ".join(expressions), len(selected), scan_time, predicate_time, select_time))
+
+    return
+
+
+if __name__ == "__main__":
+    main()
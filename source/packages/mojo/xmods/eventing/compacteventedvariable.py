@@ -0,0 +1,99 @@
+"""
+.. module:: compacteventedvariable
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`CompactEventedVariable` class which is a memory compact
+               :class:`EventedVariable` that stores timestamps as monotonic clock values.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, Optional
+
+import time
+import weakref
+
+from datetime import datetime
+
+from mojo.xmods.eventing.eventedhistory import datetime_to_monotonic, monotonic_to_datetime
+from mojo.xmods.eventing.eventedvariable import EventedVariable
+
+
+class CompactEventedVariable(EventedVariable):
+    """
+        The :class:`CompactEventedVariable` is an :class:`EventedVariable` that stores its created, updated,
+        changed and expiration timestamps as `time.monotonic()` float values instead of `datetime` objects.
+        The timestamps are converted to `datetime` objects only when they are read through the `created`,
+        `updated` and `changed` properties or `sync_read`.
+
+        The compact variable does not store its '{sink prefix}/{event name}' key, the key is created from
+        the prefix of the owning sink when the `key` property is read.
+
+        Sinks that maintain large numbers of variables can use the compact variable by setting the
+        `SINK_VARIABLE_TYPE` of the :class:`EventedVariableSink` derived type.
+
+        ..note: The `moment` passed to `wait_for_update` is still a `datetime` taken from `datetime.now()`.
+                It is converted with a fixed anchor taken when this module was imported, so adjustments made
+                to the wall clock after that point shift the comparison by the size of the adjustment.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, key: str, name: str, sink_ref: weakref.ref, value: Any = None, data_type: Optional[str] = None, default: Any = None,
+                 allowed_list=None, timestamp: datetime = None, evented: bool = True, history: Optional[int] = None):
+        """
+            Constructor for the :class:`CompactEventedVariable` object.  The parameters are the same as the
+            :class:`EventedVariable` constructor, the key is not stored.
+        """
+        super().__init__(None, name, sink_ref, value=value, data_type=data_type, default=default,
+                         allowed_list=allowed_list, timestamp=timestamp, evented=evented, history=history)
+        return
+
+    @property
+    def key(self) -> str:
+        """
+            The key {sink prefix}/{event name} for this event.
+        """
+        varkey = self._name
+
+        sink = self.sink
+        if sink is not None and sink.sink_prefix is not None:
+            varkey = "{}/{}".format(sink.sink_prefix, self._name)
+
+        return varkey
+
+    @staticmethod
+    def timestamp_now() -> float:
+        """
+            Returns the current time of the monotonic clock.
+        """
+        now = time.monotonic()
+        return now
+
+    @staticmethod
+    def _from_datetime(timestamp: Optional[datetime]) -> Optional[float]:
+        """
+            Converts a datetime to a monotonic clock value.
+        """
+        mono = datetime_to_monotonic(timestamp)
+        return mono
+
+    @staticmethod
+    def _history_timestamp(timestamp: Optional[float]) -> float:
+        """
+            The timestamps of the compact variable are already monotonic clock values.
+        """
+        return timestamp
+
+    @staticmethod
+    def _to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+        """
+            Converts a monotonic clock value to a datetime.
+        """
+        dtval = monotonic_to_datetime(timestamp)
+        return dtval
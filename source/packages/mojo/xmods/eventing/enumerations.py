@@ -23,3 +23,10 @@ class EventedVariableState(IntEnum):
     Default = 1
     Valid = 2
     Stale = 3
+
+class EventedObserverNotify(IntEnum):
+    """
+        An enumeration that indicates which updates of an evented variable an observer is notified of.
+    """
+    ValueChanged = 0
+    AnyUpdate = 1
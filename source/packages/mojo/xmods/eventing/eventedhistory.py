@@ -0,0 +1,234 @@
+"""
+.. module:: eventedhistory
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`EventedVariableHistory` class which is a fixed size ring
+               buffer of the timestamped values of an evented variable.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, List, Optional, Tuple
+
+import time
+
+from datetime import datetime, timedelta
+
+# The monotonic clock and the wall clock are sampled together once so monotonic
+# timestamps can be converted to and from datetime objects on demand.
+MONOTONIC_ANCHOR = time.monotonic()
+DATETIME_ANCHOR = datetime.now()
+
+MONOTONIC_STALE = float("-inf")
+
+
+def datetime_to_monotonic(timestamp: Optional[datetime]) -> Optional[float]:
+    """
+        Converts a datetime to a monotonic clock value using the module anchor.
+
+        :param timestamp: The datetime to convert.
+    """
+    mono = None
+
+    if timestamp is not None:
+        if timestamp == datetime.min:
+            mono = MONOTONIC_STALE
+        else:
+            offset = (timestamp - DATETIME_ANCHOR).total_seconds()
+            mono = MONOTONIC_ANCHOR + offset
+
+    return mono
+
+
+def monotonic_to_datetime(mono: Optional[float]) -> Optional[datetime]:
+    """
+        Converts a monotonic clock value to a datetime using the module anchor.
+
+        :param mono: The monotonic clock value to convert.
+    """
+    timestamp = None
+
+    if mono is not None:
+        if mono == MONOTONIC_STALE:
+            timestamp = datetime.min
+        else:
+            offset = mono - MONOTONIC_ANCHOR
+            timestamp = DATETIME_ANCHOR + timedelta(seconds=offset)
+
+    return timestamp
+
+
+class EventedVariableHistory:
+    """
+        The :class:`EventedVariableHistory` is a fixed size ring buffer of (timestamp, value) entries.  Once the
+        buffer is full, recording a new entry overwrites the oldest entry so the memory used by the history does
+        not grow.  The entries are kept in timestamp order so time range and "value at time" queries are
+        performed with a binary search.
+
+        The evented variables record their entries with `time.monotonic()` timestamps, which can not step back
+        when the wall clock is adjusted, and convert the datetimes of queries with `datetime_to_monotonic`.
+
+        ..note: The history does not perform any locking, the owning variable records and queries the history
+                while holding the state lock of its sink.
+    """
+
+    __slots__ = ("_capacity", "_timestamps", "_values", "_start", "_count")
+
+    def __init__(self, capacity: int):
+        """
+            Constructor for the :class:`EventedVariableHistory` object.
+
+            :param capacity: The maximum number of entries retained by the history.
+        """
+        if capacity < 1:
+            errmsg = "EventedVariableHistory capacity must be at least 1. capacity={}".format(capacity)
+            raise ValueError(errmsg)
+
+        self._capacity = capacity
+        self._timestamps: List[Any] = [None] * capacity
+        self._values: List[Any] = [None] * capacity
+        self._start = 0
+        self._count = 0
+        return
+
+    @property
+    def capacity(self) -> int:
+        """
+            The maximum number of entries retained by the history.
+        """
+        return self._capacity
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self):
+        """
+            Removes all of the entries from the history.
+        """
+        self._timestamps = [None] * self._capacity
+        self._values = [None] * self._capacity
+        self._start = 0
+        self._count = 0
+        return
+
+    def entries(self) -> List[Tuple[Any, Any]]:
+        """
+            Returns all of the entries of the history from the oldest to the newest.
+        """
+        entries = self._entries_range(0, self._count)
+        return entries
+
+    def entries_between(self, start: Optional[Any]=None, end: Optional[Any]=None) -> List[Tuple[Any, Any]]:
+        """
+            Returns the entries with a timestamp in the range from start to end inclusive, from the oldest
+            to the newest.
+
+            :param start: The earliest timestamp to include or None to start with the oldest entry.
+            :param end: The latest timestamp to include or None to end with the newest entry.
+        """
+        first = 0
+        if start is not None:
+            first = self._bisect_left(start)
+
+        last = self._count
+        if end is not None:
+            last = self._bisect_right(end)
+
+        entries = self._entries_range(first, last)
+        return entries
+
+    def entry_at(self, moment: Any) -> Optional[Tuple[Any, Any]]:
+        """
+            Returns the entry that was current at the specified moment, which is the newest entry with a
+            timestamp at or before the moment.  If the moment is before the oldest entry, None is returned.
+
+            :param moment: The timestamp to find the current entry for.
+        """
+        entry = None
+
+        index = self._bisect_right(moment) - 1
+        if index >= 0:
+            pindex = (self._start + index) % self._capacity
+            entry = (self._timestamps[pindex], self._values[pindex])
+
+        return entry
+
+    def newest(self) -> Optional[Tuple[Any, Any]]:
+        """
+            Returns the newest entry of the history or None if the history is empty.
+        """
+        entry = None
+
+        if self._count > 0:
+            pindex = (self._start + self._count - 1) % self._capacity
+            entry = (self._timestamps[pindex], self._values[pindex])
+
+        return entry
+
+    def record(self, timestamp: Any, value: Any):
+        """
+            Records a new entry in the history, overwriting the oldest entry if the history is full.
+
+            :param timestamp: The timestamp of the entry.  A timestamp earlier than the newest entry, such as
+                              the timestamp of an update that was taken before a concurrent update was recorded,
+                              is raised to the timestamp of the newest entry to keep the entries ordered.
+            :param value: The value of the entry.
+        """
+        if self._count > 0:
+            newest_timestamp = self._timestamps[(self._start + self._count - 1) % self._capacity]
+            if timestamp < newest_timestamp:
+                timestamp = newest_timestamp
+
+        if self._count < self._capacity:
+            pindex = (self._start + self._count) % self._capacity
+            self._count += 1
+        else:
+            pindex = self._start
+            self._start = (self._start + 1) % self._capacity
+
+        self._timestamps[pindex] = timestamp
+        self._values[pindex] = value
+        return
+
+    def _bisect_left(self, timestamp: Any) -> int:
+        """
+            Finds the logical index of the first entry with a timestamp at or after the timestamp provided.
+        """
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._timestamps[(self._start + mid) % self._capacity] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _bisect_right(self, timestamp: Any) -> int:
+        """
+            Finds the logical index of the first entry with a timestamp after the timestamp provided.
+        """
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if timestamp < self._timestamps[(self._start + mid) % self._capacity]:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def _entries_range(self, first: int, last: int) -> List[Tuple[Any, Any]]:
+        """
+            Returns the entries from the logical index first up to but not including the logical index last.
+        """
+        entries = []
+
+        for index in range(first, last):
+            pindex = (self._start + index) % self._capacity
+            entries.append((self._timestamps[pindex], self._values[pindex]))
+
+        return entries
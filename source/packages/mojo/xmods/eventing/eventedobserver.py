@@ -0,0 +1,429 @@
+"""
+.. module:: eventedobserver
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`EventedObserver` class which is used to push the
+               updates of evented variables to callbacks instead of polling for them.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, Callable, List, Optional, Tuple, TYPE_CHECKING
+
+import heapq
+import logging
+import threading
+import time
+import weakref
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+
+from mojo.xmods.eventing.enumerations import EventedObserverNotify
+
+if TYPE_CHECKING:
+    from mojo.xmods.eventing.eventedvariable import EventedVariable
+
+# The default executor has a single worker so the callbacks of an observer are
+# dispatched in the order that the updates were made.
+DEFAULT_OBSERVER_EXECUTOR_WORKERS = 1
+
+EventedObserverCallback = Callable[["EventedVariable", Any, datetime], None]
+
+logger = logging.getLogger()
+
+DEFAULT_OBSERVER_EXECUTOR = None
+DEFAULT_OBSERVER_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_default_observer_executor() -> Executor:
+    """
+        Gets the executor that is shared by observers that were not given an executor.  The executor
+        is created the first time it is requested.
+    """
+    global DEFAULT_OBSERVER_EXECUTOR
+
+    DEFAULT_OBSERVER_EXECUTOR_LOCK.acquire()
+    try:
+        if DEFAULT_OBSERVER_EXECUTOR is None:
+            DEFAULT_OBSERVER_EXECUTOR = ThreadPoolExecutor(max_workers=DEFAULT_OBSERVER_EXECUTOR_WORKERS,
+                                                           thread_name_prefix="evented-observer")
+    finally:
+        DEFAULT_OBSERVER_EXECUTOR_LOCK.release()
+
+    return DEFAULT_OBSERVER_EXECUTOR
+
+
+class EventedObserverScheduler:
+    """
+        The :class:`EventedObserverScheduler` is a singleton that dispatches the pending debounced and throttled
+        updates of every :class:`EventedObserver` from a single background thread.  The observers are kept in a
+        heap ordered by the deadline of their pending update so the thread only wakes when a deadline is due.
+
+        An observer only has a single entry in the schedule at a time.  When a debounced observer pushes its
+        deadline back, the entry is not replaced, instead the observer schedules itself again for its new deadline
+        when its entry becomes due, so a burst of updates does not create a thread or a schedule entry per update.
+
+        The scheduler only holds weak references to the observers so scheduling an observer does not keep it alive.
+    """
+
+    instance = None
+    initialized = False
+
+    def __new__(cls, *_args, **_kwargs):
+        """
+            Constructs new instances of the :class:`EventedObserverScheduler` object. The
+            :class:`EventedObserverScheduler` object is a singleton so following instantiations
+            of the object will reference the existing singleton
+        """
+
+        if cls.instance is None:
+            cls.instance = super(EventedObserverScheduler, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self):
+        thisType = type(self)
+        if not thisType.initialized:
+            thisType.initialized = True
+
+            self._schedule: List[Tuple[float, int, weakref.ref]] = []
+            self._schedule_sequence = 0
+            self._schedule_condition = threading.Condition(threading.Lock())
+
+            self._scheduler_thread = None
+        return
+
+    @property
+    def scheduled_count(self) -> int:
+        """
+            The number of pending updates in the schedule.
+        """
+        return len(self._schedule)
+
+    def schedule_observer(self, observer: "EventedObserver", deadline: float):
+        """
+            Schedules the dispatch of the pending update of an observer and starts the scheduler thread if it
+            is not running.
+
+            :param observer: The observer to call `_dispatch_pending` on when the deadline is due.
+            :param deadline: The `time.monotonic` time the pending update is due.
+        """
+
+        self._schedule_condition.acquire()
+        try:
+            # The sequence keeps entries with the same deadline in the order they were scheduled
+            self._schedule_sequence += 1
+            heapq.heappush(self._schedule, (deadline, self._schedule_sequence, weakref.ref(observer)))
+
+            if self._scheduler_thread is None:
+                self._scheduler_thread = threading.Thread(target=self._scheduler_thread_entry, name="evented-observer-scheduler", daemon=True)
+                self._scheduler_thread.start()
+
+            self._schedule_condition.notify()
+        finally:
+            self._schedule_condition.release()
+
+        return
+
+    def _scheduler_thread_entry(self):
+        """
+            The entry point for the scheduler thread which waits for the next deadline to become due.
+        """
+
+        while True:
+            observer = None
+
+            self._schedule_condition.acquire()
+            try:
+                while observer is None:
+                    if len(self._schedule) == 0:
+                        self._schedule_condition.wait()
+                        continue
+
+                    deadline, _, observer_ref = self._schedule[0]
+                    now = time.monotonic()
+                    if deadline > now:
+                        self._schedule_condition.wait(deadline - now)
+                        continue
+
+                    heapq.heappop(self._schedule)
+
+                    # The observer is None if it was garbage collected
+                    observer = observer_ref()
+            finally:
+                self._schedule_condition.release()
+
+            try:
+                observer._dispatch_pending()
+            except Exception:
+                logger.exception("EventedObserver failed to dispatch a pending update.")
+
+            del observer
+
+        return
+
+
+def get_evented_observer_scheduler() -> EventedObserverScheduler:
+    """
+        Gets the :class:`EventedObserverScheduler` singleton that dispatches the pending updates of observers.
+    """
+    scheduler = EventedObserverScheduler()
+    return scheduler
+
+
+class EventedObserver:
+    """
+        The :class:`EventedObserver` object holds a callback that is registered with an :class:`EventedVariableSink`
+        to be notified of the updates of a single evented variable or of every variable in the sink.  The
+        callbacks are dispatched off of the updating thread by submitting them to an executor.
+
+        The callback is called with the variable, the value of the update and the datetime of the update.
+
+        An observer can filter the updates it is notified of by only being notified of updates that change the
+        value of the variable and by providing a predicate that the value must satisfy.  An observer can also
+        be configured with a debounce interval, where the callback is dispatched with the last update only once
+        no updates have been made for the interval, or with a throttle interval, where the callback is dispatched
+        at most once per interval and the last update made during the interval is dispatched at the end of the
+        interval.
+
+        The pending debounced and throttled updates of all observers are dispatched by the shared
+        :class:`EventedObserverScheduler` thread.
+    """
+
+    def __init__(self, callback: EventedObserverCallback, event_name: Optional[str]=None,
+                 notify: EventedObserverNotify=EventedObserverNotify.ValueChanged,
+                 predicate: Optional[Callable[[Any], bool]]=None, debounce: Optional[float]=None,
+                 throttle: Optional[float]=None, executor: Optional[Executor]=None):
+        """
+            Constructor for the :class:`EventedObserver` object.
+
+            :param callback: The function to call with the variable, value and updated datetime of an update.
+            :param event_name: The name of the variable to observe or None to observe every variable of the sink.
+            :param notify: Indicates if the observer is notified of updates that change the value or of any update.
+            :param predicate: An optional function that the value of an update must satisfy for it to be dispatched.
+            :param debounce: An optional interval in seconds without updates to wait for before dispatching the last update.
+            :param throttle: An optional interval in seconds that dispatches are limited to one per.
+            :param executor: An optional executor to dispatch the callbacks on, if not specified the callbacks are
+                             dispatched on the executor of the sink.
+        """
+        if debounce is not None and throttle is not None:
+            errmsg = "EventedObserver constructor was called with both a debounce and throttle interval."
+            raise ValueError(errmsg)
+
+        self._callback = callback
+        self._event_name = event_name
+        self._notify = notify
+        self._predicate = predicate
+        self._debounce = debounce
+        self._throttle = throttle
+        self._executor = executor
+
+        self._lock = threading.Lock()
+        self._pending: Optional[Tuple["EventedVariable", Any, datetime]] = None
+        self._pending_executor: Optional[Executor] = None
+        self._pending_deadline: Optional[float] = None
+        self._last_dispatch = None
+        self._cancelled = False
+        return
+
+    @property
+    def event_name(self) -> Optional[str]:
+        """
+            The name of the variable being observed or None if every variable of the sink is observed.
+        """
+        return self._event_name
+
+    @property
+    def executor(self) -> Optional[Executor]:
+        """
+            The executor the callbacks of this observer are dispatched on.
+        """
+        return self._executor
+
+    @property
+    def notify(self) -> EventedObserverNotify:
+        """
+            Indicates which updates the observer is notified of.
+        """
+        return self._notify
+
+    def cancel(self):
+        """
+            Cancels the observer so no further callbacks are dispatched, including a pending debounced
+            or throttled update.
+        """
+        self._lock.acquire()
+        try:
+            # The schedule entry of a pending update is discarded when it becomes due
+            self._cancelled = True
+            self._pending = None
+            self._pending_deadline = None
+        finally:
+            self._lock.release()
+
+        return
+
+    def handle_update(self, varobj: "EventedVariable", value: Any, updated: datetime, changed: bool,
+                      default_executor: Executor):
+        """
+            Called by the sink when a variable observed by this observer is updated.  The method filters the
+            update and submits the callback to the executor and does not block on the callback.
+
+            The predicate of the observer is evaluated on the executor, not on the updating thread, so a slow
+            predicate or a predicate that raises does not affect the update.
+
+            :param varobj: The variable that was updated.
+            :param value: The value of the update.
+            :param updated: The datetime of the update.
+            :param changed: Indicates if the update changed the value of the variable.
+            :param default_executor: The executor to use if the observer was not given an executor.
+        """
+
+        executor = self._executor
+        if executor is None:
+            executor = default_executor
+
+        if self._notify == EventedObserverNotify.ValueChanged and not changed:
+            pass
+        elif self._predicate is not None:
+            executor.submit(self._filter_update, varobj, value, updated, executor)
+        else:
+            self._accept_update(varobj, value, updated, executor, on_executor=False)
+
+        return
+
+    def _accept_update(self, varobj: "EventedVariable", value: Any, updated: datetime, executor: Executor,
+                       on_executor: bool):
+        """
+            Dispatches an update that passed the filters of the observer, or defers it if the observer
+            debounces or throttles its updates.
+
+            :param on_executor: Indicates the caller is running on the executor so an immediate dispatch
+                                is made in place instead of being submitted.
+        """
+        dispatch_now = False
+
+        self._lock.acquire()
+        try:
+            if not self._cancelled:
+                if self._debounce is not None:
+                    self._locked_defer_update(varobj, value, updated, executor, self._debounce, restart=True)
+
+                elif self._throttle is not None:
+                    now = time.monotonic()
+                    if self._pending_deadline is not None:
+                        # An update is already waiting for the end of the interval, replace it
+                        # with the latest update
+                        self._pending = (varobj, value, updated)
+                        self._pending_executor = executor
+                    elif self._last_dispatch is None or (now - self._last_dispatch) >= self._throttle:
+                        self._last_dispatch = now
+                        dispatch_now = True
+                    else:
+                        remaining = self._throttle - (now - self._last_dispatch)
+                        self._locked_defer_update(varobj, value, updated, executor, remaining, restart=False)
+
+                else:
+                    dispatch_now = True
+        finally:
+            self._lock.release()
+
+        if dispatch_now:
+            if on_executor:
+                self._dispatch(varobj, value, updated)
+            else:
+                executor.submit(self._dispatch, varobj, value, updated)
+
+        return
+
+    def _dispatch(self, varobj: "EventedVariable", value: Any, updated: datetime):
+        """
+            Runs the callback on the executor and logs any exception raised by the callback so it is
+            not silently discarded with the executor future.
+        """
+        if not self._cancelled:
+            try:
+                self._callback(varobj, value, updated)
+            except Exception:
+                logger.exception("EventedObserver callback raised an exception. variable={}".format(varobj.name))
+
+        return
+
+    def _filter_update(self, varobj: "EventedVariable", value: Any, updated: datetime, executor: Executor):
+        """
+            Runs the predicate of the observer on the executor and accepts the update if the value satisfies
+            the predicate.  An exception raised by the predicate is logged and the update is not accepted.
+        """
+        accepted = False
+
+        try:
+            accepted = self._predicate(value)
+        except Exception:
+            logger.exception("EventedObserver predicate raised an exception. variable={}".format(varobj.name))
+
+        if accepted:
+            self._accept_update(varobj, value, updated, executor, on_executor=True)
+
+        return
+
+    def _dispatch_pending(self):
+        """
+            Called by the :class:`EventedObserverScheduler` when the schedule entry of the pending update is due
+            to dispatch the pending update.  If the deadline was pushed back by a debounced update after the entry
+            was scheduled, the observer is scheduled again for the new deadline instead.
+        """
+        pending = None
+        executor = None
+        reschedule = None
+
+        self._lock.acquire()
+        try:
+            if self._pending_deadline is not None:
+                now = time.monotonic()
+                if now < self._pending_deadline:
+                    reschedule = self._pending_deadline
+                else:
+                    self._pending_deadline = None
+                    if not self._cancelled and self._pending is not None:
+                        pending = self._pending
+                        executor = self._pending_executor
+                        self._pending = None
+                        self._pending_executor = None
+                        self._last_dispatch = now
+        finally:
+            self._lock.release()
+
+        if reschedule is not None:
+            get_evented_observer_scheduler().schedule_observer(self, reschedule)
+
+        if pending is not None:
+            executor.submit(self._dispatch, *pending)
+
+        return
+
+    def _locked_defer_update(self, varobj: "EventedVariable", value: Any, updated: datetime, executor: Executor,
+                             delay: float, restart: bool):
+        """
+            Stores an update as the pending update and schedules its dispatch.  When `restart` is set, the deadline
+            of an update that is already pending is pushed back to the delay from now.
+
+            ..note: The observer lock must be held by the caller.
+        """
+        self._pending = (varobj, value, updated)
+        self._pending_executor = executor
+
+        deadline = time.monotonic() + delay
+
+        if self._pending_deadline is None:
+            self._pending_deadline = deadline
+            get_evented_observer_scheduler().schedule_observer(self, deadline)
+        elif restart:
+            # The schedule entry reschedules the observer when it becomes due
+            self._pending_deadline = deadline
+
+        return
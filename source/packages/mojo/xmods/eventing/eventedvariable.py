@@ -13,19 +13,34 @@ __copyright__ = "Copyright 2023, Myron W Walker"
 __credits__ = []
 
 
-from typing import Any, Tuple, Optional, TYPE_CHECKING
+from typing import Any, Callable, List, Tuple, Optional, TYPE_CHECKING
 
 import time
 import weakref
 
 from datetime import datetime, timedelta
 
-from mojo.xmods.eventing.enumerations import EventedVariableState
+from mojo.xmods.eventing.enumerations import EventedObserverNotify, EventedVariableState
+from mojo.xmods.eventing.eventedhistory import (
+    EventedVariableHistory,
+    datetime_to_monotonic,
+    monotonic_to_datetime
+)
 
 EVENTVAR_WAIT_RETRY_INTERVAL = 1
 EVENTVAR_WAIT_TIMEOUT = 60
 
+# Variables that have not been updated share the snapshot of their default value when the
+# default is one of a small fixed set of immutable values.  The table is built once so it
+# cannot grow with the values the variables are created with.
+INITIAL_SNAPSHOTS = {
+    (type(value), value): (value, None, None)
+        for value in [None, False, True, ""] + list(range(-1, 256))
+}
+
 if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from mojo.xmods.eventing.eventedobserver import EventedObserver, EventedObserverCallback
     from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
 
 class EventedVariable:
@@ -45,10 +60,37 @@ class EventedVariable:
         If you need to ensure that the relationship between the value and updated
         members are in sync with each other, then a sync_read and sync_update
         API is provided to ensure this synchronization.
+
+        Threads waiting in `wait_for_update` or `wait_for_value` are woken by the state
+        condition of the sink as soon as an update is made with `sync_update`.  The `interval`
+        of the wait methods is retained as the longest time a waiter will go before checking
+        the variable again, which covers updates made without notifying the sink.
+
+        Instead of polling or waiting, callbacks can be registered with `add_observer` to be
+        notified of updates.  The callbacks are dispatched on an executor so they never run
+        on the thread that is making the update.
+
+        The :class:`EventedVariable` declares `__slots__` so instances do not carry a per-instance
+        `__dict__`, instances can still be weakly referenced.  Timestamps are stored in the native representation returned by `timestamp_now`
+        and are converted to `datetime` objects on demand, which allows derived types such as the
+        :class:`CompactEventedVariable` to store more compact timestamps.
+
+        A variable can optionally keep a fixed size history of its value changes by passing a `history`
+        capacity, which can be specified in the variable description table.  The history can be queried
+        with `history_between` and `history_value_at` to reconstruct the transitions of the variable.  The
+        history is stamped with the monotonic clock so adjustments of the wall clock do not break its ordering.
+
+        The value, updated and changed members are stored together in an immutable snapshot tuple that
+        is replaced as a whole by each update.  Updates are still made while holding the state lock of
+        the sink, but `sync_read` only reads the current snapshot, which is a single atomic reference
+        read, so readers never take the state lock and always see a consistent set of members.
     """
 
+    __slots__ = ("_key", "_name", "_sink_ref", "_snapshot", "_data_type", "_default", "_allowed_list",
+                 "_expires", "_created", "_history", "__weakref__")
+
     def __init__(self, key: str, name: str, sink_ref: weakref.ref, value: Any = None, data_type: Optional[str] = None, default: Any = None,
-                 allowed_list=None, timestamp: datetime = None, evented: bool = True):
+                 allowed_list=None, timestamp: datetime = None, evented: bool = True, history: Optional[int] = None):
         """
             Constructor for the :class:`EventedVariable` object.
 
@@ -59,15 +101,14 @@ class EventedVariable:
             :param timestamp: The timestamp of the creation of this variable.  If a timestamp is passed then a value
                               needs to also be passed.
             :param evented: Indicates that this variable is evented to subscribers.
+            :param history: The optional number of value changes to retain in the history of the variable.
         """
         self._key = key
         self._name = name
         self._sink_ref = sink_ref
-        self._value = value
         self._data_type = data_type
         self._default = default
         self._allowed_list = allowed_list
-        self._timestamp = None
         
         if not evented:
             errmsg = "EventedVariable constructor was called for a variabled that is not evented."
@@ -75,15 +116,27 @@ class EventedVariable:
 
         self._expires = None
 
-        if self._value is not None and timestamp is None:
-            self._timestamp  = datetime.now()
+        native_timestamp = None
+        if timestamp is not None:
+            native_timestamp = self._from_datetime(timestamp)
+        elif value is not None:
+            native_timestamp = self.timestamp_now()
 
         if value is None and default is not None:
-            self._value = default
+            value = default
+
+        self._created = native_timestamp
+        if native_timestamp is None:
+            self._snapshot = self._get_initial_snapshot(value)
+        else:
+            self._snapshot = (value, native_timestamp, native_timestamp)
+
+        self._history = None
+        if history is not None:
+            self._history = EventedVariableHistory(history)
+            if native_timestamp is not None:
+                self._history.record(self._history_timestamp(native_timestamp), value)
 
-        self._created = timestamp
-        self._updated = timestamp
-        self._changed = timestamp
         return
 
     @property
@@ -91,14 +144,16 @@ class EventedVariable:
         """
             When the event variabled value was set for the first time.
         """
-        return self._created
+        created = self._to_datetime(self._created)
+        return created
 
     @property
     def changed(self) -> datetime:
         """
             A datetime object that indicates when the value was last changed in value.
         """
-        return self._changed
+        changed = self._to_datetime(self._snapshot[2])
+        return changed
 
     @property
     def expired(self) -> bool:
@@ -107,7 +162,7 @@ class EventedVariable:
         """
         exp = False
         if self._expires is not None:
-            now = datetime.now()
+            now = self.timestamp_now()
             if now > self._expires:
                 exp = True
         else:
@@ -115,6 +170,13 @@ class EventedVariable:
 
         return exp
 
+    @property
+    def history_enabled(self) -> bool:
+        """
+            Indicates if this variable is keeping a history of its value changes.
+        """
+        return self._history is not None
+
     @property
     def key(self) -> str:
         """
@@ -127,7 +189,7 @@ class EventedVariable:
         """
             The last initiator moment that was registered with the sink for this event.
         """
-        moment = self.sink.initiator_moment_lookup(self._key)
+        moment = self.sink.initiator_moment_lookup(self.key)
         return moment
 
     @property
@@ -137,7 +199,7 @@ class EventedVariable:
         """
         rtn_state = EventedVariableState.UnInitialized
 
-        updated = self._updated
+        updated = self._to_datetime(self._snapshot[1])
         if updated == datetime.min:
             rtn_state = EventedVariableState.Stale
         elif updated is not None:
@@ -150,7 +212,8 @@ class EventedVariable:
         """
             A datetime object that indicates when the value was last updated.
         """
-        return self._updated
+        updated = self._to_datetime(self._snapshot[1])
+        return updated
 
     @property
     def name(self) -> str:
@@ -171,7 +234,96 @@ class EventedVariable:
         """
             The last value reported for the event variable this instance is referencing.
         """
-        return self._value
+        return self._snapshot[0]
+
+    @staticmethod
+    def timestamp_now() -> Any:
+        """
+            Returns the current time in the timestamp representation used to store the timestamps
+            of this variable type.
+        """
+        now = datetime.now()
+        return now
+
+    def add_observer(self, callback: "EventedObserverCallback", notify: EventedObserverNotify=EventedObserverNotify.ValueChanged,
+                     predicate: Optional[Callable[[Any], bool]]=None, debounce: Optional[float]=None,
+                     throttle: Optional[float]=None, executor: Optional["Executor"]=None) -> "EventedObserver":
+        """
+            Registers a callback with the owning sink that is called when this variable is updated.  See
+            :meth:`EventedVariableSink.add_observer` for a description of the parameters.
+
+            :returns: The observer that was registered, which is passed to `remove_observer` to unregister it.
+        """
+        observer = self.sink.add_observer(callback, event_name=self._name, notify=notify, predicate=predicate,
+                                          debounce=debounce, throttle=throttle, executor=executor)
+        return observer
+
+    def remove_observer(self, observer: "EventedObserver"):
+        """
+            Unregisters an observer that was registered with `add_observer`.
+
+            :param observer: The observer to unregister.
+        """
+        self.sink.remove_observer(observer)
+        return
+
+    def enable_history(self, capacity: int):
+        """
+            Enables the history of value changes for this variable.  If the history is already enabled, it
+            is replaced with an empty history of the new capacity.
+
+            :param capacity: The number of value changes to retain in the history.
+        """
+        history = EventedVariableHistory(capacity)
+
+        for _ in self.sink.yield_state_lock():
+            self._history = history
+
+        return
+
+    def history_between(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Tuple[datetime, Any]]:
+        """
+            Returns the (updated, value) entries of the history of this variable that were recorded between the
+            start and end datetimes inclusive, from the oldest to the newest.
+
+            :param start: The earliest datetime to include or None to start with the oldest entry.
+            :param end: The latest datetime to include or None to end with the newest entry.
+
+            :raises RuntimeError: If the history is not enabled for this variable.
+        """
+        mono_start = datetime_to_monotonic(start)
+        mono_end = datetime_to_monotonic(end)
+
+        entries = []
+        for _ in self.sink.yield_state_lock():
+            history = self._locked_get_history()
+            entries = history.entries_between(mono_start, mono_end)
+
+        entries = [ (monotonic_to_datetime(ts), val) for ts, val in entries ]
+        return entries
+
+    def history_value_at(self, moment: datetime) -> Any:
+        """
+            Returns the value this variable had at the moment specified according to its history.
+
+            :param moment: The datetime to find the value of the variable at.
+
+            :raises RuntimeError: If the history is not enabled for this variable.
+            :raises LookupError: If the moment is before the oldest entry retained in the history.
+        """
+        mono_moment = datetime_to_monotonic(moment)
+
+        entry = None
+        for _ in self.sink.yield_state_lock():
+            history = self._locked_get_history()
+            entry = history.entry_at(mono_moment)
+
+        if entry is None:
+            errmsg = "The history of variable '{}' does not contain a value at moment={}.".format(self._name, moment)
+            raise LookupError(errmsg)
+
+        _, value = entry
+        return value
 
     def invalidate_subscription(self):
         """
@@ -183,57 +335,60 @@ class EventedVariable:
             can still be used, but should be used with the understanding that they are
             stale and should be used with caution.
         """
-        self._expires = datetime.now()
+        self._expires = self.timestamp_now()
         return
 
     def sync_read(self) -> Tuple[Any, datetime, datetime, EventedVariableState]:
         """
             Performs a threadsafe read of the value, updated, and state members of a
-            :class:`EventedVariable` instance.
+            :class:`EventedVariable` instance.  The members are read from the snapshot published by
+            the last update so the read does not take the state lock of the sink.
 
             ..note: 'sync_read' does not guarantee that the values being read are up-to-date.  If you want
             freshness guarantees and subscription assurance, you must use 'wait_for_update' or 'wait_for_value'
         """
 
-        value, updated, changed, state = None, None, None, EventedVariableState.UnInitialized
+        state = EventedVariableState.UnInitialized
 
-        sink = self.sink
-        for _ in sink.yield_state_lock():
-            updated = self._updated
-            changed = self._changed
+        value, updated, changed = self._snapshot
 
-            if updated == datetime.min:
-                state = EventedVariableState.Stale
-            elif updated is not None:
-                state = EventedVariableState.Valid
+        updated = self._to_datetime(updated)
+        changed = self._to_datetime(changed)
 
-            value = self._value
+        if updated == datetime.min:
+            state = EventedVariableState.Stale
+        elif updated is not None:
+            state = EventedVariableState.Valid
 
         return value, updated, changed, state
 
-    def sync_update(self, value: Any, expires: Optional[datetime] = None, sink_locked: bool = False):
+    def sync_update(self, value: Any, expires: Optional[datetime] = None, sink_locked: bool = False,
+                    notify: bool = True, updated: Optional[Any] = None):
         """
             Peforms a threadsafe update of the value, updated and sid members of a
             :class:`EventedVariable` instance.
+
+            :param value: The new value of the variable.
+            :param expires: The time the subscription for the variable expires.
+            :param sink_locked: Indicates that the caller is already holding the sink state lock.
+            :param notify: Indicates that waiters on the sink state condition should be notified. Batch
+                           updates pass False and notify the sink once after all variables are updated.
+            :param updated: The update timestamp to use in the representation returned by `timestamp_now`,
+                            batch updates share a single timestamp.
         """
-        updated = datetime.now()
+        if updated is None:
+            updated = self.timestamp_now()
+
+        if expires is not None:
+            expires = self._from_datetime(expires)
+
+        sink = self.sink
 
         if sink_locked:
-            orig_value = self._value
-            self._value, self._updated = value, updated
-            if orig_value != self._value:
-                self._changed = updated
-            if expires is not None:
-                self._expires = expires
+            self._locked_update(sink, value, expires, notify, updated)
         else:
-            sink = self.sink
             for _ in sink.yield_state_lock():
-                orig_value = self._value
-                self._value, self._updated = value, updated
-                if orig_value != self._value:
-                    self._changed = updated
-                if expires is not None:
-                    self._expires = expires
+                self._locked_update(sink, value, expires, notify, updated)
 
         return
 
@@ -258,22 +413,18 @@ class EventedVariable:
             # this variable when we renew our subscription.
             sink = self.sink
             if sink.auto_subscribe:
-                sink.trigger_auto_subscribe_from_variable(self._key)
+                sink.trigger_auto_subscribe_from_variable(self.key)
 
-        now_time = datetime.now()
-        start_time = now_time
-        end_time = start_time + timedelta(seconds=timeout)
-        while True:
-            if now_time > end_time:
-                raise TimeoutError("Timeout waiting for event variable to update.") from None
+        native_moment = self._from_datetime(moment)
 
-            if self._updated is not None and self._updated > moment:
-                break
+        def has_updated():
+            updated = self._snapshot[1]
+            rtnval = updated is not None and updated > native_moment
+            return rtnval
 
-            time.sleep(interval)
-            now_time = datetime.now()
+        self._wait_for_condition(has_updated, timeout, interval)
 
-        return self._value
+        return self._snapshot[0]
 
     def wait_for_value(self, timeout: float = EVENTVAR_WAIT_TIMEOUT, interval: float = EVENTVAR_WAIT_RETRY_INTERVAL) -> Any:
         """
@@ -291,21 +442,146 @@ class EventedVariable:
             # this variable when we renew our subscription.
             sink = self.sink
             if sink.auto_subscribe:
-                sink.trigger_auto_subscribe_from_variable(self._key)
+                sink.trigger_auto_subscribe_from_variable(self.key)
+
+        def has_value():
+            rtnval = self._snapshot[1] is not None
+            return rtnval
+
+        self._wait_for_condition(has_value, timeout, interval)
+
+        return self._snapshot[0]
+
+    @staticmethod
+    def _get_initial_snapshot(value: Any) -> Tuple[Any, None, None]:
+        """
+            Gets the shared snapshot of a variable that has not been updated and holds the value provided.
+        """
+        try:
+            snapshot = INITIAL_SNAPSHOTS.get((type(value), value), None)
+        except TypeError:
+            # Unhashable values get their own snapshot
+            snapshot = None
+
+        if snapshot is None:
+            snapshot = (value, None, None)
+
+        return snapshot
+
+    @staticmethod
+    def _from_datetime(timestamp: Optional[datetime]) -> Any:
+        """
+            Converts a datetime to the timestamp representation used by this variable type.
+        """
+        return timestamp
+
+    @staticmethod
+    def _history_timestamp(timestamp: Any) -> float:
+        """
+            Converts the timestamp of an update that is being recorded to the monotonic clock value the
+            history entry is stamped with.  The timestamps of this variable type are taken from the wall
+            clock, so the entry is stamped with the current time of the monotonic clock instead.
+        """
+        mono = time.monotonic()
+        return mono
+
+    @staticmethod
+    def _to_datetime(timestamp: Any) -> Optional[datetime]:
+        """
+            Converts a timestamp stored by this variable type to a datetime.
+        """
+        return timestamp
+
+    def _locked_get_history(self) -> EventedVariableHistory:
+        """
+            Gets the history of this variable.
+
+            ..note: The state lock must be held by the caller.
+
+            :raises RuntimeError: If the history is not enabled for this variable.
+        """
+        if self._history is None:
+            errmsg = "The history is not enabled for variable '{}'.".format(self._name)
+            raise RuntimeError(errmsg)
+
+        return self._history
+
+    def _locked_update(self, sink: "EventedVariableSink", value: Any, expires: Any, notify: bool, updated: Any):
+        """
+            Publishes a new snapshot for an update and notifies the waiters and observers of the sink.
+
+            ..note: The state lock must be held by the caller.
+        """
+        orig_value, _, changed_timestamp = self._snapshot
+
+        changed = orig_value != value
+        if changed:
+            changed_timestamp = updated
+
+        # The snapshot is replaced with a single reference assignment so lock free readers
+        # see either the previous or the new snapshot and never a partial update
+        self._snapshot = (value, updated, changed_timestamp)
+
+        if self._history is not None and (changed or len(self._history) == 0):
+            self._history.record(self._history_timestamp(updated), value)
+        if expires is not None:
+            self._expires = expires
+        if notify:
+            sink.notify_state_change()
+        sink.notify_observers(self, value, updated, changed)
+
+        return
+
+    def _wait_for_condition(self, predicate: Callable[[], bool], timeout: float, interval: float):
+        """
+            Waits for the predicate provided to return True.  If the sink provides a state condition, the
+            wait is performed on the condition so the waiting thread wakes as soon as the sink is updated,
+            otherwise the predicate is polled every interval.
+
+            :param predicate: A function that returns True when the wait is satisfied.
+            :param timeout: The time in seconds to wait for the predicate to be satisfied.
+            :param interval: The longest time in seconds to wait before checking the predicate again.
+        """
+
+        sink = self.sink
+
+        condition = None
+        if sink is not None:
+            condition = sink.state_condition
 
         now_time = datetime.now()
         start_time = now_time
         end_time = start_time + timedelta(seconds=timeout)
         while True:
-            if now_time > end_time:
-                raise TimeoutError("Timeout waiting for event variable to update.") from None
+            if condition is not None:
+                condition.acquire()
+                try:
+                    # Check the predicate while holding the lock so an update that occurs
+                    # before we start waiting on the condition is not missed
+                    if predicate():
+                        break
+
+                    if now_time > end_time:
+                        raise TimeoutError("Timeout waiting for event variable to update.") from None
+
+                    remaining = (end_time - now_time).total_seconds()
+                    wait_time = min(interval, remaining)
+                    condition.wait(wait_time)
+                finally:
+                    condition.release()
+
+            else:
+                if predicate():
+                    break
+
+                if now_time > end_time:
+                    raise TimeoutError("Timeout waiting for event variable to update.") from None
+
+                time.sleep(interval)
 
-            if self._updated is not None:
-                break
-            time.sleep(interval)
             now_time = datetime.now()
 
-        return self._value
+        return
 
     def __str__(self) -> str:
         value, updated, changed, state = self.sync_read()
@@ -14,16 +14,29 @@ __copyright__ = "Copyright 2023, Myron W Walker"
 __credits__ = []
 
 
-from typing import Any, Dict, Optional, Tuple, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
+import os
 import threading
 import weakref
 
-from datetime import datetime
+from concurrent.futures import Executor
+from datetime import datetime, timedelta
 
 from mojo.errors.exceptions import NotOverloadedError
 
-from mojo.xmods.eventing.eventedvariable import EventedVariable
+from mojo.xmods.eventing.enumerations import EventedObserverNotify
+from mojo.xmods.eventing.eventedobserver import (
+    EventedObserver,
+    EventedObserverCallback,
+    get_default_observer_executor
+)
+from mojo.xmods.eventing.eventedvariable import (
+    EventedVariable,
+    EVENTVAR_WAIT_RETRY_INTERVAL,
+    EVENTVAR_WAIT_TIMEOUT
+)
+from mojo.xmods.eventing.subscriptionrenewal import get_subscription_renewal_scheduler
 
 class EventedVariableSink:
     """
@@ -32,14 +45,31 @@ class EventedVariableSink:
 
     SINK_VARIABLE_TYPE = EventedVariable
 
+    # When lazy variables are enabled, the evented variables are created on first use instead
+    # of being pre-created for every sink instance in the constructor.
+    SINK_LAZY_VARIABLES = False
 
-    def __init__(self, variable_description_table: dict, state_lock: Optional[threading.RLock]=None, sink_prefix: str=None, auto_subscribe: bool=False):
+    # The default number of value changes each evented variable retains in its history, variables
+    # can override the default with a 'history' entry in their variable description.
+    SINK_HISTORY_CAPACITY = None
+
+    # When auto renew is enabled, subscriptions registered with `register_subscription` are renewed
+    # by the subscription renewal scheduler before they expire.
+    SINK_AUTO_RENEW = False
+
+
+    def __init__(self, variable_description_table: dict, state_lock: Optional[threading.RLock]=None, sink_prefix: str=None, auto_subscribe: bool=False,
+                 observer_executor: Optional[Executor]=None):
         super().__init__()
 
         self._event_state_lock = state_lock
         if self._event_state_lock is None:
             self._event_state_lock = threading.RLock()
 
+        # The state condition shares the state lock so that updates made while holding the
+        # state lock can wake any threads waiting on evented variable updates
+        self._event_state_condition = threading.Condition(self._event_state_lock)
+
         self._sink_prefix = sink_prefix
         self._variable_description_table = variable_description_table
 
@@ -47,10 +77,20 @@ class EventedVariableSink:
         self._subscription_id = None
         self._subscription_expiration = None
 
+        # The evented variables are keyed by event name so lookups and updates do not need to build
+        # the '{sink prefix}/{event name}' variable key and the compact variables do not need a key
+        # string per variable.  The '{sink prefix}/{event name}' key is available from the `key` of
+        # each variable.
         self._evented_variables: Dict[str, EventedVariable] = {}
         self._initiator_moment_register: Dict[str, Union[Tuple[datetime, Any], Tuple[None, None]]] = {}
 
-        self._create_event_variables_from_list()
+        # Observers are registered by event name, the observers registered with a None event name
+        # are notified of the updates of every variable of the sink
+        self._observer_executor = observer_executor
+        self._observers: Dict[Optional[str], List[EventedObserver]] = {}
+
+        if not self.SINK_LAZY_VARIABLES:
+            self._create_event_variables_from_list()
 
         return
 
@@ -65,6 +105,21 @@ class EventedVariableSink:
         """
         return self._subscription_id
 
+    @property
+    def sink_prefix(self) -> Optional[str]:
+        """
+            Returns the prefix that is used to create the keys of the evented variables of this sink.
+        """
+        return self._sink_prefix
+
+    @property
+    def state_condition(self) -> threading.Condition:
+        """
+            Returns the condition that is notified when evented variables of this sink are updated.  The
+            condition shares the state lock of the sink.
+        """
+        return self._event_state_condition
+
     @property
     def subscriptionExpiration(self) -> str:
         return self._subscription_expiration
@@ -103,6 +158,64 @@ class EventedVariableSink:
 
         return
     
+    def add_observer(self, callback: EventedObserverCallback, event_name: Optional[str]=None,
+                     notify: EventedObserverNotify=EventedObserverNotify.ValueChanged,
+                     predicate: Optional[Callable[[Any], bool]]=None, debounce: Optional[float]=None,
+                     throttle: Optional[float]=None, executor: Optional[Executor]=None) -> EventedObserver:
+        """
+            Registers a callback that is called when an evented variable of this sink is updated.  The callback
+            is called with the variable, the value of the update and the datetime of the update and is dispatched
+            on an executor so it does not run on the thread making the update.
+
+            :param callback: The function to call with the variable, value and updated datetime of an update.
+            :param event_name: The name of the variable to observe or None to observe every variable of the sink.
+            :param notify: Indicates if the observer is notified of updates that change the value or of any update.
+            :param predicate: An optional function that the value of an update must satisfy for it to be dispatched.
+            :param debounce: An optional interval in seconds without updates to wait for before dispatching the last update.
+            :param throttle: An optional interval in seconds that dispatches are limited to one per.
+            :param executor: An optional executor to dispatch the callbacks on, if not specified the observer executor
+                             of the sink is used.
+
+            :returns: The observer that was registered, which is passed to `remove_observer` to unregister it.
+
+            :raises ValueError: If the event name is not a variable described for this sink.
+        """
+        if event_name is not None and event_name not in self._variable_description_table:
+            errmsg = "Unable to observe unknown evented variable '{}' for sink type={}.".format(event_name, type(self).__name__)
+            raise ValueError(errmsg)
+
+        observer = EventedObserver(callback, event_name=event_name, notify=notify, predicate=predicate,
+                                   debounce=debounce, throttle=throttle, executor=executor)
+
+        for _ in self.yield_state_lock():
+            if event_name in self._observers:
+                # Replace the list instead of appending so the list being dispatched to is never modified
+                self._observers[event_name] = self._observers[event_name] + [observer]
+            else:
+                self._observers[event_name] = [observer]
+
+        return observer
+
+    def remove_observer(self, observer: EventedObserver):
+        """
+            Unregisters an observer that was registered with `add_observer` and cancels any of its pending updates.
+
+            :param observer: The observer to unregister.
+        """
+
+        for _ in self.yield_state_lock():
+            event_name = observer.event_name
+            if event_name in self._observers:
+                remaining = [ obs for obs in self._observers[event_name] if obs is not observer ]
+                if len(remaining) > 0:
+                    self._observers[event_name] = remaining
+                else:
+                    del self._observers[event_name]
+
+        observer.cancel()
+
+        return
+
     def lookup_event_variable(self, event_name: str) -> Union[EventedVariable, None]:
         """
             Looks up the specified event variable.
@@ -111,33 +224,74 @@ class EventedVariableSink:
         """
         varobj = None
 
-        varkey = event_name
-        if self._sink_prefix is not None:
-            varkey = "{}/{}".format(self._sink_prefix, event_name)
-
         for _ in self.yield_state_lock():
-            if varkey in self._evented_variables:
-                varobj = self._evented_variables[varkey]
+            varobj = self._locked_lookup_event_variable(event_name)
 
         return varobj
 
     def update_event_variable(self, event_name: str, event_value: Any, sink_locked: bool=False):
 
-        varkey = event_name
-        if self._sink_prefix is not None:
-            varkey = "{}/{}".format(self._sink_prefix, event_name)
-
         if sink_locked:
-            varobj = self._evented_variables[varkey]
+            varobj = self._locked_get_event_variable(event_name)
             varobj.sync_update(event_value, expires=self._subscription_expiration, sink_locked=True)
 
         else:
             for _ in self.yield_state_lock():
-                varobj = self._evented_variables[varkey]
+                varobj = self._locked_get_event_variable(event_name)
                 varobj.sync_update(event_value, expires=self._subscription_expiration, sink_locked=True)
 
         return
 
+    def update_event_variables(self, event_values: Dict[str, Any], sink_locked: bool=False):
+        """
+            Applies a batch of evented variable updates under a single acquisition of the state lock.  All
+            of the variables in the batch share the same updated timestamp and waiters are notified once
+            after the entire batch has been applied.
+
+            :param event_values: A table of event names and the values to update the variables with.
+            :param sink_locked: Indicates that the caller is already holding the state lock.
+        """
+        if sink_locked:
+            self._locked_update_event_variables(event_values)
+
+        else:
+            for _ in self.yield_state_lock():
+                self._locked_update_event_variables(event_values)
+
+        return
+
+    def wait_for_all(self, predicate_map: Dict[str, Callable[[Any], bool]], timeout: float=EVENTVAR_WAIT_TIMEOUT,
+                     interval: float=EVENTVAR_WAIT_RETRY_INTERVAL) -> Dict[str, Any]:
+        """
+            Waits for the values of all of the evented variables in the predicate map to satisfy their predicate.
+
+            :param predicate_map: A table of event names and the predicate each variable value must satisfy.
+            :param timeout: The time in seconds to wait for the predicates to be satisfied.
+            :param interval: The longest time in seconds to wait before checking the predicates again.
+
+            :returns: A table of the event names and the variable values that satisfied the predicates.
+
+            :raises TimeoutError: If the predicates are not all satisfied before the timeout.
+        """
+        satisfied = self._wait_for_variables(predicate_map, timeout, interval, require_all=True)
+        return satisfied
+
+    def wait_for_any(self, predicate_map: Dict[str, Callable[[Any], bool]], timeout: float=EVENTVAR_WAIT_TIMEOUT,
+                     interval: float=EVENTVAR_WAIT_RETRY_INTERVAL) -> Dict[str, Any]:
+        """
+            Waits for the value of any of the evented variables in the predicate map to satisfy its predicate.
+
+            :param predicate_map: A table of event names and the predicate each variable value is tested with.
+            :param timeout: The time in seconds to wait for a predicate to be satisfied.
+            :param interval: The longest time in seconds to wait before checking the predicates again.
+
+            :returns: A table of the event names and the variable values that satisfied their predicates.
+
+            :raises TimeoutError: If none of the predicates are satisfied before the timeout.
+        """
+        satisfied = self._wait_for_variables(predicate_map, timeout, interval, require_all=False)
+        return satisfied
+
     def invalidate_subscription(self, scope: Optional[Any]=None):
         """
             Called in order to invalidate the subscription(s) specified by scope.
@@ -148,6 +302,26 @@ class EventedVariableSink:
         errmsg = "The `invalidate_subscription` method was not overloaded for type={}".format(type(self).__name__)
         raise NotOverloadedError(errmsg)
 
+    def register_subscription(self, subscription_id: str, expiration: Optional[datetime]):
+        """
+            Called by derived sinks when a subscription is made or renewed to record the subscription id and
+            expiration.  If `SINK_AUTO_RENEW` is enabled, the renewal of the subscription is scheduled ahead
+            of the expiration.
+
+            :param subscription_id: The id of the subscription.
+            :param expiration: The time the subscription expires or None if the subscription does not expire.
+        """
+
+        for _ in self.yield_state_lock():
+            self._subscription_id = subscription_id
+            self._subscription_expiration = expiration
+
+        if self.SINK_AUTO_RENEW:
+            scheduler = get_subscription_renewal_scheduler()
+            scheduler.schedule_sink(self)
+
+        return
+
     def renew_subscription(self, scope: Optional[Any]=None):
         """
             Called in order to renew the subscription(s) specified by scope. 
@@ -167,6 +341,49 @@ class EventedVariableSink:
         errmsg = "The `trigger_auto_subscribe_from_variable` method was not overloaded for type={}".format(type(self).__name__)
         raise NotOverloadedError(errmsg)
 
+    def notify_observers(self, varobj: EventedVariable, value: Any, updated: Any, changed: bool):
+        """
+            Hands an update of an evented variable to the observers of the variable and the observers of
+            the whole sink.
+
+            ..note: The state lock must be held by the caller.
+
+            :param varobj: The variable that was updated.
+            :param value: The value of the update.
+            :param updated: The timestamp of the update in the representation used by the variable type.
+            :param changed: Indicates if the update changed the value of the variable.
+        """
+        observers = self._observers
+        if len(observers) > 0:
+            variable_observers = observers.get(varobj.name, None)
+            sink_observers = observers.get(None, None)
+
+            if variable_observers is not None or sink_observers is not None:
+                executor = self._observer_executor
+                if executor is None:
+                    executor = get_default_observer_executor()
+
+                updated = varobj._to_datetime(updated)
+
+                if variable_observers is not None:
+                    for observer in variable_observers:
+                        observer.handle_update(varobj, value, updated, changed, executor)
+
+                if sink_observers is not None:
+                    for observer in sink_observers:
+                        observer.handle_update(varobj, value, updated, changed, executor)
+
+        return
+
+    def notify_state_change(self):
+        """
+            Wakes any threads that are waiting for evented variables of this sink to be updated.
+
+            ..note: The state lock must be held by the caller.
+        """
+        self._event_state_condition.notify_all()
+        return
+
     def yield_state_lock(self) -> threading.RLock:
         """
             Yields the state lock in a way that it can be automatically released at the end of an
@@ -185,16 +402,21 @@ class EventedVariableSink:
             :param event_name: The name of the event variable to create.
             :param data_type: The type of the event variable to create.
             :param default: The default value to set the new event variable to.
+
+            :returns: The event variable that was created.
         """
         varkey = event_name
         if self._sink_prefix is not None:
             varkey = "{}/{}".format(self._sink_prefix, event_name)
 
+        if self.SINK_HISTORY_CAPACITY is not None and "history" not in event_desc:
+            event_desc["history"] = self.SINK_HISTORY_CAPACITY
+
         sink_ref = weakref.ref(self)
         event_var = self.SINK_VARIABLE_TYPE(varkey, event_name, sink_ref, **event_desc)
-        self._evented_variables[varkey] = event_var
+        self._evented_variables[event_name] = event_var
 
-        return
+        return event_var
 
     def _create_event_variables_from_list(self):
         """
@@ -202,6 +424,9 @@ class EventedVariableSink:
             detailed in the EVENTED_VARIABLE_DESCRIPTIONS table of the :class:`EventedVariableSink` derived type.
             We pre-create the event variables for each instance of an :class:`EventedVariableSink` type as the
             sink objects are designed to be used in a one to one, instance to remote object way.
+
+            ..note: When `SINK_LAZY_VARIABLES` is enabled this method is not called and the variables are
+                    created the first time they are looked up or updated.
         """
 
         for event_name in self._variable_description_table:
@@ -209,3 +434,130 @@ class EventedVariableSink:
             self._create_event_variable(event_name, **event_desc)
 
         return
+
+    def _locked_get_event_variable(self, event_name: str) -> EventedVariable:
+        """
+            Gets the specified event variable, creating it if lazy variables are enabled.
+
+            ..note: The state lock must be held by the caller.
+
+            :raises KeyError: If the event name is not a variable described for this sink.
+        """
+        varobj = self._locked_lookup_event_variable(event_name)
+        if varobj is None:
+            raise KeyError(event_name)
+
+        return varobj
+
+    def _locked_has_event_variable(self, event_name: str) -> bool:
+        """
+            Indicates if the specified event variable exists or can be created on first use, without
+            creating it.
+
+            ..note: The state lock must be held by the caller.
+        """
+        has_variable = event_name in self._evented_variables
+        if not has_variable and self.SINK_LAZY_VARIABLES:
+            has_variable = event_name in self._variable_description_table
+        return has_variable
+
+    def _locked_lookup_event_variable(self, event_name: str) -> Union[EventedVariable, None]:
+        """
+            Looks up the specified event variable, creating it if lazy variables are enabled and
+            the variable is described in the variable description table.
+
+            ..note: The state lock must be held by the caller.
+        """
+        varobj = None
+
+        if event_name in self._evented_variables:
+            varobj = self._evented_variables[event_name]
+        elif self.SINK_LAZY_VARIABLES and event_name in self._variable_description_table:
+            event_desc = self._variable_description_table[event_name]
+            varobj = self._create_event_variable(event_name, **event_desc)
+
+        return varobj
+
+    def _locked_update_event_variables(self, event_values: Dict[str, Any]):
+        """
+            Applies a batch of evented variable updates.  The event names of the whole batch are checked
+            before any variable is updated so a batch with an unknown event name is not partially applied.
+
+            ..note: The state lock must be held by the caller.
+
+            :raises KeyError: If an event name is not a variable described for this sink.
+        """
+        missing = [event_name for event_name in event_values if not self._locked_has_event_variable(event_name)]
+        if len(missing) > 0:
+            errmsg = "Unable to update unknown evented variables for sink type={}. missing={}".format(
+                type(self).__name__, ", ".join(missing))
+            raise KeyError(errmsg)
+
+        updated = self.SINK_VARIABLE_TYPE.timestamp_now()
+        expires = self._subscription_expiration
+
+        for event_name, event_value in event_values.items():
+            varobj = self._locked_get_event_variable(event_name)
+            varobj.sync_update(event_value, expires=expires, sink_locked=True, notify=False, updated=updated)
+
+        self.notify_state_change()
+
+        return
+
+    def _wait_for_variables(self, predicate_map: Dict[str, Callable[[Any], bool]], timeout: float,
+                            interval: float, require_all: bool) -> Dict[str, Any]:
+        """
+            Waits on the state condition for the values of the evented variables in the predicate map to
+            satisfy their predicates.
+        """
+
+        variables = {}
+        missing = []
+        for event_name in predicate_map.keys():
+            varobj = self.lookup_event_variable(event_name)
+            if varobj is not None:
+                variables[event_name] = varobj
+            else:
+                missing.append(event_name)
+
+        if len(missing) > 0:
+            errmsg_lines = [
+                "Unable to wait on unknown evented variables for sink type={}.".format(type(self).__name__),
+                "MISSING: {}".format(", ".join(missing))
+            ]
+            errmsg = os.linesep.join(errmsg_lines)
+            raise ValueError(errmsg)
+
+        satisfied = {}
+
+        now_time = datetime.now()
+        end_time = now_time + timedelta(seconds=timeout)
+
+        self._event_state_condition.acquire()
+        try:
+            while True:
+                satisfied = {}
+                for event_name, predicate in predicate_map.items():
+                    value = variables[event_name].value
+                    if predicate(value):
+                        satisfied[event_name] = value
+
+                if require_all and len(satisfied) == len(predicate_map):
+                    break
+                elif not require_all and len(satisfied) > 0:
+                    break
+
+                if now_time > end_time:
+                    errmsg = "Timeout waiting for evented variables to satisfy predicates. variables={}".format(
+                        ", ".join(predicate_map.keys()))
+                    raise TimeoutError(errmsg) from None
+
+                remaining = (end_time - now_time).total_seconds()
+                wait_time = min(interval, remaining)
+                self._event_state_condition.wait(wait_time)
+
+                now_time = datetime.now()
+        finally:
+            self._event_state_condition.release()
+
+        return satisfied
@@ -0,0 +1,512 @@
+"""
+.. module:: eventrecorder
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`EventedSinkRecorder` and :class:`EventedSinkReplayer` classes
+               which are used to record the updates made to an :class:`EventedVariableSink` to a compact
+               append only binary log and to replay the log into a sink.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, BinaryIO, Deque, Dict, Generator, List, Optional, Tuple, TYPE_CHECKING
+
+import collections
+import logging
+import pickle
+import struct
+import threading
+import time
+
+from enum import IntEnum
+
+if TYPE_CHECKING:
+    from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+logger = logging.getLogger()
+
+EVENT_LOG_MAGIC = b"MJEVLOG"
+EVENT_LOG_VERSION = 2
+
+EVENT_LOG_HEADER = struct.Struct("<7sB")
+
+# Name records assign a numeric id to an event name the first time it is seen so
+# the following records only store the id.
+NAME_RECORD = struct.Struct("<HH")
+MAX_NAME_ID = 0xFFFF
+
+# Every other record starts with its type and the time offset in seconds from the
+# start of the recording.
+RECORD_PREFIX = struct.Struct("<Bd")
+
+ENTRY_ID = struct.Struct("<H")
+BATCH_COUNT = struct.Struct("<I")
+PAYLOAD_LENGTH = struct.Struct("<I")
+
+
+class EventLogRecordType(IntEnum):
+    """
+        An enumeration of the types of records stored in an event log.
+    """
+    Name = 0
+    Update = 1
+    BatchUpdate = 2
+    Invalidate = 3
+
+
+class EventedSinkRecorder:
+    """
+        The :class:`EventedSinkRecorder` records the `update_event_variable`, `update_event_variables` and
+        `invalidate_subscription` calls made on an :class:`EventedVariableSink` to an append only binary
+        log.  Each record stores the time offset of the call from the start of the recording so the log
+        can be replayed with the original timing by the :class:`EventedSinkReplayer`.
+
+        Event names are written once and referenced by a numeric id, values and invalidation scopes are
+        stored pickled.  A value that can not be pickled is logged and left out of the log.
+
+        The calls are queued in the order they are applied while the state lock of the sink is held and are
+        pickled and written to the log after the state lock is released, so the producers and waiters of the
+        sink do not wait on the log.
+
+        ..note: The recorder intercepts the calls by wrapping the methods of the sink instance it is attached
+                to, the methods are restored when the recorder is detached.
+    """
+
+    def __init__(self, filename: str, autoflush: bool=False):
+        """
+            Constructor for the :class:`EventedSinkRecorder` object.
+
+            :param filename: The full path of the log file to write.  The file is overwritten.
+            :param autoflush: Flush the log after every record so that the log is complete up to the last
+                              record if the process is terminated.
+        """
+        self._filename = filename
+        self._autoflush = autoflush
+
+        self._lock = threading.Lock()
+        self._stream: Optional[BinaryIO] = None
+        self._start_time = None
+        self._name_ids: Dict[str, int] = {}
+        self._record_count = 0
+
+        # The records that have been queued but not written yet, as tuples of the record type, the time
+        # offset and the record data
+        self._pending: Deque[Tuple[EventLogRecordType, float, Any]] = collections.deque()
+
+        self._sink: Optional["EventedVariableSink"] = None
+        return
+
+    @property
+    def filename(self) -> str:
+        """
+            The full path of the log file being written.
+        """
+        return self._filename
+
+    @property
+    def record_count(self) -> int:
+        """
+            The number of update and invalidate records that have been written.
+        """
+        return self._record_count
+
+    def attach(self, sink: "EventedVariableSink"):
+        """
+            Attaches the recorder to a sink and starts recording the updates made to the sink.
+
+            :param sink: The sink to record.
+        """
+        if self._sink is not None:
+            errmsg = "EventedSinkRecorder is already attached to a sink."
+            raise RuntimeError(errmsg)
+
+        self._stream = open(self._filename, 'wb')
+        self._stream.write(EVENT_LOG_HEADER.pack(EVENT_LOG_MAGIC, EVENT_LOG_VERSION))
+        self._start_time = time.perf_counter()
+        self._name_ids = {}
+        self._record_count = 0
+        self._pending.clear()
+
+        self._sink = sink
+
+        orig_update_event_variable = sink.update_event_variable
+        orig_update_event_variables = sink.update_event_variables
+        orig_invalidate_subscription = sink.invalidate_subscription
+
+        # The records are queued under the state lock of the sink after the call has been applied so the
+        # order of the records matches the order the updates were applied in and a call that fails is not
+        # recorded.  The queued records are written once the state lock is released.
+
+        def update_event_variable(event_name: str, event_value: Any, sink_locked: bool=False):
+            for _ in sink.yield_state_lock():
+                orig_update_event_variable(event_name, event_value, sink_locked=True)
+                self._queue_record(EventLogRecordType.Update, (event_name, event_value))
+            self._write_pending()
+            return
+
+        def update_event_variables(event_values: Dict[str, Any], sink_locked: bool=False):
+            for _ in sink.yield_state_lock():
+                orig_update_event_variables(event_values, sink_locked=True)
+                self._queue_record(EventLogRecordType.BatchUpdate, dict(event_values))
+            self._write_pending()
+            return
+
+        def invalidate_subscription(scope: Optional[Any]=None):
+            for _ in sink.yield_state_lock():
+                orig_invalidate_subscription(scope)
+                self._queue_record(EventLogRecordType.Invalidate, scope)
+            self._write_pending()
+            return
+
+        sink.update_event_variable = update_event_variable
+        sink.update_event_variables = update_event_variables
+        sink.invalidate_subscription = invalidate_subscription
+
+        return
+
+    def detach(self):
+        """
+            Stops recording, restores the methods of the sink and closes the log.
+        """
+        if self._sink is not None:
+            sink = self._sink
+            self._sink = None
+
+            del sink.update_event_variable
+            del sink.update_event_variables
+            del sink.invalidate_subscription
+
+        self._write_pending()
+
+        self._lock.acquire()
+        try:
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+        finally:
+            self._lock.release()
+
+        return
+
+    def flush(self):
+        """
+            Flushes the records that have been written to the log file.
+        """
+        self._lock.acquire()
+        try:
+            if self._stream is not None:
+                self._stream.flush()
+        finally:
+            self._lock.release()
+
+        return
+
+    def record_batch_update(self, event_values: Dict[str, Any]):
+        """
+            Writes a record of a batch update of evented variables.
+
+            :param event_values: A table of event names and the values the variables are updated with.
+        """
+        self._queue_record(EventLogRecordType.BatchUpdate, dict(event_values))
+        self._write_pending()
+        return
+
+    def record_invalidate(self, scope: Optional[Any]=None):
+        """
+            Writes a record of a subscription invalidation.
+
+            :param scope: The scope of the subscriptions that were invalidated.
+        """
+        self._queue_record(EventLogRecordType.Invalidate, scope)
+        self._write_pending()
+        return
+
+    def record_update(self, event_name: str, event_value: Any):
+        """
+            Writes a record of an update of an evented variable.
+
+            :param event_name: The name of the variable that was updated.
+            :param event_value: The value the variable was updated with.
+        """
+        self._queue_record(EventLogRecordType.Update, (event_name, event_value))
+        self._write_pending()
+        return
+
+    def _queue_record(self, record_type: EventLogRecordType, data: Any):
+        """
+            Queues a record to be written with the time offset of the call.
+        """
+        start_time = self._start_time
+        if start_time is not None:
+            self._pending.append((record_type, time.perf_counter() - start_time, data))
+        return
+
+    def _write_pending(self):
+        """
+            Pickles and writes the queued records to the log in the order they were queued.
+        """
+        self._lock.acquire()
+        try:
+            written = False
+
+            while len(self._pending) > 0:
+                record_type, offset, data = self._pending.popleft()
+                if self._stream is not None:
+                    written = self._locked_write_record(record_type, offset, data) or written
+
+            if written and self._autoflush:
+                self._stream.flush()
+        finally:
+            self._lock.release()
+
+        return
+
+    def _encode_entry(self, event_name: str, event_value: Any) -> Optional[bytes]:
+        """
+            Encodes the name id and pickled value of an update, or returns None if the update can not be
+            stored in the log.
+
+            ..note: The recorder lock must be held by the caller.
+        """
+        entry = None
+
+        payload = self._encode_payload(event_value, event_name)
+        if payload is not None:
+            name_id = self._locked_get_name_id(event_name)
+            if name_id is not None:
+                entry = ENTRY_ID.pack(name_id) + payload
+
+        return entry
+
+    def _encode_payload(self, value: Any, description: str) -> Optional[bytes]:
+        """
+            Pickles a value with a length prefix, or logs a warning and returns None if the value can not be
+            pickled.
+        """
+        payload = None
+
+        try:
+            pickled = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            payload = PAYLOAD_LENGTH.pack(len(pickled)) + pickled
+        except Exception as xcpt:
+            logger.warning("EventedSinkRecorder skipped a value that could not be pickled. name={} error={}".format(
+                description, xcpt))
+
+        return payload
+
+    def _locked_get_name_id(self, event_name: str) -> Optional[int]:
+        """
+            Gets the id of an event name, writing a name record the first time the name is seen.  If the log
+            already holds the maximum number of names, a warning is logged and None is returned.
+
+            ..note: The recorder lock must be held by the caller.
+        """
+        name_id = self._name_ids.get(event_name, None)
+
+        if name_id is None:
+            if len(self._name_ids) > MAX_NAME_ID:
+                logger.warning("EventedSinkRecorder skipped an update, the event log cannot store more than {} "
+                               "event names. name={}".format(MAX_NAME_ID + 1, event_name))
+            else:
+                name_id = len(self._name_ids)
+                self._name_ids[event_name] = name_id
+
+                name_bytes = event_name.encode("utf-8")
+                self._stream.write(bytes([EventLogRecordType.Name]))
+                self._stream.write(NAME_RECORD.pack(name_id, len(name_bytes)))
+                self._stream.write(name_bytes)
+
+        return name_id
+
+    def _locked_write_record(self, record_type: EventLogRecordType, offset: float, data: Any) -> bool:
+        """
+            Encodes and writes a timestamped record to the log and returns True if the record was written.
+            An update that can not be stored is not written.
+
+            ..note: The recorder lock must be held by the caller.
+        """
+        parts: List[bytes] = []
+
+        if record_type == EventLogRecordType.Update:
+            event_name, event_value = data
+            entry = self._encode_entry(event_name, event_value)
+            if entry is not None:
+                parts.append(entry)
+
+        elif record_type == EventLogRecordType.BatchUpdate:
+            entries = [self._encode_entry(event_name, event_value) for event_name, event_value in data.items()]
+            entries = [entry for entry in entries if entry is not None]
+            if len(entries) > 0:
+                parts.append(BATCH_COUNT.pack(len(entries)))
+                parts.extend(entries)
+
+        elif record_type == EventLogRecordType.Invalidate:
+            payload = self._encode_payload(data, "<invalidate>")
+            if payload is not None:
+                parts.append(payload)
+
+        written = False
+
+        if len(parts) > 0:
+            self._stream.write(RECORD_PREFIX.pack(record_type, offset))
+            for part in parts:
+                self._stream.write(part)
+
+            self._record_count += 1
+            written = True
+
+        return written
+
+    def __enter__(self) -> "EventedSinkRecorder":
+        return self
+
+    def __exit__(self, ex_type, ex_inst, ex_tb) -> bool:
+        self.detach()
+        return False
+
+
+class EventedSinkReplayer:
+    """
+        The :class:`EventedSinkReplayer` reads an event log written by the :class:`EventedSinkRecorder` and
+        replays the updates and invalidations into a sink, either with the original timing, at an accelerated
+        speed or as fast as possible.
+
+        ..note: The values in the log are unpickled, only replay logs from a trusted source.
+    """
+
+    def __init__(self, filename: str):
+        """
+            Constructor for the :class:`EventedSinkReplayer` object.
+
+            :param filename: The full path of the log file to read.
+        """
+        self._filename = filename
+        return
+
+    @property
+    def filename(self) -> str:
+        """
+            The full path of the log file being read.
+        """
+        return self._filename
+
+    def read_records(self) -> Generator[Tuple[float, EventLogRecordType, Any], None, None]:
+        """
+            Reads the update and invalidate records of the log.  Each record is yielded as a tuple of the time
+            offset in seconds, the record type and the record data.  The data of an update record is a tuple of
+            the event name and value, the data of a batch update record is a table of event names and values
+            and the data of an invalidate record is the scope.
+
+            A record that was only partially written at the end of the log is ignored.
+        """
+        with open(self._filename, 'rb') as lf:
+            header = lf.read(EVENT_LOG_HEADER.size)
+            if len(header) < EVENT_LOG_HEADER.size:
+                errmsg = "The file '{}' is not an event log.".format(self._filename)
+                raise ValueError(errmsg)
+
+            magic, version = EVENT_LOG_HEADER.unpack(header)
+            if magic != EVENT_LOG_MAGIC or version != EVENT_LOG_VERSION:
+                errmsg = "The file '{}' is not a supported event log. version={}".format(self._filename, version)
+                raise ValueError(errmsg)
+
+            names: Dict[int, str] = {}
+
+            try:
+                while True:
+                    type_byte = lf.read(1)
+                    if len(type_byte) == 0:
+                        break
+
+                    record_type = type_byte[0]
+                    if record_type == EventLogRecordType.Name:
+                        name_id, name_len = NAME_RECORD.unpack(self._read_exact(lf, NAME_RECORD.size))
+                        names[name_id] = self._read_exact(lf, name_len).decode("utf-8")
+                        continue
+
+                    offset, = struct.unpack("<d", self._read_exact(lf, RECORD_PREFIX.size - 1))
+
+                    if record_type == EventLogRecordType.Update:
+                        name_id, = ENTRY_ID.unpack(self._read_exact(lf, ENTRY_ID.size))
+                        value = self._read_payload(lf)
+                        yield offset, EventLogRecordType.Update, (names[name_id], value)
+
+                    elif record_type == EventLogRecordType.BatchUpdate:
+                        count, = BATCH_COUNT.unpack(self._read_exact(lf, BATCH_COUNT.size))
+                        event_values = {}
+                        for _ in range(count):
+                            name_id, = ENTRY_ID.unpack(self._read_exact(lf, ENTRY_ID.size))
+                            event_values[names[name_id]] = self._read_payload(lf)
+                        yield offset, EventLogRecordType.BatchUpdate, event_values
+
+                    elif record_type == EventLogRecordType.Invalidate:
+                        scope = self._read_payload(lf)
+                        yield offset, EventLogRecordType.Invalidate, scope
+
+                    else:
+                        errmsg = "Unknown record type={} in event log '{}'.".format(record_type, self._filename)
+                        raise ValueError(errmsg)
+
+            except EOFError:
+                # The last record was only partially written
+                pass
+
+        return
+
+    def replay(self, sink: "EventedVariableSink", speed: Optional[float]=1.0) -> int:
+        """
+            Replays the records of the log into a sink.
+
+            :param sink: The sink to replay the records into.
+            :param speed: The speed multiplier of the replay, 1.0 replays with the original timing and 10.0 replays
+                          ten times faster.  If None, the records are replayed as fast as possible.
+
+            :returns: The number of records that were replayed.
+        """
+        replayed = 0
+
+        start_time = time.perf_counter()
+
+        for offset, record_type, data in self.read_records():
+            if speed is not None:
+                target_time = start_time + (offset / speed)
+                delay = target_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            if record_type == EventLogRecordType.Update:
+                event_name, event_value = data
+                sink.update_event_variable(event_name, event_value)
+            elif record_type == EventLogRecordType.BatchUpdate:
+                sink.update_event_variables(data)
+            elif record_type == EventLogRecordType.Invalidate:
+                sink.invalidate_subscription(data)
+
+            replayed += 1
+
+        return replayed
+
+    def _read_exact(self, lf: BinaryIO, size: int) -> bytes:
+        """
+            Reads exactly the number of bytes specified from the log.
+
+            :raises EOFError: If the log ends before the bytes could be read.
+        """
+        data = lf.read(size)
+        if len(data) < size:
+            raise EOFError("The event log ended in the middle of a record.")
+        return data
+
+    def _read_payload(self, lf: BinaryIO) -> Any:
+        """
+            Reads a length prefixed pickled payload from the log.
+        """
+        length, = PAYLOAD_LENGTH.unpack(self._read_exact(lf, PAYLOAD_LENGTH.size))
+        payload = self._read_exact(lf, length)
+        value = pickle.loads(payload)
+        return value
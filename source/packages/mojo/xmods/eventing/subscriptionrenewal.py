@@ -0,0 +1,220 @@
+"""
+.. module:: subscriptionrenewal
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`SubscriptionRenewalScheduler` class which renews the
+               subscriptions of :class:`EventedVariableSink` instances before they expire.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Dict, List, Tuple, TYPE_CHECKING
+
+import heapq
+import logging
+import random
+import threading
+import time
+import weakref
+
+from datetime import datetime
+
+if TYPE_CHECKING:
+    from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+logger = logging.getLogger()
+
+
+class SubscriptionRenewalScheduler:
+    """
+        The :class:`SubscriptionRenewalScheduler` is a singleton that renews the subscriptions of many
+        :class:`EventedVariableSink` instances from a single background thread.  The sinks are kept in a heap
+        ordered by the time of their next renewal so the thread only wakes when a renewal is due.
+
+        A renewal is scheduled once a fraction of the remaining lifetime of the subscription has elapsed,
+        which leaves time for the renewal round trip before the subscription expires.  A random jitter is
+        subtracted from the renewal time so sinks that subscribed at the same time do not all renew at
+        the same moment.  If a renewal fails, it is retried after the retry interval.
+
+        The scheduler only holds weak references to the sinks so scheduling a sink does not keep it alive.
+    """
+
+    # The fraction of the remaining subscription lifetime that is left when the renewal is made
+    RENEWAL_LEAD_FRACTION = 0.2
+
+    # The largest fraction of the remaining subscription lifetime that is used as jitter
+    RENEWAL_JITTER_FRACTION = 0.1
+
+    # The time in seconds to wait before retrying a failed renewal
+    RENEWAL_RETRY_INTERVAL = 5
+
+    instance = None
+    initialized = False
+
+    def __new__(cls, *_args, **_kwargs):
+        """
+            Constructs new instances of the :class:`SubscriptionRenewalScheduler` object. The
+            :class:`SubscriptionRenewalScheduler` object is a singleton so following instantiations
+            of the object will reference the existing singleton
+        """
+
+        if cls.instance is None:
+            cls.instance = super(SubscriptionRenewalScheduler, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self):
+        thisType = type(self)
+        if not thisType.initialized:
+            thisType.initialized = True
+
+            self._schedule: List[Tuple[float, int, int, weakref.ref]] = []
+            self._schedule_generations: Dict[int, int] = {}
+            self._schedule_sequence = 0
+            self._schedule_condition = threading.Condition(threading.Lock())
+
+            self._renewal_thread = None
+        return
+
+    @property
+    def scheduled_count(self) -> int:
+        """
+            The number of sinks that have a renewal scheduled.
+        """
+        return len(self._schedule_generations)
+
+    def schedule_sink(self, sink: "EventedVariableSink"):
+        """
+            Schedules the renewal of the subscription of a sink based on the current subscription expiration
+            of the sink.  If the sink already has a renewal scheduled, it is replaced.
+
+            :param sink: The sink to schedule the renewal for.
+        """
+        expiration = sink.subscriptionExpiration
+
+        if expiration is None:
+            self.unschedule_sink(sink)
+        else:
+            remaining = (expiration - datetime.now()).total_seconds()
+            if remaining > 0:
+                lead = remaining * self.RENEWAL_LEAD_FRACTION
+                jitter = random.uniform(0, remaining * self.RENEWAL_JITTER_FRACTION)
+                delay = remaining - lead - jitter
+            else:
+                delay = 0
+
+            self._schedule_renewal(sink, delay)
+
+        return
+
+    def unschedule_sink(self, sink: "EventedVariableSink"):
+        """
+            Removes the scheduled renewal of a sink.
+
+            :param sink: The sink to remove the scheduled renewal for.
+        """
+        self._schedule_condition.acquire()
+        try:
+            sink_id = id(sink)
+            if sink_id in self._schedule_generations:
+                # The heap entry is discarded when it is popped because its generation no longer matches
+                del self._schedule_generations[sink_id]
+        finally:
+            self._schedule_condition.release()
+
+        return
+
+    def _renew_sink(self, sink: "EventedVariableSink"):
+        """
+            Renews the subscription of a sink and schedules the next renewal.
+        """
+        previous_expiration = sink.subscriptionExpiration
+
+        try:
+            sink.renew_subscription()
+
+            if sink.subscriptionExpiration is None or sink.subscriptionExpiration == previous_expiration:
+                # The sink did not extend its subscription, it will need to be scheduled again
+                # when it subscribes
+                self.unschedule_sink(sink)
+            else:
+                self.schedule_sink(sink)
+
+        except Exception:
+            logger.exception("Subscription renewal failed for sink type={}.".format(type(sink).__name__))
+            self._schedule_renewal(sink, self.RENEWAL_RETRY_INTERVAL)
+
+        return
+
+    def _renewal_thread_entry(self):
+        """
+            The entry point for the renewal thread which waits for the next scheduled renewal to become due.
+        """
+
+        while True:
+            sink = None
+
+            self._schedule_condition.acquire()
+            try:
+                while sink is None:
+                    if len(self._schedule) == 0:
+                        self._schedule_condition.wait()
+                        continue
+
+                    renew_at, generation, sink_id, sink_ref = self._schedule[0]
+                    now = time.monotonic()
+                    if renew_at > now:
+                        self._schedule_condition.wait(renew_at - now)
+                        continue
+
+                    heapq.heappop(self._schedule)
+
+                    # Entries that were replaced by a later schedule of the same sink have a stale generation
+                    if self._schedule_generations.get(sink_id, None) == generation:
+                        del self._schedule_generations[sink_id]
+                        # The sink is None if it was garbage collected
+                        sink = sink_ref()
+            finally:
+                self._schedule_condition.release()
+
+            self._renew_sink(sink)
+            del sink
+
+        return
+
+    def _schedule_renewal(self, sink: "EventedVariableSink", delay: float):
+        """
+            Pushes a renewal for a sink onto the schedule and starts the renewal thread if it is not running.
+        """
+        sink_id = id(sink)
+
+        self._schedule_condition.acquire()
+        try:
+            self._schedule_sequence += 1
+            generation = self._schedule_sequence
+
+            renew_at = time.monotonic() + delay
+            heapq.heappush(self._schedule, (renew_at, generation, sink_id, weakref.ref(sink)))
+            self._schedule_generations[sink_id] = generation
+
+            if self._renewal_thread is None:
+                self._renewal_thread = threading.Thread(target=self._renewal_thread_entry, name="subscription-renewal", daemon=True)
+                self._renewal_thread.start()
+
+            self._schedule_condition.notify()
+        finally:
+            self._schedule_condition.release()
+
+        return
+
+
+def get_subscription_renewal_scheduler() -> SubscriptionRenewalScheduler:
+    """
+        Gets the :class:`SubscriptionRenewalScheduler` singleton that renews the subscriptions of sinks.
+    """
+    scheduler = SubscriptionRenewalScheduler()
+    return scheduler
@@ -52,7 +52,7 @@ class ConstraintsRef:
     def __init__(self, origin: ConstraintsOrigin, originating_scope: str, identifier: str, constraints: Constraints):
         self._origin = origin
         self._originating_scope = originating_scope
-        self._identifer = identifier
+        self._identifier = identifier
         self._constraints = constraints
         return
 
@@ -5,17 +5,77 @@ __credits__ = []
 
 
 
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from mojo.xmods.injection.constraints import Constraints, FeatureConstraints, ConstraintsRef, ConstraintsOrigin
+import threading
+
+from mojo.xmods.injection.constraints import Constraints, FeatureConstraints, ConstraintsRef, ConstraintsOrigin, merge_constraints
+
+# The scope that is the ancestor of all the other scopes
+SESSION_SCOPE_NAME = "<session>"
+
+# The separators between the leaves of a scope name, injectable scopes separate the function
+# from its module with a '#'
+SCOPE_SEPARATORS = (".", "#")
+
+# Marks a constraints key that has not been resolved, None is a valid resolution
+UNRESOLVED_CONSTRAINTS = object()
 
 def create_constraint_key(source: str, identifier: str):
     return f"{source}:{identifier}"
 
+def split_constraint_key(constraints_key: str) -> Tuple[str, str]:
+    """
+        Splits a constraints key created by `create_constraint_key` into the scope and the identifier.
+    """
+    scope, _, identifier = constraints_key.rpartition(":")
+    return scope, identifier
+
+def create_ancestor_scopes(scope: str) -> List[str]:
+    """
+        Creates the list of the ancestor scopes of a scope, starting with the session scope and ending with
+        the parent of the scope.  The ancestors of 'tests.pkg.mod' are '<session>', 'tests' and 'tests.pkg'
+        and the ancestors of 'tests.mod#test_one' are '<session>', 'tests' and 'tests.mod'.
+    """
+    ancestors = []
+
+    if scope != SESSION_SCOPE_NAME:
+        ancestors.append(SESSION_SCOPE_NAME)
+
+        for cindex, ch in enumerate(scope):
+            if ch in SCOPE_SEPARATORS:
+                ancestors.append(scope[:cindex])
+
+    return ancestors
+
+def is_scope_related(scope: str, other_scope: str) -> bool:
+    """
+        Indicates if a scope is the same scope as another scope or an ancestor or descendant of it.
+    """
+    related = False
+
+    if scope == other_scope or scope == SESSION_SCOPE_NAME or other_scope == SESSION_SCOPE_NAME:
+        related = True
+    else:
+        shorter, longer = (scope, other_scope) if len(scope) < len(other_scope) else (other_scope, scope)
+        if longer.startswith(shorter) and longer[len(shorter)] in SCOPE_SEPARATORS:
+            related = True
+
+    return related
+
 class ConstraintsCatalog:
     """
         The :class:`ConstraintCatalog` object is a singleton that stores the constraints for an automation run
         and provides a way to pass constraints from multiple sources to tests.
+
+        The constraints of a parameter are resolved hierarchically.  The site constraints registered for the
+        identifier of the parameter by the ancestor scopes of the scope of the parameter are merged first,
+        starting with the session scope, then the site constraints of the scope itself and then the override
+        constraints in the same order, so override constraints take priority over site constraints and the
+        constraints of a scope take priority over the constraints of its ancestors.
+
+        The resolved constraints are memoized by key, so repeated lookups are a single dictionary lookup.  The
+        memo is cleared whenever constraints are added or pruned.
     """
 
     _instance = None
@@ -44,6 +104,9 @@ class ConstraintsCatalog:
             self._site_constraints: Dict[str, ConstraintsRef] = {}
             self._override_constraints: Dict[str, ConstraintsRef] = {}
 
+            self._resolved_constraints: Dict[str, Optional[Union[Constraints, FeatureConstraints, Dict[str, Any]]]] = {}
+            self._lock = threading.Lock()
+
         return
 
 
@@ -53,52 +116,124 @@ class ConstraintsCatalog:
 
         cref = ConstraintsRef(origin, originating_scope, identifier, constraints)
 
-        if origin == ConstraintsOrigin.SITE_PARAMETER:
-            self._site_constraints[ckey] = cref
-        elif origin == ConstraintsOrigin.OVERRIDE_PARAMETER:
-            self._override_constraints[ckey] = cref
-        else:
-            raise ValueError(f"Unkown constraint origin='{origin}' scope='{originating_scope}' identifier={identifier}")
+        self._lock.acquire()
+        try:
+            if origin == ConstraintsOrigin.SITE_PARAMETER:
+                self._site_constraints[ckey] = cref
+            elif origin == ConstraintsOrigin.OVERRIDE_PARAMETER:
+                self._override_constraints[ckey] = cref
+            else:
+                raise ValueError(f"Unkown constraint origin='{origin}' scope='{originating_scope}' identifier={identifier}")
+
+            # Any resolved constraints of the identifier can include the new constraints
+            self._resolved_constraints.clear()
+        finally:
+            self._lock.release()
         
         return ckey
     
 
     def lookup_constraints(self, constraints_key: str) -> Union[Constraints, FeatureConstraints, Dict[str, Any]]:
         """
-            Looks up a constraint by its 'scope' name based on order of priority.  Override constraints take
-            priority over factory site constraints.
+            Looks up the constraints for a constraints key by resolving them from the constraints of the scope of
+            the key and its ancestor scopes.  Override constraints take priority over factory site constraints and
+            the constraints of a scope take priority over the constraints of its ancestors.
+
+            When only one set of constraints applies, that set is returned as is, otherwise the sets are merged
+            with `merge_constraints`.  None is returned if no constraints apply.
+        """
+
+        # A single lookup so the memo being cleared between a check and a read can not raise a KeyError
+        rtnval = self._resolved_constraints.get(constraints_key, UNRESOLVED_CONSTRAINTS)
+        if rtnval is UNRESOLVED_CONSTRAINTS:
+            self._lock.acquire()
+            try:
+                rtnval = self._resolve_constraints(constraints_key)
+                self._resolved_constraints[constraints_key] = rtnval
+            finally:
+                self._lock.release()
+
+        return rtnval
+
+
+    def lookup_site_constraints(self, constraints_key: str) -> Union[Constraints, FeatureConstraints, Dict[str, Any]]:
+        """
+            Looks up the site constraints that were registered with exactly the constraints key, without the
+            constraints of the ancestor scopes or the override constraints.
         """
 
         rtnval = None
 
-        if constraints_key in self._override_constraints:
-            cref = self._override_constraints[constraints_key]
+        cref = self._site_constraints.get(constraints_key, None)
+        if cref is not None:
             rtnval = cref.constraints
-        elif constraints_key in self._site_constraints:
-            cref = self._site_constraints[constraints_key]
-            rtnval = cref.constraints
-        
+
+        return rtnval
+
+
+    def resolve_constraints(self, originating_scope: str, identifier: str) -> Union[Constraints, FeatureConstraints, Dict[str, Any]]:
+        """
+            Looks up the constraints for an identifier in a scope, see `lookup_constraints`.
+        """
+        ckey = create_constraint_key(originating_scope, identifier)
+        rtnval = self.lookup_constraints(ckey)
         return rtnval
 
 
     def prune_constraints(self, keep_scopes: List[str]):
         """
             Prunes the constraints catalog down to a specified list of scopes that are relevant to the current
-            injection environment.
+            injection environment.  The constraints of a kept scope, of its descendant scopes and of its ancestor
+            scopes, which the constraints of the kept scope are resolved with, are kept.
         """
-        
-        pruned_constraints = {}
-        for scope in keep_scopes:
-            if scope in self._site_constraints:
-                pruned_constraints[scope] = self._site_constraints[scope]
 
-        self._site_constraints = pruned_constraints
+        self._lock.acquire()
+        try:
+            self._site_constraints = self._prune_constraint_refs(self._site_constraints, keep_scopes)
+            self._override_constraints = self._prune_constraint_refs(self._override_constraints, keep_scopes)
+            self._resolved_constraints.clear()
+        finally:
+            self._lock.release()
+
+        return
+
+
+    def _prune_constraint_refs(self, constraint_refs: Dict[str, ConstraintsRef], keep_scopes: List[str]) -> Dict[str, ConstraintsRef]:
 
         pruned_constraints = {}
-        for scope in keep_scopes:
-            if scope in self._override_constraints:
-                pruned_constraints[scope] = self._override_constraints[scope]
 
-        self._override_constraints = pruned_constraints
+        for ckey, cref in constraint_refs.items():
+            for scope in keep_scopes:
+                if is_scope_related(cref.originating_scope, scope):
+                    pruned_constraints[ckey] = cref
+                    break
+
+        return pruned_constraints
+
+
+    def _resolve_constraints(self, constraints_key: str) -> Union[Constraints, FeatureConstraints, Dict[str, Any]]:
+        """
+            Resolves the constraints for a constraints key.
+
+            ..note: The lock of the catalog must be held by the caller.
+        """
+
+        rtnval = None
+
+        scope, identifier = split_constraint_key(constraints_key)
+
+        lookup_keys = [create_constraint_key(ascope, identifier) for ascope in create_ancestor_scopes(scope)]
+        lookup_keys.append(constraints_key)
 
-        return
\ No newline at end of file
+        layers = []
+        for constraint_refs in (self._site_constraints, self._override_constraints):
+            for lkey in lookup_keys:
+                if lkey in constraint_refs:
+                    layers.append(constraint_refs[lkey].constraints)
+
+        if len(layers) == 1:
+            rtnval = layers[0]
+        elif len(layers) > 1:
+            rtnval = merge_constraints(*layers)
+
+        return rtnval
@@ -0,0 +1,360 @@
+"""
+.. module:: bringupengine
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`IntegrationBringUpEngine` class which brings up the state of a
+        collection of :class:`IntegrationCoupling` types concurrently while honoring their declared precedence.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Type
+
+import enum
+import logging
+import time
+
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from mojo.xmods.injection.coupling.integrationcoupling import IntegrationCoupling
+
+logger = logging.getLogger()
+
+
+class BringUpStage(str, enum.Enum):
+    """
+        The stages of the bring-up of an :class:`IntegrationCoupling`, the value of each stage is the name of
+        the class method of the coupling that is called for the stage.
+    """
+    AttachToEnvironment = "attach_to_environment"
+    CollectResources = "collect_resources"
+    EstablishPresence = "establish_presence"
+    EstablishConnectivity = "establish_connectivity"
+
+
+DEFAULT_BRINGUP_STAGES = [
+    BringUpStage.AttachToEnvironment,
+    BringUpStage.CollectResources,
+    BringUpStage.EstablishPresence,
+    BringUpStage.EstablishConnectivity
+]
+
+# A node of the bring-up graph is a stage of a single coupling
+BringUpNode = Tuple[Type[IntegrationCoupling], BringUpStage]
+
+
+class BringUpStageResult:
+    """
+        The :class:`BringUpStageResult` holds the outcome and timing of a single stage of the bring-up of
+        a coupling.  The start and end times are `time.perf_counter()` values.
+    """
+
+    def __init__(self, coupling: Type[IntegrationCoupling], stage: BringUpStage):
+        self.coupling = coupling
+        self.stage = stage
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.skipped = False
+        return
+
+    @property
+    def elapsed(self) -> float:
+        """
+            The time in seconds the stage took to run or 0 if the stage did not run.
+        """
+        elapsed = 0.0
+        if self.start is not None and self.end is not None:
+            elapsed = self.end - self.start
+        return elapsed
+
+    @property
+    def failed(self) -> bool:
+        """
+            Indicates if the stage raised an exception or was skipped because a stage it depends on failed.
+        """
+        return self.error is not None or self.skipped
+
+
+class IntegrationBringUpReport:
+    """
+        The :class:`IntegrationBringUpReport` is the outcome of a bring-up run of an :class:`IntegrationBringUpEngine`.
+    """
+
+    def __init__(self, stages: List[BringUpStage], results: Dict[BringUpNode, BringUpStageResult], start: float, end: float):
+        self._stages = stages
+        self._results = results
+        self._start = start
+        self._end = end
+        return
+
+    @property
+    def elapsed(self) -> float:
+        """
+            The wall clock time in seconds taken by the whole bring-up.
+        """
+        return self._end - self._start
+
+    @property
+    def failures(self) -> List[BringUpStageResult]:
+        """
+            The stages that raised an exception, the stages that were skipped are not included.
+        """
+        failures = [sres for sres in self._results.values() if sres.error is not None]
+        return failures
+
+    @property
+    def results(self) -> Dict[BringUpNode, BringUpStageResult]:
+        return self._results
+
+    @property
+    def succeeded(self) -> bool:
+        """
+            Indicates if every stage of every coupling ran without raising an exception.
+        """
+        succeeded = True
+        for sres in self._results.values():
+            if sres.failed:
+                succeeded = False
+                break
+        return succeeded
+
+    def collect_stage_errors(self, stage: BringUpStage) -> List[str]:
+        """
+            Collects the error messages that were returned by the presence or connectivity stage of the couplings.
+
+            :param stage: The stage to collect the returned error messages of.
+        """
+        errors = []
+
+        for sres in self._results.values():
+            if sres.stage == stage and isinstance(sres.result, tuple) and len(sres.result) > 0 and sres.result[0]:
+                errors.extend(sres.result[0])
+
+        return errors
+
+    def format_report(self) -> str:
+        """
+            Formats a report of the timing of each stage and of any stages that failed.
+        """
+        lines = ["Integration bring-up completed in {:.3f}s".format(self.elapsed)]
+
+        stage_timings = self.stage_timings()
+        for stage in self._stages:
+            wall, busy = stage_timings[stage]
+            lines.append("    {}: wall={:.3f}s busy={:.3f}s".format(stage.value, wall, busy))
+
+        for sres in self._results.values():
+            if sres.error is not None:
+                lines.append("    FAILED {}.{}: {!r}".format(sres.coupling.__name__, sres.stage.value, sres.error))
+            elif sres.skipped:
+                lines.append("    SKIPPED {}.{}".format(sres.coupling.__name__, sres.stage.value))
+
+        report = "\n".join(lines)
+        return report
+
+    def stage_timings(self) -> Dict[BringUpStage, Tuple[float, float]]:
+        """
+            Returns a table of (wall, busy) times in seconds for each stage.  The wall time is the time from the
+            first coupling starting the stage to the last coupling finishing it and the busy time is the sum of
+            the time taken by each coupling for the stage.
+        """
+        timings = {}
+
+        for stage in self._stages:
+            starts = []
+            ends = []
+            busy = 0.0
+            for sres in self._results.values():
+                if sres.stage == stage and sres.start is not None:
+                    starts.append(sres.start)
+                    ends.append(sres.end)
+                    busy += sres.elapsed
+
+            wall = 0.0
+            if len(starts) > 0:
+                wall = max(ends) - min(starts)
+
+            timings[stage] = (wall, busy)
+
+        return timings
+
+
+class IntegrationBringUpEngine:
+    """
+        The :class:`IntegrationBringUpEngine` brings up a collection of :class:`IntegrationCoupling` types by
+        running the stages of each coupling on a thread pool.  A graph is built with a node for each stage of
+        each coupling, the stages of a coupling run in order and a stage of a coupling runs after the same stage
+        of the couplings at the next lower precedence level declared by `declare_precedence`.  The couplings that
+        share a precedence level run their stages concurrently and a coupling can move on to its next stage
+        without waiting for the rest of its level.  Couplings that do not declare a precedence only wait on their
+        own stages.
+
+        When a stage raises an exception, the stages that depend on it are skipped and the stages that do not
+        depend on it continue to run.
+
+        ..note: Running the stages concurrently requires the stage methods of the couplings to be thread safe
+                with respect to the couplings they do not depend on.
+    """
+
+    def __init__(self, couplings: Sequence[Type[IntegrationCoupling]], stages: Optional[List[BringUpStage]] = None,
+                 max_workers: Optional[int] = None, executor: Optional[Executor] = None,
+                 attach_kwargs: Optional[Dict[str, Any]] = None, allow_missing_devices: bool = False):
+        """
+            Constructor for the :class:`IntegrationBringUpEngine` object.
+
+            :param couplings: The integration coupling types to bring up.
+            :param stages: The stages to run, by default all of the bring-up stages are run in order.
+            :param max_workers: The number of threads of the pool created for the bring-up if no executor is provided.
+            :param executor: An optional executor to run the stages on.
+            :param attach_kwargs: The keyword arguments to pass to `attach_to_environment`.
+            :param allow_missing_devices: The value passed to `establish_connectivity`.
+        """
+        if stages is None:
+            stages = DEFAULT_BRINGUP_STAGES
+
+        # Remove duplicates while preserving the order the couplings were provided in
+        self._couplings: List[Type[IntegrationCoupling]] = list(dict.fromkeys(couplings))
+        self._stages = list(stages)
+        self._max_workers = max_workers
+        self._executor = executor
+        self._attach_kwargs = attach_kwargs if attach_kwargs is not None else {}
+        self._allow_missing_devices = allow_missing_devices
+        return
+
+    @property
+    def couplings(self) -> List[Type[IntegrationCoupling]]:
+        return self._couplings
+
+    @property
+    def stages(self) -> List[BringUpStage]:
+        return self._stages
+
+    def bring_up(self) -> IntegrationBringUpReport:
+        """
+            Runs the bring-up stages of the couplings and returns the report of the run.
+        """
+        predecessors, successors = self.build_graph()
+
+        results: Dict[BringUpNode, BringUpStageResult] = {}
+        for node in predecessors:
+            results[node] = BringUpStageResult(*node)
+
+        remaining = {node: len(preds) for node, preds in predecessors.items()}
+        blocked: Set[BringUpNode] = set()
+
+        executor = self._executor
+        owns_executor = False
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="integration-bringup")
+            owns_executor = True
+
+        start = time.perf_counter()
+
+        try:
+            pending: Dict[Future, BringUpNode] = {}
+
+            ready = [node for node, count in remaining.items() if count == 0]
+
+            while len(ready) > 0 or len(pending) > 0:
+
+                # Nodes whose predecessors failed are completed as skipped without running them, which
+                # may make more nodes ready
+                completed = []
+                for node in ready:
+                    if node in blocked:
+                        results[node].skipped = True
+                        completed.append(node)
+                    else:
+                        future = executor.submit(self._run_stage, results[node])
+                        pending[future] = node
+                ready = []
+
+                if len(completed) == 0:
+                    done, _ = wait(list(pending.keys()), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        completed.append(pending.pop(future))
+
+                for node in completed:
+                    node_failed = results[node].failed
+                    for succ in successors[node]:
+                        if node_failed:
+                            blocked.add(succ)
+                        remaining[succ] -= 1
+                        if remaining[succ] == 0:
+                            ready.append(succ)
+        finally:
+            if owns_executor:
+                executor.shutdown(wait=True)
+
+        end = time.perf_counter()
+
+        report = IntegrationBringUpReport(self._stages, results, start, end)
+        return report
+
+    def build_graph(self) -> Tuple[Dict[BringUpNode, List[BringUpNode]], Dict[BringUpNode, List[BringUpNode]]]:
+        """
+            Builds the bring-up graph and returns the tables of the predecessors and successors of each node.
+        """
+        precedence_levels: Dict[int, List[Type[IntegrationCoupling]]] = {}
+        for coupling in self._couplings:
+            precedence = coupling.declare_precedence()
+            if precedence is not None:
+                precedence_levels.setdefault(precedence, []).append(coupling)
+
+        # The couplings of a level depend on the couplings of the next lower level, the dependencies on the
+        # levels below that are implied by the dependencies of the next lower level
+        lower_level: Dict[Type[IntegrationCoupling], List[Type[IntegrationCoupling]]] = {}
+        previous_level = []
+        for precedence in sorted(precedence_levels.keys()):
+            level = precedence_levels[precedence]
+            for coupling in level:
+                lower_level[coupling] = previous_level
+            previous_level = level
+
+        predecessors: Dict[BringUpNode, List[BringUpNode]] = {}
+        successors: Dict[BringUpNode, List[BringUpNode]] = {}
+
+        for coupling in self._couplings:
+            for sindex, stage in enumerate(self._stages):
+                node = (coupling, stage)
+
+                preds = []
+                if sindex > 0:
+                    preds.append((coupling, self._stages[sindex - 1]))
+                for lower in lower_level.get(coupling, []):
+                    preds.append((lower, stage))
+
+                predecessors[node] = preds
+                successors.setdefault(node, [])
+                for pred in preds:
+                    successors.setdefault(pred, []).append(node)
+
+        return predecessors, successors
+
+    def _run_stage(self, sres: BringUpStageResult):
+        """
+            Runs a single stage of a coupling on the executor and records its outcome and timing.
+        """
+        sres.start = time.perf_counter()
+        try:
+            stage_method = getattr(sres.coupling, sres.stage.value)
+            if sres.stage == BringUpStage.AttachToEnvironment:
+                sres.result = stage_method(**self._attach_kwargs)
+            elif sres.stage == BringUpStage.EstablishConnectivity:
+                sres.result = stage_method(allow_missing_devices=self._allow_missing_devices)
+            else:
+                sres.result = stage_method()
+        except Exception as xcpt:
+            sres.error = xcpt
+            logger.exception("Integration bring-up stage failed. coupling={} stage={}".format(
+                sres.coupling.__name__, sres.stage.value))
+        finally:
+            sres.end = time.perf_counter()
+
+        return
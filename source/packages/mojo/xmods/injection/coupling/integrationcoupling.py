@@ -168,10 +168,11 @@ def is_integration_coupling(cls):
     return is_integmi
 
 
-def sort_integration_couplings_by_precedence(self, coupling_list: List[IntegrationCoupling]) -> List[IntegrationCoupling]:
+def sort_integration_couplings_by_precedence(coupling_list: List[IntegrationCoupling]) -> List[IntegrationCoupling]:
     """
         Takes a list of :class:`IntegrationCoupling` classes and creates an ordered list based on the ordinal
-        precedence declared by the :class:`IntegrationCoupling`.
+        precedence declared by the :class:`IntegrationCoupling`.  The couplings that do not declare a
+        precedence are placed first.
     """
     precedence_table = {}
 
@@ -185,8 +186,7 @@ def sort_integration_couplings_by_precedence(self, coupling_list: List[Integrati
             precedence_table[precedence] = precedence_level_list
         precedence_level_list.append(coupling)
 
-    precedence_keys_sorted = precedence_table.keys()
-    precedence_keys_sorted.sort()
+    precedence_keys_sorted = sorted(precedence_table.keys(), key=lambda p: (p is not None, p if p is not None else 0))
 
     ordered_couplings = []
     for precedence in precedence_keys_sorted:
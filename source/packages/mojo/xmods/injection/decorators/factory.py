@@ -25,6 +25,8 @@ from mojo.xmods.injection.coupling.scopecoupling import ScopeCoupling
 
 from mojo.errors.exceptions import SemanticError
 
+from mojo.xmods.xinspect import get_function_signature
+
 from mojo.xmods.injection.injectionregistry import injection_registry
 
 from mojo.xmods.injection.integrationsource import IntegrationSource
@@ -43,7 +45,7 @@ def integration(*, constraints: Optional[Dict]=None):
     def decorator(source_function: Callable) -> Callable:
         nonlocal constraints
 
-        signature = inspect.signature(source_function)
+        signature = get_function_signature(source_function)
         integration_context = signature.return_annotation
 
         resource_type = None
@@ -85,7 +87,7 @@ def resource(*, query_function: Optional[Callable]=None, constraints: Optional[D
     def decorator(source_function: Callable) -> Callable:
         nonlocal constraints
 
-        signature = inspect.signature(source_function)
+        signature = get_function_signature(source_function)
         resource_context = signature.return_annotation
 
         resource_type = None
@@ -127,7 +129,7 @@ def scope(*, query_function: Optional[Callable]=None, constraints: Optional[Dict
     def decorator(source_function: Callable) -> Callable:
         nonlocal constraints
 
-        signature = inspect.signature(source_function)
+        signature = get_function_signature(source_function)
         scope_context = signature.return_annotation
 
         resource_type = None
@@ -168,7 +170,7 @@ def validator(*, constraints: Optional[Dict]=None):
     def decorator(source_function: Callable) -> Callable:
         nonlocal constraints
 
-        signature = inspect.signature(source_function)
+        signature = get_function_signature(source_function)
         resource_context = signature.return_annotation
 
         resource_type = None
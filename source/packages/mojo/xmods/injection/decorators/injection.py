@@ -32,12 +32,12 @@ def param(source, *, identifier: Optional[None], constraints: Optional[Dict[str,
 
         source_info = injection_registry.lookup_resource_source(source)
 
-        if constraints is not None and 'constraints' not in source_info.source_signature.parameters:
+        if constraints is not None and 'constraints' not in source_info.source_parameter_names:
             raise SemanticError("Attempting to pass constraints to a parameter origin with no 'constraints' parameter.") from None
 
         assigned_scope = "{}#{}".format(subscriber.__module__, subscriber.__name__)
 
-        param_origin = ParameterOrigin(assigned_scope, identifier, life_span, source_info, constraints)
+        param_origin = ParameterOrigin(assigned_scope, identifier, life_span, source_info, constraints=constraints)
         injection_registry.register_parameter_origin(identifier, param_origin)
 
         return subscriber
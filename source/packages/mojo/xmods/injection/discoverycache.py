@@ -0,0 +1,499 @@
+"""
+.. module:: discoverycache
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`DiscoveryCache` class which persists the parameter origins
+               and injectable metadata that are discovered when injectable modules are imported, so the
+               discovery of unchanged modules can be restored without re-importing them.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from types import FunctionType
+
+import hashlib
+import inspect
+import os
+import pickle
+import sys
+
+from mojo.xmods.injection.constraintscatalog import ConstraintsCatalog
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+from mojo.xmods.injection.sourcebase import SourceBase
+from mojo.xmods.ximport import import_by_name
+
+DISCOVERY_CACHE_VERSION = 2
+
+# The fingerprint of a module file is (mtime_ns, size, sha256 hex digest)
+ModuleFingerprint = Tuple[int, int, str]
+
+constraints_catalog = ConstraintsCatalog()
+
+
+def create_module_fingerprint(module_file: str, previous: Optional[ModuleFingerprint] = None) -> ModuleFingerprint:
+    """
+        Creates the fingerprint of a module file.  If the modification time and size of the file match the
+        previous fingerprint, the previous fingerprint is returned without reading the file.
+
+        :param module_file: The path of the module file.
+        :param previous: The fingerprint that was previously stored for the file if there is one.
+    """
+    fstat = os.stat(module_file)
+
+    if previous is not None and previous[0] == fstat.st_mtime_ns and previous[1] == fstat.st_size:
+        fingerprint = previous
+    else:
+        hasher = hashlib.sha256()
+        with open(module_file, 'rb') as mf:
+            hasher.update(mf.read())
+        fingerprint = (fstat.st_mtime_ns, fstat.st_size, hasher.hexdigest())
+
+    return fingerprint
+
+
+class CachedSource(SourceBase):
+    """
+        The :class:`CachedSource` is a parameter source that was restored from a :class:`DiscoveryCache`.  The
+        signature of the source function is rebuilt from the cached parameters so it is available without
+        importing the module of the source.  The source function and the resource type are only resolved,
+        which imports their modules, the first time they are requested.
+    """
+
+    def __init__(self, module_name: str, function_name: str, parameters: List[Tuple[str, int]], resource_type_blob: bytes):
+        SourceBase.__init__(self, None, None, None, None)
+        self._module_name = module_name
+        self._function_name = function_name
+        self._resource_type_blob = resource_type_blob
+
+        sig_params = [inspect.Parameter(pname, inspect._ParameterKind(pkind)) for pname, pkind in parameters]
+        self._signature = inspect.Signature(sig_params)
+        self._signature_parameter_names = tuple(self._signature.parameters)
+        return
+
+    @property
+    def is_cached(self) -> bool:
+        return True
+
+    @property
+    def module_name(self) -> str:
+        return self._module_name
+
+    @property
+    def resource_type(self) -> Type:
+        if self._resource_type is None:
+            self._resource_type = pickle.loads(self._resource_type_blob)
+        return self._resource_type
+
+    @property
+    def source_function(self) -> Callable:
+        if self._source_func is None:
+            module = import_by_name(self._module_name)
+            self._source_func = getattr(module, self._function_name)
+        return self._source_func
+
+    @property
+    def source_parameter_names(self) -> Tuple[str, ...]:
+        return self._signature_parameter_names
+
+    @property
+    def source_signature(self) -> inspect.Signature:
+        return self._signature
+
+    @property
+    def source_id(self) -> str:
+        idstr = "{}#{}".format(self._module_name, self._function_name)
+        return idstr
+
+
+class CachedInjectableRef(InjectableRef):
+    """
+        The :class:`CachedInjectableRef` is an :class:`InjectableRef` that was restored from a :class:`DiscoveryCache`.
+        The name and metadata of the injectable are available without importing the module of the injectable,
+        the injectable function is only resolved, which imports the module, the first time it is requested.
+    """
+
+    __slots__ = ("_module_name", "_function_name", "_cached_metadata")
+
+    def __init__(self, module_name: str, function_name: str, metadata: Optional[Dict[str, str]]):
+        InjectableRef.__init__(self, None)
+        self._module_name = module_name
+        self._function_name = function_name
+        self._cached_metadata = metadata
+        return
+
+    @property
+    def base_name(self) -> str:
+        return self._function_name
+
+    @property
+    def function(self) -> FunctionType:
+        if self._inj_function is None:
+            module = import_by_name(self._module_name)
+            self._inj_function = getattr(module, self._function_name)
+        return self._inj_function
+
+    @property
+    def module_name(self) -> str:
+        return self._module_name
+
+    @property
+    def name(self) -> str:
+        inj_name = "%s#%s" % (self._module_name, self._function_name)
+        return inj_name
+
+    def _reference_metadata(self):
+        return self._cached_metadata
+
+
+class DiscoveryModuleRecord:
+    """
+        The :class:`DiscoveryModuleRecord` holds the discovery information that was cached for a single module.
+    """
+
+    def __init__(self, module_name: str, fingerprint: ModuleFingerprint, origins: List[Dict[str, Any]],
+                 injectables: Dict[str, Optional[Dict[str, str]]],
+                 dependencies: Optional[Dict[str, Tuple[str, ModuleFingerprint]]] = None):
+        self.module_name = module_name
+        self.fingerprint = fingerprint
+        self.origins = origins
+        self.injectables = injectables
+
+        # The file and fingerprint of each of the other modules that the sources of the origins come from, by
+        # module name
+        self.dependencies = dependencies if dependencies is not None else {}
+        return
+
+
+class DiscoveryCache:
+    """
+        The :class:`DiscoveryCache` persists the discovery information of injectable modules between runs.  The
+        discovery of a module is recorded by the :class:`InjectionRegistry` while the module is imported and is
+        stored along with a fingerprint of the module file and of the files of the other modules that the sources
+        of its origins come from.  On a later run, the record of a module is only used if none of those files
+        have changed.  The modification time and size of a file are compared first and the contents of the file
+        are only hashed when they differ.
+
+        For each module the cache stores the parameter origins registered while the module was imported, with
+        the scope, identifier, life span, constraints and source of each origin, and the names and metadata of
+        the injectables of the module.  The sources are restored as :class:`CachedSource` objects, which provide
+        the source signature without calling `inspect.signature` or importing the module, and the injectables
+        are restored as :class:`CachedInjectableRef` objects.  The restored sources are registered with the
+        injection registry so they can be looked up by their source function.
+
+        A module is not cached if it registers validator origins, if anything about its origins can not be
+        pickled or if a source of its origins comes from a module without a file, those modules are always
+        imported.
+
+        ..note: The cache file is unpickled, only load cache files from a trusted location.
+    """
+
+    def __init__(self, filename: str):
+        """
+            Constructor for the :class:`DiscoveryCache` object.
+
+            :param filename: The path of the file the cache is loaded from and saved to.
+        """
+        self._filename = filename
+        self._records: Dict[str, DiscoveryModuleRecord] = {}
+        self._hits = 0
+        self._misses = 0
+        self._modified = False
+
+        # The fingerprints of the dependency files created while storing records, by file, so a module that
+        # many modules depend on is only hashed once
+        self._dependency_fingerprints: Dict[str, ModuleFingerprint] = {}
+        return
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def hits(self) -> int:
+        """
+            The number of module lookups that found an unchanged record.
+        """
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """
+            The number of module lookups that did not find a record or found a record for a changed module.
+        """
+        return self._misses
+
+    @property
+    def modified(self) -> bool:
+        """
+            Indicates if records have been stored or discarded since the cache was loaded or saved.
+        """
+        return self._modified
+
+    def discard_module(self, module_name: str):
+        """
+            Removes the record of a module from the cache.
+        """
+        if module_name in self._records:
+            del self._records[module_name]
+            self._modified = True
+        return
+
+    def load(self) -> bool:
+        """
+            Loads the cache file.  If the cache file does not exist, can not be read or was written by a different
+            version of the cache, the cache is left empty.
+
+            :returns: True if the records were loaded from the cache file.
+        """
+        loaded = False
+        self._records = {}
+
+        if os.path.exists(self._filename):
+            try:
+                with open(self._filename, 'rb') as cf:
+                    content = pickle.load(cf)
+
+                if isinstance(content, dict) and content.get("version", None) == DISCOVERY_CACHE_VERSION:
+                    self._records = content["records"]
+                    loaded = True
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+                self._records = {}
+
+        self._modified = False
+
+        return loaded
+
+    def lookup_module(self, module_name: str, module_file: str) -> Optional[DiscoveryModuleRecord]:
+        """
+            Looks up the record of a module and returns it if the module file has not changed since the record
+            was stored.
+
+            :param module_name: The name of the module.
+            :param module_file: The path of the module file.
+
+            :returns: The record of the module or None if there is no record or the module has changed.
+        """
+        record = None
+
+        if module_name in self._records:
+            found = self._records[module_name]
+
+            fingerprint = create_module_fingerprint(module_file, previous=found.fingerprint)
+            if fingerprint[2] == found.fingerprint[2] and self._check_dependencies(found):
+                if fingerprint is not found.fingerprint:
+                    # The file was touched without being changed, remember the new timestamp so it
+                    # is not hashed again
+                    found.fingerprint = fingerprint
+                    self._modified = True
+                record = found
+            else:
+                self.discard_module(module_name)
+
+        if record is not None:
+            self._hits += 1
+        else:
+            self._misses += 1
+
+        return record
+
+    def restore_module(self, record: DiscoveryModuleRecord) -> List[ParameterOrigin]:
+        """
+            Creates and registers the parameter origins of a cached module record and their sources with the
+            injection registry.
+
+            :param record: The record of the module to restore.
+
+            :returns: The parameter origins that were restored.
+        """
+        # The registry imports this module to record discoveries, so it is imported here to avoid a cycle
+        from mojo.xmods.injection.injectionregistry import injection_registry
+
+        origins = []
+
+        for orec in record.origins:
+            srec = orec["source"]
+            source = CachedSource(srec["module_name"], srec["function_name"], srec["parameters"], srec["resource_type"])
+
+            constraints = None
+            if orec["constraints"] is not None:
+                constraints = pickle.loads(orec["constraints"])
+
+            injection_registry.register_resource_source(source)
+
+            origin = ParameterOrigin(orec["originating_scope"], orec["identifier"], ResourceLifespan(orec["life_span"]),
+                                     source=source, implied=orec["implied"], constraints=constraints)
+            injection_registry.register_parameter_origin(orec["identifier"], origin)
+            origins.append(origin)
+
+        return origins
+
+    def restore_injectables(self, record: DiscoveryModuleRecord) -> Dict[str, InjectableRef]:
+        """
+            Creates the injectable references of a cached module record.
+
+            :param record: The record of the module to restore the injectables of.
+
+            :returns: A table of the restored injectable references by name.
+        """
+        inj_references = {}
+
+        for inj_name, metadata in record.injectables.items():
+            module_name, function_name = inj_name.split("#")
+            inj_references[inj_name] = CachedInjectableRef(module_name, function_name, metadata)
+
+        return inj_references
+
+    def save(self):
+        """
+            Saves the cache file.  The file is written to a temporary file first and then moved over the
+            cache file so a reader never sees a partially written cache.
+        """
+        content = {
+            "version": DISCOVERY_CACHE_VERSION,
+            "records": self._records
+        }
+
+        cache_dir = os.path.dirname(os.path.abspath(self._filename))
+        os.makedirs(cache_dir, exist_ok=True)
+
+        tmp_filename = "{}.{}.tmp".format(self._filename, os.getpid())
+        with open(tmp_filename, 'wb') as cf:
+            pickle.dump(content, cf, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_filename, self._filename)
+
+        self._modified = False
+
+        return
+
+    def store_module(self, module_name: str, module_file: str, origins: List[Any],
+                     injectables: Optional[Dict[str, Optional[Dict[str, str]]]] = None) -> bool:
+        """
+            Stores the discovery record of a module.
+
+            :param module_name: The name of the module.
+            :param module_file: The path of the module file.
+            :param origins: The parameter and validator origins that were registered while the module was imported.
+            :param injectables: A table of the names of the injectables of the module and the metadata that was
+                                declared on each injectable function.
+
+            :returns: True if the record was stored, False if the discovery of the module can not be cached.
+        """
+        stored = False
+
+        dependencies = None
+
+        origin_records = self._create_origin_records(origins)
+        if origin_records is not None:
+            dependencies = self._create_dependencies(module_name, origin_records)
+
+        if dependencies is not None:
+            if injectables is None:
+                injectables = {}
+
+            fingerprint = create_module_fingerprint(module_file)
+            self._records[module_name] = DiscoveryModuleRecord(module_name, fingerprint, origin_records, dict(injectables),
+                                                               dependencies=dependencies)
+            self._modified = True
+            stored = True
+        else:
+            self.discard_module(module_name)
+
+        return stored
+
+    def _check_dependencies(self, record: DiscoveryModuleRecord) -> bool:
+        """
+            Checks that the modules the sources of a record come from have not changed since the record was
+            stored.  The fingerprints of dependency files that were touched without being changed are updated.
+        """
+        unchanged = True
+
+        for dep_name, (dep_file, dep_fingerprint) in record.dependencies.items():
+            try:
+                fingerprint = create_module_fingerprint(dep_file, previous=dep_fingerprint)
+            except OSError:
+                unchanged = False
+                break
+
+            if fingerprint[2] != dep_fingerprint[2]:
+                unchanged = False
+                break
+
+            if fingerprint is not dep_fingerprint:
+                record.dependencies[dep_name] = (dep_file, fingerprint)
+                self._modified = True
+
+        return unchanged
+
+    def _create_dependencies(self, module_name: str, origin_records: List[Dict[str, Any]]) -> Optional[Dict[str, Tuple[str, ModuleFingerprint]]]:
+        """
+            Creates the table of the files and fingerprints of the other modules that the sources of the origin
+            records come from, or returns None if a source comes from a module that does not have a file.
+        """
+        dependencies = {}
+
+        for orec in origin_records:
+            dep_name = orec["source"]["module_name"]
+            if dep_name == module_name or dep_name in dependencies:
+                continue
+
+            dep_file = getattr(sys.modules.get(dep_name, None), "__file__", None)
+            if dep_file is None:
+                dependencies = None
+                break
+
+            fingerprint = create_module_fingerprint(dep_file, previous=self._dependency_fingerprints.get(dep_file, None))
+            self._dependency_fingerprints[dep_file] = fingerprint
+            dependencies[dep_name] = (dep_file, fingerprint)
+
+        return dependencies
+
+    def _create_origin_records(self, origins: List[Any]) -> Optional[List[Dict[str, Any]]]:
+        """
+            Creates the records of a list of parameter origins or returns None if any of the origins can
+            not be cached.
+        """
+        origin_records = []
+
+        try:
+            for origin in origins:
+                if not isinstance(origin, ParameterOrigin) or origin.implied:
+                    # Validator origins are not cached and implied origins do not have a source
+                    origin_records = None
+                    break
+
+                constraints_blob = None
+                if origin.constraints_key is not None:
+                    # Only the constraints registered by the origin are cached, the constraints of ancestor
+                    # scopes and overrides are resolved again when the origin is restored
+                    constraints = constraints_catalog.lookup_site_constraints(origin.constraints_key)
+                    constraints_blob = pickle.dumps(constraints, protocol=pickle.HIGHEST_PROTOCOL)
+
+                parameters = [(pname, int(pval.kind)) for pname, pval in origin.source_signature.parameters.items()]
+
+                source_record = {
+                    "module_name": origin.source_module_name,
+                    "function_name": origin.source_function_name,
+                    "parameters": parameters,
+                    "resource_type": pickle.dumps(origin.source_resource_type, protocol=pickle.HIGHEST_PROTOCOL)
+                }
+
+                origin_records.append({
+                    "originating_scope": origin.originating_scope,
+                    "identifier": origin.identifier,
+                    "life_span": origin.life_span.value,
+                    "implied": origin.implied,
+                    "constraints": constraints_blob,
+                    "source": source_record
+                })
+        except (pickle.PicklingError, TypeError, AttributeError):
+            origin_records = None
+
+        return origin_records
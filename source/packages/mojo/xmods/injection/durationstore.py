@@ -0,0 +1,255 @@
+"""
+.. module:: durationstore
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`DurationStore` class which persists the durations and outcomes of
+               the injectables of previous runs so later runs can be ordered and sharded with them.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Dict, Iterable, Optional
+
+import json
+import os
+import threading
+
+DURATION_STORE_VERSION = 1
+
+# The weight given to the newest duration when it is blended into the duration of an injectable, the rest
+# of the weight is given to the durations of the previous runs
+DEFAULT_DURATION_SMOOTHING = 0.3
+
+
+class DurationRecord:
+    """
+        The :class:`DurationRecord` holds the duration history and outcome history of a single injectable.
+    """
+
+    __slots__ = ("duration", "last_duration", "runs", "failures", "last_failed")
+
+    def __init__(self, duration: float = 0.0, last_duration: float = 0.0, runs: int = 0, failures: int = 0,
+                 last_failed: bool = False):
+        self.duration = duration
+        self.last_duration = last_duration
+        self.runs = runs
+        self.failures = failures
+        self.last_failed = last_failed
+        return
+
+    @property
+    def failure_score(self) -> float:
+        """
+            A score of how likely the injectable is to fail.  The score is the fraction of the runs that failed
+            plus one if the last run failed, so the injectables that failed the last run always come first.
+        """
+        score = 0.0
+        if self.runs > 0:
+            score = self.failures / self.runs
+        if self.last_failed:
+            score += 1.0
+        return score
+
+    def to_dict(self) -> Dict:
+        rdict = {
+            "duration": self.duration,
+            "last_duration": self.last_duration,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_failed": self.last_failed
+        }
+        return rdict
+
+    @classmethod
+    def from_dict(cls, rdict: Dict) -> "DurationRecord":
+        record = cls(float(rdict["duration"]), float(rdict["last_duration"]), int(rdict["runs"]),
+                     int(rdict["failures"]), bool(rdict["last_failed"]))
+        return record
+
+
+class DurationStore:
+    """
+        The :class:`DurationStore` persists the duration and outcome history of injectables, keyed by the
+        `InjectableRef.name` of the injectable.  The duration of an injectable is a moving average of the
+        durations of its runs so a single slow or fast run does not reorder a whole suite.
+
+        The store is saved as JSON so it can be inspected and shared between runner hosts.
+    """
+
+    def __init__(self, filename: Optional[str] = None, smoothing: float = DEFAULT_DURATION_SMOOTHING):
+        """
+            Constructor for the :class:`DurationStore` object.
+
+            :param filename: The path of the file the store is loaded from and saved to, if not provided the
+                             store is only kept in memory.
+            :param smoothing: The weight between 0 and 1 given to the newest duration of an injectable.
+        """
+        if smoothing <= 0.0 or smoothing > 1.0:
+            errmsg = "The 'smoothing' parameter must be greater than 0 and at most 1. smoothing={}".format(smoothing)
+            raise ValueError(errmsg)
+
+        self._filename = filename
+        self._smoothing = smoothing
+        self._records: Dict[str, DurationRecord] = {}
+        self._lock = threading.Lock()
+        self._modified = False
+        return
+
+    @property
+    def filename(self) -> Optional[str]:
+        return self._filename
+
+    @property
+    def modified(self) -> bool:
+        """
+            Indicates if outcomes have been recorded since the store was loaded or saved.
+        """
+        return self._modified
+
+    def average_duration(self, default: float = 0.0) -> float:
+        """
+            Returns the average of the durations of the injectables that have history or the default if no
+            injectable has history.
+        """
+        average = default
+        if len(self._records) > 0:
+            average = sum(record.duration for record in self._records.values()) / len(self._records)
+        return average
+
+    def durations(self) -> Dict[str, float]:
+        """
+            Returns the durations of the injectables that have history, by name.
+        """
+        durations = {name: record.duration for name, record in self._records.items()}
+        return durations
+
+    def failure_score(self, inj_name: str) -> float:
+        """
+            Returns the failure score of an injectable or 0 if there is no history for the injectable.
+        """
+        score = 0.0
+        if inj_name in self._records:
+            score = self._records[inj_name].failure_score
+        return score
+
+    def load(self) -> bool:
+        """
+            Loads the store file.  If the store file does not exist, can not be read or was written by a different
+            version of the store, the store is left empty.
+
+            :returns: True if the records were loaded from the store file.
+        """
+        loaded = False
+        self._records = {}
+
+        if self._filename is not None and os.path.exists(self._filename):
+            try:
+                with open(self._filename, 'r') as sf:
+                    content = json.load(sf)
+
+                if isinstance(content, dict) and content.get("version", None) == DURATION_STORE_VERSION:
+                    self._records = {name: DurationRecord.from_dict(rdict) for name, rdict in content["records"].items()}
+                    loaded = True
+            except (OSError, ValueError, KeyError, TypeError):
+                self._records = {}
+
+        self._modified = False
+
+        return loaded
+
+    def lookup(self, inj_name: str) -> Optional[DurationRecord]:
+        """
+            Looks up the history record of an injectable.
+        """
+        record = self._records.get(inj_name, None)
+        return record
+
+    def lookup_duration(self, inj_name: str, default: Optional[float] = None) -> Optional[float]:
+        """
+            Looks up the duration of an injectable or returns the default if there is no history for the injectable.
+        """
+        duration = default
+        if inj_name in self._records:
+            duration = self._records[inj_name].duration
+        return duration
+
+    def record(self, inj_name: str, duration: float, passed: bool = True):
+        """
+            Records the outcome of a run of an injectable.  This method can be called from multiple threads.
+
+            :param inj_name: The name of the injectable.
+            :param duration: The time in seconds the injectable took to run.
+            :param passed: Indicates if the injectable passed.
+        """
+        self._lock.acquire()
+        try:
+            record = self._records.get(inj_name, None)
+            if record is None:
+                record = DurationRecord(duration=duration)
+                self._records[inj_name] = record
+            else:
+                record.duration = self._smoothing * duration + (1.0 - self._smoothing) * record.duration
+
+            record.last_duration = duration
+            record.runs += 1
+            record.last_failed = not passed
+            if not passed:
+                record.failures += 1
+
+            self._modified = True
+        finally:
+            self._lock.release()
+
+        return
+
+    def record_run(self, durations: Dict[str, float], failures: Iterable[str] = ()):
+        """
+            Records the outcomes of a whole run, such as the durations and failures of a :class:`ShardedRunReport`.
+
+            :param durations: The durations of the injectables that ran, by name.
+            :param failures: The names of the injectables that failed.
+        """
+        failed = set(failures)
+        for inj_name, duration in durations.items():
+            self.record(inj_name, duration, passed=inj_name not in failed)
+        return
+
+    def save(self):
+        """
+            Saves the store file.  The file is written to a temporary file first and then moved over the
+            store file so a reader never sees a partially written store.
+        """
+        if self._filename is None:
+            errmsg = "The duration store can not be saved because it was created without a filename."
+            raise RuntimeError(errmsg)
+
+        self._lock.acquire()
+        try:
+            content = {
+                "version": DURATION_STORE_VERSION,
+                "records": {name: record.to_dict() for name, record in self._records.items()}
+            }
+        finally:
+            self._lock.release()
+
+        store_dir = os.path.dirname(os.path.abspath(self._filename))
+        os.makedirs(store_dir, exist_ok=True)
+
+        tmp_filename = "{}.{}.tmp".format(self._filename, os.getpid())
+        with open(tmp_filename, 'w') as sf:
+            json.dump(content, sf, indent=4, sort_keys=True)
+        os.replace(tmp_filename, self._filename)
+
+        self._modified = False
+
+        return
+
+    def __contains__(self, inj_name: str) -> bool:
+        return inj_name in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
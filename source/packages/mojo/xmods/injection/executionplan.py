@@ -0,0 +1,421 @@
+"""
+.. module:: executionplan
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`ExecutionPlanBuilder` class which generates and compiles the code
+               that resolves the parameters of the injectables of an :class:`InjectableGroup` tree and calls the
+               injectables.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from types import CodeType
+
+import hashlib
+import logging
+import os
+import time
+
+from mojo.errors.exceptions import SemanticError
+
+from mojo.xmods.injection.injectablegroup import InjectableGroup
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.injection.injectionregistry import InjectionRegistry, injection_registry
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcecache import ResourceInstanceCache, create_resource_cache_key
+from mojo.xmods.injection.resourcescope import RESERVED_PARAMETER_NAMES
+from mojo.xmods.xdebugger import debugger_wellknown_breakpoint_code_append, WELLKNOWN_BREAKPOINTS
+
+logger = logging.getLogger()
+
+PLAN_FILENAME = "<execution-plan>"
+
+PLAN_INDENT = "    "
+
+# The compiled code objects of the plans that have been generated, keyed by the digest of the plan source, so
+# generating the same plan again does not compile it again.
+PLAN_CODE_CACHE: Dict[str, CodeType] = {}
+
+
+class ExecutionPlanEntry:
+    """
+        The :class:`ExecutionPlanEntry` is the compiled invocation of a single injectable in an :class:`ExecutionPlan`.
+    """
+
+    __slots__ = ("inj_ref", "scope_name", "group_scopes", "invoke")
+
+    def __init__(self, inj_ref: InjectableRef, group_scopes: Tuple[str, ...], invoke: Callable):
+        self.inj_ref = inj_ref
+        self.scope_name = inj_ref.scope_name
+        self.group_scopes = group_scopes
+        self.invoke = invoke
+        return
+
+
+class ExecutionPlan:
+    """
+        The :class:`ExecutionPlan` holds the compiled code of a plan along with an entry for each injectable in the
+        order the injectables appear in the :class:`InjectableGroup` tree.  The invoke function of an entry resolves
+        the parameters of the injectable in dependency order, with the resource getter that is passed to it, and then
+        calls the injectable.
+    """
+
+    def __init__(self, source: str, code: CodeType, entries: List[ExecutionPlanEntry], plan_start: Callable):
+        self._source = source
+        self._code = code
+        self._entries = entries
+        self._entry_table = {entry.inj_ref.name: entry for entry in entries}
+        self._plan_start = plan_start
+        return
+
+    @property
+    def code(self) -> CodeType:
+        return self._code
+
+    @property
+    def entries(self) -> List[ExecutionPlanEntry]:
+        return self._entries
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    def start(self):
+        """
+            Runs the start code of the plan, which is where the well known breakpoint of the start of a test run
+            is placed when it is enabled.  The start code should be run once before the injectables are invoked.
+        """
+        self._plan_start()
+        return
+
+    def invoke(self, inj_name: str, cache: ResourceInstanceCache) -> Any:
+        """
+            Invokes a single injectable of the plan.
+
+            :param inj_name: The name of the injectable to invoke.
+            :param cache: The resource cache to resolve the parameters of the injectable from.
+        """
+        entry = self._entry_table[inj_name]
+        result = entry.invoke(cache.get_resource_by_key)
+        return result
+
+    def run(self, cache: Optional[ResourceInstanceCache] = None,
+            timings: Optional[Dict[str, float]] = None) -> Dict[str, Tuple[Any, Optional[Exception]]]:
+        """
+            Runs every injectable of the plan in order.  The resources of the scope of each injectable are
+            evicted after the injectable runs and the resources of a group scope are evicted when the last
+            injectable of the group has run.
+
+            :param cache: The resource cache to resolve parameters from, a new cache is used if not provided.  The
+                          session of a new cache is exited when the run completes, the session of a cache that is
+                          provided is left for the caller to exit.
+            :param timings: An optional table that is filled in with the time in seconds each injectable took to
+                            run, including the creation of the resources it was the first to request.
+
+            :returns: A table of the result and the exception raised, if any, of each injectable by name.
+        """
+        owns_cache = False
+        if cache is None:
+            cache = ResourceInstanceCache()
+            owns_cache = True
+
+        resource_get = cache.get_resource_by_key
+
+        results = {}
+
+        self.start()
+
+        active_scopes: List[str] = []
+        try:
+            for entry in self._entries:
+                group_scopes = entry.group_scopes
+
+                # Exit the group scopes that the entry is not a member of
+                common = 0
+                while common < len(active_scopes) and common < len(group_scopes) and active_scopes[common] == group_scopes[common]:
+                    common += 1
+                while len(active_scopes) > common:
+                    self._exit_scope(cache, active_scopes.pop())
+                active_scopes.extend(group_scopes[common:])
+
+                inj_start = time.perf_counter()
+                try:
+                    results[entry.inj_ref.name] = (entry.invoke(resource_get), None)
+                except Exception as xcpt:
+                    results[entry.inj_ref.name] = (None, xcpt)
+                finally:
+                    self._exit_scope(cache, entry.scope_name)
+                    if timings is not None:
+                        timings[entry.inj_ref.name] = time.perf_counter() - inj_start
+        finally:
+            while len(active_scopes) > 0:
+                self._exit_scope(cache, active_scopes.pop())
+            if owns_cache:
+                for error in cache.exit_session():
+                    logger.error("Error finalizing a session resource. error={!r}".format(error))
+
+        return results
+
+    def _exit_scope(self, cache: ResourceInstanceCache, scope_name: str):
+        """
+            Exits a scope of the cache and logs the errors raised by the finalization of its resources.
+        """
+        for error in cache.exit_scope(scope_name):
+            logger.error("Error finalizing a resource of scope '{}'. error={!r}".format(scope_name, error))
+        return
+
+
+class ExecutionPlanBuilder:
+    """
+        The :class:`ExecutionPlanBuilder` generates an :class:`ExecutionPlan` from a finalized :class:`InjectionRegistry`
+        and an :class:`InjectableGroup` tree.  For each injectable, the parameter origins that are visible from the
+        scope of the injectable are resolved once while the plan is built, along with the origins of the parameters
+        of their sources, and are ordered so every resource is resolved after the resources it is created from.
+
+        The plan is generated as Python source with a function for each injectable and is compiled once.  The origins,
+        resource cache keys and injectable functions are bound to the generated functions as default arguments so
+        invoking an injectable only performs the resource cache lookups and the call of the injectable.
+    """
+
+    def __init__(self, registry: Optional[InjectionRegistry] = None):
+        """
+            Constructor for the :class:`ExecutionPlanBuilder` object.
+
+            :param registry: The finalized registry to resolve the parameter origins with, the injection registry
+                             singleton is used if not provided.
+        """
+        if registry is None:
+            registry = injection_registry
+
+        self._registry = registry
+        self._visible_cache: Dict[Tuple[str, str], Optional[ParameterOrigin]] = {}
+
+        # The origins that the parameters of the source of each origin resolve to, keyed by the id of the origin
+        self._origin_dependencies: Dict[int, Dict[str, ParameterOrigin]] = {}
+        return
+
+    def build_plan(self, root_group: InjectableGroup) -> ExecutionPlan:
+        """
+            Builds the execution plan for the injectables of an :class:`InjectableGroup` tree.
+
+            :param root_group: The root of the group tree.
+
+            :raises SemanticError: If a parameter can not be resolved or the sources of the resources depend on
+                                   each other in a cycle.
+        """
+        namespace: Dict[str, Any] = {}
+        origin_names: Dict[int, str] = {}
+
+        code_lines = [
+            "def plan_start():"
+        ]
+        start_body = []
+        debugger_wellknown_breakpoint_code_append(WELLKNOWN_BREAKPOINTS.TESTRUN_START, start_body, PLAN_INDENT)
+        if len(start_body) == 0:
+            start_body.append("{}pass".format(PLAN_INDENT))
+        code_lines.extend(start_body)
+
+        plan_items: List[Tuple[InjectableRef, Tuple[str, ...], str]] = []
+
+        for inj_ref, group_scopes in self._walk_injectables(root_group, []):
+            findex = len(plan_items)
+            func_name = "invoke_{}".format(findex)
+
+            self._append_injectable_code(code_lines, namespace, origin_names, inj_ref, findex, func_name)
+            plan_items.append((inj_ref, tuple(group_scopes), func_name))
+
+        source = os.linesep.join(code_lines) + os.linesep
+
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        code = PLAN_CODE_CACHE.get(digest, None)
+        if code is None:
+            code = compile(source, PLAN_FILENAME, "exec")
+            PLAN_CODE_CACHE[digest] = code
+
+        exec(code, namespace)
+
+        entries = [ExecutionPlanEntry(inj_ref, group_scopes, namespace[func_name]) for inj_ref, group_scopes, func_name in plan_items]
+
+        plan = ExecutionPlan(source, code, entries, namespace["plan_start"])
+        return plan
+
+    def resolve_injectable_origins(self, inj_ref: InjectableRef) -> List[ParameterOrigin]:
+        """
+            Resolves the parameter origins needed to invoke an injectable, ordered so that each origin comes after
+            the origins of the parameters of its source.
+
+            :param inj_ref: The injectable to resolve the parameter origins for.
+        """
+        ordered: List[ParameterOrigin] = []
+        visited: Dict[int, bool] = {}
+
+        for param_name in inj_ref.function_parameter_names:
+            origin = self._lookup_visible_origin(inj_ref.scope_name, param_name)
+            if origin is None:
+                errmsg = "Unable to resolve parameter '{}' of injectable '{}'.".format(param_name, inj_ref.name)
+                raise SemanticError(errmsg) from None
+            self._order_origin(origin, ordered, visited, [])
+
+        return ordered
+
+    def _append_injectable_code(self, code_lines: List[str], namespace: Dict[str, Any], origin_names: Dict[int, str],
+                                inj_ref: InjectableRef, findex: int, func_name: str):
+        """
+            Appends the function that invokes an injectable to the code of the plan.
+        """
+        ordered = self.resolve_injectable_origins(inj_ref)
+
+        default_args = ["resource_get"]
+
+        inj_func_name = "injfunc_{}".format(findex)
+        namespace[inj_func_name] = inj_ref.function
+        default_args.append("{0}={0}".format(inj_func_name))
+
+        # Each resolved resource is held in its own local so origins that share an identifier in
+        # different scopes do not shadow each other
+        local_names: Dict[int, str] = {}
+
+        body = []
+        for origin in ordered:
+            oname = origin_names.get(id(origin), None)
+            if oname is None:
+                oname = "origin_{}".format(len(origin_names))
+                origin_names[id(origin)] = oname
+                namespace[oname] = origin
+            default_args.append("{0}={0}".format(oname))
+
+            dependencies = self._origin_dependencies[id(origin)]
+            if len(dependencies) > 0:
+                params_literal = "{" + ", ".join("{!r}: {}".format(pname, local_names[id(dep_origin)])
+                                                 for pname, dep_origin in dependencies.items()) + "}"
+            else:
+                params_literal = "None"
+
+            local_name = "res_{}".format(len(local_names))
+            local_names[id(origin)] = local_name
+
+            kname = "key_{}_{}".format(findex, local_name)
+            # The cache key only depends on the origin and the scope of the injectable, so it is created
+            # while the plan is built instead of on every invocation
+            namespace[kname] = create_resource_cache_key(origin, inj_ref.scope_name)
+            default_args.append("{0}={0}".format(kname))
+
+            body.append("{}{} = resource_get({}, {}, {})".format(PLAN_INDENT, local_name, kname, oname, params_literal))
+
+        call_args = ", ".join("{}={}".format(pname, local_names[id(self._lookup_visible_origin(inj_ref.scope_name, pname))])
+                              for pname in inj_ref.function_parameter_names)
+        body.append("{}return {}({})".format(PLAN_INDENT, inj_func_name, call_args))
+
+        code_lines.append("")
+        code_lines.append("# {}".format(inj_ref.name))
+        code_lines.append("def {}({}):".format(func_name, ", ".join(default_args)))
+        code_lines.extend(body)
+
+        return
+
+    def _lookup_visible_origin(self, scope_name: str, identifier: str) -> Optional[ParameterOrigin]:
+        """
+            Looks up the parameter origin of an identifier that is visible from a scope, which is the origin in the
+            nearest scope walking from the scope up to the session scope.
+        """
+        cache_key = (scope_name, identifier)
+        if cache_key in self._visible_cache:
+            return self._visible_cache[cache_key]
+
+        origin = None
+
+        scope_path = scope_name
+        while origin is None:
+            rscope = self._registry.lookup_resource_scope(scope_path)
+            if rscope is not None and identifier in rscope.parameter_originations:
+                origin = rscope.parameter_originations[identifier]
+
+            if scope_path == "<session>":
+                break
+
+            sep_index = max(scope_path.rfind("."), scope_path.rfind("#"))
+            if sep_index > -1:
+                scope_path = scope_path[:sep_index]
+            else:
+                scope_path = "<session>"
+
+        self._visible_cache[cache_key] = origin
+
+        return origin
+
+    def _order_origin(self, origin: ParameterOrigin, ordered: List[ParameterOrigin], visited: Dict[int, bool],
+                      path: List[str]):
+        """
+            Adds an origin to the ordered list after the origins of the parameters of its source.
+        """
+        oid = id(origin)
+
+        if oid in visited:
+            if not visited[oid]:
+                errmsg = "The sources of the parameters have a dependency cycle. cycle={}".format(
+                    " -> ".join(path + [origin.identifier]))
+                raise SemanticError(errmsg) from None
+        else:
+            visited[oid] = False
+            path.append(origin.identifier)
+
+            dependencies = self._origin_dependencies.get(oid, None)
+            if dependencies is None:
+                dependencies = {}
+                for pname in origin.source_parameter_names:
+                    if pname in RESERVED_PARAMETER_NAMES:
+                        continue
+
+                    dep_origin = self._lookup_visible_origin(origin.originating_scope, pname)
+                    if dep_origin is origin:
+                        # The source can not consume the resource it produces, look above its scope
+                        dep_origin = self._lookup_parent_origin(origin.originating_scope, pname)
+
+                    if dep_origin is None:
+                        errmsg = "Unable to resolve parameter '{}' of the source of '{}'.".format(pname, origin.source_id)
+                        raise SemanticError(errmsg) from None
+
+                    dependencies[pname] = dep_origin
+                self._origin_dependencies[oid] = dependencies
+
+            for dep_origin in dependencies.values():
+                self._order_origin(dep_origin, ordered, visited, path)
+
+            path.pop()
+            visited[oid] = True
+            ordered.append(origin)
+
+        return
+
+    def _lookup_parent_origin(self, scope_name: str, identifier: str) -> Optional[ParameterOrigin]:
+        """
+            Looks up the origin of an identifier that is visible from the parent of a scope.
+        """
+        origin = None
+
+        if scope_name != "<session>":
+            sep_index = max(scope_name.rfind("."), scope_name.rfind("#"))
+            parent_scope = scope_name[:sep_index] if sep_index > -1 else "<session>"
+            origin = self._lookup_visible_origin(parent_scope, identifier)
+
+        return origin
+
+    def _walk_injectables(self, group: InjectableGroup, group_scopes: List[str]):
+        """
+            Yields each injectable of a group tree in order with the scope names of the groups it is a member of.
+        """
+        child: Union[InjectableRef, InjectableGroup]
+        for child in group.children.values():
+            if isinstance(child, InjectableGroup):
+                group_scopes.append(child.scope_name)
+                yield from self._walk_injectables(child, group_scopes)
+                group_scopes.pop()
+            else:
+                yield child, group_scopes
+        return
@@ -13,20 +13,40 @@ __credits__ = []
 
 
 
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple, Union
 
+import enum
 import logging
 import sys
 
 from mojo.errors.exceptions import SemanticError
 
+from mojo.xmods.injection.durationstore import DurationStore
 from mojo.xmods.injection.injectionregistry import injection_registry
 from mojo.xmods.injection.resourcescope import ResourceScope
 
 from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.markers import MetadataIndex, chain_metadata
 
 logger = logging.getLogger()
 
+
+class InjectableOrder(str, enum.Enum):
+    """
+        The orders the children of an :class:`InjectableGroup` can be arranged in with the history of a
+        :class:`DurationStore`.
+
+        * Declared - The order the injectables were added to the group.
+        * LongestFirst - The longest running children first, which minimizes the time it takes a pool of
+          workers to finish a collection of injectables.
+        * FailFastFirst - The children most likely to fail first, with the shortest first for an equal
+          likelihood, so failures are reported as early as possible.
+    """
+    Declared = "declared"
+    LongestFirst = "longest-first"
+    FailFastFirst = "fail-fast-first"
+
+
 class InjectableGroup:
     """
               -------------
@@ -38,6 +58,8 @@ class InjectableGroup:
         -------------------------------
     """
 
+    __slots__ = ("_name", "_package", "_children", "_finalized", "_metadata")
+
     def __init__(self, name, package=None):
         self._name = name
         self._package = package
@@ -60,6 +82,13 @@ class InjectableGroup:
     def finalized(self):
         return self._finalized
 
+    @property
+    def metadata(self) -> Optional[Mapping[str, str]]:
+        """
+            The metadata of the group that was resolved by `resolve_metadata`.
+        """
+        return self._metadata
+
     @property
     def name(self):
         return self._name
@@ -90,28 +119,58 @@ class InjectableGroup:
 
         return
 
+    def create_metadata_index(self) -> MetadataIndex:
+        """
+            Creates a :class:`MetadataIndex` of the injectables of the group tree so the injectables selected by
+            a set of filters can be found with set operations instead of evaluating the filters for each
+            injectable.  The index should be created after `resolve_metadata` and is a snapshot of the metadata,
+            so it must be created again if the metadata is resolved again.
+        """
+        index = MetadataIndex((inj_ref, inj_ref.metadata) for inj_ref in self.iterate_injectables())
+        return index
+
     def finalize(self):
         self._finalized = True
         return
 
+    def iterate_injectables(self) -> Iterator[InjectableRef]:
+        """
+            Iterates the injectables of the group tree in order.
+        """
+        child: Union[InjectableRef, InjectableGroup]
+        for child in self._children.values():
+            if isinstance(child, InjectableGroup):
+                yield from child.iterate_injectables()
+            else:
+                yield child
+        return
+
+    def order_children(self, order: InjectableOrder, store: DurationStore):
+        """
+            Arranges the children of the group and of its descendant groups in an order based on the history of
+            previous runs.  A group is ordered by the total duration of its injectables and by the highest failure
+            score of its injectables, so the groups stay together as they are moved.  The children with the same
+            history keep the order they were declared in.  The injectables with no duration history are assumed to
+            take the average duration of the store.
+
+            :param order: The order to arrange the children in.
+            :param store: The store with the history of previous runs.
+        """
+        if order != InjectableOrder.Declared:
+            default_duration = store.average_duration()
+            self._order_children(order, store, default_duration)
+        return
+
     def get_resource_scope(self) -> ResourceScope:
         scope_name = self.scope_name
         rscope = injection_registry.lookup_resource_scope(scope_name)
         return rscope
 
-    def resolve_metadata(self, parent_metadata: Optional[Dict[str, str]]=None):
+    def resolve_metadata(self, parent_metadata: Optional[Mapping[str, str]]=None):
 
-        reference_metadata = self._reference_metadata()
-
-        if parent_metadata is not None:
-            if reference_metadata is not None:
-                self._metadata = {}
-                self._metadata.update(parent_metadata)
-                self._metadata.update(reference_metadata)
-            else:
-                self._metadata = parent_metadata
-        else:
-            self._metadata = reference_metadata
+        # The children share the metadata of the group, a child that declares metadata of its own
+        # layers it over the metadata of the group with a chain instead of a merged copy
+        self._metadata = chain_metadata(self._reference_metadata(), parent_metadata)
 
         child: Union[InjectableRef, InjectableGroup]
         for child in self._children.values():
@@ -152,6 +211,34 @@ class InjectableGroup:
 
         return
 
+    def _order_children(self, order: InjectableOrder, store: DurationStore, default_duration: float) -> Tuple[float, float]:
+        """
+            Orders the children of the group and returns the total duration and the highest failure score of
+            the injectables of the group.
+        """
+        child_history: Dict[str, Tuple[float, float]] = {}
+
+        child: Union[InjectableRef, InjectableGroup]
+        for child_key, child in self._children.items():
+            if isinstance(child, InjectableGroup):
+                child_history[child_key] = child._order_children(order, store, default_duration)
+            else:
+                child_history[child_key] = (store.lookup_duration(child.name, default_duration),
+                                            store.failure_score(child.name))
+
+        if order == InjectableOrder.LongestFirst:
+            sort_key = lambda ckey: -child_history[ckey][0]
+        else:
+            sort_key = lambda ckey: (-child_history[ckey][1], child_history[ckey][0])
+
+        # The sort is stable so the children with the same history keep their declared order
+        self._children = {ckey: self._children[ckey] for ckey in sorted(self._children, key=sort_key)}
+
+        total_duration = sum(duration for duration, _ in child_history.values())
+        failure_score = max((score for _, score in child_history.values()), default=0.0)
+
+        return total_duration, failure_score
+
     def _reference_metadata(self):
         """
             Looks up the metadata if any on the module associated with this group.
@@ -13,16 +13,16 @@ __credits__ = []
 
 
 
-from typing import Any, Dict, List, OrderedDict, Optional, Sequence
+from typing import Any, List, Mapping, OrderedDict, Optional, Sequence, Tuple
 
 from types import FunctionType
 
 
 import collections
-import inspect
 
 
-from mojo.xmods.markers import MetaFilter
+from mojo.xmods.markers import MetaFilter, chain_metadata
+from mojo.xmods.xinspect import get_function_signature
 
 class InjectableRef:
     """
@@ -33,28 +33,49 @@ class InjectableRef:
         The :class:`InjectableRef` object allows us to delay the creation of injectable runtime instance data and state until it is
         necessary to instantiate it and allows us to cleanup the runtime instance and state as soon as it is no longer
         being used.
+
+        A run can reference a very large number of injectables so the references are slotted, the moniker list
+        and subscriptions are only created when they are first used and the metadata of a reference is a chain
+        that shares the metadata of its parent groups, see :class:`MetadataChain`.
     """
 
+    __slots__ = ("_inj_function", "_monikers", "_pivots", "_subscriptions", "_finalized", "_metadata",
+                 "_signature", "_signature_parameter_names", "_signature_key")
+
     def __init__(self, injfunc: FunctionType, monikers: Optional[List[str]] = None, pivots: OrderedDict[str, Any]=collections.OrderedDict()):
         """
             Initializes the injectable reference object.
         """
-        if monikers is None:
-            monikers = []
- 
         self._inj_function = injfunc
         self._monikers = monikers
         self._pivots = pivots
-        self._subscriptions = {}
+        self._subscriptions = None
         self._finalized = False
+        self._metadata = None
+
+        # The signature is introspected the first time the parameters are requested and is cached
+        # along with the function and code object it was introspected from, so it is introspected
+        # again if either of them is replaced.
+        self._signature = None
+        self._signature_parameter_names = None
+        self._signature_key = None
         return
 
     @property
     def finalized(self) -> bool:
         return self._finalized
 
+    @property
+    def metadata(self) -> Optional[Mapping[str, Any]]:
+        """
+            The metadata of the injectable that was resolved by `resolve_metadata`.
+        """
+        return self._metadata
+
     @property
     def monikers(self) -> List[str]:
+        if self._monikers is None:
+            self._monikers = []
         return self._monikers
 
     @property
@@ -67,6 +88,8 @@ class InjectableRef:
 
     @property
     def subscriptions(self):
+        if self._subscriptions is None:
+            self._subscriptions = {}
         return self._subscriptions
 
     @subscriptions.setter
@@ -88,8 +111,15 @@ class InjectableRef:
 
     @property
     def function_parameters(self):
-        signature = inspect.signature(self._inj_function)
-        return signature.parameters
+        if self._signature_key != self._create_signature_key():
+            self._update_signature()
+        return self._signature.parameters
+
+    @property
+    def function_parameter_names(self) -> Tuple[str, ...]:
+        if self._signature_key != self._create_signature_key():
+            self._update_signature()
+        return self._signature_parameter_names
 
     @property
     def module_name(self) -> str:
@@ -117,23 +147,28 @@ class InjectableRef:
         for mfilter in metafilters:
             if not mfilter.should_include(self._metadata):
                 include = False
+                break
 
         return include
 
-    def resolve_metadata(self, parent_metadata: Optional[Dict[str, str]]=None):
+    def resolve_metadata(self, parent_metadata: Optional[Mapping[str, str]]=None):
 
-        reference_metadata = self._reference_metadata()
+        # The metadata of the parent is shared instead of copied, see `chain_metadata`
+        self._metadata = chain_metadata(self._reference_metadata(), parent_metadata)
 
-        if parent_metadata is not None:
-            if reference_metadata is not None:
-                self._metadata = {}
-                self._metadata.update(parent_metadata)
-                self._metadata.update(reference_metadata)
-            else:
-                self._metadata = parent_metadata
-        else:
-            self._metadata = reference_metadata
+        return
 
+    def _create_signature_key(self):
+        # The key is created from the function that has already been resolved, a cached reference
+        # only resolves its function, which imports the module, when the signature is updated.
+        inj_function = self._inj_function
+        sigkey = (inj_function, getattr(inj_function, "__code__", None))
+        return sigkey
+
+    def _update_signature(self):
+        self._signature = get_function_signature(self.function)
+        self._signature_parameter_names = tuple(self._signature.parameters)
+        self._signature_key = self._create_signature_key()
         return
 
     def _reference_metadata(self):
@@ -0,0 +1,418 @@
+"""
+.. module:: injectablescheduler
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`InjectableScheduler` class which runs the injectables of an
+        :class:`ExecutionPlan` concurrently on a pool of workers while honoring the scopes of the injectables.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import logging
+import threading
+import time
+
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
+
+from mojo.xmods.injection.coupling.scopecoupling import ScopeCoupling
+from mojo.xmods.injection.durationstore import DurationStore
+from mojo.xmods.injection.executionplan import ExecutionPlan, ExecutionPlanEntry
+from mojo.xmods.injection.resourcecache import ResourceInstanceCache
+
+logger = logging.getLogger()
+
+
+class InjectableShard:
+    """
+        The :class:`InjectableShard` is the unit of placement of the :class:`InjectableScheduler`.  A shard holds the
+        plan entries of the injectables of a single package, in plan order, and the entries of a shard are always
+        run in order by the same worker.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.entries: List[ExecutionPlanEntry] = []
+        return
+
+    @property
+    def weight(self) -> float:
+        """
+            The relative cost of running the shard that is used by the placement policies.
+        """
+        return float(len(self.entries))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class ShardPlacementPolicy:
+    """
+        The :class:`ShardPlacementPolicy` is the base class of the policies that decide which worker runs each
+        shard.  Derived policies override `place_shards`.
+    """
+
+    def place_shards(self, shards: List[InjectableShard], worker_count: int) -> List[List[InjectableShard]]:
+        """
+            Places the shards on the workers and returns the shards for each worker in the order the worker
+            should run them.
+
+            :param shards: The shards to place, in plan order.
+            :param worker_count: The number of workers to place the shards on.
+        """
+        raise NotImplementedError("'ShardPlacementPolicy' derived classes must override 'place_shards'.")
+
+
+class RoundRobinPlacementPolicy(ShardPlacementPolicy):
+    """
+        Places the shards on the workers in turn, in plan order.
+    """
+
+    def place_shards(self, shards: List[InjectableShard], worker_count: int) -> List[List[InjectableShard]]:
+        placements = [[] for _ in range(worker_count)]
+
+        for sindex, shard in enumerate(shards):
+            placements[sindex % worker_count].append(shard)
+
+        return placements
+
+
+class BalancedPlacementPolicy(ShardPlacementPolicy):
+    """
+        Places the heaviest shards first, each on the worker with the least total weight, so the workers finish
+        at about the same time.  The weight of a shard is the number of its injectables or, when a duration store
+        is provided, the total of the historical durations of its injectables.
+    """
+
+    def __init__(self, store: Optional[DurationStore] = None):
+        """
+            Constructor for the :class:`BalancedPlacementPolicy` object.
+
+            :param store: An optional store with the duration history of the injectables.
+        """
+        self._store = store
+        return
+
+    def place_shards(self, shards: List[InjectableShard], worker_count: int) -> List[List[InjectableShard]]:
+        placements = [[] for _ in range(worker_count)]
+        loads = [0.0 for _ in range(worker_count)]
+
+        weights = {id(shard): self.shard_weight(shard) for shard in shards}
+
+        for shard in sorted(shards, key=lambda s: weights[id(s)], reverse=True):
+            windex = loads.index(min(loads))
+            placements[windex].append(shard)
+            loads[windex] += weights[id(shard)]
+
+        return placements
+
+    def shard_weight(self, shard: InjectableShard) -> float:
+        """
+            Returns the weight of a shard.
+        """
+        weight = shard.weight
+        if self._store is not None and len(self._store) > 0:
+            default_duration = self._store.average_duration()
+            weight = sum(self._store.lookup_duration(entry.inj_ref.name, default_duration) for entry in shard.entries)
+        return weight
+
+
+class InjectableScheduleReport:
+    """
+        The :class:`InjectableScheduleReport` is the outcome of a run of an :class:`InjectableScheduler`.
+    """
+
+    def __init__(self, results: Dict[str, Tuple[Any, Optional[BaseException]]], placements: List[List[InjectableShard]],
+                 start: float, end: float):
+        self._results = results
+        self._placements = placements
+        self._start = start
+        self._end = end
+        return
+
+    @property
+    def elapsed(self) -> float:
+        """
+            The wall clock time in seconds taken by the whole run.
+        """
+        return self._end - self._start
+
+    @property
+    def failures(self) -> Dict[str, BaseException]:
+        """
+            The exceptions raised by the injectables that failed or by the scopes they could not enter, by name.
+        """
+        failures = {name: error for name, (_, error) in self._results.items() if error is not None}
+        return failures
+
+    @property
+    def placements(self) -> List[List[InjectableShard]]:
+        return self._placements
+
+    @property
+    def results(self) -> Dict[str, Tuple[Any, Optional[BaseException]]]:
+        return self._results
+
+    @property
+    def succeeded(self) -> bool:
+        return len(self.failures) == 0
+
+
+class _ScopeState:
+    """
+        Tracks the entry of a group scope and the number of injectables in the scope that have not finished.
+    """
+
+    __slots__ = ("lock", "entered", "error", "remaining")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entered = False
+        self.error: Optional[BaseException] = None
+        self.remaining = 0
+        return
+
+
+class InjectableScheduler:
+    """
+        The :class:`InjectableScheduler` runs the injectables of an :class:`ExecutionPlan` on a pool of workers.
+        The entries of the plan are split into a shard for each package and the shards are placed on the workers
+        by a :class:`ShardPlacementPolicy`.  Each worker runs the entries of its shards in order.
+
+        The group scopes are shared by the workers.  A group scope is entered by the first worker that runs an
+        injectable in the scope and the other workers wait for the entry to finish.  A group scope is exited and
+        its package resources are evicted from the resource cache when the last injectable in the scope has
+        finished, no matter which worker ran it, so the child scopes of a group are always exited before the
+        group.  The session resources are shared by all of the workers and are finalized when the run ends.
+
+        When a :class:`ScopeCoupling` is provided for a group scope, its `scope_enter` and `scope_exit` methods are
+        called as the scope is entered and exited.  If `scope_enter` raises an exception, the injectables in the
+        scope are not run and the exception is reported as their error.
+
+        ..note: Running the injectables concurrently requires the injectables, and the sources of the resources
+                they share, to be thread safe with respect to the injectables of the other packages.
+    """
+
+    def __init__(self, plan: ExecutionPlan, max_workers: int = 4, placement_policy: Optional[ShardPlacementPolicy] = None,
+                 scope_couplings: Optional[Dict[str, ScopeCoupling]] = None, executor: Optional[Executor] = None):
+        """
+            Constructor for the :class:`InjectableScheduler` object.
+
+            :param plan: The execution plan with the injectables to run.
+            :param max_workers: The number of workers to place the shards on.
+            :param placement_policy: The policy that places the shards on the workers, the shards are balanced by
+                                     the number of injectables if not provided.
+            :param scope_couplings: A table of the scope couplings to enter and exit, by group scope name.
+            :param executor: An optional executor to run the workers on.
+        """
+        if max_workers < 1:
+            errmsg = "The 'max_workers' parameter must be at least 1. max_workers={}".format(max_workers)
+            raise ValueError(errmsg)
+
+        if placement_policy is None:
+            placement_policy = BalancedPlacementPolicy()
+
+        self._plan = plan
+        self._max_workers = max_workers
+        self._placement_policy = placement_policy
+        self._scope_couplings = scope_couplings if scope_couplings is not None else {}
+        self._executor = executor
+
+        self._lock = threading.Lock()
+        self._scope_states: Dict[str, _ScopeState] = {}
+        self._results: Dict[str, Tuple[Any, Optional[BaseException]]] = {}
+        self._cache: Optional[ResourceInstanceCache] = None
+        return
+
+    @property
+    def plan(self) -> ExecutionPlan:
+        return self._plan
+
+    def build_shards(self) -> List[InjectableShard]:
+        """
+            Splits the entries of the plan into a shard for each package.  The package of an entry is the group
+            scope that contains the module of the injectable.
+        """
+        shard_table: Dict[str, InjectableShard] = {}
+
+        for entry in self._plan.entries:
+            shard_name = self._shard_name(entry)
+
+            shard = shard_table.get(shard_name, None)
+            if shard is None:
+                shard = InjectableShard(shard_name)
+                shard_table[shard_name] = shard
+
+            shard.entries.append(entry)
+
+        shards = list(shard_table.values())
+        return shards
+
+    def run(self, cache: Optional[ResourceInstanceCache] = None) -> InjectableScheduleReport:
+        """
+            Runs the injectables of the plan on the workers and returns the report of the run.
+
+            :param cache: The resource cache to resolve parameters from, a new cache is used if not provided.  The
+                          session of a new cache is exited when the run completes, the session of a cache that is
+                          provided is left for the caller to exit.
+        """
+        owns_cache = False
+        if cache is None:
+            cache = ResourceInstanceCache()
+            owns_cache = True
+
+        shards = self.build_shards()
+        worker_count = min(self._max_workers, max(len(shards), 1))
+        placements = self._placement_policy.place_shards(shards, worker_count)
+
+        self._cache = cache
+        self._results = {}
+        self._scope_states = {}
+        for entry in self._plan.entries:
+            for scope_name in entry.group_scopes:
+                state = self._scope_states.get(scope_name, None)
+                if state is None:
+                    state = _ScopeState()
+                    self._scope_states[scope_name] = state
+                state.remaining += 1
+
+        executor = self._executor
+        owns_executor = False
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="injectable-worker")
+            owns_executor = True
+
+        start = time.perf_counter()
+
+        self._plan.start()
+
+        try:
+            futures = [executor.submit(self._run_worker, worker_shards) for worker_shards in placements if len(worker_shards) > 0]
+            wait(futures)
+            for future in futures:
+                # Surface any error that escaped a worker
+                future.result()
+        finally:
+            if owns_executor:
+                executor.shutdown(wait=True)
+            if owns_cache:
+                cache.exit_session()
+
+        end = time.perf_counter()
+
+        report = InjectableScheduleReport(self._results, placements, start, end)
+        return report
+
+    def _enter_scopes(self, group_scopes: Sequence[str]) -> Optional[BaseException]:
+        """
+            Enters the group scopes of an entry that have not been entered, from the outermost scope in, and
+            returns the error of the first scope that failed to enter, if any.
+        """
+        error = None
+
+        for scope_name in group_scopes:
+            state = self._scope_states[scope_name]
+
+            state.lock.acquire()
+            try:
+                if not state.entered:
+                    state.entered = True
+                    coupling = self._scope_couplings.get(scope_name, None)
+                    if coupling is not None:
+                        try:
+                            coupling.scope_enter()
+                        except Exception as xcpt:
+                            state.error = xcpt
+                            logger.exception("Failed to enter scope '{}'.".format(scope_name))
+                error = state.error
+            finally:
+                state.lock.release()
+
+            if error is not None:
+                break
+
+        return error
+
+    def _release_scopes(self, group_scopes: Sequence[str]):
+        """
+            Releases the group scopes of a finished entry, from the innermost scope out, and exits the scopes
+            that have no more entries to run.
+        """
+        for scope_name in reversed(group_scopes):
+            state = self._scope_states[scope_name]
+
+            self._lock.acquire()
+            try:
+                state.remaining -= 1
+                scope_done = state.remaining == 0
+            finally:
+                self._lock.release()
+
+            if scope_done:
+                coupling = self._scope_couplings.get(scope_name, None)
+                if coupling is not None and state.entered and state.error is None:
+                    try:
+                        coupling.scope_exit()
+                    except Exception:
+                        logger.exception("Failed to exit scope '{}'.".format(scope_name))
+
+                for error in self._cache.exit_scope(scope_name):
+                    logger.error("Error finalizing a resource of scope '{}'. error={!r}".format(scope_name, error))
+
+        return
+
+    def _run_entry(self, entry: ExecutionPlanEntry):
+        """
+            Runs a single entry of the plan inside of its group scopes.
+        """
+        result = None
+        error = self._enter_scopes(entry.group_scopes)
+
+        try:
+            if error is None:
+                try:
+                    result = entry.invoke(self._cache.get_resource_by_key)
+                except Exception as xcpt:
+                    error = xcpt
+                finally:
+                    for finalize_error in self._cache.exit_scope(entry.scope_name):
+                        logger.error("Error finalizing a resource of scope '{}'. error={!r}".format(entry.scope_name, finalize_error))
+
+            self._lock.acquire()
+            try:
+                self._results[entry.inj_ref.name] = (result, error)
+            finally:
+                self._lock.release()
+        finally:
+            self._release_scopes(entry.group_scopes)
+
+        return
+
+    def _run_worker(self, worker_shards: List[InjectableShard]):
+        """
+            Runs the entries of the shards placed on a worker in order.
+        """
+        for shard in worker_shards:
+            for entry in shard.entries:
+                self._run_entry(entry)
+        return
+
+    def _shard_name(self, entry: ExecutionPlanEntry) -> str:
+        """
+            Returns the name of the shard of an entry, which is the scope of the package that contains the
+            module of the injectable.
+        """
+        group_scopes = entry.group_scopes
+
+        shard_name = "<session>"
+        if len(group_scopes) > 1:
+            shard_name = group_scopes[-2]
+        elif len(group_scopes) == 1:
+            shard_name = group_scopes[0]
+
+        return shard_name
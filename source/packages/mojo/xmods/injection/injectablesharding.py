@@ -0,0 +1,496 @@
+"""
+.. module:: injectablesharding
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the functions and the :class:`InjectableShardRunner` class which partition a
+        finalized collection of injectables into shards and run the shards in worker processes.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import bisect
+import enum
+import hashlib
+import logging
+import multiprocessing
+import queue
+import time
+import traceback
+
+from multiprocessing import Queue
+
+from mojo.xmods.injection.executionplan import ExecutionPlanBuilder
+from mojo.xmods.injection.injectablegroup import InjectableGroup
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.ximport import import_by_name
+from mojo.xmods.xmultiprocessing.pipedprocess import PipedProcess
+
+logger = logging.getLogger()
+
+DEFAULT_HASH_REPLICAS = 64
+
+# The most a shard is allowed to be loaded, relative to an even split of the durations, before the modules that
+# hash to it are moved to the next shard on the ring
+DEFAULT_LOAD_FACTOR = 1.25
+
+# The duration that is assumed for an injectable when there is no history for it and no other history to
+# take an average from
+DEFAULT_INJECTABLE_DURATION = 1.0
+
+RESULT_POLL_INTERVAL = 0.5
+
+
+class ShardingMode(str, enum.Enum):
+    """
+        The ways the injectables can be partitioned into shards.  In both modes, all of the injectables of a
+        module are placed in the same shard so the resources of the module and its package are not created by
+        more than one worker for the same module.
+    """
+    Module = "module"
+    Duration = "duration"
+
+
+def create_hash_point(key: str) -> int:
+    """
+        Creates the position of a key on a hash ring.  A digest is used instead of the builtin `hash` so the
+        position is the same in every process and between runs.
+    """
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    point = int.from_bytes(digest[:8], "big")
+    return point
+
+
+def create_shard_names(shard_count: int) -> List[str]:
+    """
+        Creates the names of the nodes of the hash ring for a count of shards.
+    """
+    shard_names = ["shard-{}".format(sindex) for sindex in range(shard_count)]
+    return shard_names
+
+
+class ConsistentHashRing:
+    """
+        The :class:`ConsistentHashRing` maps keys to nodes so that a key maps to the same node between runs and
+        only the keys of a node move when a node is added or removed.  Each node is placed on the ring at a number
+        of replica points to spread the keys evenly across the nodes.
+    """
+
+    def __init__(self, nodes: Sequence[str], replicas: int = DEFAULT_HASH_REPLICAS):
+        """
+            Constructor for the :class:`ConsistentHashRing` object.
+
+            :param nodes: The names of the nodes of the ring.
+            :param replicas: The number of points each node is placed at on the ring.
+        """
+        if len(nodes) == 0:
+            errmsg = "A hash ring must have at least one node."
+            raise ValueError(errmsg)
+
+        self._nodes = list(nodes)
+
+        ring = []
+        for node in self._nodes:
+            for rindex in range(replicas):
+                ring.append((create_hash_point("{}#{}".format(node, rindex)), node))
+        ring.sort()
+
+        self._points = [point for point, _ in ring]
+        self._point_nodes = [node for _, node in ring]
+        return
+
+    @property
+    def nodes(self) -> List[str]:
+        return self._nodes
+
+    def iterate_nodes(self, key: str) -> Iterator[str]:
+        """
+            Iterates the distinct nodes of the ring in order starting with the node the key maps to.
+        """
+        point_count = len(self._points)
+        start = bisect.bisect(self._points, create_hash_point(key)) % point_count
+
+        seen = set()
+        for offset in range(point_count):
+            node = self._point_nodes[(start + offset) % point_count]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self._nodes):
+                    break
+
+        return
+
+    def lookup(self, key: str) -> str:
+        """
+            Looks up the node a key maps to.
+        """
+        node = next(self.iterate_nodes(key))
+        return node
+
+
+def partition_injectables(inj_references: Dict[str, InjectableRef], shard_count: int, mode: ShardingMode = ShardingMode.Module,
+                          durations: Optional[Dict[str, float]] = None, replicas: int = DEFAULT_HASH_REPLICAS,
+                          load_factor: float = DEFAULT_LOAD_FACTOR) -> List[Dict[str, InjectableRef]]:
+    """
+        Partitions a finalized collection of injectables into shards.  The modules of the injectables are mapped
+        to the shards with a :class:`ConsistentHashRing` so a module stays in the same shard between runs.
+
+        In :attr:`ShardingMode.Duration` mode the modules are placed from the longest running to the shortest, each
+        on the shard it hashes to unless that would load the shard past `load_factor` times an even split of the
+        total duration, in which case the module is placed on the next shard on the ring that has room.  The
+        injectables that have no duration history are assumed to take the average of the known durations.
+
+        :param inj_references: The injectable references by name, as passed to `finalize_startup`.
+        :param shard_count: The number of shards to partition the injectables into.
+        :param mode: The way the injectables are partitioned.
+        :param durations: The historical durations of the injectables in seconds, by name.
+        :param replicas: The number of points each shard is placed at on the hash ring.
+        :param load_factor: The most a shard can be loaded relative to an even split in duration mode.
+
+        :returns: A table of the injectable references for each shard, in the order of the collection.
+    """
+    if shard_count < 1:
+        errmsg = "The 'shard_count' parameter must be at least 1. shard_count={}".format(shard_count)
+        raise ValueError(errmsg)
+
+    shard_names = create_shard_names(shard_count)
+    ring = ConsistentHashRing(shard_names, replicas=replicas)
+    shard_indexes = {sname: sindex for sindex, sname in enumerate(shard_names)}
+
+    module_injectables: Dict[str, List[str]] = {}
+    for inj_name, inj_ref in inj_references.items():
+        module_injectables.setdefault(inj_ref.module_name, []).append(inj_name)
+
+    module_shards: Dict[str, int] = {}
+
+    if mode == ShardingMode.Duration:
+        if durations is None:
+            durations = {}
+
+        default_duration = DEFAULT_INJECTABLE_DURATION
+        if len(durations) > 0:
+            default_duration = sum(durations.values()) / len(durations)
+
+        module_weights = {}
+        for module_name, inj_names in module_injectables.items():
+            module_weights[module_name] = sum(durations.get(inj_name, default_duration) for inj_name in inj_names)
+
+        capacity = load_factor * sum(module_weights.values()) / shard_count
+
+        loads = [0.0 for _ in range(shard_count)]
+
+        for module_name in sorted(module_weights, key=lambda mname: (-module_weights[mname], mname)):
+            weight = module_weights[module_name]
+
+            placed_index = None
+            for node in ring.iterate_nodes(module_name):
+                sindex = shard_indexes[node]
+                if loads[sindex] + weight <= capacity:
+                    placed_index = sindex
+                    break
+
+            if placed_index is None:
+                # The module is heavier than the room left on every shard
+                placed_index = loads.index(min(loads))
+
+            loads[placed_index] += weight
+            module_shards[module_name] = placed_index
+    else:
+        for module_name in module_injectables:
+            module_shards[module_name] = shard_indexes[ring.lookup(module_name)]
+
+    shards: List[Dict[str, InjectableRef]] = [{} for _ in range(shard_count)]
+    for inj_name, inj_ref in inj_references.items():
+        shards[module_shards[inj_ref.module_name]][inj_name] = inj_ref
+
+    return shards
+
+
+class InjectableOutcome:
+    """
+        The :class:`InjectableOutcome` is the result of running an injectable in a worker process.  Only the
+        formatted error is returned from the worker because the results and exceptions of the injectables are
+        not guaranteed to be picklable.
+    """
+
+    __slots__ = ("name", "shard_index", "error", "duration")
+
+    def __init__(self, name: str, shard_index: int, error: Optional[str] = None, duration: float = 0.0):
+        self.name = name
+        self.shard_index = shard_index
+        self.error = error
+        self.duration = duration
+        return
+
+    @property
+    def passed(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return "InjectableOutcome(name={!r}, shard_index={}, passed={})".format(self.name, self.shard_index, self.passed)
+
+
+def format_outcome_error(xcpt: BaseException) -> str:
+    """
+        Formats an exception raised in a worker process so it can be returned to the parent process.
+    """
+    errstr = "".join(traceback.format_exception(type(xcpt), xcpt, xcpt.__traceback__))
+    return errstr
+
+
+def run_injectable_shard(shard_index: int, injectable_names: Sequence[str]) -> Dict[str, InjectableOutcome]:
+    """
+        Runs the injectables of a shard in the current process.  The modules of the injectables are looked up
+        by name and the injectables are run in order with an :class:`ExecutionPlan` built from the registry of
+        the current process.
+
+        ..note: The registry must already hold the parameter origins of the injectables, including origins
+                declared in modules that do not contain injectables, so the shard workers are forked from the
+                process that performed the discovery.
+
+        :param shard_index: The index of the shard that is run.
+        :param injectable_names: The names of the injectables of the shard.
+    """
+    outcomes: Dict[str, InjectableOutcome] = {}
+
+    try:
+        root = InjectableGroup("root")
+        for inj_name in injectable_names:
+            module_name, func_name = inj_name.split("#")
+            module = import_by_name(module_name)
+            root.add_descendent(InjectableRef(getattr(module, func_name)))
+
+        plan = ExecutionPlanBuilder().build_plan(root)
+
+        timings: Dict[str, float] = {}
+        results = plan.run(timings=timings)
+
+        for inj_name in injectable_names:
+            _, xcpt = results[inj_name]
+            error = format_outcome_error(xcpt) if xcpt is not None else None
+            outcomes[inj_name] = InjectableOutcome(inj_name, shard_index, error, timings.get(inj_name, 0.0))
+
+    except Exception as xcpt:
+        # The shard could not be loaded or planned, so none of its injectables ran
+        errstr = format_outcome_error(xcpt)
+        for inj_name in injectable_names:
+            outcomes[inj_name] = InjectableOutcome(inj_name, shard_index, errstr)
+
+    return outcomes
+
+
+def injectable_shard_main(shard_index: int, injectable_names: List[str], result_queue: Queue):
+    """
+        The entry point of a shard worker process.
+    """
+    outcomes = run_injectable_shard(shard_index, injectable_names)
+    result_queue.put((shard_index, outcomes))
+    return
+
+
+def merge_shard_outcomes(injectable_names: Sequence[str], shard_outcomes: Dict[int, Dict[str, InjectableOutcome]],
+                         shard_assignments: Dict[str, int]) -> Dict[str, InjectableOutcome]:
+    """
+        Merges the outcomes returned by the shard workers into a single table in the order of the injectables.
+        The injectables of a shard that did not return outcomes are reported as failed.
+
+        :param injectable_names: The names of all of the injectables, in order.
+        :param shard_outcomes: The outcomes returned by each shard, by shard index.
+        :param shard_assignments: The index of the shard each injectable was assigned to, by name.
+    """
+    merged: Dict[str, InjectableOutcome] = {}
+
+    for inj_name in injectable_names:
+        sindex = shard_assignments[inj_name]
+
+        outcome = None
+        if sindex in shard_outcomes:
+            outcome = shard_outcomes[sindex].get(inj_name, None)
+
+        if outcome is None:
+            errmsg = "The worker process of shard {} exited without reporting an outcome for '{}'.".format(sindex, inj_name)
+            outcome = InjectableOutcome(inj_name, sindex, errmsg)
+
+        merged[inj_name] = outcome
+
+    return merged
+
+
+class ShardedRunReport:
+    """
+        The :class:`ShardedRunReport` is the merged outcome of a run of an :class:`InjectableShardRunner`.
+    """
+
+    def __init__(self, outcomes: Dict[str, InjectableOutcome], shards: List[List[str]], start: float, end: float):
+        self._outcomes = outcomes
+        self._shards = shards
+        self._start = start
+        self._end = end
+        return
+
+    @property
+    def elapsed(self) -> float:
+        """
+            The wall clock time in seconds taken by the whole run.
+        """
+        return self._end - self._start
+
+    @property
+    def failures(self) -> List[InjectableOutcome]:
+        failures = [outcome for outcome in self._outcomes.values() if not outcome.passed]
+        return failures
+
+    @property
+    def outcomes(self) -> Dict[str, InjectableOutcome]:
+        return self._outcomes
+
+    @property
+    def shards(self) -> List[List[str]]:
+        return self._shards
+
+    @property
+    def succeeded(self) -> bool:
+        return len(self.failures) == 0
+
+    def durations(self) -> Dict[str, float]:
+        """
+            Returns the durations of the injectables that ran, by name, which can be used as the duration history
+            of a later run.
+        """
+        durations = {name: outcome.duration for name, outcome in self._outcomes.items() if outcome.duration > 0}
+        return durations
+
+
+class InjectableShardRunner:
+    """
+        The :class:`InjectableShardRunner` partitions a finalized collection of injectables with `partition_injectables`
+        and runs each shard in its own worker process.  The worker processes are forked from the process that
+        performed the discovery so the workers inherit the registry.  The outcomes of the shards are merged back
+        into a :class:`ShardedRunReport`.
+
+        ..note: The workers are always started with the 'fork' start method, regardless of the default start
+                method of the process, because a spawned worker would only register the origins declared by the
+                modules of its injectables.  The runner can not be used on platforms that do not support 'fork'.
+
+        The workers are :class:`PipedProcess` objects so their output is forwarded to this process tagged with
+        the process id of the worker.
+    """
+
+    def __init__(self, inj_references: Dict[str, InjectableRef], shard_count: int, mode: ShardingMode = ShardingMode.Module,
+                 durations: Optional[Dict[str, float]] = None, timeout: Optional[float] = None):
+        """
+            Constructor for the :class:`InjectableShardRunner` object.
+
+            :param inj_references: The injectable references by name, as passed to `finalize_startup`.
+            :param shard_count: The number of shards and worker processes.
+            :param mode: The way the injectables are partitioned.
+            :param durations: The historical durations of the injectables in seconds, by name.
+            :param timeout: The time in seconds to wait for the workers before terminating them.
+        """
+        self._inj_references = inj_references
+        self._shard_count = shard_count
+        self._mode = mode
+        self._durations = durations
+        self._timeout = timeout
+        return
+
+    def partition(self) -> List[List[str]]:
+        """
+            Partitions the injectables and returns the names of the injectables of each shard.
+        """
+        shards = partition_injectables(self._inj_references, self._shard_count, mode=self._mode, durations=self._durations)
+        shard_names = [list(shard.keys()) for shard in shards]
+        return shard_names
+
+    def run(self) -> ShardedRunReport:
+        """
+            Runs the shards in worker processes and returns the merged report of the run.
+
+            :raises RuntimeError: If the platform does not support the 'fork' start method.
+        """
+        if "fork" not in multiprocessing.get_all_start_methods():
+            errmsg = "InjectableShardRunner requires the 'fork' start method which is not supported on this platform."
+            raise RuntimeError(errmsg)
+
+        context = multiprocessing.get_context("fork")
+
+        shards = self.partition()
+
+        shard_assignments = {}
+        for sindex, inj_names in enumerate(shards):
+            for inj_name in inj_names:
+                shard_assignments[inj_name] = sindex
+
+        result_queue = context.Queue()
+
+        start = time.perf_counter()
+
+        workers: Dict[int, PipedProcess] = {}
+        for sindex, inj_names in enumerate(shards):
+            if len(inj_names) > 0:
+                worker = PipedProcess(target=injectable_shard_main, name="injectable-shard-{}".format(sindex),
+                                      args=(sindex, inj_names, result_queue), daemon=True, context=context)
+                worker.start()
+                workers[sindex] = worker
+
+        shard_outcomes = self._collect_outcomes(workers, result_queue, start)
+
+        end = time.perf_counter()
+
+        outcomes = merge_shard_outcomes(list(self._inj_references.keys()), shard_outcomes, shard_assignments)
+
+        report = ShardedRunReport(outcomes, shards, start, end)
+        return report
+
+    def _collect_outcomes(self, workers: Dict[int, PipedProcess], result_queue: Queue, start: float) -> Dict[int, Dict[str, InjectableOutcome]]:
+        """
+            Collects the outcomes from the workers until every worker has reported, has exited or the timeout
+            has expired, and then joins the workers.
+        """
+        shard_outcomes: Dict[int, Dict[str, InjectableOutcome]] = {}
+        pending = set(workers.keys())
+
+        try:
+            while len(pending) > 0:
+                try:
+                    sindex, outcomes = result_queue.get(timeout=RESULT_POLL_INTERVAL)
+                    shard_outcomes[sindex] = outcomes
+                    pending.discard(sindex)
+                    continue
+                except queue.Empty:
+                    pass
+
+                exited = [sindex for sindex in pending if not workers[sindex].is_alive()]
+                if len(exited) > 0:
+                    # A worker flushes its outcomes before it exits, so drain anything that arrived after the poll
+                    # before deciding the exited workers did not report
+                    try:
+                        while True:
+                            sindex, outcomes = result_queue.get(timeout=RESULT_POLL_INTERVAL)
+                            shard_outcomes[sindex] = outcomes
+                            pending.discard(sindex)
+                    except queue.Empty:
+                        pass
+
+                    for sindex in exited:
+                        if sindex in pending:
+                            logger.error("Shard worker {} exited with code {} without reporting.".format(
+                                sindex, workers[sindex].exitcode))
+                            pending.discard(sindex)
+
+                if self._timeout is not None and time.perf_counter() - start > self._timeout:
+                    for sindex in pending:
+                        logger.error("Terminating shard worker {} after timeout.".format(sindex))
+                        workers[sindex].terminate()
+                    break
+        finally:
+            for worker in workers.values():
+                worker.join()
+
+        return shard_outcomes
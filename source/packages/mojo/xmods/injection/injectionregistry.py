@@ -5,7 +5,9 @@ __credits__ = []
 
 
 
-from typing import Dict
+from typing import Any, Dict, List, Optional
+
+import logging
 
 from mojo.errors.exceptions import SemanticError
 
@@ -20,6 +22,10 @@ from mojo.xmods.injection.validatorsource import ValidatorSource
 
 from mojo.xmods.injection.injectableref import InjectableRef
 
+from mojo.xmods.xinspect import signature_profiler
+
+logger = logging.getLogger()
+
 
 class InjectionRegistry:
     """
@@ -40,15 +46,15 @@ class InjectionRegistry:
         3. Walk through the entire scope tree and prune non-relevant nodes starting at the leaves and
            working backwards until a relavant node is reached or the root of the tree is reached.
 
-        4. Iterate over the injectable references and for each injectable reference, walk through the now
-           pruned scope tree utilizing a parameter visibility dictionary chain assigning usages to each
-           ParameterOrigin object as a reference is found.  As we walk, we make sure that any parameters
-           reference in the current scope are visible in the current parameter dictionary and if not
-           store information about the missing parameter.
+        4. Walk through the now pruned scope tree once utilizing a parameter visibility dictionary chain
+           assigning usages to each ParameterOrigin object as a reference is found.  As we walk, we make
+           sure that any parameters reference in the current scope are visible in the current parameter
+           dictionary and if not store information about the missing parameter for each of the injectable
+           references below the scope.
 
-        5. Go through all of the injectable references and for each injectable reference, collect integration
-           and scope couplings that are referenced so we can build a combined picture of everything that
-           is being coupled into the execution run.
+        5. Walk through the scope tree once and collect the integration and scope couplings that are
+           referenced so we can build a combined picture of everything that is being coupled into the
+           execution run.
     """
     _instance = None
     _initialized = False
@@ -75,6 +81,10 @@ class InjectionRegistry:
             # a given type of resource.
             self._integration_source = {}
             self._resource_source = {}
+
+            # Sources restored from a discovery cache are registered by source id so registering them
+            # does not import the modules of their source functions
+            self._cached_resource_source = {}
             self._scope_source = {}
             self._validator_source = {}
 
@@ -95,6 +105,11 @@ class InjectionRegistry:
 
             self._referenced_integrations = {}
             self._referenced_scopes = {}
+
+            # The origins registered while the discovery of a module is being recorded, so the
+            # discovery of the module can be stored in a discovery cache.
+            self._discovery_module: Optional[str] = None
+            self._discovery_origins: Optional[List[Any]] = None
         return
 
     @property
@@ -129,6 +144,35 @@ class InjectionRegistry:
         self._scope_tree_root.rename_resource_origins_from_main(new_origin)
         return
 
+    def begin_module_discovery(self, module_name: str):
+        """
+            Starts recording the parameter and validator origins that are registered while a module
+            is imported.
+
+            :param module_name: The name of the module being imported.
+        """
+        if self._discovery_origins is not None:
+            errmsg = "The discovery of module '{}' is already being recorded.".format(self._discovery_module)
+            raise SemanticError(errmsg) from None
+
+        self._discovery_module = module_name
+        self._discovery_origins = []
+        return
+
+    def end_module_discovery(self) -> List[Any]:
+        """
+            Stops recording the origins registered for a module and returns the origins that were
+            registered since :method:`begin_module_discovery` was called.
+        """
+        origins = self._discovery_origins
+        if origins is None:
+            origins = []
+
+        self._discovery_module = None
+        self._discovery_origins = None
+
+        return origins
+
     def lookup_resource_scope(self, scope_name):
         resource_scope = self._scope_tree_root.lookup_scope(scope_name)
         return resource_scope
@@ -143,6 +187,9 @@ class InjectionRegistry:
             source = self._scope_source[source_func]
         elif source_func in self._resource_source:
             source = self._resource_source[source_func]
+        elif len(self._cached_resource_source) > 0:
+            source_id = "{}#{}".format(source_func.__module__, source_func.__name__)
+            source = self._cached_resource_source.get(source_id, None)
 
         return source
     
@@ -176,24 +223,37 @@ class InjectionRegistry:
         originating_scope = origin.originating_scope
 
         if self._scope_tree_root.has_descendent_parameter(originating_scope, identifier):
-            errmsg = "A wellknown variable identified as '{}' has already been assigned to scope '{}'.".format(identifier, originating_scope)
-            raise SemanticError(errmsg) from None
+            # An origin that was restored from a discovery cache is replaced when the module that
+            # originates it is imported, any other duplicate is an error
+            existing_scope = self._scope_tree_root.lookup_scope(originating_scope)
+            existing_origin = existing_scope.parameter_originations[identifier]
+            if not existing_origin.restored or existing_origin.source_id != origin.source_id:
+                errmsg = "A wellknown variable identified as '{}' has already been assigned to scope '{}'.".format(identifier, originating_scope)
+                raise SemanticError(errmsg) from None
 
         # Add the parameter origin to the identifiers_for_scope table for this scope so we
         # can lookup identifiers by scope
         self._scope_tree_root.add_descendent_parameter_origination(originating_scope, origin)
 
+        if self._discovery_origins is not None:
+            self._discovery_origins.append(origin)
+
         return
 
     def register_resource_source(self, source: ResourceSource):
         """
             This method is called by the 'resource' decorator in order to register a
-            factory function that generate an arbitrary parameter resources.
+            factory function that generate an arbitrary parameter resources.  Sources that were
+            restored from a discovery cache are registered by their source id.
         """
-        source_func = source.source_function
-        
-        if source_func not in self._resource_source:
-            self._resource_source[source_func] = source
+        if source.is_cached:
+            source_id = source.source_id
+            if source_id not in self._cached_resource_source:
+                self._cached_resource_source[source_id] = source
+        else:
+            source_func = source.source_function
+            if source_func not in self._resource_source:
+                self._resource_source[source_func] = source
 
         return
 
@@ -237,6 +297,9 @@ class InjectionRegistry:
         # can lookup identifiers by scope
         self._scope_tree_root.add_descendent_validator_origination(originating_scope, origin)
 
+        if self._discovery_origins is not None:
+            self._discovery_origins.append(origin)
+
         return
 
     def finalize_startup(self, inj_references: Dict[str, InjectableRef]):
@@ -261,25 +324,25 @@ class InjectionRegistry:
         #    working backwards until a relavant node is reached or the root of the tree is reached.
         self._scope_tree_root.prune_unreference_scopes()
 
-        # 3. Iterate over the injectable references and for each reference, walk through the now pruned
-        #    scope tree utilizing a parameter visibility dictionary chain assigning usages to each
-        #    ParameterOrigin object as a reference is found.  As we walk, we make sure that any parameters
-        #    reference in the current scope are visible in the current parameter dictionary and if not
-        #    store information about the missing parameter.
-        for _, inj_ref in inj_references.items():
-            missing_params = []
-
-            self._scope_tree_root.resolve_parameter_originations_for_injectable(inj_ref, missing_params)
-
-            if len(missing_params) > 0:
-                self._unknown_parameters[inj_ref.name] = missing_params
-
-        # 4. Go through all of the injectable references and for each reference, collect integration and
-        #    scope couplings that are referenced so we can build a combined picture of everything that
-        #    is being coupled into the execution run.
-        for _, inj_ref in inj_references.items():
+        # 3. Walk through the now pruned scope tree once utilizing a parameter visibility dictionary chain
+        #    assigning usages to each ParameterOrigin object as a reference is found.  As we walk, we make
+        #    sure that any parameters reference in the current scope are visible in the current parameter
+        #    dictionary and if not store information about the missing parameter for the injectables below
+        #    the scope.
+        unknown_parameters = self._scope_tree_root.resolve_parameter_originations_for_injectables(inj_references)
+        self._unknown_parameters.update(unknown_parameters)
+
+        # 4. Collect the integration and scope couplings that are referenced so we can build a combined
+        #    picture of everything that is being coupled into the execution run.  The collection walks the
+        #    whole scope tree, so it only needs to be performed once and not once per injectable.
+        if len(inj_references) > 0:
             self._scope_tree_root.collect_integrations_and_scopes_for_injectable(self._referenced_integrations, self._referenced_scopes)
 
+        # When signature profiling is enabled, report the time that was spent introspecting signatures
+        # during the discovery and finalization of the startup.
+        if signature_profiler.enabled:
+            logger.info("InjectionRegistry startup {}".format(signature_profiler.report()))
+
         return
 
 injection_registry = InjectionRegistry()
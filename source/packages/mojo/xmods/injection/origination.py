@@ -43,7 +43,7 @@ def originate_parameter(source_func, *, identifier: Optional[None], life_span: R
             errmsg = "The 'assigned_scope' parameter should not be specified unless the source of the resource is of type 'scope' or 'resource'."
             raise SemanticError(errmsg) from None
 
-    if constraints is not None and 'constraints' not in source_info.source_signature.parameters:
+    if constraints is not None and 'constraints' not in source_info.source_parameter_names:
             raise SemanticError("Attempting to pass constraints to a parameter origin with no 'constraints' parameter.") from None
 
     caller_frame = inspect.stack()[1]
@@ -65,7 +65,7 @@ def originate_parameter(source_func, *, identifier: Optional[None], life_span: R
     elif life_span == ResourceLifespan.Session:
         assigned_scope = "<session>"
 
-    param_origin = ParameterOrigin(assigned_scope, identifier, life_span, source_info, constraints)
+    param_origin = ParameterOrigin(assigned_scope, identifier, life_span, source_info, constraints=constraints)
     injection_registry.register_parameter_origin(identifier, param_origin)
 
     return
@@ -5,7 +5,7 @@ __credits__ = []
 
 
 
-from typing import Any, Callable, Dict, Optional, Type
+from typing import Any, Callable, Dict, Optional, Tuple, Type
 
 import inspect
 
@@ -30,6 +30,14 @@ class ParameterOrigin:
             self._constraints_key = constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, originating_scope, identifier, constraints)
         return
 
+    @property
+    def constraints(self) -> Optional[Any]:
+        """
+            The constraints of the parameter resolved from the constraints of its scope and ancestor scopes.
+        """
+        cval = constraints_catalog.resolve_constraints(self._originating_scope, self._identifier)
+        return cval
+
     @property
     def constraints_key(self) -> str:
         return self._constraints_key
@@ -42,6 +50,13 @@ class ParameterOrigin:
     def implied(self) -> bool:
         return self._implied
 
+    @property
+    def restored(self) -> bool:
+        """
+            Indicates if the source of the origin was restored from a discovery cache.
+        """
+        return self._source is not None and self._source.is_cached
+
     @property
     def life_span(self) -> ResourceLifespan:
         return self._life_span
@@ -58,6 +73,10 @@ class ParameterOrigin:
     def source_function_name(self) -> str:
         return self._source.source_function.__name__
 
+    @property
+    def source_parameter_names(self) -> Tuple[str, ...]:
+        return self._source.source_parameter_names
+
     @property
     def source_signature(self) -> inspect.Signature:
         return self._source.source_signature
@@ -85,7 +104,7 @@ class ParameterOrigin:
     def generate_call(self, constraints: Optional[dict] = None):
         call_arg_str = ""
 
-        call_args = [param for param in self.source_signature.parameters]
+        call_args = list(self.source_parameter_names)
         if constraints is None and "constraints" in call_args:
             call_args.remove("constraints")
 
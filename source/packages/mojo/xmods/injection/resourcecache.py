@@ -0,0 +1,399 @@
+"""
+.. module:: resourcecache
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module containing the :class:`ResourceInstanceCache` class which memoizes the resources produced
+               by parameter origins for the lifespan of the scope the resources belong to.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, Dict, Generator, Hashable, List, Optional, Tuple
+
+import inspect
+import logging
+import threading
+
+from mojo.xmods.injection.constraintscatalog import SESSION_SCOPE_NAME
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+
+# The key of a cached resource is (source_id, lifespan scope name, constraints key)
+ResourceCacheKey = Tuple[str, str, Hashable]
+
+logger = logging.getLogger()
+
+
+def create_constraints_cache_key(constraints: Any) -> Hashable:
+    """
+        Creates a hashable key from a set of constraints so resources produced with equal constraints share
+        a cache entry.  Dictionaries are keyed by their sorted items and lists by their items, values that
+        can not be hashed are keyed by their `repr`.
+    """
+    ckey = None
+
+    if isinstance(constraints, dict):
+        ckey = tuple(sorted((repr(k), create_constraints_cache_key(v)) for k, v in constraints.items()))
+    elif isinstance(constraints, (list, tuple, set, frozenset)):
+        items = [create_constraints_cache_key(v) for v in constraints]
+        if isinstance(constraints, (set, frozenset)):
+            items.sort(key=repr)
+        ckey = tuple(items)
+    else:
+        try:
+            hash(constraints)
+            ckey = constraints
+        except TypeError:
+            ckey = repr(constraints)
+
+    return ckey
+
+
+def create_resource_cache_key(origin: ParameterOrigin, scope_name: str, constraints: Optional[Any] = None) -> ResourceCacheKey:
+    """
+        Creates the cache key for the resource of a parameter origin requested from a scope.
+
+        :param origin: The parameter origin of the resource.
+        :param scope_name: The full name of the scope the resource is requested from.
+        :param constraints: The constraints the resource is requested with, if None the constraints registered
+                            with the parameter origin are used.
+    """
+    lifespan_scope = lookup_lifespan_scope(origin, scope_name)
+
+    if constraints is not None:
+        ckey = create_constraints_cache_key(constraints)
+    else:
+        ckey = origin.constraints_key
+
+    key = (origin.source_id, lifespan_scope, ckey)
+    return key
+
+
+def lookup_lifespan_scope(origin: ParameterOrigin, scope_name: str) -> str:
+    """
+        Looks up the name of the scope that the lifespan of a parameter origin binds its resources to.
+
+        :param origin: The parameter origin of the resource.
+        :param scope_name: The full name of the scope the resource is requested from.
+    """
+    lifespan_scope = scope_name
+
+    if origin.life_span == ResourceLifespan.Session:
+        lifespan_scope = SESSION_SCOPE_NAME
+    elif origin.life_span == ResourceLifespan.Package:
+        lifespan_scope = origin.originating_scope
+
+    return lifespan_scope
+
+
+def is_descendent_scope(scope_name: str, ancestor_scope_name: str) -> bool:
+    """
+        Indicates if a scope name is the same as or a descendant of an ancestor scope name.  The session scope
+        is the ancestor of every scope.
+    """
+    is_descendent = False
+
+    if ancestor_scope_name == SESSION_SCOPE_NAME or scope_name == ancestor_scope_name:
+        is_descendent = True
+    elif scope_name.startswith(ancestor_scope_name):
+        separator = scope_name[len(ancestor_scope_name)]
+        is_descendent = separator in (".", "#")
+
+    return is_descendent
+
+
+class ResourceCacheEntry:
+    """
+        The :class:`ResourceCacheEntry` holds a cached resource along with the generator that produced it, if the
+        source is a generator, so the generator can be resumed to finalize the resource when its scope exits.
+    """
+
+    __slots__ = ("key", "resource", "generator", "sequence")
+
+    def __init__(self, key: ResourceCacheKey, resource: Any, generator: Optional[Generator], sequence: int):
+        self.key = key
+        self.resource = resource
+        self.generator = generator
+        self.sequence = sequence
+        return
+
+
+class ResourceInstanceCache:
+    """
+        The :class:`ResourceInstanceCache` memoizes the resources produced by the source functions of parameter
+        origins.  A resource is cached for the scope that its lifespan binds it to, session resources are cached
+        for the session, package resources for the originating scope of the parameter origin and test resources
+        for the scope of the test that requested them.  Resources produced with different constraints are cached
+        separately.
+
+        When the source function is a generator, the first value yielded is the resource and the generator is
+        resumed to finalize the resource when its scope is exited.  Exiting a scope evicts and finalizes the
+        resources of the scope and of all of its descendant scopes, the resources are finalized in the reverse
+        order of their creation so resources are torn down before the resources they were created from.
+
+        The cache is thread safe, a resource that is being created by one thread is waited on by the other
+        threads that request it instead of being created more than once.
+    """
+
+    def __init__(self):
+        """
+            Constructor for the :class:`ResourceInstanceCache` object.
+        """
+        self._lock = threading.Lock()
+        self._entries: Dict[ResourceCacheKey, ResourceCacheEntry] = {}
+        self._scope_entries: Dict[str, List[ResourceCacheKey]] = {}
+        self._creation_locks: Dict[ResourceCacheKey, threading.Lock] = {}
+        self._sequence = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._finalizations = 0
+        self._source_metrics: Dict[str, List[int]] = {}
+        return
+
+    @property
+    def evictions(self) -> int:
+        return self._evictions
+
+    @property
+    def finalizations(self) -> int:
+        return self._finalizations
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    def __contains__(self, key: ResourceCacheKey) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def create_cache_key(self, origin: ParameterOrigin, scope_name: str, constraints: Optional[Any] = None) -> ResourceCacheKey:
+        """
+            Creates the cache key for the resource of a parameter origin requested from a scope.
+
+            :param origin: The parameter origin of the resource.
+            :param scope_name: The full name of the scope the resource is requested from.
+            :param constraints: The constraints the resource is requested with, if None the constraints registered
+                                with the parameter origin are used.
+        """
+        key = create_resource_cache_key(origin, scope_name, constraints)
+        return key
+
+    def exit_scope(self, scope_name: str) -> List[Exception]:
+        """
+            Evicts the resources of a scope and its descendant scopes and finalizes the resources that were
+            produced by generators.
+
+            :param scope_name: The full name of the scope that is being exited.
+
+            :returns: The exceptions raised by the finalization of the resources.
+        """
+        evicted: List[ResourceCacheEntry] = []
+
+        self._lock.acquire()
+        try:
+            for lifespan_scope in list(self._scope_entries.keys()):
+                if is_descendent_scope(lifespan_scope, scope_name):
+                    for key in self._scope_entries.pop(lifespan_scope):
+                        entry = self._entries.pop(key, None)
+                        if entry is not None:
+                            evicted.append(entry)
+            self._evictions += len(evicted)
+        finally:
+            self._lock.release()
+
+        errors = []
+
+        evicted.sort(key=lambda e: e.sequence, reverse=True)
+        for entry in evicted:
+            if entry.generator is not None:
+                error = self._finalize_entry(entry)
+                if error is not None:
+                    errors.append(error)
+
+        return errors
+
+    def exit_session(self) -> List[Exception]:
+        """
+            Evicts and finalizes all of the resources in the cache.
+        """
+        errors = self.exit_scope(SESSION_SCOPE_NAME)
+        return errors
+
+    def get_resource(self, origin: ParameterOrigin, scope_name: str, parameters: Optional[Dict[str, Any]] = None,
+                     constraints: Optional[Any] = None) -> Any:
+        """
+            Gets the resource of a parameter origin for a scope, calling the source function of the origin to
+            produce the resource if it is not already cached.
+
+            :param origin: The parameter origin of the resource.
+            :param scope_name: The full name of the scope the resource is requested from.
+            :param parameters: The table of resources that can be passed to the source function by parameter name.
+            :param constraints: The constraints to request the resource with, if None the constraints registered
+                                with the parameter origin are used.
+
+            :returns: The cached or newly produced resource.
+        """
+        key = self.create_cache_key(origin, scope_name, constraints)
+        resource = self.get_resource_by_key(key, origin, parameters, constraints)
+        return resource
+
+    def get_resource_by_key(self, key: ResourceCacheKey, origin: ParameterOrigin, parameters: Optional[Dict[str, Any]] = None,
+                            constraints: Optional[Any] = None) -> Any:
+        """
+            Gets the resource of a parameter origin with a cache key that was created in advance with
+            :method:`create_cache_key`, so callers that request the same resource repeatedly do not have to
+            create the key on every request.
+
+            :param key: The cache key of the resource.
+            :param origin: The parameter origin of the resource.
+            :param parameters: The table of resources that can be passed to the source function by parameter name.
+            :param constraints: The constraints the key was created with.
+
+            :returns: The cached or newly produced resource.
+        """
+        entry = None
+        creation_lock = None
+
+        self._lock.acquire()
+        try:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                creation_lock = self._creation_locks.setdefault(key, threading.Lock())
+            else:
+                self._locked_record_access(origin.source_id, hit=True)
+        finally:
+            self._lock.release()
+
+        if entry is None:
+            creation_lock.acquire()
+            try:
+                # Another thread may have created the resource while this thread waited on the creation lock
+                self._lock.acquire()
+                try:
+                    entry = self._entries.get(key, None)
+                    self._locked_record_access(origin.source_id, hit=entry is not None)
+                finally:
+                    self._lock.release()
+
+                if entry is None:
+                    entry = self._create_entry(key, origin, parameters, constraints)
+            finally:
+                creation_lock.release()
+
+        return entry.resource
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+            Returns a table of the hit, miss, eviction and finalization counts of the cache along with the
+            hit and miss counts of each source.
+        """
+        self._lock.acquire()
+        try:
+            metrics = {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "finalizations": self._finalizations,
+                "sources": {sid: {"hits": sm[0], "misses": sm[1]} for sid, sm in self._source_metrics.items()}
+            }
+        finally:
+            self._lock.release()
+
+        return metrics
+
+    def _create_entry(self, key: ResourceCacheKey, origin: ParameterOrigin, parameters: Optional[Dict[str, Any]],
+                      constraints: Optional[Any]) -> ResourceCacheEntry:
+        """
+            Calls the source function of a parameter origin and stores the resource it produces.
+
+            ..note: The creation lock of the key must be held by the caller.
+        """
+        if parameters is None:
+            parameters = {}
+
+        if constraints is None:
+            constraints = origin.constraints
+
+        call_kwargs = {}
+        for pname in origin.source_parameter_names:
+            if pname == "constraints":
+                if constraints is not None:
+                    call_kwargs[pname] = constraints
+            else:
+                call_kwargs[pname] = parameters[pname]
+
+        generator = None
+        resource = origin.source_function(**call_kwargs)
+        if inspect.isgenerator(resource):
+            generator = resource
+            resource = next(generator)
+
+        self._lock.acquire()
+        try:
+            self._sequence += 1
+            entry = ResourceCacheEntry(key, resource, generator, self._sequence)
+            self._entries[key] = entry
+            self._scope_entries.setdefault(key[1], []).append(key)
+            del self._creation_locks[key]
+        finally:
+            self._lock.release()
+
+        return entry
+
+    def _finalize_entry(self, entry: ResourceCacheEntry) -> Optional[Exception]:
+        """
+            Resumes the generator of an evicted entry so the source can tear down the resource.
+        """
+        error = None
+
+        try:
+            next(entry.generator)
+            # The source yielded more than once, close it so its cleanup still runs
+            entry.generator.close()
+            logger.warning("Resource source yielded more than once. key={}".format(entry.key))
+        except StopIteration:
+            pass
+        except Exception as xcpt:
+            error = xcpt
+            logger.exception("Resource finalization failed. key={}".format(entry.key))
+
+        self._lock.acquire()
+        try:
+            self._finalizations += 1
+        finally:
+            self._lock.release()
+
+        return error
+
+    def _locked_record_access(self, source_id: str, hit: bool):
+        """
+            Records a hit or miss for a source.
+
+            ..note: The cache lock must be held by the caller.
+        """
+        sm = self._source_metrics.get(source_id, None)
+        if sm is None:
+            sm = [0, 0]
+            self._source_metrics[source_id] = sm
+
+        if hit:
+            self._hits += 1
+            sm[0] += 1
+        else:
+            self._misses += 1
+            sm[1] += 1
+
+        return
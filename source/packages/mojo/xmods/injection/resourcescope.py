@@ -6,10 +6,11 @@ __credits__ = []
 
 
 from typing import (
-    Any, Callable, Dict, List, get_args as typing_get_args
+    Any, Callable, Dict, List, Optional, get_args as typing_get_args
 )
 
 import collections
+import logging
 
 from mojo.errors.exceptions import SemanticError
 from mojo.xmods.injection.coupling.integrationcoupling import IntegrationCoupling
@@ -20,11 +21,19 @@ from mojo.xmods.injection.validatororigin import ValidatorOrigin
 
 from mojo.xmods.injection.injectableref import InjectableRef
 
+logger = logging.getLogger()
+
 RESOURCE_KEY_FORMAT = "{}@{}:{}"
 
 RESERVED_PARAMETER_NAMES = ["constraints"]
 
 class ResourceScope:
+    """
+        The :class:`ResourceScope` is a node in the scope tree of the injection registry.  The root of
+        the tree also maintains a flat index of every scope in the tree keyed by the full dotted path of
+        the scope, so scopes can be found by name without walking the tree.  The '#' that separates the
+        module and injectable names in a scope name is treated the same as a '.' by the index.
+    """
 
     def __init__(self, name=None, package=None, is_inj_scope=False):
         self._name = name
@@ -34,6 +43,11 @@ class ResourceScope:
         self._validator_originations = collections.OrderedDict()
         self._is_inj_scope = is_inj_scope
         self._is_relevant = False
+
+        # Only the root scope maintains the index of the scopes in the tree
+        self._scope_index: Optional[Dict[str, ResourceScope]] = None
+        if package is None:
+            self._scope_index = {}
         return
 
     @property
@@ -85,10 +99,12 @@ class ResourceScope:
             if assigned_scope.find("#") > -1:
                 is_inj_scope = True
                 assigned_scope = assigned_scope.replace("#", ".")
-            to_walk_list = assigned_scope.split(".")
-            path_stack = []
 
-            self._add_descendent_parameter_origination(parameter_origin, to_walk_list, path_stack, is_inj_scope)
+            curr_scope = self._get_or_create_descendent_scope(assigned_scope, is_inj_scope)
+            if parameter_origin is not None:
+                identifier = parameter_origin.identifier
+                curr_scope._parameter_originations[identifier] = parameter_origin
+                curr_scope._parameter_originations.move_to_end(identifier, last=True)
 
         return
     
@@ -117,10 +133,12 @@ class ResourceScope:
             if assigned_scope.find("#") > -1:
                 is_inj_scope = True
                 assigned_scope = assigned_scope.replace("#", ".")
-            to_walk_list = assigned_scope.split(".")
-            path_stack = []
 
-            self._add_descendent_validator_origination(validator_origin, to_walk_list, path_stack, is_inj_scope)
+            curr_scope = self._get_or_create_descendent_scope(assigned_scope, is_inj_scope)
+            if validator_origin is not None:
+                identifier = validator_origin.identifier
+                curr_scope._validator_originations[identifier] = validator_origin
+                curr_scope._validator_originations.move_to_end(identifier, last=True)
 
         return
 
@@ -137,7 +155,8 @@ class ResourceScope:
 
             if not param_orig.implied:
 
-                source_function = param_orig.source_function
+                # The source function is only looked up for couplings, looking up the source function
+                # of an origin restored from a discovery cache imports the module of the source.
                 param_resource_type = param_orig.source_resource_type
 
                 if len(typing_get_args(param_resource_type)) > 0:
@@ -145,18 +164,18 @@ class ResourceScope:
                         if issubclass(type_arg, IntegrationCoupling):
                             # There should never be more than one fixture with the same well-known or
                             # declared name in the same collection of injectables.
-                            integration_table[source_function] = type_arg
+                            integration_table[param_orig.source_function] = type_arg
                             break
                         elif issubclass(type_arg, ScopeCoupling):
-                            scope_table[source_function] = type_arg
+                            scope_table[param_orig.source_function] = type_arg
                             break
                 else:
                     if issubclass(param_resource_type, IntegrationCoupling):
                         # There should never be more than one fixture with the same well-known or
                         # declared name in the same collection of injectables.
-                        integration_table[source_function] = param_resource_type
+                        integration_table[param_orig.source_function] = param_resource_type
                     elif issubclass(param_resource_type, ScopeCoupling):
-                        scope_table[source_function] = param_resource_type
+                        scope_table[param_orig.source_function] = param_resource_type
 
         for child_scope in self._children.values():
 
@@ -177,15 +196,40 @@ class ResourceScope:
 
         inj_scope_name = inj_ref.scope_name
 
-        module_name, inj_name = inj_scope_name.split("#")
+        self._is_relevant = True
 
-        inj_scope_parts = module_name.split(".")
-        inj_scope_parts.append(inj_name)
+        if self._scope_index is not None:
+            scope_path = inj_scope_name.replace("#", ".")
 
-        path_stack = []
+            # Every scope on the path of a relevant scope is marked relevant when it is marked, so
+            # if the scope of the injectable is already relevant there is nothing left to do
+            inj_scope = self._scope_index.get(scope_path, None)
+            if inj_scope is None or not inj_scope._is_relevant:
+                parts = scope_path.split(".")
+                last_index = len(parts) - 1
 
-        self._is_relevant = True
-        self._ensure_parameter_scopes_for_injectable(inj_ref, inj_scope_parts, path_stack)
+                curr_scope = self
+                for pindex, curr_leaf in enumerate(parts):
+                    if curr_leaf in curr_scope._children:
+                        curr_scope = curr_scope._children[curr_leaf]
+                    else:
+                        curr_package = ".".join(parts[:pindex + 1])
+                        nxt_scope = ResourceScope(curr_leaf, curr_package, pindex == last_index)
+                        curr_scope._children[curr_leaf] = nxt_scope
+                        self._scope_index[curr_package] = nxt_scope
+                        curr_scope = nxt_scope
+
+                    curr_scope._is_relevant = True
+
+        else:
+            module_name, inj_name = inj_scope_name.split("#")
+
+            inj_scope_parts = module_name.split(".")
+            inj_scope_parts.append(inj_name)
+
+            path_stack = []
+
+            self._ensure_parameter_scopes_for_injectable(inj_ref, inj_scope_parts, path_stack)
 
         return
 
@@ -203,6 +247,10 @@ class ResourceScope:
         if self._package is None and scope_name == "<session>":
             if identifier in self._parameter_originations:
                 rtnval = True
+        elif self._scope_index is not None:
+            scope = self._scope_index.get(scope_name.replace("#", "."), None)
+            if scope is not None and identifier in scope._parameter_originations:
+                rtnval = True
         else:
             scope_name = scope_name.replace("#", ".")
             to_walk_list = scope_name.split(".")
@@ -225,6 +273,10 @@ class ResourceScope:
         if self._package is None and scope_name == "<session>":
             if identifier in self._validator_originations:
                 rtnval = True
+        elif self._scope_index is not None:
+            scope = self._scope_index.get(scope_name.replace("#", "."), None)
+            if scope is not None and identifier in scope._validator_originations:
+                rtnval = True
         else:
             scope_name = scope_name.replace("#", ".")
             to_walk_list = scope_name.split(".")
@@ -244,6 +296,8 @@ class ResourceScope:
         scope_found = None
         if self._package is None and scope_name == "<session>":
             scope_found = self
+        elif self._scope_index is not None:
+            scope_found = self._scope_index.get(scope_name.replace("#", "."), None)
         else:
             scope_name = scope_name.replace("#", ".")
             to_walk_list = scope_name.split(".")
@@ -274,6 +328,11 @@ class ResourceScope:
             if not nxt_child._is_relevant:
                 del self._children[nxt_child_key]
 
+        if self._scope_index is not None:
+            # The descendants of a scope that is not relevant are also not relevant, so the scopes
+            # that were pruned are exactly the scopes in the index that are not relevant
+            self._scope_index = { spath: scope for spath, scope in self._scope_index.items() if scope._is_relevant }
+
         return
 
     def rename_resource_origins_from_main(self, new_origin: str):
@@ -296,6 +355,9 @@ class ResourceScope:
                     poval._originating_scope = inj_scope_origin
                     self.add_descendent_parameter_origination(inj_scope_origin, poval)
 
+            if self._scope_index is not None:
+                self._rebuild_scope_index()
+
         return
 
     def resolve_parameter_originations_for_injectable(self, inj_ref: InjectableRef, missing_params: List[Any]):
@@ -317,75 +379,90 @@ class ResourceScope:
         inj_scope_parts = module_name.split(".")
         inj_scope_parts.append(inj_name)
 
-        param_table = {}
-        for pname, pinfo in self._parameter_originations.items():
-            param_table[pname] = pinfo
+        # The parameter visibility of each scope is chained onto the visibility of its parent
+        # scope instead of copying the parent table at every level
+        param_table = collections.ChainMap(self._parameter_originations)
 
         self._resolve_parameter_originations_for_injectable_descend(inj_ref, inj_scope_parts, param_table, missing_params)
 
         return
 
-    def _add_descendent_parameter_origination(self, parameter_origin: ParameterOrigin, to_walk_list: List[str], path_stack: List[str], is_inj_scope):
+    def resolve_parameter_originations_for_injectables(self, inj_references: Dict[str, InjectableRef]) -> Dict[str, List[Any]]:
+        """
+            Walk through the scope tree once and validate the resolution of all parameters that are being
+            utilized by any parameter source functions for all of the injectable references provided.  The
+            parameters that are missing in a scope are the same for every injectable below the scope, so each
+            scope is only checked once instead of once for every injectable whose path passes through it.
 
-        curr_leaf = to_walk_list.pop(0)
-        curr_scope = None
+            :param inj_references: The table of :class:`InjectableRef` objects to validate the parameters of.
 
-        if curr_leaf in self._children:
-            curr_scope = self._children[curr_leaf]
-        else:
-            curr_package = curr_leaf
-            if len(path_stack) > 0:
-                curr_package = "{}.{}".format(".".join(path_stack), curr_package)
+            :returns: A table of the names of the injectables that have missing parameters and the list of
+                      parameters that are missing for each one.
+        """
 
-            set_inj_scope = False
-            if len(to_walk_list) == 0:
-                set_inj_scope = is_inj_scope
+        unknown_parameters = {}
 
-            curr_scope = ResourceScope(curr_leaf, curr_package, set_inj_scope)
-            self._children[curr_leaf] = curr_scope
+        inj_by_path = {}
+        for inj_ref in inj_references.values():
+            inj_by_path[inj_ref.scope_name.replace("#", ".")] = inj_ref
 
-        if len(to_walk_list) > 0:
-            path_stack.append(curr_leaf)
-            curr_scope._add_descendent_parameter_origination(parameter_origin, to_walk_list, path_stack, is_inj_scope)
-            path_stack.pop()
-        else:
-            if parameter_origin is not None:
-                identifier = parameter_origin.identifier
-                curr_scope._parameter_originations[identifier] = parameter_origin
-                curr_scope._parameter_originations.move_to_end(identifier, last=True)
+        param_table = collections.ChainMap(self._parameter_originations)
 
-        return
-    
-    def _add_descendent_validator_origination(self, validator_origin: ValidatorOrigin, to_walk_list: List[str], path_stack: List[str], is_inj_scope):
+        walk_stack = [(child_name, child, param_table, []) for child_name, child in self._children.items()]
+        while len(walk_stack) > 0:
+            scope_path, scope, parent_param_table, parent_missing_params = walk_stack.pop()
 
-        curr_leaf = to_walk_list.pop(0)
-        curr_scope = None
+            scope_param_table = parent_param_table.new_child()
 
-        if curr_leaf in self._children:
-            curr_scope = self._children[curr_leaf]
-        else:
-            curr_package = curr_leaf
-            if len(path_stack) > 0:
-                curr_package = "{}.{}".format(".".join(path_stack), curr_package)
+            scope_missing_params = []
+            for scope_param_name, scope_param_origin in scope.parameter_originations.items():
+                if isinstance(scope_param_origin, ParameterOrigin):
+                    self._collect_missing_source_parameters(scope_param_origin, scope_param_table, scope_missing_params)
+                    scope_param_table[scope_param_name] = scope_param_origin
+                else:
+                    logger.warning("Ignoring parameter origination that is not a ParameterOrigin. scope={} name={} type={}".format(
+                        scope.package, scope_param_name, type(scope_param_origin).__name__))
 
-            set_inj_scope = False
-            if len(to_walk_list) == 0:
-                set_inj_scope = is_inj_scope
+            # The list of missing parameters is only copied for scopes that add missing parameters
+            missing_params = parent_missing_params
+            if len(scope_missing_params) > 0:
+                missing_params = parent_missing_params + scope_missing_params
 
-            curr_scope = ResourceScope(curr_leaf, curr_package, set_inj_scope)
-            self._children[curr_leaf] = curr_scope
+            if scope_path in inj_by_path and len(missing_params) > 0:
+                unknown_parameters[inj_by_path[scope_path].name] = list(missing_params)
 
-        if len(to_walk_list) > 0:
-            path_stack.append(curr_leaf)
-            curr_scope._add_descendent_validator_origination(validator_origin, to_walk_list, path_stack, is_inj_scope)
-            path_stack.pop()
-        else:
-            if validator_origin is not None:
-                identifier = validator_origin.identifier
-                curr_scope._validator_originations[identifier] = validator_origin
-                curr_scope._validator_originations.move_to_end(identifier, last=True)
+            for child_name, child in scope._children.items():
+                walk_stack.append(("{}.{}".format(scope_path, child_name), child, scope_param_table, missing_params))
 
-        return
+        return unknown_parameters
+
+    def _get_or_create_descendent_scope(self, scope_path: str, is_inj_scope: bool) -> "ResourceScope":
+        """
+            Gets the descendent scope with the dotted scope path provided from the scope index, creating the
+            scope and any missing ancestor scopes if it does not exist.
+
+            :param scope_path: The full dotted path of the scope.
+            :param is_inj_scope: Indicates if the scope is the scope of an injectable, which is only applied
+                                 if the scope is created.
+        """
+        curr_scope = self._scope_index.get(scope_path, None)
+
+        if curr_scope is None:
+            parts = scope_path.split(".")
+            last_index = len(parts) - 1
+
+            curr_scope = self
+            for pindex, curr_leaf in enumerate(parts):
+                if curr_leaf in curr_scope._children:
+                    curr_scope = curr_scope._children[curr_leaf]
+                else:
+                    curr_package = ".".join(parts[:pindex + 1])
+                    nxt_scope = ResourceScope(curr_leaf, curr_package, is_inj_scope and pindex == last_index)
+                    curr_scope._children[curr_leaf] = nxt_scope
+                    self._scope_index[curr_package] = nxt_scope
+                    curr_scope = nxt_scope
+
+        return curr_scope
 
     def _ensure_parameter_scopes_for_injectable(self, inj_ref: InjectableRef, inj_scope_parts: List[str], path_stack: List[str]):
 
@@ -468,15 +545,45 @@ class ResourceScope:
 
         return scope_found
 
+    def _collect_missing_source_parameters(self, param_origin: ParameterOrigin, scope_param_table: collections.ChainMap,
+        missing_params: List[Any]):
+        """
+            Adds the parameters of the source function of a parameter origin that are not visible in the
+            scope parameter table to the list of missing parameters.
+        """
+
+        for sparam_name in param_origin.source_parameter_names:
+            if sparam_name not in scope_param_table and sparam_name not in RESERVED_PARAMETER_NAMES:
+                sparam_origin = param_origin.source_signature.parameters[sparam_name]
+                missing_params.append([sparam_name, sparam_origin])
+        return
+
+    def _rebuild_scope_index(self):
+        """
+            Rebuilds the scope index from the scope tree.  Children with a dotted name are not indexed
+            because a scope path never resolves to them.
+        """
+        self._scope_index = {}
+
+        walk_stack = [(child_name, child) for child_name, child in self._children.items() if child_name.find(".") < 0]
+        while len(walk_stack) > 0:
+            scope_path, scope = walk_stack.pop()
+            self._scope_index[scope_path] = scope
+            for child_name, child in scope._children.items():
+                if child_name.find(".") < 0:
+                    walk_stack.append(("{}.{}".format(scope_path, child_name), child))
+
+        return
+
     def _resolve_parameter_originations_for_injectable_descend(self, inj_ref: InjectableRef, inj_scope_parts: List[str],
-        param_table: dict, missing_params: List[Any]):
+        param_table: collections.ChainMap, missing_params: List[Any]):
 
         if len(inj_scope_parts) > 0:
             nxt_scope_name = inj_scope_parts.pop(0)
             if nxt_scope_name in self._children:
                 nxt_scope = self._children[nxt_scope_name]
 
-                nxt_param_table = param_table.copy()
+                nxt_param_table = param_table.new_child()
 
                 # Go through all the parameter originations registered in this scope an add them
                 # to the nxt_param_table dictionary to pass down to descendant scopes
@@ -501,12 +608,8 @@ class ResourceScope:
         return
 
     def _resolve_parameter_originations_for_injectable_lateral(self, inj_ref: InjectableRef, lateral_param_origin: ParameterOrigin,
-        inj_scope_parts: List[str], scope_param_table: dict, missing_params: List[Any]):
+        inj_scope_parts: List[str], scope_param_table: collections.ChainMap, missing_params: List[Any]):
 
-        source_params = lateral_param_origin.source_signature.parameters
-        if len(source_params) > 0:
-            for sparam_name, sparam_origin in source_params.items():
-                if sparam_name not in scope_param_table and sparam_name not in RESERVED_PARAMETER_NAMES:
-                    missing_params.append([sparam_name, sparam_origin])
+        self._collect_missing_source_parameters(lateral_param_origin, scope_param_table, missing_params)
         return
 
@@ -5,10 +5,12 @@ __credits__ = []
 
 
 
-from typing import Callable, Type
+from typing import Callable, Tuple, Type
 
 import inspect
 
+from mojo.xmods.xinspect import get_function_signature
+
 class SourceBase:
 
     def __init__(self, source_func: Callable, query_func: Callable, resource_type: Type, constaints: dict):
@@ -17,12 +19,25 @@ class SourceBase:
         self._resource_type = resource_type
         self._constraints = constaints
         self._subscriptions = None
+
+        # The signature is introspected when the source is registered and is cached along with the
+        # function and code object it was introspected from, so it is introspected again if either
+        # of them is replaced.
+        self._signature = None
+        self._signature_parameter_names = None
+        self._signature_key = None
+        if source_func is not None:
+            self._update_signature()
         return
 
     @property
     def constraints(self):
         return self._constraints
 
+    @property
+    def is_cached(self) -> bool:
+        return False
+
     @property
     def module_name(self) -> str:
         return self._source_func.__module__
@@ -39,9 +54,17 @@ class SourceBase:
     def source_function(self) -> Callable:
         return self._source_func
 
+    @property
+    def source_parameter_names(self) -> Tuple[str, ...]:
+        if self._signature_key != self._create_signature_key():
+            self._update_signature()
+        return self._signature_parameter_names
+
     @property
     def source_signature(self) -> inspect.Signature:
-        return inspect.signature(self._source_func)
+        if self._signature_key != self._create_signature_key():
+            self._update_signature()
+        return self._signature
 
     @property
     def source_id(self) -> str:
@@ -56,4 +79,15 @@ class SourceBase:
     @subscriptions.setter
     def subscriptions(self, val):
         self._subscriptions = val
-        return
\ No newline at end of file
+        return
+
+    def _create_signature_key(self):
+        source_func = self._source_func
+        sigkey = (source_func, getattr(source_func, "__code__", None))
+        return sigkey
+
+    def _update_signature(self):
+        self._signature = get_function_signature(self._source_func)
+        self._signature_parameter_names = tuple(self._signature.parameters)
+        self._signature_key = self._create_signature_key()
+        return
@@ -5,7 +5,7 @@ __credits__ = []
 __version__ = "1.0.0"
 
 
-from typing import Any, Callable, Dict, Optional, Type, Union
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union
 
 import inspect
 
@@ -59,6 +59,10 @@ class ValidatorOrigin:
     def source_function_name(self) -> str:
         return self._source.source_function.__name__
 
+    @property
+    def source_parameter_names(self) -> Tuple[str, ...]:
+        return self._source.source_parameter_names
+
     @property
     def source_signature(self) -> inspect.Signature:
         return self._source.source_signature
@@ -87,7 +91,7 @@ class ValidatorOrigin:
     def generate_call(self, constraints: Optional[dict] = None):
         call_arg_str = ""
 
-        call_args = [param for param in self.source_signature.parameters]
+        call_args = list(self.source_parameter_names)
         if constraints is None and "constraints" in call_args:
             call_args.remove("constraints")
 
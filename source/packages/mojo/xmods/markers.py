@@ -3,9 +3,13 @@ __copyright__ = "Copyright 2023, Myron W Walker"
 __credits__ = []
 
 
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
 
+import collections.abc
 import inspect
+import re
+
+from types import CodeType, MappingProxyType
 
 
 from mojo.errors.exceptions import SemanticError
@@ -115,6 +119,81 @@ def mark_descendent_priority(*, priority: int):
     return
 
 
+EMPTY_METADATA = MappingProxyType({})
+
+# Returned by metadata lookups for a missing group, it is not equal to any metadata value
+MISSING_METADATA = object()
+
+# The compiled code objects of the predicates, keyed by the predicate source, the values of the filters are bound
+# as default arguments so filters with the same structure share the same code
+PREDICATE_CODE_CACHE: Dict[str, CodeType] = {}
+
+
+def bind_predicate_value(namespace: Dict[str, Any], value: Any) -> str:
+    """
+        Binds a value into the namespace of a compiled predicate and returns the name it is bound to.
+    """
+    name = "v{}".format(len(namespace))
+    namespace[name] = value
+    return name
+
+
+def compile_metafilter_predicate(metafilter: "MetaFilter") -> Callable[[Optional[Dict[str, Any]]], bool]:
+    """
+        Compiles a filter tree into a predicate function which evaluates the whole tree as a single Python
+        expression.
+
+        :param metafilter: The root of the filter tree.
+    """
+    namespace: Dict[str, Any] = {}
+    expression = metafilter.create_predicate_code(namespace)
+
+    default_args = "".join(", {0}={0}".format(name) for name in namespace)
+    source = (
+        "def predicate(metadata{}):\n"
+        "    md = metadata if metadata is not None else EMPTY_METADATA\n"
+        "    return {}\n"
+    ).format(default_args, expression)
+
+    code = PREDICATE_CODE_CACHE.get(source, None)
+    if code is None:
+        code = compile(source, "<marker-predicate>", "exec")
+        PREDICATE_CODE_CACHE[source] = code
+
+    namespace["EMPTY_METADATA"] = EMPTY_METADATA
+    exec(code, namespace)
+
+    predicate = namespace["predicate"]
+    return predicate
+
+
+def metadata_value_contains(found_marker: Any, value: Any) -> bool:
+    """
+        Indicates if a metadata value contains a value, which is a substring match for string metadata values and
+        an item match for list and tuple metadata values.
+    """
+    contains = False
+    if isinstance(found_marker, (str, list, tuple)):
+        contains = value in found_marker
+    return contains
+
+
+def metadata_value_in(found_marker: Any, values: Tuple[Any, ...]) -> bool:
+    """
+        Indicates if a metadata value is one of a tuple of values or, for list and tuple metadata values, if an
+        item of the metadata value is one of the values.
+    """
+    found = False
+    if isinstance(found_marker, (list, tuple)):
+        for value in values:
+            if value in found_marker:
+                found = True
+                break
+    else:
+        found = found_marker in values
+    return found
+
+
 class MetaFilter:
 
     def __init__(self, include: bool, group: str):
@@ -130,6 +209,43 @@ class MetaFilter:
     def include(self):
         return self._include
 
+    @property
+    def filter_key(self) -> Optional[Hashable]:
+        """
+            A key that identifies the selection of the filter so the selections of equal filters can be shared
+            by a :class:`MetadataIndex`, or None if the selection of the filter should not be shared.
+        """
+        return None
+
+    def create_predicate(self) -> Callable[[Optional[Dict[str, Any]]], bool]:
+        """
+            Creates a function that takes the metadata of an injectable and returns True if the filter includes
+            the metadata.  The filter tree is compiled into a single Python expression so evaluating it does not
+            dispatch through the filter objects, see `compile_metafilter_predicate`.
+        """
+        predicate = compile_metafilter_predicate(self)
+        return predicate
+
+    def create_predicate_code(self, namespace: Dict[str, Any]) -> str:
+        """
+            Creates the Python expression that evaluates the filter for the compiled predicate.  The expression can
+            use the `metadata` variable, which may be None, and the `md` variable, which is an empty mapping when
+            the metadata is None.  The values the expression uses are bound into the namespace with
+            `bind_predicate_value`.  Derived filters override this method, the default expression calls
+            `should_include`.
+        """
+        code = "{}(metadata)".format(bind_predicate_value(namespace, self.should_include))
+        return code
+
+    def select_mask(self, index: "MetadataIndex") -> int:
+        """
+            Selects the members of a :class:`MetadataIndex` that the filter includes and returns them as a
+            bit mask of member positions.  Derived filters override this method to select the members with
+            the inverted indexes, the default selection evaluates `should_include` for each distinct metadata.
+        """
+        mask = index.scan_mask(self.should_include)
+        return mask
+
     def should_include(self, metadata: Dict[str, Any]) -> bool:
         errmsg = "MetaFilter.should_include must be implemented in derived classes."
         raise NotImplementedError(errmsg)
@@ -141,7 +257,25 @@ class MetaFilterContains(MetaFilter):
         super().__init__(include, group)
         self._value = value
         return
-    
+
+    @property
+    def filter_key(self) -> Optional[Hashable]:
+        return ("contains", self._include, self._group, self._value)
+
+    def create_predicate_code(self, namespace: Dict[str, Any]) -> str:
+        group = bind_predicate_value(namespace, self._group)
+        code = "({1} in md and {0}(md[{1}], {2}))".format(bind_predicate_value(namespace, metadata_value_contains),
+                                                         group, bind_predicate_value(namespace, self._value))
+        if not self._include:
+            code = "(not {})".format(code)
+        return code
+
+    def select_mask(self, index: "MetadataIndex") -> int:
+        mask = index.contains_mask(self._group, self._value)
+        if not self._include:
+            mask = index.complement(mask)
+        return mask
+
     def should_include(self, metadata: Dict[str, Any]) -> bool:
 
         include = False
@@ -170,6 +304,23 @@ class MetaFilterEquals(MetaFilter):
         self._value = value
         return
 
+    @property
+    def filter_key(self) -> Optional[Hashable]:
+        return ("equals", self._include, self._group, self._value)
+
+    def create_predicate_code(self, namespace: Dict[str, Any]) -> str:
+        group = bind_predicate_value(namespace, self._group)
+        code = "({0} in md and md[{0}] == {1})".format(group, bind_predicate_value(namespace, self._value))
+        if not self._include:
+            code = "(not {})".format(code)
+        return code
+
+    def select_mask(self, index: "MetadataIndex") -> int:
+        mask = index.equals_mask(self._group, self._value)
+        if not self._include:
+            mask = index.complement(mask)
+        return mask
+
     def should_include(self, metadata: Dict[str, Any]) -> bool:
 
         include = False
@@ -193,6 +344,18 @@ class MetaFilterNotEquals(MetaFilterEquals):
         super().__init__(include, group, value)
         return
 
+    @property
+    def filter_key(self) -> Optional[Hashable]:
+        return ("notequals", self._include, self._group, self._value)
+
+    def create_predicate_code(self, namespace: Dict[str, Any]) -> str:
+        code = "(not {})".format(super().create_predicate_code(namespace))
+        return code
+
+    def select_mask(self, index: "MetadataIndex") -> int:
+        mask = index.complement(super().select_mask(index))
+        return mask
+
     def should_include(self, metadata: Dict[str, Any]) -> bool:
 
         include = super().should_include(metadata)
@@ -201,64 +364,843 @@ class MetaFilterNotEquals(MetaFilterEquals):
         return include
 
 
-def parse_marker_expression(expression: str):
+class MetaFilterIn(MetaFilter):
+    """
+        Includes the metadata with a group value that is one of a list of values or, for list and tuple group
+        values, with an item that is one of the values.
+    """
 
-    include = True
-    group = None
-    marker = None
+    def __init__(self, include: bool, group: str, values: Sequence[str]):
+        super().__init__(include, group)
+        self._values = tuple(values)
+        return
 
-    working_expr = expression.strip()
+    @property
+    def filter_key(self) -> Optional[Hashable]:
+        return ("in", self._include, self._group, self._values)
+
+    def create_predicate_code(self, namespace: Dict[str, Any]) -> str:
+        group = bind_predicate_value(namespace, self._group)
+        code = "({1} in md and {0}(md[{1}], {2}))".format(bind_predicate_value(namespace, metadata_value_in),
+                                                         group, bind_predicate_value(namespace, self._values))
+        if not self._include:
+            code = "(not {})".format(code)
+        return code
+
+    @property
+    def values(self) -> Tuple[str, ...]:
+        return self._values
+
+    def select_mask(self, index: "MetadataIndex") -> int:
+        mask = 0
+        for value in self._values:
+            mask |= index.equals_mask(self._group, value) | index.item_mask(self._group, value)
+        if not self._include:
+            mask = index.complement(mask)
+        return mask
+
+    def should_include(self, metadata: Dict[str, Any]) -> bool:
 
-    include_symbol = working_expr[0]
-    if include_symbol == "+":
-        include = True
-    elif include_symbol == "-":
         include = False
-    else:
-        errmsg = "Marker expressions must begin with a + (include) or - (exclude) symbol. expression={}".format(expression)
-        raise SemanticError(errmsg)
 
-    # Strip off the include or exclude
-    working_expr = working_expr[1:].lstrip()
-
-    errmsg = "Marker expressions must be in the form (+ or -)(group)/(marker)(= or ~)(value). expression={}".format(expression)
-
-    operator = None
-    # Equals
-    if working_expr.find("==") > 0:
-        operator = "=="
-        working_expr.split(operator)
-    # Contains
-    elif working_expr.find("~=") > 0:
-        operator = "~="
-    # Not Equal
-    elif working_expr.find("!=") > 0:
-        operator = "!="
-    else:
-        raise SemanticError(errmsg)
+        if metadata is not None and self._group in metadata:
+            found_marker = metadata[self._group]
+            if isinstance(found_marker, (list, tuple)):
+                for value in self._values:
+                    if value in found_marker:
+                        include = True
+                        break
+            elif found_marker in self._values:
+                include = True
+
+        if not self._include:
+            include = False if include else True
+
+        return include
+
+
+class MetaFilterMatches(MetaFilter):
+    """
+        Includes the metadata with a string group value that matches a regular expression or, for list and tuple
+        group values, with a string item that matches the regular expression.  The expression is searched for
+        anywhere in the value, anchors can be used to match the whole value.
+    """
+
+    def __init__(self, include: bool, group: str, pattern: str):
+        super().__init__(include, group)
+        self._pattern = pattern
+        try:
+            self._regex = re.compile(pattern)
+        except re.error as xcpt:
+            errmsg = "Invalid regular expression for marker group '{}'. pattern={} error={}".format(group, pattern, xcpt)
+            raise SemanticError(errmsg) from None
+        return
+
+    @property
+    def filter_key(self) -> Optional[Hashable]:
+        return ("matches", self._include, self._group, self._pattern)
+
+    def create_predicate_code(self, namespace: Dict[str, Any]) -> str:
+        group = bind_predicate_value(namespace, self._group)
+        code = "({1} in md and {0}(md[{1}]))".format(bind_predicate_value(namespace, self._value_matches), group)
+        if not self._include:
+            code = "(not {})".format(code)
+        return code
+
+    @property
+    def pattern(self) -> str:
+        return self._pattern
+
+    def select_mask(self, index: "MetadataIndex") -> int:
+        mask = index.values_mask(self._group, self._value_matches)
+        if not self._include:
+            mask = index.complement(mask)
+        return mask
+
+    def should_include(self, metadata: Dict[str, Any]) -> bool:
+
+        include = False
+
+        if metadata is not None and self._group in metadata:
+            include = self._value_matches(metadata[self._group])
+
+        if not self._include:
+            include = False if include else True
+
+        return include
+
+    def _value_matches(self, value: Any) -> bool:
+        matches = False
+        if isinstance(value, str):
+            matches = self._regex.search(value) is not None
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                if isinstance(item, str) and self._regex.search(item) is not None:
+                    matches = True
+                    break
+        return matches
+
+
+class MetaFilterAnd(MetaFilter):
+    """
+        Includes the metadata that every one of its filters includes.
+    """
+
+    def __init__(self, metafilters: Sequence[MetaFilter]):
+        super().__init__(True, None)
+        self._metafilters = tuple(metafilters)
+        self._predicate = None
+        return
+
+    @property
+    def filter_key(self) -> Optional[Hashable]:
+        fkey = None
+        child_keys = tuple(mfilter.filter_key for mfilter in self._metafilters)
+        if None not in child_keys:
+            fkey = ("and", child_keys)
+        return fkey
+
+    @property
+    def metafilters(self) -> Tuple[MetaFilter, ...]:
+        return self._metafilters
+
+    def create_predicate_code(self, namespace: Dict[str, Any]) -> str:
+        code = "(" + " and ".join(mfilter.create_predicate_code(namespace) for mfilter in self._metafilters) + ")"
+        return code
+
+    def select_mask(self, index: "MetadataIndex") -> int:
+        mask = index.universe
+        for mfilter in self._metafilters:
+            mask &= index.filter_mask(mfilter)
+            if mask == 0:
+                break
+        return mask
+
+    def should_include(self, metadata: Dict[str, Any]) -> bool:
+        if self._predicate is None:
+            self._predicate = self.create_predicate()
+        return self._predicate(metadata)
+
+
+class MetaFilterOr(MetaFilter):
+    """
+        Includes the metadata that any one of its filters includes.
+    """
+
+    def __init__(self, metafilters: Sequence[MetaFilter]):
+        super().__init__(True, None)
+        self._metafilters = tuple(metafilters)
+        self._predicate = None
+        return
+
+    @property
+    def filter_key(self) -> Optional[Hashable]:
+        fkey = None
+        child_keys = tuple(mfilter.filter_key for mfilter in self._metafilters)
+        if None not in child_keys:
+            fkey = ("or", child_keys)
+        return fkey
+
+    @property
+    def metafilters(self) -> Tuple[MetaFilter, ...]:
+        return self._metafilters
+
+    def create_predicate_code(self, namespace: Dict[str, Any]) -> str:
+        code = "(" + " or ".join(mfilter.create_predicate_code(namespace) for mfilter in self._metafilters) + ")"
+        return code
 
-    marker_group = None
-    marker_value = None
+    def select_mask(self, index: "MetadataIndex") -> int:
+        mask = 0
+        for mfilter in self._metafilters:
+            mask |= index.filter_mask(mfilter)
+            if mask == index.universe:
+                break
+        return mask
 
-    next_parts = working_expr.split(operator)
-    if len(next_parts) == 1:
-        if operator in ["==", "~=", "!="]:
-            errmsg = 'Expressions using the "==", "~=", "!=" operators must have a value component. expression={}'.format(expression)
+    def should_include(self, metadata: Dict[str, Any]) -> bool:
+        if self._predicate is None:
+            self._predicate = self.create_predicate()
+        return self._predicate(metadata)
+
+
+class MetaFilterNot(MetaFilter):
+    """
+        Includes the metadata that its filter does not include.
+    """
+
+    def __init__(self, metafilter: MetaFilter):
+        super().__init__(True, None)
+        self._metafilter = metafilter
+        return
+
+    @property
+    def filter_key(self) -> Optional[Hashable]:
+        fkey = None
+        child_key = self._metafilter.filter_key
+        if child_key is not None:
+            fkey = ("not", child_key)
+        return fkey
+
+    @property
+    def metafilter(self) -> MetaFilter:
+        return self._metafilter
+
+    def create_predicate_code(self, namespace: Dict[str, Any]) -> str:
+        code = "(not {})".format(self._metafilter.create_predicate_code(namespace))
+        return code
+
+    def select_mask(self, index: "MetadataIndex") -> int:
+        mask = index.complement(index.filter_mask(self._metafilter))
+        return mask
+
+    def should_include(self, metadata: Dict[str, Any]) -> bool:
+        include = not self._metafilter.should_include(metadata)
+        return include
+
+
+class MarkerToken:
+    """
+        A token of a marker expression along with the position of the token in the expression.
+    """
+
+    __slots__ = ("kind", "text", "position")
+
+    def __init__(self, kind: str, text: str, position: int):
+        self.kind = kind
+        self.text = text
+        self.position = position
+        return
+
+
+MARKER_TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+    | (?P<lparen>\()
+    | (?P<rparen>\))
+    | (?P<lbracket>\[)
+    | (?P<rbracket>\])
+    | (?P<comma>,)
+    | (?P<operator>==|!=|~=|=~)
+    | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    | (?P<word>[^\s()\[\],=!~"']+)
+""", re.VERBOSE)
+
+MARKER_STRING_ESCAPE_PATTERN = re.compile(r"\\(.)")
+
+
+def tokenize_marker_expression(expression: str) -> List[MarkerToken]:
+    """
+        Splits a marker expression into tokens.
+
+        :raises SemanticError: If the expression has a character that can not start a token.
+    """
+    tokens = []
+
+    position = 0
+    while position < len(expression):
+        match = MARKER_TOKEN_PATTERN.match(expression, position)
+        if match is None:
+            errmsg = "Unexpected character {!r} at position {} of marker expression. expression={}".format(
+                expression[position], position, expression)
             raise SemanticError(errmsg)
-        marker_group = next_parts[0]
-    elif len(next_parts) == 2:
-        marker_group, marker_value = next_parts
-    else:
-        raise SemanticError(errmsg)
 
-    if operator == "==":
-        metafilter = MetaFilterEquals(include, marker_group, marker_value)
-    elif operator == "~=":
-        metafilter = MetaFilterContains(include, marker_group, marker_value)
-    elif operator == "!=":
-        metafilter = MetaFilterNotEquals(include, marker_group, marker_value)
-    else:
-        errmsg = "Uh Oh. Did someone partially implement a new operator. expression={}".format(expression)
+        kind = match.lastgroup
+        if kind != "space":
+            text = match.group(kind)
+            if kind == "string":
+                text = MARKER_STRING_ESCAPE_PATTERN.sub(r"\1", text[1:-1])
+            tokens.append(MarkerToken(kind, text, position))
+
+        position = match.end()
+
+    return tokens
+
+
+class MarkerExpressionParser:
+    """
+        The :class:`MarkerExpressionParser` parses a marker expression into a tree of :class:`MetaFilter` objects
+        with the following grammar, where the keywords are case sensitive:
+
+            expression := and_expr ( "or" and_expr )*
+            and_expr   := not_expr ( "and" not_expr )*
+            not_expr   := "not" not_expr | "(" expression ")" | term
+            term       := [ "+" | "-" ] group ( "==" | "!=" | "~=" | "=~" ) value
+                        | [ "+" | "-" ] group [ "not" ] "in" "[" value ( "," value )* "]"
+            value      := word | quoted string
+
+        The operators of a term are equals (==), not equals (!=), contains (~=), regular expression search (=~)
+        and membership (in).  A term prefixed with "-" is excluded, which is the same as prefixing it with "not".
+    """
+
+    def __init__(self, expression: str):
+        self._expression = expression
+        self._tokens = tokenize_marker_expression(expression)
+        self._index = 0
+        return
+
+    def parse(self) -> MetaFilter:
+        """
+            Parses the expression and returns the root of the filter tree.
+
+            :raises SemanticError: If the expression is not valid.
+        """
+        if len(self._tokens) == 0:
+            errmsg = "A marker expression can not be empty."
+            raise SemanticError(errmsg)
+
+        metafilter = self._parse_or()
+
+        if self._index < len(self._tokens):
+            self._raise_error("Unexpected token {!r}".format(self._tokens[self._index].text))
+
+        return metafilter
+
+    def _accept_word(self, word: str) -> bool:
+        accepted = False
+        token = self._peek()
+        if token is not None and token.kind == "word" and token.text == word:
+            self._index += 1
+            accepted = True
+        return accepted
+
+    def _expect(self, kind: str, description: str) -> MarkerToken:
+        token = self._peek()
+        if token is None or token.kind != kind:
+            self._raise_error("Expected {}".format(description))
+        self._index += 1
+        return token
+
+    def _parse_and(self) -> MetaFilter:
+        metafilters = [self._parse_not()]
+        while self._accept_word("and"):
+            metafilters.append(self._parse_not())
+
+        metafilter = metafilters[0] if len(metafilters) == 1 else MetaFilterAnd(metafilters)
+        return metafilter
+
+    def _parse_not(self) -> MetaFilter:
+        token = self._peek()
+
+        if token is not None and token.kind == "word" and token.text == "not":
+            self._index += 1
+            metafilter = MetaFilterNot(self._parse_not())
+        elif token is not None and token.kind == "lparen":
+            self._index += 1
+            metafilter = self._parse_or()
+            self._expect("rparen", "a closing parenthesis")
+        else:
+            metafilter = self._parse_term()
+
+        return metafilter
+
+    def _parse_or(self) -> MetaFilter:
+        metafilters = [self._parse_and()]
+        while self._accept_word("or"):
+            metafilters.append(self._parse_and())
+
+        metafilter = metafilters[0] if len(metafilters) == 1 else MetaFilterOr(metafilters)
+        return metafilter
+
+    def _parse_term(self) -> MetaFilter:
+        group_token = self._expect("word", "a marker group")
+
+        include = True
+        group = group_token.text
+        if group[0] in "+-":
+            include = group[0] == "+"
+            group = group[1:]
+            if len(group) == 0:
+                group = self._expect("word", "a marker group").text
+
+        token = self._peek()
+
+        metafilter = None
+        if token is not None and token.kind == "operator":
+            self._index += 1
+            value = self._parse_value()
+            if token.text == "==":
+                metafilter = MetaFilterEquals(include, group, value)
+            elif token.text == "!=":
+                metafilter = MetaFilterNotEquals(include, group, value)
+            elif token.text == "~=":
+                metafilter = MetaFilterContains(include, group, value)
+            else:
+                metafilter = MetaFilterMatches(include, group, value)
+        else:
+            if self._accept_word("not"):
+                include = not include
+                if not self._accept_word("in"):
+                    self._raise_error("Expected 'in' after 'not'")
+            elif not self._accept_word("in"):
+                self._raise_error("Expected an operator (==, !=, ~=, =~, in) after marker group '{}'".format(group))
+
+            self._expect("lbracket", "a list of values")
+            values = [self._parse_value()]
+            while self._peek() is not None and self._peek().kind == "comma":
+                self._index += 1
+                values.append(self._parse_value())
+            self._expect("rbracket", "a closing bracket")
+
+            metafilter = MetaFilterIn(include, group, values)
+
+        return metafilter
+
+    def _parse_value(self) -> str:
+        token = self._peek()
+        if token is None or token.kind not in ("word", "string"):
+            self._raise_error("Expected a value")
+        self._index += 1
+        return token.text
+
+    def _peek(self) -> Optional[MarkerToken]:
+        token = None
+        if self._index < len(self._tokens):
+            token = self._tokens[self._index]
+        return token
+
+    def _raise_error(self, message: str):
+        position = len(self._expression)
+        if self._index < len(self._tokens):
+            position = self._tokens[self._index].position
+
+        errmsg = "{} at position {} of marker expression. expression={}".format(message, position, self._expression)
         raise SemanticError(errmsg)
 
-    return metafilter
\ No newline at end of file
+
+def parse_marker_expression(expression: str) -> MetaFilter:
+    """
+        Parses a marker expression into a :class:`MetaFilter`.  A simple expression such as `+categories~=smoke`
+        results in a single term filter and a compound expression such as
+        `(categories ~= smoke or keywords in [wifi, audio]) and not priority == 3` results in a tree of filters.
+        The filter can be evaluated for the metadata of a single injectable with `should_include`, converted to
+        a predicate function with `create_predicate` or used to select injectables from a :class:`MetadataIndex`.
+
+        :param expression: The marker expression to parse, see :class:`MarkerExpressionParser` for the grammar.
+
+        :raises SemanticError: If the expression is not valid.
+    """
+    parser = MarkerExpressionParser(expression)
+    metafilter = parser.parse()
+    return metafilter
+
+
+class MetadataChain(collections.abc.Mapping):
+    """
+        The :class:`MetadataChain` is a read only mapping that layers the metadata of a node over the metadata of
+        its parent without copying either of them.  A lookup walks the chain from the node to the root, so the
+        metadata of a tree of injectables is stored once per node that declares metadata instead of as a merged
+        copy for every node.
+
+        The layers are never modified.  Changing the metadata of a node creates a new chain with a layer for the
+        change on top of the chain of the node, see `derive`, so the nodes that share the chain are not affected.
+    """
+
+    __slots__ = ("_values", "_parent")
+
+    def __init__(self, values: Mapping, parent: Optional[Mapping] = None):
+        """
+            Constructor for the :class:`MetadataChain` object.
+
+            :param values: The metadata of this layer of the chain, which must not be modified afterwards.
+            :param parent: The metadata of the parent, which can be a chain or any other mapping.
+        """
+        self._values = values
+        self._parent = parent
+        return
+
+    @property
+    def parent(self) -> Optional[Mapping]:
+        return self._parent
+
+    @property
+    def values_layer(self) -> Mapping:
+        return self._values
+
+    def derive(self, values: Mapping) -> "MetadataChain":
+        """
+            Creates a new chain with a layer of values on top of this chain.
+        """
+        chain = MetadataChain(values, self)
+        return chain
+
+    def flatten(self) -> Dict[str, Any]:
+        """
+            Returns a dictionary with the effective values of the chain.
+        """
+        flattened = {} if self._parent is None else dict(self._parent)
+        flattened.update(self._values)
+        return flattened
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = default
+
+        layer = self
+        while layer is not None:
+            if type(layer) is MetadataChain:
+                if key in layer._values:
+                    value = layer._values[key]
+                    break
+                layer = layer._parent
+            else:
+                value = layer.get(key, default)
+                break
+
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        found = False
+
+        layer = self
+        while layer is not None:
+            if type(layer) is MetadataChain:
+                if key in layer._values:
+                    found = True
+                    break
+                layer = layer._parent
+            else:
+                found = key in layer
+                break
+
+        return found
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, MISSING_METADATA)
+        if value is MISSING_METADATA:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        seen = set()
+
+        layer = self
+        while layer is not None:
+            values = layer._values if type(layer) is MetadataChain else layer
+            for key in values:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+            layer = layer._parent if type(layer) is MetadataChain else None
+
+        return
+
+    def __len__(self) -> int:
+        count = 0
+        for _ in self:
+            count += 1
+        return count
+
+    def __repr__(self) -> str:
+        return "MetadataChain({!r})".format(self.flatten())
+
+
+def chain_metadata(values: Optional[Mapping], parent: Optional[Mapping]) -> Optional[Mapping]:
+    """
+        Combines the metadata of a node with the metadata of its parent without copying them.  The parent metadata
+        is shared as is when the node has no metadata of its own and the node metadata is shared as is when there
+        is no parent metadata, otherwise a :class:`MetadataChain` layers the node metadata over the parent metadata.
+    """
+    metadata = parent
+    if values is not None and len(values) > 0:
+        if parent is None:
+            metadata = values
+        else:
+            metadata = MetadataChain(values, parent)
+    return metadata
+
+
+def create_metadata_value_key(value: Any) -> Hashable:
+    """
+        Creates a hashable key for a metadata value so equal values share an entry in a :class:`MetadataIndex`.
+    """
+    vkey = value
+
+    # Most metadata values are strings, so the scalar types are checked for first
+    if type(value) not in (str, int, float, bool):
+        if isinstance(value, list):
+            vkey = ("<list>", tuple(create_metadata_value_key(item) for item in value))
+        elif isinstance(value, tuple):
+            vkey = ("<tuple>", tuple(create_metadata_value_key(item) for item in value))
+        elif isinstance(value, dict):
+            vkey = ("<dict>", tuple(sorted((k, create_metadata_value_key(v)) for k, v in value.items())))
+        elif isinstance(value, (set, frozenset)):
+            vkey = ("<set>", frozenset(value))
+
+    return vkey
+
+
+def create_position_mask(positions: Sequence[int]) -> int:
+    """
+        Creates a bit mask with the bits of a sorted sequence of positions set.  The bits are set in a byte
+        array that is converted to an integer once, setting the bits of a large integer one at a time creates
+        a new integer for each bit.
+    """
+    mask = 0
+
+    if len(positions) == 1:
+        mask = 1 << positions[0]
+    elif len(positions) > 1:
+        bitmap = bytearray((positions[-1] >> 3) + 1)
+        for position in positions:
+            bitmap[position >> 3] |= 1 << (position & 7)
+        mask = int.from_bytes(bitmap, "little")
+
+    return mask
+
+
+class MetadataIndex:
+    """
+        The :class:`MetadataIndex` holds inverted indexes of the metadata of a collection of members, such as the
+        injectables of an :class:`InjectableGroup` tree after `resolve_metadata`, so the members selected by a
+        set of :class:`MetaFilter` objects can be found without evaluating the filters for every member.
+
+        Each member is given a position and a selection is a bit mask of member positions, so the filters are
+        combined with set algebra on integers.  The indexes map each metadata group to the members by the value
+        of the group and, for list and tuple values, by each item of the value.  The members that share the same
+        metadata dictionary are indexed once, which is typical because the metadata of a module is shared by the
+        injectables of the module that are not marked individually.
+    """
+
+    def __init__(self, members: Iterable[Tuple[Any, Optional[Dict[str, Any]]]]):
+        """
+            Constructor for the :class:`MetadataIndex` object.
+
+            :param members: The members to index along with the metadata of each member.
+        """
+        self._members: List[Any] = []
+
+        # The distinct metadata dictionaries, along with the mask of the members that have them
+        self._metadata_masks: Dict[int, Tuple[Optional[Dict[str, Any]], int]] = {}
+        metadata_positions: Dict[int, Tuple[Optional[Dict[str, Any]], List[int]]] = {}
+
+        # group -> value key -> (value, mask)
+        self._value_index: Dict[str, Dict[Hashable, Tuple[Any, int]]] = {}
+
+        # group -> item key -> mask, for the items of list and tuple values
+        self._item_index: Dict[str, Dict[Hashable, int]] = {}
+
+        self._mask_cache: Dict[Hashable, int] = {}
+
+        for member, metadata in members:
+            mdkey = id(metadata)
+            if mdkey in metadata_positions:
+                metadata_positions[mdkey][1].append(len(self._members))
+            else:
+                metadata_positions[mdkey] = (metadata, [len(self._members)])
+            self._members.append(member)
+
+        # The positions of the members of each value and item are collected first and each mask is created
+        # once at the end, combining the large masks one metadata at a time creates a new integer each time
+        value_positions: Dict[str, Dict[Hashable, Tuple[Any, List[int]]]] = {}
+        item_positions: Dict[str, Dict[Hashable, List[int]]] = {}
+
+        for mdkey, (metadata, positions) in metadata_positions.items():
+            self._metadata_masks[mdkey] = (metadata, create_position_mask(positions))
+
+            if metadata is None:
+                continue
+
+            for group, value in metadata.items():
+                group_values = value_positions.setdefault(group, {})
+                vkey = create_metadata_value_key(value)
+                if vkey in group_values:
+                    group_values[vkey][1].extend(positions)
+                else:
+                    group_values[vkey] = (value, list(positions))
+
+                if isinstance(value, (list, tuple)):
+                    group_items = item_positions.setdefault(group, {})
+                    for item in value:
+                        group_items.setdefault(create_metadata_value_key(item), []).extend(positions)
+
+        for group, group_values in value_positions.items():
+            self._value_index[group] = {vkey: (value, create_position_mask(sorted(positions)))
+                                        for vkey, (value, positions) in group_values.items()}
+
+        for group, group_items in item_positions.items():
+            self._item_index[group] = {ikey: create_position_mask(sorted(positions))
+                                       for ikey, positions in group_items.items()}
+
+        self._universe = (1 << len(self._members)) - 1
+        return
+
+    @property
+    def members(self) -> List[Any]:
+        return self._members
+
+    @property
+    def universe(self) -> int:
+        """
+            The mask of all of the members.
+        """
+        return self._universe
+
+    def complement(self, mask: int) -> int:
+        """
+            Returns the mask of the members that are not in a mask.
+        """
+        return self._universe & ~mask
+
+    def contains_mask(self, group: str, value: Any) -> int:
+        """
+            Returns the mask of the members with a metadata group whose list or tuple value has the value as an
+            item or whose string value has the value as a substring.
+        """
+        cache_key = ("contains", group, create_metadata_value_key(value))
+
+        mask = self._mask_cache.get(cache_key, None)
+        if mask is None:
+            mask = 0
+
+            mask |= self.item_mask(group, value)
+
+            if group in self._value_index and isinstance(value, str):
+                # Only the distinct string values of the group are searched, not each member
+                for group_value, value_mask in self._value_index[group].values():
+                    if isinstance(group_value, str) and group_value.find(value) > -1:
+                        mask |= value_mask
+
+            self._mask_cache[cache_key] = mask
+
+        return mask
+
+    def equals_mask(self, group: str, value: Any) -> int:
+        """
+            Returns the mask of the members with a metadata group equal to the value.
+        """
+        mask = 0
+        if group in self._value_index:
+            found = self._value_index[group].get(create_metadata_value_key(value), None)
+            if found is not None:
+                mask = found[1]
+        return mask
+
+    def expand_mask(self, mask: int) -> List[Any]:
+        """
+            Returns the members of a mask in the order they were indexed.
+        """
+        members = []
+
+        # The bits of the mask are searched as a string, lowest bit first, which is much faster than
+        # clearing the bits of a large integer one at a time
+        bits = format(mask, "b")[::-1]
+
+        position = bits.find("1")
+        while position > -1:
+            members.append(self._members[position])
+            position = bits.find("1", position + 1)
+
+        return members
+
+    def filter_mask(self, metafilter: MetaFilter) -> int:
+        """
+            Returns the mask of the members included by a filter.  The masks of filters with a filter key are
+            cached so each distinct filter is only evaluated once.
+        """
+        fkey = metafilter.filter_key
+
+        mask = None
+        if fkey is not None:
+            mask = self._mask_cache.get(fkey, None)
+
+        if mask is None:
+            mask = metafilter.select_mask(self)
+            if fkey is not None:
+                self._mask_cache[fkey] = mask
+
+        return mask
+
+    def item_mask(self, group: str, value: Any) -> int:
+        """
+            Returns the mask of the members with a metadata group whose list or tuple value has the value as an item.
+        """
+        mask = 0
+        if group in self._item_index:
+            mask = self._item_index[group].get(create_metadata_value_key(value), 0)
+        return mask
+
+    def scan_mask(self, predicate: Callable[[Optional[Dict[str, Any]]], bool]) -> int:
+        """
+            Returns the mask of the members whose metadata the predicate returns True for.  The predicate is
+            evaluated once for each distinct metadata dictionary.
+        """
+        mask = 0
+        for metadata, metadata_mask in self._metadata_masks.values():
+            if predicate(metadata):
+                mask |= metadata_mask
+        return mask
+
+    def select(self, metafilters: Sequence[MetaFilter]) -> List[Any]:
+        """
+            Selects the members that are included by all of the filters, which is the same selection as calling
+            `should_include` for every filter on every member.
+
+            :param metafilters: The filters to select the members with, such as the filters created by
+                                `parse_marker_expression`.
+        """
+        members = self.expand_mask(self.select_mask(metafilters))
+        return members
+
+    def select_mask(self, metafilters: Sequence[MetaFilter]) -> int:
+        """
+            Returns the mask of the members that are included by all of the filters.
+        """
+        mask = self._universe
+        for mfilter in metafilters:
+            mask &= self.filter_mask(mfilter)
+            if mask == 0:
+                break
+        return mask
+
+    def values_mask(self, group: str, predicate: Callable[[Any], bool]) -> int:
+        """
+            Returns the mask of the members with a metadata group whose value the predicate returns True for.
+            The predicate is evaluated once for each distinct value of the group.
+        """
+        mask = 0
+        if group in self._value_index:
+            for group_value, value_mask in self._value_index[group].values():
+                if predicate(group_value):
+                    mask |= value_mask
+        return mask
+
+    def __len__(self) -> int:
+        return len(self._members)
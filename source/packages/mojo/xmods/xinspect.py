@@ -16,8 +16,12 @@ __credits__ = []
 
 
 
+from typing import Callable
+
 import inspect
 import sys
+import threading
+import time
 
 def get_current_function_name():
     """
@@ -79,4 +83,89 @@ def is_typed_from_type(obj) -> bool:
         is_of_type = True
     
     return is_of_type
+
+
+class SignatureProfiler:
+    """
+        The :class:`SignatureProfiler` accumulates the number of calls made to :func:`get_function_signature`
+        and the time spent in them while it is enabled, so the cost of signature introspection during
+        startup can be reported.
+    """
+
+    def __init__(self):
+        self._enabled = False
+        self._calls = 0
+        self._elapsed = 0.0
+        self._lock = threading.Lock()
+        return
+
+    @property
+    def calls(self) -> int:
+        """
+            The number of signatures that were introspected while the profiler was enabled.
+        """
+        return self._calls
+
+    @property
+    def elapsed(self) -> float:
+        """
+            The time in seconds spent introspecting signatures while the profiler was enabled.
+        """
+        return self._elapsed
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def disable(self):
+        self._enabled = False
+        return
+
+    def enable(self):
+        self._enabled = True
+        return
+
+    def record(self, elapsed: float):
+        """
+            Records the time spent introspecting a single signature.
+        """
+        self._lock.acquire()
+        try:
+            self._calls += 1
+            self._elapsed += elapsed
+        finally:
+            self._lock.release()
+        return
+
+    def report(self) -> str:
+        """
+            Returns a one line report of the signature introspection calls and time.
+        """
+        rptstr = "signature introspection: calls={} elapsed={:.6f}s".format(self._calls, self._elapsed)
+        return rptstr
+
+    def reset(self):
+        self._lock.acquire()
+        try:
+            self._calls = 0
+            self._elapsed = 0.0
+        finally:
+            self._lock.release()
+        return
+
+signature_profiler = SignatureProfiler()
+
+def get_function_signature(func: Callable) -> inspect.Signature:
+    """
+        Gets the signature of a function with `inspect.signature` and records the time spent with the
+        :class:`SignatureProfiler` when it is enabled.
+    """
+    if signature_profiler.enabled:
+        start = time.perf_counter()
+        signature = inspect.signature(func)
+        signature_profiler.record(time.perf_counter() - start)
+    else:
+        signature = inspect.signature(func)
+
+    return signature
     
\ No newline at end of file
@@ -16,27 +16,281 @@ __copyright__ = "Copyright 2023, Myron W Walker"
 __credits__ = []
 
 
-from typing import Type
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
 
-from types import TracebackType
+from types import FrameType, TracebackType
 
+import asyncio
 import logging
 import os
+import sys
+import tempfile
 import threading
+import time
 import uuid
 
 from datetime import datetime, timedelta
 
 from mojo.waiting import TimeoutContext
 
+from mojo.collections.contextpaths import ContextPaths
 from mojo.collections.helpers import insert_into_ordered_list_ascending
+from mojo.collections.wellknown import ContextSingleton
 
+from mojo.xmods.fspath import get_expanded_path, normalize_name_for_path
 from mojo.xmods.xformatting import split_and_indent_lines
+from mojo.xmods.xlogging.scopestatistics import ScopeStatistics
 
 DEFAULT_MONITORED_SCOPE_NOTIFY_DELAY = timedelta(seconds=60)
+DEFAULT_MONITORED_SCOPE_PROFILE_INTERVAL = 0.01
 
 logger = logging.getLogger()
 
+
+def format_collapsed_stack(frame: FrameType) -> str:
+    """
+        Takes a frame and walks the frame stack back to the root frame in order to create a
+        collapsed stack string.  The collapsed stack has the frames ordered from the root frame
+        to the leaf frame, separated by ';', which is the format consumed by flamegraph tools.
+
+        :param frame: The leaf frame of the stack to collapse.
+
+        :returns: The collapsed stack string for the frame provided.
+    """
+    frame_labels = []
+
+    curr_frame = frame
+    while curr_frame is not None:
+        code = curr_frame.f_code
+        module_name = curr_frame.f_globals.get("__name__", code.co_filename)
+        frame_labels.append("{}:{}".format(module_name, code.co_name))
+        curr_frame = curr_frame.f_back
+
+    frame_labels.reverse()
+
+    stack_str = ";".join(frame_labels)
+    return stack_str
+
+
+def iterate_awaitable_chain(task: asyncio.Task) -> Iterator[Tuple[Any, Optional[FrameType]]]:
+    """
+        Takes an asyncio task and walks the chain of awaited coroutines and generators starting at the
+        coroutine of the task, yielding each awaitable along with its frame, from the outermost coroutine
+        to the innermost awaitable.  The innermost awaitable, such as a future, might not have a frame.
+
+        :param task: The task to walk the awaitable chain for.
+    """
+
+    awaitable = task.get_coro()
+    while awaitable is not None:
+        frame = None
+        next_awaitable = None
+
+        if hasattr(awaitable, "cr_frame"):
+            frame = awaitable.cr_frame
+            next_awaitable = awaitable.cr_await
+        elif hasattr(awaitable, "gi_frame"):
+            frame = awaitable.gi_frame
+            next_awaitable = awaitable.gi_yieldfrom
+        elif hasattr(awaitable, "ag_frame"):
+            frame = awaitable.ag_frame
+            next_awaitable = awaitable.ag_await
+
+        yield awaitable, frame
+
+        awaitable = next_awaitable
+
+    return
+
+
+def format_collapsed_coroutine_stack(task: asyncio.Task) -> str:
+    """
+        Takes an asyncio task and walks the chain of awaited coroutines in order to create a collapsed
+        stack string in the same format as :func:`format_collapsed_stack`, ordered from the coroutine of
+        the task to the innermost awaitable.
+
+        :param task: The task to collapse the coroutine stack of.
+
+        :returns: The collapsed stack string for the task provided.
+    """
+    frame_labels = []
+
+    for awaitable, frame in iterate_awaitable_chain(task):
+        if frame is not None:
+            code = frame.f_code
+            module_name = frame.f_globals.get("__name__", code.co_filename)
+            frame_labels.append("{}:{}".format(module_name, code.co_name))
+        else:
+            frame_labels.append(type(awaitable).__name__)
+
+    stack_str = ";".join(frame_labels)
+    return stack_str
+
+
+def format_coroutine_stack(task: asyncio.Task) -> List[str]:
+    """
+        Takes an asyncio task and walks the chain of awaited coroutines and generators starting at the
+        coroutine of the task in order to create a list of stack lines ordered from the outermost
+        coroutine to the innermost awaitable.
+
+        :param task: The task to format the coroutine stack for.
+
+        :returns: A list of lines that describe the frames of the awaited coroutine chain.
+    """
+    stack_lines = []
+
+    for awaitable, frame in iterate_awaitable_chain(task):
+        if frame is not None:
+            code = frame.f_code
+            stack_lines.append('File "{}", line {}, in {}'.format(code.co_filename, frame.f_lineno, code.co_name))
+        else:
+            stack_lines.append("Awaiting {!r}".format(awaitable))
+
+    return stack_lines
+
+
+class ScopeSamplingProfiler:
+    """
+        The :class:`ScopeSamplingProfiler` is a low overhead sampling profiler that samples the frames of
+        a single thread at a fixed interval and aggregates the samples by stack.  The aggregated samples can
+        be written out in the collapsed stack format so they can be rendered with flamegraph tools.
+
+        The sampling is performed from a separate thread using :func:`sys._current_frames` so the thread
+        being profiled is not slowed down by the installation of a trace or profile function.
+
+        When a task is provided, the coroutine stack of the task is sampled instead of the frames of the
+        thread.  The thread of an event loop runs many tasks, so the frames of the thread would mostly show
+        the event loop and the other tasks instead of where the profiled task is stuck.
+    """
+
+    def __init__(self, thread_id: int, interval: float=DEFAULT_MONITORED_SCOPE_PROFILE_INTERVAL,
+                 task: Optional[asyncio.Task]=None):
+        """
+            Constructor for the :class:`ScopeSamplingProfiler` object.
+
+            :param thread_id: The identifier of the thread whose frames are to be sampled.
+            :param interval: The interval in seconds between the sampling of the thread frames.
+            :param task: The asyncio task whose coroutine stack is to be sampled instead of the thread frames.
+        """
+        self._thread_id = thread_id
+        self._interval = interval
+        self._task = task
+
+        self._stack_counts: Dict[str, int] = {}
+        self._sample_count = 0
+
+        self._stop_gate = threading.Event()
+        self._sampler_thread = None
+        return
+
+    @property
+    def sample_count(self) -> int:
+        """
+            The number of samples that have been collected by the profiler.
+        """
+        return self._sample_count
+
+    @property
+    def stack_counts(self) -> Dict[str, int]:
+        """
+            The table of collapsed stacks and the number of samples collected for each stack.
+        """
+        return self._stack_counts
+
+    @property
+    def task(self) -> Optional[asyncio.Task]:
+        """
+            The asyncio task that is being sampled, if a task is being sampled.
+        """
+        return self._task
+
+    @property
+    def thread_id(self) -> int:
+        """
+            The identifier of the thread that is being sampled.
+        """
+        return self._thread_id
+
+    def start(self):
+        """
+            Starts the sampling thread which samples the frames of the profiled thread.
+        """
+        self._stop_gate.clear()
+
+        self._sampler_thread = threading.Thread(target=self._sampler_thread_entry, name="ScopeSamplingProfiler", daemon=True)
+        self._sampler_thread.start()
+        return
+
+    def stop(self):
+        """
+            Stops the sampling thread and waits for it to exit.
+        """
+        self._stop_gate.set()
+
+        sampler_thread = self._sampler_thread
+        if sampler_thread is not None and sampler_thread is not threading.current_thread():
+            sampler_thread.join()
+
+        return
+
+    def write_collapsed_stacks(self, filename: str):
+        """
+            Writes the samples that were collected to a file in the collapsed stack format. Each line
+            of the file contains a ';' separated stack followed by a space and the sample count.
+
+            :param filename: The full path of the file to write the collapsed stacks to.
+        """
+
+        stack_items = sorted(self._stack_counts.items())
+
+        with open(filename, 'w') as sf:
+            for stack, count in stack_items:
+                sf.write("{} {}\n".format(stack, count))
+
+        return
+
+    def _sampler_thread_entry(self):
+        """
+            The entry point for the sampling thread.  Samples are taken until the profiler is stopped
+            or the profiled thread has exited.
+        """
+
+        while not self._stop_gate.wait(self._interval):
+            if not self._take_sample():
+                break
+
+        return
+
+    def _take_sample(self) -> bool:
+        """
+            Takes a single sample of the frames of the profiled thread or the coroutine stack of the
+            profiled task.
+
+            :returns: A boolean indicating if the profiled thread or task was still alive.
+        """
+        sampled = False
+
+        stack = None
+        if self._task is not None:
+            if not self._task.done():
+                stack = format_collapsed_coroutine_stack(self._task)
+        else:
+            thread_frames = sys._current_frames()
+            if self._thread_id in thread_frames:
+                stack = format_collapsed_stack(thread_frames[self._thread_id])
+
+        if stack is not None:
+            if stack in self._stack_counts:
+                self._stack_counts[stack] += 1
+            else:
+                self._stack_counts[stack] = 1
+
+            self._sample_count += 1
+            sampled = True
+
+        return sampled
+
+
 class MonitoredScope:
     """
         The :class:`MonitoredScope` object is utilized in order to provide monitoring on threads
@@ -50,11 +304,39 @@ class MonitoredScope:
         sections of code, but delay the logging until the thread has failed to exit in a timely manner and
         ensure the logging can happen by passing the work off to another thread that is running in a safer
         context.
+
+        When `profile` is enabled, a :class:`ScopeSamplingProfiler` is started for the thread that entered
+        the scope once the scope has expired.  The thread is sampled until it exits the scope and the samples
+        are written to a collapsed stack file in the output directory.  For a scope entered with `async with`,
+        the coroutine stack of the task is sampled instead and the file is written off of the event loop.
+
+        The duration of every exited scope is recorded by label with the :class:`ScopeStatistics` singleton
+        so the latency of monitored scopes can be tracked even when the scopes exit in time.
+
+        The :class:`MonitoredScope` can also be used in an `async with` statement.  When entered asynchronously,
+        the scope tracks the current asyncio task and reports the coroutine stack of the task if the task fails
+        to exit the scope in time.  Async scopes share the same :class:`ScopeMonitor` thread as synchronous
+        scopes so no additional threads are created per scope.
     """
 
     ERROR_COMPARISON_TYPE_MESSAGE = "Comparison is only support between two 'MonitoredScope' objects."
 
-    def __init__(self, label, message, timeout_ctx: TimeoutContext, notify_delay: timedelta=DEFAULT_MONITORED_SCOPE_NOTIFY_DELAY):
+    def __init__(self, label, message, timeout_ctx: TimeoutContext, notify_delay: timedelta=DEFAULT_MONITORED_SCOPE_NOTIFY_DELAY,
+                 profile: bool=False, profile_interval: float=DEFAULT_MONITORED_SCOPE_PROFILE_INTERVAL,
+                 profile_directory: Optional[str]=None):
+        """
+            Constructor for the :class:`MonitoredScope` object.
+
+            :param label: The human readable label that identifies the scope.
+            :param message: The message that is logged if the scope is not exited before it expires.
+            :param timeout_ctx: The timeout context that determines when the scope times out.
+            :param notify_delay: The delay after the timeout before the scope is considered expired.
+            :param profile: Indicates that the thread that entered the scope should be sampled by a profiler
+                            from the time the scope expires until the thread exits the scope.
+            :param profile_interval: The interval in seconds between profiler samples.
+            :param profile_directory: The directory to write the profile to.  If not specified the output
+                                      directory from the context is used.
+        """
         self._id = str(uuid.uuid4())
         self._label = label
         self._message = message
@@ -65,6 +347,18 @@ class MonitoredScope:
         self._diag_args = None
         self._diag_kwargs = None
 
+        self._profile = profile
+        self._profile_interval = profile_interval
+        self._profile_directory = profile_directory
+        self._profile_filename = None
+        self._profiler = None
+        self._profiler_lock = threading.Lock()
+
+        self._thread_id = None
+        self._task = None
+        self._entered = None
+        self._duration = None
+
         self._exited = False
         self._triggered = False
         return
@@ -72,22 +366,32 @@ class MonitoredScope:
     def __enter__(self) -> "MonitoredScope":
         """
         """
-        global global_scope_monitor
-
-        if global_scope_monitor is None:
-            global_scope_monitor = ScopeMonitor()
-
-        self._timeout_ctx.mark_begin()
-
-        global_scope_monitor.register_monitor(self)
-
+        self._enter_scope()
         return self
 
     def __exit__(self, ex_type: Type[BaseException], ex_inst: BaseException, ex_tb: TracebackType) -> bool:
         """
         """
-        self._exited = True
+        profiler = self._exit_scope()
+        if profiler is not None:
+            self._finish_profile(profiler)
+        return False
+
+    async def __aenter__(self) -> "MonitoredScope":
+        """
+        """
+        self._task = asyncio.current_task()
+        self._enter_scope()
+        return self
 
+    async def __aexit__(self, ex_type: Type[BaseException], ex_inst: BaseException, ex_tb: TracebackType) -> bool:
+        """
+        """
+        profiler = self._exit_scope()
+        if profiler is not None:
+            # Stopping the profiler and writing the profile file block, so they are run off of the event loop
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._finish_profile, profiler)
         return False
 
     def __eq__(self, other: "MonitoredScope"):
@@ -144,6 +448,13 @@ class MonitoredScope:
 
         return self._timeout_ctx.end_time != other._timeout_ctx.end_time
 
+    @property
+    def duration(self) -> Optional[float]:
+        """
+            The duration in seconds that the scope was occupied, available after the scope has exited.
+        """
+        return self._duration
+
     @property
     def exited(self):
         """
@@ -185,6 +496,34 @@ class MonitoredScope:
         """
         return self._message
 
+    @property
+    def profile_filename(self) -> Optional[str]:
+        """
+            The full path of the collapsed stack profile file if a profile was captured.
+        """
+        return self._profile_filename
+
+    @property
+    def task(self) -> Optional[asyncio.Task]:
+        """
+            The asyncio task that entered the scope if the scope was entered with `async with`.
+        """
+        return self._task
+
+    @property
+    def thread_id(self) -> Optional[int]:
+        """
+            The identifier of the thread that entered the scope.
+        """
+        return self._thread_id
+
+    @property
+    def triggered(self) -> bool:
+        """
+            Returns true if the :class:`ScopeMonitor` has noticed the expiration of the scope.
+        """
+        return self._triggered
+
     def set_diagnostic(self, diagnostic_function, *args, **kwargs):
         """
             Sets the diagnostic function and its associated args which will be run if
@@ -202,25 +541,131 @@ class MonitoredScope:
         """
         if not self._triggered:
             self._triggered = True
-            if self.expired:
+            if self.expired and not self._exited:
+
+                occupant = "thread"
+                if self._task is not None:
+                    occupant = "task"
 
                 errlines = [
-                    "MonitoredScope({}): Timeout waiting for thread to exit monitored scope.".format(self._label),
+                    "MonitoredScope({}): Timeout waiting for {} to exit monitored scope.".format(self._label, occupant),
                     "MESSAGE: {}".format(self._message),
 
                 ]
 
+                if self._task is not None:
+                    errlines.append("TASK: {}".format(self._task.get_name()))
+                    errlines.append("COROUTINE STACK:")
+                    for stack_line in format_coroutine_stack(self._task):
+                        errlines.append("    {}".format(stack_line))
+
                 if  self._diag_func:
                     errlines.append("DIAGNOSTIC:")
 
                     diagmsg = self._diag_func(*self._diag_args, **self._diag_kwargs)
                     errlines.extend(split_and_indent_lines(diagmsg, 1))
 
+                if self._profile and self._start_profile():
+                    errlines.append("PROFILE: Sampling {} stacks until the scope is exited.".format(occupant))
+
                 errmsg = os.linesep.join(errlines)
                 logger.error(errmsg)
 
         return
 
+    def _enter_scope(self):
+        """
+            Marks the beginning of the scope and registers the scope with the :class:`ScopeMonitor`.
+        """
+        global global_scope_monitor
+
+        if global_scope_monitor is None:
+            global_scope_monitor = ScopeMonitor()
+
+        self._thread_id = threading.get_ident()
+
+        self._timeout_ctx.mark_begin()
+        self._entered = time.perf_counter()
+
+        global_scope_monitor.register_monitor(self)
+
+        return
+
+    def _exit_scope(self) -> Optional[ScopeSamplingProfiler]:
+        """
+            Marks the scope as exited and records the duration of the scope.
+
+            :returns: The profiler that was started for the scope, if any, which the caller must
+                      finish with `_finish_profile`.
+        """
+        self._duration = time.perf_counter() - self._entered
+        timed_out = datetime.now() > self._timeout_ctx.end_time
+
+        scope_stats = ScopeStatistics()
+        scope_stats.record_duration(self._label, self._duration, timed_out=timed_out)
+
+        profiler = None
+
+        self._profiler_lock.acquire()
+        try:
+            self._exited = True
+            profiler = self._profiler
+            self._profiler = None
+        finally:
+            self._profiler_lock.release()
+
+        return profiler
+
+    def _finish_profile(self, profiler: ScopeSamplingProfiler):
+        """
+            Stops the profiler and writes the collected samples to a collapsed stack file in the
+            profile output directory.
+        """
+        profiler.stop()
+
+        output_dir = self._profile_directory
+        if output_dir is None:
+            ctx = ContextSingleton()
+            output_dir = ctx.lookup(ContextPaths.OUTPUT_DIRECTORY, None)
+        if output_dir is None:
+            output_dir = tempfile.gettempdir()
+
+        output_dir = get_expanded_path(output_dir)
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        profile_leaf = "scope-profile-{}-{}.folded".format(normalize_name_for_path(self._label), self._id)
+        profile_filename = os.path.join(output_dir, profile_leaf)
+
+        profiler.write_collapsed_stacks(profile_filename)
+        self._profile_filename = profile_filename
+
+        infomsg = "MonitoredScope({}): Wrote profile with {} samples to '{}'.".format(
+            self._label, profiler.sample_count, profile_filename)
+        logger.info(infomsg)
+
+        return
+
+    def _start_profile(self) -> bool:
+        """
+            Starts a profiler for the thread or task that entered the scope if the thread or task has not
+            yet exited the scope.
+
+            :returns: A boolean indicating if a profiler was started.
+        """
+        started = False
+
+        self._profiler_lock.acquire()
+        try:
+            if not self._exited and self._profiler is None:
+                self._profiler = ScopeSamplingProfiler(self._thread_id, interval=self._profile_interval, task=self._task)
+                self._profiler.start()
+                started = True
+        finally:
+            self._profiler_lock.release()
+
+        return started
+
 class ScopeMonitor:
     """
         The :class:`ScopeMonitor` object is utilized to provide monitoring of threads that are entering
@@ -234,6 +679,9 @@ class ScopeMonitor:
             with MonitoredScope("RunCommand", "Running command on cluster node (%s)" % nodeip) as mscope:
                 cluster.run_cmd(1, "echo blah")
 
+            async with MonitoredScope("RunCommand", "Running command on cluster node (%s)" % nodeip) as mscope:
+                await cluster.run_cmd_async(1, "echo blah")
+
         The use of a :class:`MonitoredScope` remove the necessity to log prior to entering a critical
         section of code but allows log entrys to be pre-emptively handed off to the :class:`ScopeMonitor`
         thread for contingent processing should a the thread fail to return from the critical section of
@@ -264,7 +712,7 @@ class ScopeMonitor:
             self._monitors = []
             self._monitors_lock = threading.RLock()
 
-            self._timer = threading.Timer(self.SCOPE_MONITOR_INTERVAL, self._monitor_tick)
+            self._monitor_thread = None
         return
 
     def register_monitor(self, monitor: MonitoredScope):
@@ -277,23 +725,43 @@ class ScopeMonitor:
         self._monitors_lock.acquire()
         try:
             insert_into_ordered_list_ascending(self._monitors, monitor)
+
+            if self._monitor_thread is None:
+                self._monitor_thread = threading.Thread(target=self._monitor_thread_entry, name="ScopeMonitor", daemon=True)
+                self._monitor_thread.start()
         finally:
             self._monitors_lock.release()
 
         return
 
+    def _monitor_thread_entry(self):
+        """
+            The entry point for the monitor thread which periodically checks the registered
+            scopes for expiration.
+        """
+
+        while True:
+            time.sleep(self.SCOPE_MONITOR_INTERVAL)
+            self._monitor_tick()
+
+        return
+
     def _monitor_tick(self):
 
         self._monitors_lock.acquire()
         try:
-            if len(self._monitors) > 0:
-                while True:
-                    firstMonitor = self._monitors[0]
-                    if firstMonitor.expired:
-                        firstMonitor.trigger_notification()
-                        del self._monitors[0]
-                    else:
-                        break
+            still_active = []
+
+            for monitor in self._monitors:
+                if monitor.exited:
+                    continue
+
+                if monitor.expired:
+                    monitor.trigger_notification()
+                else:
+                    still_active.append(monitor)
+
+            self._monitors = still_active
         finally:
             self._monitors_lock.release()
 
@@ -0,0 +1,389 @@
+"""
+.. module:: scopestatistics
+    :platform: Darwin, Linux, Unix, Windows
+    :synopsis: Module which contains the :class:`ScopeStatistics` object which aggregates the durations
+               of :class:`MonitoredScope` instances by label into fixed memory histograms.
+
+.. moduleauthor:: Myron Walker <myron.walker@gmail.com>
+"""
+
+__author__ = "Myron Walker"
+__copyright__ = "Copyright 2023, Myron W Walker"
+__credits__ = []
+
+
+from typing import Any, Dict, List, Optional
+
+import atexit
+import json
+import logging
+import os
+import threading
+
+from mojo.collections.contextpaths import ContextPaths
+from mojo.collections.wellknown import ContextSingleton
+
+from mojo.xmods.fspath import get_expanded_path
+
+DEFAULT_HISTOGRAM_SIGNIFICANT_BITS = 7
+DEFAULT_HISTOGRAM_MAX_MICROSECONDS = 1 << 40
+
+SCOPE_STATISTICS_FILENAME = "scope-statistics.json"
+
+logger = logging.getLogger()
+
+
+class ScopeDurationHistogram:
+    """
+        The :class:`ScopeDurationHistogram` is a log-linear histogram in the style of an HDR histogram.  Durations
+        are recorded in microseconds into a fixed number of buckets.  Values below 2^significant_bits are recorded
+        exactly and larger values are recorded with a relative precision of 1/2^(significant_bits - 1), so the memory
+        used by the histogram is fixed no matter how many durations are recorded.
+    """
+
+    def __init__(self, label: str, significant_bits: int=DEFAULT_HISTOGRAM_SIGNIFICANT_BITS,
+                 max_microseconds: int=DEFAULT_HISTOGRAM_MAX_MICROSECONDS):
+        """
+            Constructor for the :class:`ScopeDurationHistogram` object.
+
+            :param label: The label of the scopes whose durations are recorded.
+            :param significant_bits: The number of significant bits of precision for each recorded value.
+            :param max_microseconds: The largest duration in microseconds that can be recorded without clamping.
+        """
+        self._label = label
+        self._significant_bits = significant_bits
+        self._sub_bucket_count = 1 << significant_bits
+        self._sub_bucket_half = self._sub_bucket_count >> 1
+        self._max_shift = max(max_microseconds.bit_length() - significant_bits, 0)
+
+        bucket_total = self._sub_bucket_count + (self._max_shift * self._sub_bucket_half)
+        self._buckets: List[int] = [0] * bucket_total
+
+        self._count = 0
+        self._timeout_count = 0
+        self._total_microseconds = 0
+        self._min_microseconds = None
+        self._max_microseconds = None
+        return
+
+    @property
+    def count(self) -> int:
+        """
+            The number of durations that have been recorded.
+        """
+        return self._count
+
+    @property
+    def label(self) -> str:
+        """
+            The label of the scopes whose durations are recorded.
+        """
+        return self._label
+
+    @property
+    def max(self) -> Optional[float]:
+        """
+            The largest duration in seconds that has been recorded.
+        """
+        rtnval = None
+        if self._max_microseconds is not None:
+            rtnval = self._max_microseconds / 1000000
+        return rtnval
+
+    @property
+    def mean(self) -> Optional[float]:
+        """
+            The mean duration in seconds of the durations that have been recorded.
+        """
+        rtnval = None
+        if self._count > 0:
+            rtnval = (self._total_microseconds / self._count) / 1000000
+        return rtnval
+
+    @property
+    def min(self) -> Optional[float]:
+        """
+            The smallest duration in seconds that has been recorded.
+        """
+        rtnval = None
+        if self._min_microseconds is not None:
+            rtnval = self._min_microseconds / 1000000
+        return rtnval
+
+    @property
+    def timeout_count(self) -> int:
+        """
+            The number of recorded durations that exceeded the timeout of the scope.
+        """
+        return self._timeout_count
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+            Computes the duration in seconds at or below which the specified percentage of the recorded
+            durations fall.  The value returned is the highest value that is equivalent to the bucket the
+            percentile lands in, clamped to the largest recorded duration.
+
+            :param percent: The percentile to compute in the range 0 to 100.
+        """
+        rtnval = None
+
+        if self._count > 0:
+            percent = min(max(percent, 0.0), 100.0)
+
+            target = int((percent / 100.0) * self._count + 0.5)
+            if target < 1:
+                target = 1
+
+            running = 0
+            for bidx, bcount in enumerate(self._buckets):
+                running += bcount
+                if running >= target:
+                    _, upper = self._bucket_range(bidx)
+                    if bidx == len(self._buckets) - 1:
+                        # The last bucket also holds the clamped values
+                        upper = self._max_microseconds
+                    upper = min(upper, self._max_microseconds)
+                    rtnval = upper / 1000000
+                    break
+
+        return rtnval
+
+    def record(self, duration: float, timed_out: bool=False):
+        """
+            Records a duration into the histogram.
+
+            :param duration: The duration in seconds to record.
+            :param timed_out: Indicates that the scope exceeded its timeout.
+        """
+        micros = int(duration * 1000000)
+        if micros < 0:
+            micros = 0
+
+        bidx = self._bucket_index(micros)
+        self._buckets[bidx] += 1
+
+        self._count += 1
+        self._total_microseconds += micros
+
+        if self._min_microseconds is None or micros < self._min_microseconds:
+            self._min_microseconds = micros
+        if self._max_microseconds is None or micros > self._max_microseconds:
+            self._max_microseconds = micros
+
+        if timed_out:
+            self._timeout_count += 1
+
+        return
+
+    def summary(self) -> Dict[str, Any]:
+        """
+            Creates a summary of the histogram that contains the count, timeout count, min, max, mean, p50, p95
+            and p99 durations in seconds.
+        """
+        summary = {
+            "count": self._count,
+            "timeouts": self._timeout_count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.mean,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99)
+        }
+        return summary
+
+    def _bucket_index(self, micros: int) -> int:
+        """
+            Computes the index of the bucket that a value in microseconds is recorded in.
+        """
+        bidx = micros
+
+        if micros >= self._sub_bucket_count:
+            shift = micros.bit_length() - self._significant_bits
+            if shift > self._max_shift:
+                bidx = len(self._buckets) - 1
+            else:
+                sub_index = micros >> shift
+                bidx = self._sub_bucket_count + ((shift - 1) * self._sub_bucket_half) + (sub_index - self._sub_bucket_half)
+
+        return bidx
+
+    def _bucket_range(self, bidx: int):
+        """
+            Computes the lowest and highest values in microseconds that are equivalent to a bucket.
+        """
+        lower = bidx
+        upper = bidx
+
+        if bidx >= self._sub_bucket_count:
+            offset = bidx - self._sub_bucket_count
+            shift = (offset // self._sub_bucket_half) + 1
+            sub_index = (offset % self._sub_bucket_half) + self._sub_bucket_half
+            lower = sub_index << shift
+            upper = ((sub_index + 1) << shift) - 1
+
+        return lower, upper
+
+
+class ScopeStatistics:
+    """
+        The :class:`ScopeStatistics` object is a singleton that aggregates the durations of exited
+        :class:`MonitoredScope` instances into a :class:`ScopeDurationHistogram` per label.  The statistics
+        are logged and written to the output directory when the process exits so the latency of monitored
+        sections of code can be tracked across releases.
+    """
+
+    DUMP_AT_EXIT = True
+
+    instance = None
+    initialized = False
+
+    def __new__(cls, *_args, **_kwargs):
+        """
+            Constructs new instances of the :class:`ScopeStatistics` object. The
+            :class:`ScopeStatistics` object is a singleton so following instantiations
+            of the object will reference the existing singleton
+        """
+
+        if cls.instance is None:
+            cls.instance = super(ScopeStatistics, cls).__new__(cls)
+        return cls.instance
+
+    def __init__(self):
+        thisType = type(self)
+        if not thisType.initialized:
+            thisType.initialized = True
+
+            self._histograms: Dict[str, ScopeDurationHistogram] = {}
+            self._histograms_lock = threading.Lock()
+
+            atexit.register(self._dump_at_exit)
+        return
+
+    def format_report(self) -> str:
+        """
+            Formats a report of the statistics of each scope label.
+        """
+        summaries = self.get_summaries()
+
+        report_lines = [
+            "MONITORED SCOPE STATISTICS:"
+        ]
+
+        for label in sorted(summaries.keys()):
+            summary = summaries[label]
+            report_lines.append("    {}: count={} timeouts={} p50={} p95={} p99={} max={}".format(
+                label, summary["count"], summary["timeouts"], summary["p50"], summary["p95"],
+                summary["p99"], summary["max"]))
+
+        report = os.linesep.join(report_lines)
+        return report
+
+    def get_histogram(self, label: str) -> Optional[ScopeDurationHistogram]:
+        """
+            Gets the histogram for the specified scope label.
+
+            :param label: The label of the scope to get the histogram for.
+        """
+        histogram = None
+
+        self._histograms_lock.acquire()
+        try:
+            if label in self._histograms:
+                histogram = self._histograms[label]
+        finally:
+            self._histograms_lock.release()
+
+        return histogram
+
+    def get_summaries(self) -> Dict[str, Dict[str, Any]]:
+        """
+            Gets a table of the histogram summaries of each scope label.
+        """
+        summaries = {}
+
+        self._histograms_lock.acquire()
+        try:
+            for label, histogram in self._histograms.items():
+                summaries[label] = histogram.summary()
+        finally:
+            self._histograms_lock.release()
+
+        return summaries
+
+    def record_duration(self, label: str, duration: float, timed_out: bool=False):
+        """
+            Records the duration of an exited scope in the histogram for the scope label.
+
+            :param label: The label of the scope that was exited.
+            :param duration: The duration in seconds that the scope was occupied.
+            :param timed_out: Indicates that the scope exceeded its timeout.
+        """
+
+        self._histograms_lock.acquire()
+        try:
+            if label in self._histograms:
+                histogram = self._histograms[label]
+            else:
+                histogram = ScopeDurationHistogram(label)
+                self._histograms[label] = histogram
+
+            histogram.record(duration, timed_out=timed_out)
+        finally:
+            self._histograms_lock.release()
+
+        return
+
+    def reset(self):
+        """
+            Clears all of the recorded statistics.
+        """
+
+        self._histograms_lock.acquire()
+        try:
+            self._histograms.clear()
+        finally:
+            self._histograms_lock.release()
+
+        return
+
+    def write_report(self, filename: str):
+        """
+            Writes the histogram summaries of each scope label to a JSON file.
+
+            :param filename: The full path of the file to write the statistics to.
+        """
+        summaries = self.get_summaries()
+
+        with open(filename, 'w') as sf:
+            json.dump(summaries, sf, indent=4, sort_keys=True)
+
+        return
+
+    def _dump_at_exit(self):
+        """
+            Logs the statistics report and writes the statistics to the output directory when the
+            process exits.
+        """
+
+        if self.DUMP_AT_EXIT and len(self._histograms) > 0:
+            report = self.format_report()
+            logger.info(report)
+
+            ctx = ContextSingleton()
+            output_dir = ctx.lookup(ContextPaths.OUTPUT_DIRECTORY, None)
+            if output_dir is not None:
+                output_dir = get_expanded_path(output_dir)
+                if os.path.exists(output_dir):
+                    statistics_filename = os.path.join(output_dir, SCOPE_STATISTICS_FILENAME)
+                    self.write_report(statistics_filename)
+
+        return
+
+
+def get_scope_statistics() -> ScopeStatistics:
+    """
+        Gets the :class:`ScopeStatistics` singleton that aggregates :class:`MonitoredScope` durations.
+    """
+    scope_stats = ScopeStatistics()
+    return scope_stats
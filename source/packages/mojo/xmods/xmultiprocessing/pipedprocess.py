@@ -19,6 +19,7 @@ import threading
 
 from io import StringIO
 from multiprocessing import Process, Queue
+from multiprocessing.context import BaseContext
 
 class RemoteStdTee(StringIO):
     def __init__(self, queue: Queue, orig_file):
@@ -59,15 +60,29 @@ def piped_process_main(entry_point: Callable, stdout_queue: Queue, stderr_queue:
 
 
 class PipedProcess(Process):
+    """
+        A :class:`Process` that forwards the output written to stdout and stderr by the process to the stdout
+        and stderr of the parent process, prefixed with the process id.
+
+        The process is started with the start method of the multiprocessing context provided or, if no context
+        is provided, with the default start method.
+    """
 
     def __init__(self, group: None = None, target: Optional[Callable]=None, name: Optional[str]=None, args: Iterable[Any] = (),
-                 kwargs: Optional[Mapping[str, Any]] = None, *, daemon: Optional[bool]=None) -> None:
+                 kwargs: Optional[Mapping[str, Any]] = None, *, daemon: Optional[bool]=None,
+                 context: Optional[BaseContext]=None) -> None:
         
         if kwargs is None:
             kwargs = {}
 
-        self._stdout_queue = Queue()
-        self._stderr_queue = Queue()
+        self._context = context
+
+        if context is not None:
+            self._stdout_queue = context.Queue()
+            self._stderr_queue = context.Queue()
+        else:
+            self._stdout_queue = Queue()
+            self._stderr_queue = Queue()
 
         self._stdout_thread = threading.Thread(target=self.stdout_monitor, daemon=True)
         self._stdout_thread.start()
@@ -79,6 +94,15 @@ class PipedProcess(Process):
         rmargs = target, self._stdout_queue, self._stderr_queue, *args
         super().__init__(group=group, target=rmtarget, name=name, args=rmargs, kwargs=kwargs, daemon=daemon)
         return
+
+    def _Popen(self, process_obj):
+        # Called by `start` to launch the process, the process is launched with the start method of the
+        # context if one was provided
+        if self._context is not None:
+            popen = self._context.Process._Popen(process_obj)
+        else:
+            popen = Process._Popen(process_obj)
+        return popen
     
     def stdout_monitor(self):
 
@@ -0,0 +1,110 @@
+
+import threading
+import time
+import unittest
+import weakref
+
+from datetime import datetime, timedelta
+
+from mojo.xmods.eventing.compacteventedvariable import (
+    CompactEventedVariable,
+    datetime_to_monotonic,
+    monotonic_to_datetime
+)
+from mojo.xmods.eventing.enumerations import EventedVariableState
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+VARIABLE_DESCRIPTIONS = {
+    "Volume": { "data_type": "int", "default": 0 },
+    "Mute": { "data_type": "bool" }
+}
+
+
+class CompactSink(EventedVariableSink):
+
+    SINK_VARIABLE_TYPE = CompactEventedVariable
+    SINK_LAZY_VARIABLES = True
+
+    def __init__(self):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="compact")
+        return
+
+
+class TestCompactEventedVariable(unittest.TestCase):
+
+    def test_no_instance_dict(self):
+        sink = CompactSink()
+        volume = sink.lookup_event_variable("Volume")
+
+        assert not hasattr(volume, "__dict__"), "The compact variable should not have an instance '__dict__'."
+        assert weakref.ref(volume)() is volume, "The compact variable should support weak references."
+
+    def test_variable_keys(self):
+        sink = CompactSink()
+        sink.update_event_variable("Volume", 5)
+
+        assert list(sink._evented_variables.keys()) == ["Volume"], "The variables should be keyed by event name."
+
+        volume = sink.lookup_event_variable("Volume")
+        assert volume.key == "compact/Volume", f"The variable key should include the sink prefix. key={volume.key}"
+        assert volume.value == 5
+
+    def test_monotonic_conversion(self):
+        now = datetime.now()
+        mono = datetime_to_monotonic(now)
+        converted = monotonic_to_datetime(mono)
+
+        diff = abs((converted - now).total_seconds())
+        assert diff < 0.001, f"The converted datetime should match the original. now={now} converted={converted}"
+
+        assert monotonic_to_datetime(datetime_to_monotonic(datetime.min)) == datetime.min, "The stale timestamp should round trip."
+
+    def test_lazy_creation(self):
+        sink = CompactSink()
+
+        assert len(sink._evented_variables) == 0, "No variables should be created until they are used."
+
+        sink.update_event_variable("Mute", True)
+        assert len(sink._evented_variables) == 1, "Only the updated variable should have been created."
+
+        assert sink.lookup_event_variable("Unknown") is None, "Unknown variables should not be created."
+
+        with self.assertRaises(KeyError):
+            sink.update_event_variable("Unknown", 1)
+
+    def test_update_and_read(self):
+        sink = CompactSink()
+
+        before = datetime.now()
+        sink.update_event_variable("Volume", 5)
+        volume = sink.lookup_event_variable("Volume")
+
+        value, updated, changed, state = volume.sync_read()
+        assert value == 5, f"The value should be 5. value={value}"
+        assert isinstance(updated, datetime), f"The updated timestamp should be a datetime. updated={updated}"
+        assert updated == changed, "The value changed so updated and changed should match."
+        assert updated >= before - timedelta(milliseconds=1), f"The updated timestamp should follow the moment. before={before} updated={updated}"
+        assert state == EventedVariableState.Valid, f"The state should be valid. state={state}"
+
+    def test_wait_for_update(self):
+        sink = CompactSink()
+        volume = sink.lookup_event_variable("Volume")
+
+        moment = datetime.now()
+
+        def delayed_update():
+            time.sleep(0.05)
+            sink.update_event_variable("Volume", 7)
+            return
+
+        updater = threading.Thread(target=delayed_update, daemon=True)
+        updater.start()
+
+        value = volume.wait_for_update(moment, timeout=10, interval=5)
+        updater.join()
+
+        assert value == 7, f"The updated value should be 7. value={value}"
+
+
+if __name__ == '__main__':
+    unittest.main()
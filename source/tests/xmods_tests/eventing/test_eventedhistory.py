@@ -0,0 +1,161 @@
+
+import time
+import unittest
+
+from datetime import datetime, timedelta
+
+from mojo.xmods.eventing.compacteventedvariable import CompactEventedVariable
+from mojo.xmods.eventing.eventedhistory import EventedVariableHistory
+from mojo.xmods.eventing.eventedvariable import EventedVariable
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+VARIABLE_DESCRIPTIONS = {
+    "Volume": { "data_type": "int", "default": 0, "history": 3 },
+    "Mute": { "data_type": "bool" }
+}
+
+
+class SampleSink(EventedVariableSink):
+
+    def __init__(self):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="sample")
+        return
+
+
+class CompactHistorySink(EventedVariableSink):
+
+    SINK_VARIABLE_TYPE = CompactEventedVariable
+    SINK_HISTORY_CAPACITY = 10
+
+    def __init__(self):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="compact")
+        return
+
+
+class SteppedClockVariable(EventedVariable):
+    """
+        A variable whose wall clock is stepped back an hour after the first update.
+    """
+
+    __slots__ = ()
+
+    CLOCK_OFFSETS = []
+
+    @staticmethod
+    def timestamp_now() -> datetime:
+        offset = SteppedClockVariable.CLOCK_OFFSETS.pop(0) if SteppedClockVariable.CLOCK_OFFSETS else timedelta(0)
+        return datetime.now() + offset
+
+
+class SteppedClockSink(EventedVariableSink):
+
+    SINK_VARIABLE_TYPE = SteppedClockVariable
+
+    def __init__(self):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="stepped")
+        return
+
+
+class TestEventedVariableHistory(unittest.TestCase):
+
+    def test_ring_buffer_overwrites_oldest(self):
+        history = EventedVariableHistory(3)
+        for ts in range(1, 6):
+            history.record(ts, ts * 10)
+
+        assert len(history) == 3, f"The history should be full. count={len(history)}"
+        entries = history.entries()
+        assert entries == [(3, 30), (4, 40), (5, 50)], f"Unexpected entries. entries={entries}"
+
+    def test_ring_buffer_queries(self):
+        history = EventedVariableHistory(4)
+        for ts in range(0, 10, 2):
+            history.record(ts, ts)
+
+        between = history.entries_between(3, 6)
+        assert between == [(4, 4), (6, 6)], f"Unexpected range entries. between={between}"
+
+        assert history.entry_at(5) == (4, 4), "The entry at 5 should be the entry recorded at 4."
+        assert history.entry_at(8) == (8, 8), "The entry at 8 should be the entry recorded at 8."
+        assert history.entry_at(1) is None, "The moment is before the oldest retained entry."
+
+    def test_variable_history_records_changes(self):
+        sink = SampleSink()
+        volume = sink.lookup_event_variable("Volume")
+
+        sink.update_event_variable("Volume", 1)
+        time.sleep(0.01)
+        between_moment = datetime.now()
+        time.sleep(0.01)
+        sink.update_event_variable("Volume", 1)
+        sink.update_event_variable("Volume", 2)
+
+        entries = volume.history_between()
+        values = [ val for _, val in entries ]
+        assert values == [1, 2], f"Only value changes should be recorded. values={values}"
+
+        value = volume.history_value_at(between_moment)
+        assert value == 1, f"The value at the moment should be 1. value={value}"
+
+        with self.assertRaises(LookupError):
+            volume.history_value_at(datetime(2000, 1, 1))
+
+    def test_ring_buffer_keeps_order(self):
+        history = EventedVariableHistory(4)
+        history.record(5, "a")
+        history.record(3, "b")
+
+        assert history.entries() == [(5, "a"), (5, "b")], "An earlier timestamp should be raised to the newest timestamp."
+        assert history.entry_at(5) == (5, "b"), "The entry recorded last should be current."
+
+    def test_variable_history_wall_clock_step(self):
+        sink = SteppedClockSink()
+        volume = sink.lookup_event_variable("Volume")
+
+        start = datetime.now()
+        time.sleep(0.01)
+
+        SteppedClockVariable.CLOCK_OFFSETS = [timedelta(0), timedelta(hours=-1), timedelta(hours=-1)]
+        for val in range(1, 4):
+            sink.update_event_variable("Volume", val)
+            time.sleep(0.01)
+
+        values = [ val for _, val in volume.history_between(start=start) ]
+        assert values == [1, 2, 3], f"The history should keep the update order. values={values}"
+        assert volume.history_value_at(datetime.now()) == 3, "The latest update should be current."
+
+    def test_variable_history_not_enabled(self):
+        sink = SampleSink()
+        mute = sink.lookup_event_variable("Mute")
+
+        assert not mute.history_enabled, "The history should not be enabled for Mute."
+        with self.assertRaises(RuntimeError):
+            mute.history_between()
+
+        mute.enable_history(2)
+        sink.update_event_variable("Mute", True)
+        sink.update_event_variable("Mute", False)
+        sink.update_event_variable("Mute", True)
+
+        values = [ val for _, val in mute.history_between() ]
+        assert values == [False, True], f"The history should retain the last two changes. values={values}"
+
+    def test_compact_variable_history(self):
+        sink = CompactHistorySink()
+        mute = sink.lookup_event_variable("Mute")
+        volume = sink.lookup_event_variable("Volume")
+
+        start = datetime.now()
+        sink.update_event_variables({ "Mute": True, "Volume": 4 })
+
+        entries = mute.history_between(start=start)
+        assert len(entries) == 1, f"The history should contain one entry. entries={entries}"
+
+        updated, value = entries[0]
+        assert isinstance(updated, datetime), "The history timestamps should be returned as datetime."
+        assert value is True, f"The value should be True. value={value}"
+        assert volume.history_enabled and len(volume.history_between()) == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
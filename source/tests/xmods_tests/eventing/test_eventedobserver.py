@@ -0,0 +1,189 @@
+
+import threading
+import time
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from mojo.xmods.eventing.enumerations import EventedObserverNotify
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+VARIABLE_DESCRIPTIONS = {
+    "Volume": { "data_type": "int", "default": 0 },
+    "Mute": { "data_type": "bool" }
+}
+
+
+class SampleSink(EventedVariableSink):
+
+    def __init__(self, observer_executor=None):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="sample", observer_executor=observer_executor)
+        return
+
+
+class ObservedUpdates:
+
+    def __init__(self):
+        self.updates = []
+        self.threads = []
+        self.condition = threading.Condition()
+        return
+
+    def callback(self, varobj, value, updated):
+        with self.condition:
+            self.updates.append((varobj.name, value, updated))
+            self.threads.append(threading.get_ident())
+            self.condition.notify_all()
+        return
+
+    def wait_for_count(self, count, timeout=5):
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.updates) >= count, timeout)
+            return list(self.updates)
+
+
+class TestEventedObserver(unittest.TestCase):
+
+    def test_variable_observer_value_changed(self):
+        sink = SampleSink()
+        volume = sink.lookup_event_variable("Volume")
+
+        observed = ObservedUpdates()
+        volume.add_observer(observed.callback)
+
+        sink.update_event_variable("Volume", 5)
+        sink.update_event_variable("Volume", 5)
+        sink.update_event_variable("Volume", 7)
+        sink.update_event_variable("Mute", True)
+
+        updates = observed.wait_for_count(2)
+        time.sleep(0.1)
+
+        values = [ val for _, val, _ in observed.updates ]
+        assert values == [5, 7], f"Only the value changes of Volume should be observed. values={values}"
+        assert updates[0][2] is not None, "The updated datetime should be passed to the callback."
+        assert threading.get_ident() not in observed.threads, "The callbacks should not run on the updating thread."
+
+    def test_sink_observer_any_update_with_predicate(self):
+        sink = SampleSink()
+
+        observed = ObservedUpdates()
+        sink.add_observer(observed.callback, notify=EventedObserverNotify.AnyUpdate, predicate=lambda v: v is not False)
+
+        sink.update_event_variables({ "Volume": 3, "Mute": False })
+        sink.update_event_variable("Volume", 3)
+        sink.update_event_variable("Mute", True)
+
+        observed.wait_for_count(3)
+        time.sleep(0.1)
+
+        names = [ name for name, _, _ in observed.updates ]
+        assert names == ["Volume", "Volume", "Mute"], f"Unexpected observed updates. names={names}"
+
+    def test_raising_predicate_in_batch(self):
+        sink = SampleSink()
+
+        predicate_threads = []
+        def raising_predicate(value):
+            predicate_threads.append(threading.get_ident())
+            raise RuntimeError("The predicate failed.")
+
+        observed = ObservedUpdates()
+        sink.add_observer(lambda *args: None, event_name="Volume", predicate=raising_predicate)
+        sink.add_observer(observed.callback, event_name="Mute")
+
+        with self.assertLogs(level="ERROR") as logs:
+            sink.update_event_variables({ "Volume": 4, "Mute": True })
+            observed.wait_for_count(1)
+            time.sleep(0.1)
+
+        assert sink.lookup_event_variable("Volume").value == 4
+        assert sink.lookup_event_variable("Mute").value is True, "The rest of the batch should be applied."
+        assert [ val for _, val, _ in observed.updates ] == [True], "The rest of the batch should be observed."
+        assert predicate_threads and threading.get_ident() not in predicate_threads, \
+            "The predicate should not run on the updating thread."
+        assert any("predicate raised" in line for line in logs.output), f"The predicate error should be logged. logs={logs.output}"
+
+    def test_debounce_dispatches_last_update(self):
+        sink = SampleSink()
+
+        observed = ObservedUpdates()
+        sink.add_observer(observed.callback, event_name="Volume", debounce=0.1)
+
+        for val in range(1, 6):
+            sink.update_event_variable("Volume", val)
+
+        observed.wait_for_count(1)
+        time.sleep(0.2)
+
+        values = [ val for _, val, _ in observed.updates ]
+        assert values == [5], f"Only the last update of the burst should be dispatched. values={values}"
+
+    def test_debounce_burst_does_not_create_threads(self):
+        sink = SampleSink()
+
+        observed = ObservedUpdates()
+        sink.add_observer(observed.callback, event_name="Volume", debounce=0.1)
+
+        threads_before = threading.active_count()
+        for val in range(1, 51):
+            sink.update_event_variable("Volume", val)
+        threads_during = threading.active_count()
+
+        observed.wait_for_count(1)
+        time.sleep(0.2)
+
+        # The shared scheduler thread and the default executor thread might be started by the burst
+        assert threads_during - threads_before <= 2, f"A burst should not create a thread per update. before={threads_before} during={threads_during}"
+
+        values = [ val for _, val, _ in observed.updates ]
+        assert values == [50], f"Only the last update of the burst should be dispatched. values={values}"
+
+    def test_throttle_dispatches_first_and_last(self):
+        sink = SampleSink()
+
+        observed = ObservedUpdates()
+        sink.add_observer(observed.callback, event_name="Volume", throttle=0.2)
+
+        for val in range(1, 6):
+            sink.update_event_variable("Volume", val)
+
+        observed.wait_for_count(2)
+        time.sleep(0.3)
+
+        values = [ val for _, val, _ in observed.updates ]
+        assert values == [1, 5], f"The first and last update of the burst should be dispatched. values={values}"
+
+    def test_remove_observer_and_custom_executor(self):
+        executor = ThreadPoolExecutor(max_workers=1)
+        sink = SampleSink(observer_executor=executor)
+
+        observed = ObservedUpdates()
+        observer = sink.add_observer(observed.callback, event_name="Volume")
+
+        sink.update_event_variable("Volume", 1)
+        observed.wait_for_count(1)
+
+        sink.remove_observer(observer)
+        sink.update_event_variable("Volume", 2)
+
+        executor.shutdown(wait=True)
+
+        values = [ val for _, val, _ in observed.updates ]
+        assert values == [1], f"No updates should be dispatched after the observer is removed. values={values}"
+
+    def test_observe_unknown_variable(self):
+        sink = SampleSink()
+
+        with self.assertRaises(ValueError):
+            sink.add_observer(lambda *args: None, event_name="Unknown")
+
+    def test_debounce_and_throttle_conflict(self):
+        sink = SampleSink()
+
+        with self.assertRaises(ValueError):
+            sink.add_observer(lambda *args: None, event_name="Volume", debounce=0.1, throttle=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
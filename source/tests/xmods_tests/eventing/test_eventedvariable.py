@@ -0,0 +1,131 @@
+
+import threading
+import time
+import unittest
+
+from datetime import datetime
+
+from mojo.xmods.eventing.enumerations import EventedVariableState
+from mojo.xmods.eventing.eventedvariable import INITIAL_SNAPSHOTS
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+VARIABLE_DESCRIPTIONS = {
+    "Volume": { "data_type": "int", "default": 0 },
+    "Mute": { "data_type": "bool" }
+}
+
+
+class SampleSink(EventedVariableSink):
+
+    def __init__(self):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="sample")
+        return
+
+
+class TestEventedVariableWaits(unittest.TestCase):
+
+    def test_wait_for_update_wakes_on_update(self):
+        sink = SampleSink()
+        volume = sink.lookup_event_variable("Volume")
+
+        moment = datetime.now()
+
+        def delayed_update():
+            time.sleep(0.05)
+            sink.update_event_variable("Volume", 10)
+            return
+
+        updater = threading.Thread(target=delayed_update, daemon=True)
+        updater.start()
+
+        start = time.perf_counter()
+        value = volume.wait_for_update(moment, timeout=10, interval=5)
+        elapsed = time.perf_counter() - start
+
+        updater.join()
+
+        assert value == 10, f"The updated value should be 10. value={value}"
+        assert elapsed < 1, f"The waiter should wake when notified, not on the interval. elapsed={elapsed}"
+
+    def test_wait_for_value_already_set(self):
+        sink = SampleSink()
+        sink.update_event_variable("Mute", True)
+
+        mute = sink.lookup_event_variable("Mute")
+        value = mute.wait_for_value(timeout=1)
+
+        assert value is True, f"The value should be True. value={value}"
+
+    def test_wait_for_update_timeout(self):
+        sink = SampleSink()
+        volume = sink.lookup_event_variable("Volume")
+
+        moment = datetime.now()
+
+        with self.assertRaises(TimeoutError):
+            volume.wait_for_update(moment, timeout=0.1, interval=0.05)
+
+
+class TestEventedVariableSnapshot(unittest.TestCase):
+
+    def test_sync_read_does_not_take_state_lock(self):
+        sink = SampleSink()
+        sink.update_event_variable("Volume", 3)
+        volume = sink.lookup_event_variable("Volume")
+
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_state_lock():
+            for _ in sink.yield_state_lock():
+                locked.set()
+                release.wait(5)
+            return
+
+        holder = threading.Thread(target=hold_state_lock, daemon=True)
+        holder.start()
+        locked.wait(5)
+
+        results = []
+        reader = threading.Thread(target=lambda: results.append(volume.sync_read()), daemon=True)
+        reader.start()
+        reader.join(1)
+
+        release.set()
+        holder.join()
+
+        assert len(results) == 1, "The sync_read should not block on the state lock."
+        value, updated, changed, _ = results[0]
+        assert value == 3 and updated == changed, f"Unexpected snapshot. result={results[0]}"
+
+    def test_unupdated_variables_read_default(self):
+        sink_a = SampleSink()
+        sink_b = SampleSink()
+
+        volume_a = sink_a.lookup_event_variable("Volume")
+        volume_b = sink_b.lookup_event_variable("Volume")
+
+        value, updated, changed, state = volume_b.sync_read()
+        assert value == 0 and updated is None and changed is None, f"Unexpected read. result={(value, updated, changed)}"
+        assert state == EventedVariableState.UnInitialized
+
+        sink_a.update_event_variable("Volume", 1)
+        assert volume_a.value == 1
+        assert volume_b.value == 0, "Updating one variable should not change an other variable."
+        assert volume_b.sync_read()[1] is None, "Updating one variable should not mark an other variable updated."
+
+    def test_initial_snapshots_bounded(self):
+        snapshot_count = len(INITIAL_SNAPSHOTS)
+
+        descriptions = {
+            "Name{}".format(nidx): { "data_type": "str", "default": "default-{}".format(nidx) } for nidx in range(100)
+        }
+        descriptions["Levels"] = { "data_type": "list", "default": [1, 2] }
+        sink = EventedVariableSink(descriptions, sink_prefix="bounded")
+
+        assert sink.lookup_event_variable("Name42").value == "default-42"
+        assert sink.lookup_event_variable("Levels").value == [1, 2]
+        assert len(INITIAL_SNAPSHOTS) == snapshot_count, "Creating variables should not grow the shared snapshots."
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+
+import threading
+import time
+import unittest
+
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+VARIABLE_DESCRIPTIONS = {
+    "Volume": { "data_type": "int", "default": 0 },
+    "Mute": { "data_type": "bool", "default": False },
+    "Source": { "data_type": "str" }
+}
+
+
+class SampleSink(EventedVariableSink):
+
+    def __init__(self):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="sample")
+        return
+
+
+class TestEventedVariableSinkBatches(unittest.TestCase):
+
+    def test_update_event_variables(self):
+        sink = SampleSink()
+
+        sink.update_event_variables({ "Volume": 20, "Mute": True, "Source": "HDMI" })
+
+        volume = sink.lookup_event_variable("Volume")
+        mute = sink.lookup_event_variable("Mute")
+        source = sink.lookup_event_variable("Source")
+
+        assert volume.value == 20, f"The volume should be 20. value={volume.value}"
+        assert mute.value is True, f"The mute should be True. value={mute.value}"
+        assert source.value == "HDMI", f"The source should be 'HDMI'. value={source.value}"
+        assert volume.updated == mute.updated == source.updated, "The batch should share a single updated timestamp."
+
+    def test_update_event_variables_unknown(self):
+        sink = SampleSink()
+
+        with self.assertRaises(KeyError):
+            sink.update_event_variables({ "Unknown": 1 })
+
+        volume = sink.lookup_event_variable("Volume")
+        before = volume.updated
+
+        with self.assertRaises(KeyError):
+            sink.update_event_variables({ "Volume": 25, "Unknown": 1 })
+
+        assert volume.value != 25, "A batch with an unknown variable should not update any variable."
+        assert volume.updated == before, "A batch with an unknown variable should not update any timestamp."
+
+    def test_wait_for_all(self):
+        sink = SampleSink()
+
+        def delayed_updates():
+            time.sleep(0.05)
+            sink.update_event_variable("Volume", 30)
+            time.sleep(0.05)
+            sink.update_event_variable("Mute", True)
+            return
+
+        updater = threading.Thread(target=delayed_updates, daemon=True)
+        updater.start()
+
+        predicate_map = {
+            "Volume": lambda val: val == 30,
+            "Mute": lambda val: val is True
+        }
+
+        start = time.perf_counter()
+        satisfied = sink.wait_for_all(predicate_map, timeout=10, interval=5)
+        elapsed = time.perf_counter() - start
+
+        updater.join()
+
+        assert satisfied == { "Volume": 30, "Mute": True }, f"Both variables should be satisfied. satisfied={satisfied}"
+        assert elapsed < 1, f"The waiter should wake when notified. elapsed={elapsed}"
+
+    def test_wait_for_any(self):
+        sink = SampleSink()
+
+        def delayed_update():
+            time.sleep(0.05)
+            sink.update_event_variables({ "Source": "TV" })
+            return
+
+        updater = threading.Thread(target=delayed_update, daemon=True)
+        updater.start()
+
+        predicate_map = {
+            "Volume": lambda val: val == 99,
+            "Source": lambda val: val == "TV"
+        }
+
+        satisfied = sink.wait_for_any(predicate_map, timeout=10, interval=5)
+
+        updater.join()
+
+        assert satisfied == { "Source": "TV" }, f"Only the source should be satisfied. satisfied={satisfied}"
+
+    def test_wait_for_any_timeout(self):
+        sink = SampleSink()
+
+        with self.assertRaises(TimeoutError):
+            sink.wait_for_any({ "Volume": lambda val: val == 99 }, timeout=0.1, interval=0.05)
+
+    def test_wait_for_unknown_variable(self):
+        sink = SampleSink()
+
+        with self.assertRaises(ValueError):
+            sink.wait_for_all({ "Unknown": lambda val: True }, timeout=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
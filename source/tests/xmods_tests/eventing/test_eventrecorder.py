@@ -0,0 +1,161 @@
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from mojo.xmods.eventing.eventrecorder import EventedSinkRecorder, EventedSinkReplayer, EventLogRecordType, MAX_NAME_ID
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+
+VARIABLE_DESCRIPTIONS = {
+    "Volume": { "data_type": "int", "default": 0 },
+    "Mute": { "data_type": "bool" }
+}
+
+
+class SampleSink(EventedVariableSink):
+
+    def __init__(self):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="sample")
+        self.invalidated = []
+        return
+
+    def invalidate_subscription(self, scope=None):
+        self.invalidated.append(scope)
+        return
+
+
+class TestEventRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.logfile = os.path.join(self.tempdir.name, "events.bin")
+        return
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+        return
+
+    def _record_sample_log(self):
+        sink = SampleSink()
+
+        recorder = EventedSinkRecorder(self.logfile)
+        recorder.attach(sink)
+        with recorder:
+            sink.update_event_variable("Volume", 1)
+            time.sleep(0.1)
+            sink.update_event_variables({ "Volume": 2, "Mute": True })
+            sink.invalidate_subscription("all")
+
+        assert recorder.record_count == 3, f"Three records should be written. count={recorder.record_count}"
+        assert "update_event_variable" not in sink.__dict__, "The sink methods should be restored on detach."
+        assert sink.invalidated == ["all"], "The recorded sink should still be invalidated."
+
+        return
+
+    def test_read_records(self):
+        self._record_sample_log()
+
+        replayer = EventedSinkReplayer(self.logfile)
+        records = list(replayer.read_records())
+
+        types = [ rtype for _, rtype, _ in records ]
+        assert types == [EventLogRecordType.Update, EventLogRecordType.BatchUpdate, EventLogRecordType.Invalidate]
+        assert records[0][2] == ("Volume", 1), f"Unexpected update record. record={records[0]}"
+        assert records[1][2] == { "Volume": 2, "Mute": True }, f"Unexpected batch record. record={records[1]}"
+        assert records[1][0] - records[0][0] >= 0.09, "The record offsets should preserve the timing."
+
+    def test_replay_into_sink(self):
+        self._record_sample_log()
+
+        sink = SampleSink()
+        replayer = EventedSinkReplayer(self.logfile)
+
+        start = time.perf_counter()
+        replayed = replayer.replay(sink, speed=10.0)
+        elapsed = time.perf_counter() - start
+
+        assert replayed == 3, f"Three records should be replayed. replayed={replayed}"
+        assert sink.lookup_event_variable("Volume").value == 2
+        assert sink.lookup_event_variable("Mute").value is True
+        assert sink.invalidated == ["all"], f"The invalidation should be replayed. invalidated={sink.invalidated}"
+        assert elapsed < 0.09, f"The accelerated replay should be faster than the recording. elapsed={elapsed}"
+
+    def test_truncated_log(self):
+        self._record_sample_log()
+
+        with open(self.logfile, 'rb') as lf:
+            content = lf.read()
+        with open(self.logfile, 'wb') as lf:
+            lf.write(content[:-3])
+
+        replayer = EventedSinkReplayer(self.logfile)
+        records = list(replayer.read_records())
+
+        assert len(records) == 2, f"The partial last record should be ignored. records={records}"
+
+    def test_failed_update_not_recorded(self):
+        sink = SampleSink()
+
+        with EventedSinkRecorder(self.logfile) as recorder:
+            recorder.attach(sink)
+
+            with self.assertRaises(KeyError):
+                sink.update_event_variables({ "Volume": 3, "Missing": 1 })
+
+            for _ in sink.yield_state_lock():
+                sink.update_event_variable("Volume", 4, sink_locked=True)
+
+        assert recorder.record_count == 1, f"Only the applied update should be recorded. count={recorder.record_count}"
+
+        records = list(EventedSinkReplayer(self.logfile).read_records())
+        assert [ data for _, _, data in records ] == [("Volume", 4)], f"Unexpected records. records={records}"
+
+    def test_name_id_limit(self):
+        sink = SampleSink()
+
+        with EventedSinkRecorder(self.logfile) as recorder:
+            recorder.attach(sink)
+
+            recorder.record_batch_update({ "name{}".format(nidx): None for nidx in range(MAX_NAME_ID + 1) })
+
+            with self.assertLogs(level="WARNING") as logs:
+                recorder.record_update("overflow", None)
+
+        assert recorder.record_count == 1, "The update of a name past the limit should not be recorded."
+        assert any("overflow" in line for line in logs.output), f"The skipped update should be logged. logs={logs.output}"
+
+        records = list(EventedSinkReplayer(self.logfile).read_records())
+        assert len(records) == 1, "The log should stay readable after the limit is reached."
+        assert len(records[0][2]) == MAX_NAME_ID + 1, "A batch with more entries than a 16 bit count should be recorded."
+
+    def test_unpicklable_value_skipped(self):
+        sink = SampleSink()
+        unpicklable = threading.Lock()
+
+        with EventedSinkRecorder(self.logfile) as recorder:
+            recorder.attach(sink)
+
+            with self.assertLogs(level="WARNING") as logs:
+                sink.update_event_variable("Volume", unpicklable)
+                sink.update_event_variables({ "Volume": unpicklable, "Mute": True })
+
+        assert sink.lookup_event_variable("Volume").value is unpicklable, "The update should be applied."
+        assert sink.lookup_event_variable("Mute").value is True
+        assert len(logs.output) == 2, f"Each skipped value should be logged. logs={logs.output}"
+
+        records = list(EventedSinkReplayer(self.logfile).read_records())
+        assert [ data for _, _, data in records ] == [{ "Mute": True }], f"Unexpected records. records={records}"
+
+    def test_not_an_event_log(self):
+        with open(self.logfile, 'wb') as lf:
+            lf.write(b"not an event log")
+
+        replayer = EventedSinkReplayer(self.logfile)
+        with self.assertRaises(ValueError):
+            list(replayer.read_records())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+
+import threading
+import time
+import unittest
+
+from datetime import datetime, timedelta
+
+from mojo.xmods.eventing.eventedvariablesink import EventedVariableSink
+from mojo.xmods.eventing.subscriptionrenewal import get_subscription_renewal_scheduler
+
+VARIABLE_DESCRIPTIONS = {
+    "Volume": { "data_type": "int", "default": 0 }
+}
+
+SUBSCRIPTION_LIFETIME = 0.5
+
+
+class RenewingSink(EventedVariableSink):
+
+    SINK_AUTO_RENEW = True
+
+    def __init__(self, fail_count=0):
+        super().__init__(VARIABLE_DESCRIPTIONS, sink_prefix="renewing")
+        self.renewals = []
+        self.fail_count = fail_count
+        self.renewed = threading.Event()
+        return
+
+    def subscribe(self):
+        expiration = datetime.now() + timedelta(seconds=SUBSCRIPTION_LIFETIME)
+        self.register_subscription("sid-0", expiration)
+        return
+
+    def renew_subscription(self, scope=None):
+        if self.fail_count > 0:
+            self.fail_count -= 1
+            raise ConnectionError("Simulated renewal failure.")
+
+        self.renewals.append(datetime.now())
+
+        expiration = datetime.now() + timedelta(seconds=SUBSCRIPTION_LIFETIME)
+        self.register_subscription("sid-{}".format(len(self.renewals)), expiration)
+
+        self.renewed.set()
+        return
+
+
+class TestSubscriptionRenewalScheduler(unittest.TestCase):
+
+    def test_renews_before_expiration(self):
+        sink = RenewingSink()
+        sink.subscribe()
+        expiration = sink.subscriptionExpiration
+
+        assert sink.renewed.wait(5), "The subscription should be renewed."
+        assert sink.renewals[0] < expiration, "The renewal should be made before the subscription expires."
+        assert sink.subscriptionId == "sid-1", f"The renewal should register the new subscription. sid={sink.subscriptionId}"
+
+        get_subscription_renewal_scheduler().unschedule_sink(sink)
+
+    def test_many_sinks_one_thread(self):
+        sinks = [ RenewingSink() for _ in range(20) ]
+        for sink in sinks:
+            sink.subscribe()
+
+        for sink in sinks:
+            assert sink.renewed.wait(5), "Every subscription should be renewed."
+
+        renewal_threads = [ th for th in threading.enumerate() if th.name == "subscription-renewal" ]
+        assert len(renewal_threads) == 1, "All of the sinks should be renewed by a single thread."
+
+        first_renewals = sorted([ sink.renewals[0] for sink in sinks ])
+        spread = (first_renewals[-1] - first_renewals[0]).total_seconds()
+        assert spread > 0, "The jitter should spread the renewals of the sinks."
+
+        scheduler = get_subscription_renewal_scheduler()
+        for sink in sinks:
+            scheduler.unschedule_sink(sink)
+
+    def test_failed_renewal_is_retried(self):
+        scheduler = get_subscription_renewal_scheduler()
+
+        orig_retry = scheduler.RENEWAL_RETRY_INTERVAL
+        type(scheduler).RENEWAL_RETRY_INTERVAL = 0.05
+        try:
+            sink = RenewingSink(fail_count=1)
+            sink.subscribe()
+
+            assert sink.renewed.wait(5), "The failed renewal should be retried."
+            assert sink.fail_count == 0
+        finally:
+            type(scheduler).RENEWAL_RETRY_INTERVAL = orig_retry
+
+        scheduler.unschedule_sink(sink)
+
+    def test_unscheduled_sink_not_renewed(self):
+        scheduler = get_subscription_renewal_scheduler()
+
+        sink = RenewingSink()
+        sink.subscribe()
+        scheduler.unschedule_sink(sink)
+
+        time.sleep(SUBSCRIPTION_LIFETIME)
+
+        assert len(sink.renewals) == 0, "An unscheduled sink should not be renewed."
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+
+import threading
+import time
+import unittest
+
+from mojo.xmods.injection.coupling.bringupengine import BringUpStage, IntegrationBringUpEngine
+from mojo.xmods.injection.coupling.integrationcoupling import (
+    IntegrationCoupling,
+    sort_integration_couplings_by_precedence
+)
+
+STAGE_DELAY = 0.05
+
+
+class RecordingCoupling(IntegrationCoupling):
+
+    precedence = None
+    fail_stage = None
+
+    events = []
+    events_lock = threading.Lock()
+
+    @classmethod
+    def _record(cls, stage):
+        cls.events_lock.acquire()
+        try:
+            RecordingCoupling.events.append((cls.__name__, stage, "start", time.perf_counter()))
+        finally:
+            cls.events_lock.release()
+
+        time.sleep(STAGE_DELAY)
+
+        if cls.fail_stage == stage:
+            raise RuntimeError("Stage '{}' failed for '{}'.".format(stage, cls.__name__))
+
+        cls.events_lock.acquire()
+        try:
+            RecordingCoupling.events.append((cls.__name__, stage, "end", time.perf_counter()))
+        finally:
+            cls.events_lock.release()
+        return
+
+    @classmethod
+    def attach_to_environment(cls, **kwargs):
+        cls._record("attach_to_environment")
+        return
+
+    @classmethod
+    def collect_resources(cls):
+        cls._record("collect_resources")
+        return
+
+    @classmethod
+    def declare_precedence(cls) -> int:
+        return cls.precedence
+
+    @classmethod
+    def establish_connectivity(cls, allow_missing_devices: bool=False):
+        cls._record("establish_connectivity")
+        return ([], {})
+
+    @classmethod
+    def establish_presence(cls):
+        cls._record("establish_presence")
+        return (["{} not present".format(cls.__name__)], {})
+
+
+class LowCouplingA(RecordingCoupling):
+    precedence = 1
+
+class LowCouplingB(RecordingCoupling):
+    precedence = 1
+
+class HighCoupling(RecordingCoupling):
+    precedence = 2
+
+class FreeCoupling(RecordingCoupling):
+    precedence = None
+
+
+def event_time(name, stage, kind):
+    for ename, estage, ekind, etime in RecordingCoupling.events:
+        if ename == name and estage == stage and ekind == kind:
+            return etime
+    return None
+
+
+class TestIntegrationBringUpEngine(unittest.TestCase):
+
+    def setUp(self):
+        RecordingCoupling.events = []
+        LowCouplingB.fail_stage = None
+        return
+
+    def test_precedence_and_concurrency(self):
+        engine = IntegrationBringUpEngine([HighCoupling, LowCouplingA, LowCouplingB, FreeCoupling], max_workers=4)
+        report = engine.bring_up()
+
+        assert report.succeeded, report.format_report()
+
+        for stage in BringUpStage:
+            for low in ["LowCouplingA", "LowCouplingB"]:
+                assert event_time(low, stage.value, "end") <= event_time("HighCoupling", stage.value, "start"), \
+                    "A stage of a higher precedence coupling should start after the lower precedence couplings."
+
+        # The couplings of the same level run their stages at the same time
+        assert event_time("LowCouplingB", "attach_to_environment", "start") < event_time("LowCouplingA", "attach_to_environment", "end")
+
+        serial_time = 4 * len(BringUpStage) * STAGE_DELAY
+        assert report.elapsed < serial_time, "The bring-up should be faster than running the stages serially."
+
+        timings = report.stage_timings()
+        wall, busy = timings[BringUpStage.CollectResources]
+        assert busy >= 4 * STAGE_DELAY * 0.9 and wall > 0
+
+        assert len(report.collect_stage_errors(BringUpStage.EstablishPresence)) == 4
+        assert "collect_resources" in report.format_report()
+
+    def test_failure_skips_dependents(self):
+        LowCouplingB.fail_stage = "collect_resources"
+
+        engine = IntegrationBringUpEngine([LowCouplingA, LowCouplingB, HighCoupling, FreeCoupling], max_workers=4)
+        report = engine.bring_up()
+
+        assert not report.succeeded
+        assert len(report.failures) == 1
+
+        results = report.results
+        assert results[(LowCouplingB, BringUpStage.EstablishPresence)].skipped
+        assert results[(HighCoupling, BringUpStage.CollectResources)].skipped
+        assert results[(HighCoupling, BringUpStage.AttachToEnvironment)].error is None
+        assert not results[(LowCouplingA, BringUpStage.EstablishConnectivity)].failed, "Independent couplings should finish."
+        assert not results[(FreeCoupling, BringUpStage.EstablishConnectivity)].failed
+
+    def test_sort_by_precedence(self):
+        ordered = sort_integration_couplings_by_precedence([HighCoupling, LowCouplingA, FreeCoupling, LowCouplingB])
+        assert ordered == [FreeCoupling, LowCouplingA, LowCouplingB, HighCoupling]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+
+import unittest
+
+from mojo.xmods.injection.constraints import ConstraintsOrigin, FeatureConstraints
+from mojo.xmods.injection.constraintscatalog import (
+    ConstraintsCatalog,
+    create_ancestor_scopes,
+    is_scope_related
+)
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+
+constraints_catalog = ConstraintsCatalog()
+
+
+class TestConstraintsCatalog(unittest.TestCase):
+
+    def setUp(self):
+        # Each test starts with an empty catalog and the constraints of the singleton are restored after
+        # the test so pruning in a test does not affect other tests
+        self._saved_constraints = (constraints_catalog._site_constraints, constraints_catalog._override_constraints,
+                                   constraints_catalog._resolved_constraints)
+        constraints_catalog._site_constraints = {}
+        constraints_catalog._override_constraints = {}
+        constraints_catalog._resolved_constraints = {}
+        return
+
+    def tearDown(self):
+        constraints_catalog._site_constraints, constraints_catalog._override_constraints, \
+            constraints_catalog._resolved_constraints = self._saved_constraints
+        return
+
+    def test_ancestor_scopes(self):
+        assert create_ancestor_scopes("tests.pkg.mod") == ["<session>", "tests", "tests.pkg"]
+        assert create_ancestor_scopes("tests.mod#test_one") == ["<session>", "tests", "tests.mod"]
+        assert create_ancestor_scopes("<session>") == []
+
+    def test_scope_related(self):
+        assert is_scope_related("pkg.mod", "pkg.mod#test_one") and is_scope_related("pkg.mod#test_one", "pkg")
+        assert is_scope_related("<session>", "pkg.mod#test_one")
+        assert not is_scope_related("pkg.mod", "pkg.module") and not is_scope_related("pkg.mod#test_one", "pkg.mod#test_two")
+
+    def test_function_scope_resolution(self):
+        constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "pkg.mod", "func_device", {"model": "mod"})
+        func_key = constraints_catalog.add_constraints(ConstraintsOrigin.OVERRIDE_PARAMETER, "pkg.mod#func", "func_device",
+                                                       {"timeout": 5})
+        other_key = constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "pkg.other#func", "func_device",
+                                                        {"model": "other"})
+
+        assert constraints_catalog.resolve_constraints("pkg.mod#test_x", "func_device") == {"model": "mod"}
+        assert constraints_catalog.lookup_constraints(func_key) == {"model": "mod", "timeout": 5}
+
+        constraints_catalog.prune_constraints(["pkg.mod"])
+
+        assert constraints_catalog.lookup_constraints(func_key) == {"model": "mod", "timeout": 5}
+        assert constraints_catalog.lookup_site_constraints(other_key) is None
+
+    def test_hierarchical_resolution(self):
+        constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "<session>", "hier_device",
+                                            {"model": "any", "timeout": 10, "region": "us"})
+        constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "hierpkg", "hier_device",
+                                            {"model": "base", "timeout": 20})
+        ckey = constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "hierpkg.mod", "hier_device",
+                                                   {"model": "mod"})
+        constraints_catalog.add_constraints(ConstraintsOrigin.OVERRIDE_PARAMETER, "hierpkg", "hier_device",
+                                            {"timeout": 99})
+
+        resolved = constraints_catalog.lookup_constraints(ckey)
+        assert resolved == {"model": "mod", "timeout": 99, "region": "us"}
+        assert constraints_catalog.lookup_constraints(ckey) is resolved, "Repeated lookups should be memoized."
+        assert constraints_catalog.lookup_site_constraints(ckey) == {"model": "mod"}
+
+        # A scope without constraints of its own resolves the constraints of its ancestors
+        assert constraints_catalog.resolve_constraints("hierpkg.other", "hier_device") == \
+            {"model": "base", "timeout": 99, "region": "us"}
+        assert constraints_catalog.resolve_constraints("hierpkg.mod", "hier_missing") is None
+
+        # Adding constraints invalidates the memoized constraints
+        constraints_catalog.add_constraints(ConstraintsOrigin.OVERRIDE_PARAMETER, "hierpkg.mod", "hier_device",
+                                            {"model": "override"})
+        assert constraints_catalog.lookup_constraints(ckey)["model"] == "override"
+
+    def test_single_constraints_keep_type(self):
+        features = FeatureConstraints(required_features=["wifi"])
+        ckey = constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "typepkg.mod", "type_device", features)
+        assert constraints_catalog.lookup_constraints(ckey) is features
+
+    def test_prune_by_scope_prefix(self):
+        keep_key = constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "prunepkg.keep.mod", "prune_device", {"a": 1})
+        parent_key = constraints_catalog.add_constraints(ConstraintsOrigin.OVERRIDE_PARAMETER, "prunepkg", "prune_device", {"b": 2})
+        drop_key = constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "prunepkg.drop", "prune_device", {"c": 3})
+        similar_key = constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "prunepkg.keeper", "prune_device", {"d": 4})
+        child_key = constraints_catalog.add_constraints(ConstraintsOrigin.SITE_PARAMETER, "prunepkg.keep.mod.sub", "prune_other", {"e": 5})
+
+        assert constraints_catalog.lookup_constraints(drop_key) == {"b": 2, "c": 3}
+
+        constraints_catalog.prune_constraints(["prunepkg.keep"])
+
+        assert constraints_catalog.lookup_constraints(keep_key) == {"a": 1, "b": 2}
+        assert constraints_catalog.lookup_constraints(parent_key) == {"b": 2}
+        assert constraints_catalog.lookup_constraints(drop_key) == {"b": 2}
+        assert constraints_catalog.lookup_site_constraints(similar_key) is None
+        assert constraints_catalog.lookup_site_constraints(child_key) == {"e": 5}
+
+    def test_parameter_origin_constraints(self):
+        origin = ParameterOrigin("originpkg.mod", "origin_device", ResourceLifespan.Package, None,
+                                 constraints={"model": "mod"})
+        constraints_catalog.add_constraints(ConstraintsOrigin.OVERRIDE_PARAMETER, "originpkg", "origin_device", {"model": "override"})
+
+        assert not origin.implied
+        assert origin.constraints_key == "originpkg.mod:origin_device"
+        assert origin.constraints == {"model": "override"}
+
+
+if __name__ == '__main__':
+    unittest.main()
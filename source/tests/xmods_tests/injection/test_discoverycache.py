@@ -0,0 +1,170 @@
+
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+
+from mojo.xmods.injection.discoverycache import CachedInjectableRef, CachedSource, DiscoveryCache
+from mojo.xmods.injection.injectionregistry import injection_registry
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+from mojo.xmods.injection.resourcesource import ResourceSource
+
+from ..injectionhelpers import unregister_origin
+
+
+class SampleResource:
+    pass
+
+
+def sample_resource(session_resource, constraints=None):
+    return SampleResource()
+
+
+class TestDiscoveryCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tempdir = tempfile.TemporaryDirectory()
+        self._module_file = os.path.join(self._tempdir.name, "sample_module.py")
+        with open(self._module_file, 'w') as mf:
+            mf.write("VALUE = 1\n")
+        self._cache_file = os.path.join(self._tempdir.name, "discovery.cache")
+        return
+
+    def tearDown(self):
+        self._tempdir.cleanup()
+        return
+
+    def _store_sample(self, module_name):
+        source = ResourceSource(sample_resource, None, SampleResource, None)
+        origin = ParameterOrigin(module_name, "sample_resource", ResourceLifespan.Package, source)
+
+        cache = DiscoveryCache(self._cache_file)
+        stored = cache.store_module(module_name, self._module_file, [origin],
+                                    {"{}#test_one".format(module_name): {"priority": "1"}})
+        assert stored, "The module should be cacheable."
+        cache.save()
+        return
+
+    def test_store_and_lookup(self):
+        self._store_sample("cached.store")
+
+        cache = DiscoveryCache(self._cache_file)
+        assert cache.load()
+
+        record = cache.lookup_module("cached.store", self._module_file)
+        assert record is not None and cache.hits == 1
+
+        injectables = cache.restore_injectables(record)
+        inj_ref = injectables["cached.store#test_one"]
+        assert isinstance(inj_ref, CachedInjectableRef)
+        assert inj_ref.name == "cached.store#test_one" and inj_ref.module_name == "cached.store"
+        inj_ref.resolve_metadata()
+        assert inj_ref._metadata == {"priority": "1"}
+
+        origins = cache.restore_module(record)
+        assert len(origins) == 1
+        origin = origins[0]
+        assert origin.restored and isinstance(origin._source, CachedSource)
+        assert list(origin.source_signature.parameters) == ["session_resource", "constraints"]
+        assert origin.source_id == "{}#sample_resource".format(__name__)
+        assert origin.source_resource_type is SampleResource
+        assert origin.source_function is sample_resource
+
+        assert injection_registry.lookup_resource_scope("cached.store").parameter_originations["sample_resource"] is origin
+
+        # Importing the module that originates a restored origin replaces the restored origin
+        source = ResourceSource(sample_resource, None, SampleResource, None)
+        imported_origin = ParameterOrigin("cached.store", "sample_resource", ResourceLifespan.Package, source)
+        injection_registry.register_parameter_origin("sample_resource", imported_origin)
+        assert injection_registry.lookup_resource_scope("cached.store").parameter_originations["sample_resource"] is imported_origin
+
+    def test_cached_injectable_resolves_lazily(self):
+        module_name = "lazy_sample_module"
+        with open(os.path.join(self._tempdir.name, module_name + ".py"), 'w') as mf:
+            mf.write("def test_lazy(lazy_resource):\n    return None\n")
+
+        sys.path.insert(0, self._tempdir.name)
+        try:
+            inj_ref = CachedInjectableRef(module_name, "test_lazy", None)
+            assert inj_ref.name == "lazy_sample_module#test_lazy" and inj_ref.base_name == "test_lazy"
+            assert module_name not in sys.modules, "The module should not be imported before the function is needed."
+
+            assert inj_ref.function_parameter_names == ("lazy_resource",)
+            assert module_name in sys.modules
+            assert inj_ref.function_parameter_names == ("lazy_resource",)
+        finally:
+            sys.path.remove(self._tempdir.name)
+            sys.modules.pop(module_name, None)
+
+    def test_changed_module_misses(self):
+        self._store_sample("cached.changed")
+
+        with open(self._module_file, 'w') as mf:
+            mf.write("VALUE = 2\n")
+        os.utime(self._module_file, ns=(0, 0))
+
+        cache = DiscoveryCache(self._cache_file)
+        cache.load()
+
+        record = cache.lookup_module("cached.changed", self._module_file)
+        assert record is None and cache.misses == 1, "A changed module should not be restored."
+        assert cache.modified, "The record of the changed module should be discarded."
+
+    def test_changed_fixture_module_misses(self):
+        fixture_name = "disc_edit_fixtures"
+        fixture_file = os.path.join(self._tempdir.name, fixture_name + ".py")
+        with open(fixture_file, 'w') as ff:
+            ff.write("def edit_resource(session_resource):\n    return None\n")
+
+        sys.path.insert(0, self._tempdir.name)
+        try:
+            fixture_module = importlib.import_module(fixture_name)
+
+            # Cold run, the origin of the injectable module uses a source from the fixture module
+            source = ResourceSource(fixture_module.edit_resource, None, SampleResource, None)
+            origin = ParameterOrigin("cached.edit", "edit_resource", ResourceLifespan.Package, source)
+
+            cache = DiscoveryCache(self._cache_file)
+            assert cache.store_module("cached.edit", self._module_file, [origin])
+            cache.save()
+
+            # Warm run with the fixture module unchanged
+            cache = DiscoveryCache(self._cache_file)
+            cache.load()
+            record = cache.lookup_module("cached.edit", self._module_file)
+            assert record is not None, "The record should be restored while the fixture module is unchanged."
+
+            restored = cache.restore_module(record)
+            self.addCleanup(unregister_origin, restored[0])
+            assert injection_registry.lookup_resource_source(fixture_module.edit_resource) is restored[0]._source, \
+                "The restored source should be registered with the injection registry."
+
+            # Warm run after the signature of the fixture changed
+            with open(fixture_file, 'w') as ff:
+                ff.write("def edit_resource(session_resource, other_resource):\n    return None\n")
+
+            cache = DiscoveryCache(self._cache_file)
+            cache.load()
+            record = cache.lookup_module("cached.edit", self._module_file)
+            assert record is None and cache.misses == 1, "A record should not be restored after a fixture module changed."
+        finally:
+            sys.path.remove(self._tempdir.name)
+            sys.modules.pop(fixture_name, None)
+
+    def test_touched_module_hits(self):
+        self._store_sample("cached.touched")
+
+        os.utime(self._module_file, ns=(0, 0))
+
+        cache = DiscoveryCache(self._cache_file)
+        cache.load()
+
+        record = cache.lookup_module("cached.touched", self._module_file)
+        assert record is not None, "A module with an unchanged content should be restored."
+        assert record.fingerprint[0] == 0, "The fingerprint should be updated with the new timestamp."
+
+
+if __name__ == '__main__':
+    unittest.main()
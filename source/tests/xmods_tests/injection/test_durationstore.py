@@ -0,0 +1,83 @@
+
+import os
+import tempfile
+import unittest
+
+from mojo.xmods.injection.durationstore import DurationStore
+from mojo.xmods.injection.injectablegroup import InjectableGroup, InjectableOrder
+
+from ..injectionhelpers import create_injectable
+
+
+def create_tree():
+    root = InjectableGroup("root")
+    for module_name, func_names in [("orderpkg.fast", ["test_a", "test_b"]), ("orderpkg.slow", ["test_c", "test_d"])]:
+        for func_name in func_names:
+            root.add_descendent(create_injectable(module_name, func_name))
+    return root
+
+
+def injectable_order(group):
+    names = []
+    for child in group.children.values():
+        if isinstance(child, InjectableGroup):
+            names.extend(injectable_order(child))
+        else:
+            names.append(child.base_name)
+    return names
+
+
+class TestDurationStore(unittest.TestCase):
+
+    def test_record_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "history", "durations.json")
+
+            store = DurationStore(filename, smoothing=0.5)
+            store.record("orderpkg.fast#test_a", 2.0)
+            store.record("orderpkg.fast#test_a", 4.0, passed=False)
+            assert store.modified
+            store.save()
+            assert not store.modified
+
+            loaded = DurationStore(filename)
+            assert loaded.load()
+
+            record = loaded.lookup("orderpkg.fast#test_a")
+            assert record.duration == 3.0 and record.last_duration == 4.0
+            assert record.runs == 2 and record.failures == 1 and record.last_failed
+            assert loaded.failure_score("orderpkg.fast#test_a") == 1.5
+            assert loaded.lookup_duration("orderpkg.fast#missing", 7.0) == 7.0
+
+            with open(filename, 'w') as sf:
+                sf.write("not json")
+            assert not loaded.load() and len(loaded) == 0
+
+    def test_order_children(self):
+        store = DurationStore()
+        store.record_run({
+            "orderpkg.fast#test_a": 1.0,
+            "orderpkg.fast#test_b": 2.0,
+            "orderpkg.slow#test_c": 5.0,
+            "orderpkg.slow#test_d": 3.0
+        }, failures=["orderpkg.fast#test_b"])
+
+        root = create_tree()
+
+        root.order_children(InjectableOrder.Declared, store)
+        assert injectable_order(root) == ["test_a", "test_b", "test_c", "test_d"]
+
+        root.order_children(InjectableOrder.LongestFirst, store)
+        assert injectable_order(root) == ["test_c", "test_d", "test_b", "test_a"]
+
+        root.order_children(InjectableOrder.FailFastFirst, store)
+        assert injectable_order(root) == ["test_b", "test_a", "test_d", "test_c"]
+
+        # An injectable without history takes the average duration
+        root.add_descendent(create_injectable("orderpkg.fast", "test_e"))
+        root.order_children(InjectableOrder.LongestFirst, store)
+        assert injectable_order(root) == ["test_c", "test_d", "test_e", "test_b", "test_a"]
+
+
+if __name__ == '__main__':
+    unittest.main()
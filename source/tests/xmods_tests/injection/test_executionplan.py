@@ -0,0 +1,152 @@
+
+import unittest
+
+from typing import Generator
+
+from mojo.errors.exceptions import SemanticError
+
+from mojo.xmods.injection.executionplan import ExecutionPlanBuilder
+from mojo.xmods.injection.injectablegroup import InjectableGroup
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.injection.injectionregistry import injection_registry
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcecache import ResourceInstanceCache
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+from mojo.xmods.injection.resourcesource import ResourceSource
+
+from ..injectionhelpers import unregister_origin
+
+events = []
+
+
+def create_function(module_name, func_name, param_names, body):
+    namespace = {"events": events}
+    exec("def {}({}):\n    {}\n".format(func_name, ", ".join(param_names), body), namespace)
+    func = namespace[func_name]
+    func.__module__ = module_name
+    return func
+
+
+def plan_session_resource() -> Generator[str, None, None]:
+    events.append("session-up")
+    yield "session"
+    events.append("session-down")
+
+
+def plan_final_resource() -> Generator[str, None, None]:
+    yield "final"
+    raise RuntimeError("Unable to finalize the resource.")
+
+
+def register_origin(scope_name, source_func, life_span, identifier=None):
+    if identifier is None:
+        identifier = source_func.__name__
+    source = ResourceSource(source_func, None, object, None)
+    origin = ParameterOrigin(scope_name, identifier, life_span, source)
+    injection_registry.register_parameter_origin(identifier, origin)
+    return origin
+
+
+class TestExecutionPlan(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.origins = []
+
+        cls.origins.append(register_origin("<session>", plan_session_resource, ResourceLifespan.Session))
+
+        package_func = create_function("planpkg.sources", "plan_package_resource", ["plan_session_resource"],
+                                       "return ('package', plan_session_resource)")
+        cls.origins.append(register_origin("planpkg.alpha", package_func, ResourceLifespan.Package))
+
+        # A module level origin that shadows the package origin and consumes it
+        shadow_func = create_function("planpkg.sources", "plan_shadow_resource", ["plan_package_resource"],
+                                      "return ('shadow', plan_package_resource)")
+        cls.origins.append(register_origin("planpkg.alpha.beta", shadow_func, ResourceLifespan.Package, identifier="plan_package_resource"))
+        return
+
+    @classmethod
+    def tearDownClass(cls):
+        for origin in cls.origins:
+            unregister_origin(origin)
+        return
+
+    def setUp(self):
+        events.clear()
+        return
+
+    def test_build_and_run_plan(self):
+        root = InjectableGroup("root")
+
+        inj_one = InjectableRef(create_function("planpkg.alpha.beta", "test_one", ["plan_session_resource", "plan_package_resource"],
+                                                "return (plan_session_resource, plan_package_resource)"))
+        inj_two = InjectableRef(create_function("planpkg.alpha.gamma", "test_two", ["plan_package_resource"],
+                                                "return plan_package_resource"))
+        root.add_descendent(inj_one)
+        root.add_descendent(inj_two)
+
+        builder = ExecutionPlanBuilder()
+        plan = builder.build_plan(root)
+
+        assert [entry.inj_ref.name for entry in plan.entries] == [inj_one.name, inj_two.name]
+        assert plan.entries[0].group_scopes == ("planpkg", "planpkg.alpha", "planpkg.alpha.beta")
+        assert "def invoke_0(" in plan.source
+
+        origins = builder.resolve_injectable_origins(inj_one)
+        assert [o.identifier for o in origins] == ["plan_session_resource", "plan_package_resource", "plan_package_resource"]
+
+        cache = ResourceInstanceCache()
+        results = plan.run(cache)
+
+        result_one, error_one = results[inj_one.name]
+        assert error_one is None
+        assert result_one == ("session", ("shadow", ("package", "session")))
+
+        result_two, error_two = results[inj_two.name]
+        assert error_two is None and result_two == ("package", "session")
+
+        assert events == ["session-up"], "The session of a cache that is provided should be left to the caller."
+        assert len(cache) == 1
+
+        cache.exit_session()
+        assert events == ["session-up", "session-down"]
+        assert len(cache) == 0
+
+        # The session of the cache the run creates is exited when the run completes
+        events.clear()
+        plan.run()
+        assert events == ["session-up", "session-down"], "The session resource should be finalized at the end of the run."
+
+        # Building the same plan again reuses the compiled code
+        assert builder.build_plan(root).code is plan.code
+
+    def test_finalize_errors_logged(self):
+        scope_name = "planfinal.tests#test_final"
+        origin = register_origin(scope_name, plan_final_resource, ResourceLifespan.Test)
+        self.addCleanup(unregister_origin, origin)
+
+        root = InjectableGroup("root")
+        root.add_descendent(InjectableRef(create_function("planfinal.tests", "test_final", ["plan_final_resource"],
+                                                          "return plan_final_resource")))
+        plan = ExecutionPlanBuilder().build_plan(root)
+
+        with self.assertLogs(level="ERROR") as logs:
+            results = plan.run()
+
+        assert results["planfinal.tests#test_final"] == ("final", None)
+        assert any("Error finalizing a resource of scope '{}'".format(scope_name) in line for line in logs.output), \
+            f"The finalize error of the test resource should be logged. logs={logs.output}"
+
+    def test_unresolved_parameter(self):
+        root = InjectableGroup("root")
+        root.add_descendent(InjectableRef(create_function("planpkg.delta", "test_missing", ["plan_unknown_resource"], "return None")))
+
+        try:
+            ExecutionPlanBuilder().build_plan(root)
+            assert False, "Building a plan with an unresolved parameter should fail."
+        except SemanticError as xcpt:
+            assert "plan_unknown_resource" in str(xcpt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+
+import threading
+import time
+import unittest
+
+from typing import Generator
+
+from mojo.xmods.injection.coupling.scopecoupling import ScopeCoupling
+from mojo.xmods.injection.executionplan import ExecutionPlanBuilder
+from mojo.xmods.injection.injectablegroup import InjectableGroup
+from mojo.xmods.injection.injectablescheduler import (
+    InjectableScheduler,
+    RoundRobinPlacementPolicy,
+    ShardPlacementPolicy
+)
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.injection.injectionregistry import injection_registry
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcecache import ResourceInstanceCache
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+from mojo.xmods.injection.resourcesource import ResourceSource
+
+from ..injectionhelpers import name_injectable_function, unregister_origin
+
+TEST_DELAY = 0.05
+
+events = []
+events_lock = threading.Lock()
+
+
+def record_event(*event):
+    events_lock.acquire()
+    try:
+        events.append(event)
+    finally:
+        events_lock.release()
+    return
+
+
+def sched_shared_resource() -> Generator[str, None, None]:
+    record_event("shared-up")
+    yield "shared"
+    record_event("shared-down")
+
+
+def sched_final_resource() -> Generator[str, None, None]:
+    yield "final"
+    raise RuntimeError("Unable to finalize the resource.")
+
+
+def create_injectable(module_name, func_name):
+    def injectable(sched_shared_resource):
+        record_event("test", module_name, func_name, time.perf_counter())
+        time.sleep(TEST_DELAY)
+        return sched_shared_resource
+    return InjectableRef(name_injectable_function(injectable, module_name, func_name))
+
+
+class RecordingScopeCoupling(ScopeCoupling):
+
+    def __init__(self, scope_name, fail_enter=False):
+        # The scopes of the test are not published to the context
+        self.scope_name = scope_name
+        self.fail_enter = fail_enter
+        return
+
+    def scope_enter(self):
+        record_event("enter", self.scope_name, time.perf_counter())
+        if self.fail_enter:
+            raise RuntimeError("Unable to enter scope '{}'.".format(self.scope_name))
+        return
+
+    def scope_exit(self):
+        record_event("exit", self.scope_name, time.perf_counter())
+        return
+
+
+class SessionCountingCache(ResourceInstanceCache):
+
+    def __init__(self):
+        super().__init__()
+        self.session_exits = 0
+        return
+
+    def exit_session(self):
+        self.session_exits += 1
+        return super().exit_session()
+
+
+class ReversePlacementPolicy(ShardPlacementPolicy):
+
+    def place_shards(self, shards, worker_count):
+        return [list(reversed(shards))]
+
+
+def create_tree():
+    root = InjectableGroup("root")
+    for pkg in ["one", "two", "three", "four"]:
+        for tindex in range(2):
+            root.add_descendent(create_injectable("schedpkg.{}.tests".format(pkg), "test_{}_{}".format(pkg, tindex)))
+    return root
+
+
+class TestInjectableScheduler(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        source = ResourceSource(sched_shared_resource, None, object, None)
+        cls.origin = ParameterOrigin("schedpkg", "sched_shared_resource", ResourceLifespan.Package, source)
+        injection_registry.register_parameter_origin("sched_shared_resource", cls.origin)
+        return
+
+    @classmethod
+    def tearDownClass(cls):
+        unregister_origin(cls.origin)
+        return
+
+    def setUp(self):
+        events.clear()
+        return
+
+    def test_parallel_run_honors_scopes(self):
+        plan = ExecutionPlanBuilder().build_plan(create_tree())
+
+        couplings = {
+            "schedpkg": RecordingScopeCoupling("schedpkg"),
+            "schedpkg.two": RecordingScopeCoupling("schedpkg.two")
+        }
+
+        scheduler = InjectableScheduler(plan, max_workers=4, scope_couplings=couplings)
+
+        shards = scheduler.build_shards()
+        assert [shard.name for shard in shards] == ["schedpkg.one", "schedpkg.two", "schedpkg.three", "schedpkg.four"]
+
+        report = scheduler.run()
+
+        assert report.succeeded, report.failures
+        assert len(report.results) == 8
+        assert all(result == "shared" for result, _ in report.results.values())
+        assert report.elapsed < 8 * TEST_DELAY, "The packages should run concurrently."
+
+        kinds = [event[0] for event in events]
+        assert kinds.count("shared-up") == 1, "The package resource should be shared by the workers."
+        assert kinds[0] == "enter" and kinds[-1] == "shared-down"
+
+        test_times = [event[3] for event in events if event[0] == "test"]
+        two_times = [event[3] for event in events if event[0] == "test" and event[1].startswith("schedpkg.two.")]
+        enter_times = {event[1]: event[2] for event in events if event[0] == "enter"}
+        exit_times = {event[1]: event[2] for event in events if event[0] == "exit"}
+
+        assert enter_times["schedpkg"] <= min(test_times)
+        assert enter_times["schedpkg.two"] <= min(two_times)
+        assert exit_times["schedpkg.two"] >= max(two_times) + TEST_DELAY * 0.9
+        assert exit_times["schedpkg"] >= exit_times["schedpkg.two"], "A child scope should exit before its parent."
+
+    def test_failed_scope_enter(self):
+        plan = ExecutionPlanBuilder().build_plan(create_tree())
+
+        couplings = {
+            "schedpkg.three": RecordingScopeCoupling("schedpkg.three", fail_enter=True)
+        }
+
+        report = InjectableScheduler(plan, max_workers=2, scope_couplings=couplings).run()
+
+        assert sorted(report.failures.keys()) == ["schedpkg.three.tests#test_three_0", "schedpkg.three.tests#test_three_1"]
+        assert not any(event[0] == "test" and event[1].startswith("schedpkg.three.") for event in events)
+        assert not any(event[0] == "exit" for event in events), "A scope that failed to enter should not be exited."
+
+    def test_placement_policy(self):
+        plan = ExecutionPlanBuilder().build_plan(create_tree())
+
+        placements = RoundRobinPlacementPolicy().place_shards(InjectableScheduler(plan).build_shards(), 3)
+        assert [[shard.name for shard in worker] for worker in placements] == [
+            ["schedpkg.one", "schedpkg.four"], ["schedpkg.two"], ["schedpkg.three"]
+        ]
+
+        report = InjectableScheduler(plan, max_workers=4, placement_policy=ReversePlacementPolicy()).run()
+        assert report.succeeded
+
+        order = [event[1] for event in events if event[0] == "test"]
+        assert order[0].startswith("schedpkg.four.") and order[-1].startswith("schedpkg.one.")
+
+    def test_supplied_cache_session(self):
+        plan = ExecutionPlanBuilder().build_plan(create_tree())
+
+        cache = SessionCountingCache()
+        report = InjectableScheduler(plan, max_workers=2).run(cache)
+        assert report.succeeded
+        assert cache.session_exits == 0, "The session of a cache that is provided should be left to the caller."
+
+    def test_finalize_errors_logged(self):
+        scope_name = "schedfinal.tests#test_final"
+
+        source = ResourceSource(sched_final_resource, None, object, None)
+        origin = ParameterOrigin(scope_name, "sched_final_resource", ResourceLifespan.Test, source)
+        injection_registry.register_parameter_origin("sched_final_resource", origin)
+        self.addCleanup(unregister_origin, origin)
+
+        def test_final(sched_final_resource):
+            return sched_final_resource
+
+        root = InjectableGroup("root")
+        root.add_descendent(InjectableRef(name_injectable_function(test_final, "schedfinal.tests", "test_final")))
+        plan = ExecutionPlanBuilder().build_plan(root)
+
+        with self.assertLogs(level="ERROR") as logs:
+            report = InjectableScheduler(plan, max_workers=1).run()
+
+        assert report.succeeded
+        assert any("Error finalizing a resource of scope '{}'".format(scope_name) in line for line in logs.output), \
+            f"The finalize error of the test resource should be logged. logs={logs.output}"
+
+
+if __name__ == '__main__':
+    unittest.main()
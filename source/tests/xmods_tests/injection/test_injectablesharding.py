@@ -0,0 +1,143 @@
+
+import multiprocessing
+import sys
+import types
+import unittest
+
+from mojo.xmods.injection.injectablesharding import (
+    ConsistentHashRing,
+    InjectableShardRunner,
+    ShardingMode,
+    create_shard_names,
+    partition_injectables
+)
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.injection.injectionregistry import injection_registry
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+from mojo.xmods.injection.resourcesource import ResourceSource
+
+from ..injectionhelpers import name_injectable_function, unregister_origin
+
+
+def shard_session_resource() -> str:
+    return "session"
+
+
+def create_injectable_function(module_name, func_name, fail=False):
+    def injectable(shard_session_resource):
+        if fail:
+            raise RuntimeError("Injectable '{}' failed.".format(func_name))
+        return shard_session_resource
+    return name_injectable_function(injectable, module_name, func_name)
+
+
+def create_references(module_count, per_module=2):
+    inj_references = {}
+    for mindex in range(module_count):
+        module_name = "shardpkg.mod{}.tests".format(mindex)
+        for findex in range(per_module):
+            inj_ref = InjectableRef(create_injectable_function(module_name, "test_{}".format(findex)))
+            inj_references[inj_ref.name] = inj_ref
+    return inj_references
+
+
+def shard_modules(shards):
+    modules = []
+    for shard in shards:
+        modules.append(set(inj_ref.module_name for inj_ref in shard.values()))
+    return modules
+
+
+class TestInjectableSharding(unittest.TestCase):
+
+    def test_module_partition_is_stable(self):
+        inj_references = create_references(40)
+
+        shards = partition_injectables(inj_references, 4)
+        assert shard_modules(shards) == shard_modules(partition_injectables(inj_references, 4))
+        assert sum(len(shard) for shard in shards) == len(inj_references)
+        assert all(len(shard) > 0 for shard in shards)
+
+        for shard in shards:
+            for inj_name in shard:
+                module_name = inj_name.split("#")[0]
+                assert all(name in shard for name in inj_references if name.startswith(module_name + "#")), \
+                    "The injectables of a module should be in the same shard."
+
+        # Adding a shard only moves modules onto the new shard
+        grown = shard_modules(partition_injectables(inj_references, 5))
+        for sindex, modules in enumerate(shard_modules(shards)):
+            assert grown[sindex] <= modules
+
+    def test_duration_partition_is_balanced(self):
+        inj_references = create_references(30, per_module=1)
+
+        durations = {}
+        for rindex, inj_name in enumerate(inj_references):
+            durations[inj_name] = float(1 + (rindex % 7))
+
+        shards = partition_injectables(inj_references, 3, mode=ShardingMode.Duration, durations=durations, load_factor=1.1)
+
+        loads = [sum(durations[name] for name in shard) for shard in shards]
+        even_split = sum(durations.values()) / 3
+        assert max(loads) <= even_split * 1.1
+
+        # Injectables without history are assumed to take the average duration
+        del durations[next(iter(durations))]
+        shards = partition_injectables(inj_references, 3, mode=ShardingMode.Duration, durations=durations)
+        assert sum(len(shard) for shard in shards) == len(inj_references)
+
+    def test_hash_ring(self):
+        ring = ConsistentHashRing(create_shard_names(3))
+        assert ring.lookup("alpha.beta") == ConsistentHashRing(create_shard_names(3)).lookup("alpha.beta")
+        assert sorted(ring.iterate_nodes("alpha.beta")) == ["shard-0", "shard-1", "shard-2"]
+
+    def _run_sample_shards(self):
+        source = ResourceSource(shard_session_resource, None, object, None)
+        origin = ParameterOrigin("<session>", "shard_session_resource", ResourceLifespan.Session, source)
+        injection_registry.register_parameter_origin("shard_session_resource", origin)
+        self.addCleanup(unregister_origin, origin)
+
+        inj_references = {}
+        for mindex in range(3):
+            module_name = "shardrun.mod{}.tests".format(mindex)
+            module = types.ModuleType(module_name)
+            for findex in range(2):
+                func_name = "test_{}".format(findex)
+                func = create_injectable_function(module_name, func_name, fail=(mindex == 1 and findex == 1))
+                setattr(module, func_name, func)
+                inj_ref = InjectableRef(func)
+                inj_references[inj_ref.name] = inj_ref
+            sys.modules[module_name] = module
+
+        try:
+            runner = InjectableShardRunner(inj_references, 2, timeout=60)
+            report = runner.run()
+        finally:
+            for mindex in range(3):
+                del sys.modules["shardrun.mod{}.tests".format(mindex)]
+
+        assert list(report.outcomes.keys()) == list(inj_references.keys()), "The outcomes should be merged in order."
+        assert [outcome.name for outcome in report.failures] == ["shardrun.mod1.tests#test_1"]
+        assert "RuntimeError" in report.failures[0].error
+        assert len(report.durations()) == 6
+        assert sorted(name for shard in report.shards for name in shard) == sorted(inj_references.keys())
+
+    @unittest.skipUnless("fork" in multiprocessing.get_all_start_methods(), "The workers inherit the test modules by forking.")
+    def test_run_shards_in_processes(self):
+        self._run_sample_shards()
+
+    @unittest.skipUnless({"fork", "spawn"} <= set(multiprocessing.get_all_start_methods()),
+                         "The fork and spawn start methods are not both available.")
+    def test_run_shards_with_spawn_default(self):
+        # The workers are forked even when the default start method of the process is spawn
+        start_method = multiprocessing.get_start_method()
+        multiprocessing.set_start_method("spawn", force=True)
+        try:
+            self._run_sample_shards()
+        finally:
+            multiprocessing.set_start_method(start_method, force=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+
+import threading
+import time
+import unittest
+
+from typing import Generator
+
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcecache import ResourceInstanceCache, create_constraints_cache_key
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+from mojo.xmods.injection.resourcesource import ResourceSource
+
+teardown_order = []
+created_count = [0]
+
+
+def session_resource() -> Generator[str, None, None]:
+    yield "session"
+    teardown_order.append("session")
+
+
+def package_resource(session_resource, constraints=None) -> Generator[dict, None, None]:
+    created_count[0] += 1
+    yield {"session": session_resource, "constraints": constraints}
+    teardown_order.append("package")
+
+
+def slow_resource() -> object:
+    created_count[0] += 1
+    time.sleep(0.05)
+    return object()
+
+
+def create_origin(scope_name, source_func, life_span):
+    source = ResourceSource(source_func, None, object, None)
+    origin = ParameterOrigin(scope_name, source_func.__name__, life_span, source)
+    return origin
+
+
+class TestResourceInstanceCache(unittest.TestCase):
+
+    def setUp(self):
+        teardown_order.clear()
+        created_count[0] = 0
+        return
+
+    def test_lifespan_caching_and_finalization(self):
+        cache = ResourceInstanceCache()
+
+        session_origin = create_origin("<session>", session_resource, ResourceLifespan.Session)
+        package_origin = create_origin("alpha.beta", package_resource, ResourceLifespan.Package)
+
+        session_res = cache.get_resource(session_origin, "alpha.beta#test_one")
+        assert session_res == "session"
+
+        params = {"session_resource": session_res}
+        first = cache.get_resource(package_origin, "alpha.beta#test_one", params)
+        second = cache.get_resource(package_origin, "alpha.beta#test_two", params)
+        assert first is second, "A package resource should be shared by the tests of the package."
+
+        constrained = cache.get_resource(package_origin, "alpha.beta#test_two", params, constraints={"model": "x"})
+        assert constrained is not first and constrained["constraints"] == {"model": "x"}
+        assert cache.get_resource(package_origin, "alpha.beta#test_three", params, constraints={"model": "x"}) is constrained
+
+        assert created_count[0] == 2
+        assert cache.hits == 2 and cache.misses == 3
+        assert cache.metrics()["sources"][package_origin.source_id] == {"hits": 2, "misses": 2}
+
+        # Exiting a test scope does not evict the package resources
+        assert cache.exit_scope("alpha.beta#test_one") == []
+        assert len(cache) == 3
+
+        errors = cache.exit_scope("alpha")
+        assert errors == []
+        assert len(cache) == 1 and cache.evictions == 2
+        assert teardown_order == ["package", "package"]
+
+        cache.exit_session()
+        assert len(cache) == 0 and cache.finalizations == 3
+        assert teardown_order[-1] == "session"
+
+    def test_test_lifespan_is_per_test(self):
+        cache = ResourceInstanceCache()
+        test_origin = create_origin("alpha.beta#test_one", slow_resource, ResourceLifespan.Test)
+
+        first = cache.get_resource(test_origin, "alpha.beta#test_one")
+        assert cache.get_resource(test_origin, "alpha.beta#test_one") is first
+        assert cache.get_resource(test_origin, "alpha.beta#test_two") is not first
+
+        cache.exit_scope("alpha.beta#test_one")
+        assert cache.get_resource(test_origin, "alpha.beta#test_one") is not first
+
+    def test_concurrent_requests_create_once(self):
+        cache = ResourceInstanceCache()
+        origin = create_origin("alpha", slow_resource, ResourceLifespan.Package)
+
+        results = []
+        def request():
+            results.append(cache.get_resource(origin, "alpha.beta#test_one"))
+
+        threads = [threading.Thread(target=request) for _ in range(8)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+
+        assert created_count[0] == 1, "The resource should only be created once."
+        assert all(res is results[0] for res in results)
+        assert cache.misses == 1 and cache.hits == 7
+
+    def test_constraints_cache_key(self):
+        assert create_constraints_cache_key({"b": [1, 2], "a": 1}) == create_constraints_cache_key({"a": 1, "b": [1, 2]})
+        assert create_constraints_cache_key({"a": 1}) != create_constraints_cache_key({"a": 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+
+import unittest
+
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+from mojo.xmods.injection.resourcescope import ResourceScope
+from mojo.xmods.injection.resourcesource import ResourceSource
+
+
+def create_function(module_name, func_name, param_names=()):
+    namespace = {}
+    exec("def {}({}):\n    return None\n".format(func_name, ", ".join(param_names)), namespace)
+    func = namespace[func_name]
+    func.__module__ = module_name
+    return func
+
+
+def create_origin(scope_name, identifier, param_names=()):
+    source = ResourceSource(create_function("sample.sources", identifier, param_names), None, object, None)
+    origin = ParameterOrigin(scope_name, identifier, ResourceLifespan.Package, source)
+    return origin
+
+
+class TestResourceScopeIndex(unittest.TestCase):
+
+    def test_lookup_and_has_parameter(self):
+        root = ResourceScope()
+        root.add_descendent_parameter_origination("alpha.beta", create_origin("alpha.beta", "res_a"))
+        root.add_descendent_parameter_origination("alpha.beta#test_one", create_origin("alpha.beta#test_one", "res_b"))
+
+        beta = root.lookup_scope("alpha.beta")
+        assert beta is not None and beta.package == "alpha.beta", "The scope should be found by its dotted path."
+        assert root.lookup_scope("alpha").children["beta"] is beta, "The index should reference the tree nodes."
+
+        test_one = root.lookup_scope("alpha.beta#test_one")
+        assert test_one is not None and test_one.name == "test_one"
+
+        assert root.has_descendent_parameter("alpha.beta", "res_a")
+        assert root.has_descendent_parameter("alpha.beta#test_one", "res_b")
+        assert not root.has_descendent_parameter("alpha.beta", "res_b")
+        assert not root.has_descendent_parameter("alpha.gamma", "res_a")
+        assert root.lookup_scope("alpha.gamma") is None
+
+    def test_ensure_and_prune(self):
+        root = ResourceScope()
+        root.add_descendent_parameter_origination("alpha.unused", create_origin("alpha.unused", "res_a"))
+
+        inj_ref = InjectableRef(create_function("alpha.beta", "test_one"))
+        root.ensure_parameter_scopes_for_injectable(inj_ref)
+
+        inj_scope = root.lookup_scope(inj_ref.scope_name)
+        assert inj_scope is not None and inj_scope.is_relevant, "The injectable scope should be created and relevant."
+        assert root.lookup_scope("alpha.beta").is_relevant, "The ancestors of the injectable should be relevant."
+
+        root.prune_unreference_scopes()
+
+        assert root.lookup_scope("alpha.unused") is None, "Pruned scopes should be removed from the index."
+        assert "unused" not in root.lookup_scope("alpha").children
+        assert root.lookup_scope(inj_ref.scope_name) is inj_scope
+
+    def test_rename_resource_origins_from_main(self):
+        root = ResourceScope()
+        root.add_descendent_parameter_origination("__main__#test_one", create_origin("__main__#test_one", "res_a"))
+
+        root.rename_resource_origins_from_main("sample.tests")
+
+        assert root.lookup_scope("__main__#test_one") is None, "The '__main__' scopes should be removed from the index."
+        assert root.has_descendent_parameter("sample.tests#test_one", "res_a")
+
+
+    def test_resolve_parameter_originations_for_injectables(self):
+        root = ResourceScope()
+        root.add_descendent_parameter_origination("alpha", create_origin("alpha", "res_a"))
+        root.add_descendent_parameter_origination("alpha.beta", create_origin("alpha.beta", "res_b", ["res_a", "res_x"]))
+        root.add_descendent_parameter_origination("alpha.gamma", create_origin("alpha.gamma", "res_c", ["res_a"]))
+
+        inj_references = {}
+        for module_name, func_name in [("alpha.beta", "test_one"), ("alpha.beta", "test_two"), ("alpha.gamma", "test_three")]:
+            inj_ref = InjectableRef(create_function(module_name, func_name))
+            inj_references[inj_ref.name] = inj_ref
+            root.ensure_parameter_scopes_for_injectable(inj_ref)
+
+        root.prune_unreference_scopes()
+
+        unknown_parameters = root.resolve_parameter_originations_for_injectables(inj_references)
+
+        for inj_ref in inj_references.values():
+            missing_params = []
+            root.resolve_parameter_originations_for_injectable(inj_ref, missing_params)
+
+            if len(missing_params) > 0:
+                found = [pname for pname, _ in unknown_parameters[inj_ref.name]]
+                expected = [pname for pname, _ in missing_params]
+                assert found == expected, "The single pass should find the same missing parameters as the per injectable walk."
+            else:
+                assert inj_ref.name not in unknown_parameters
+
+        assert len(unknown_parameters) == 2, "Only the injectables below 'alpha.beta' should have missing parameters."
+        for inj_name, missing_params in unknown_parameters.items():
+            assert inj_name.startswith("alpha.beta#")
+            assert [pname for pname, _ in missing_params] == ["res_x"]
+
+
+if __name__ == '__main__':
+    unittest.main()
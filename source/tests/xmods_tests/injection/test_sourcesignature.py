@@ -0,0 +1,72 @@
+
+import unittest
+
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.injection.parameterorigin import ParameterOrigin
+from mojo.xmods.injection.resourcelifespan import ResourceLifespan
+from mojo.xmods.injection.resourcesource import ResourceSource
+from mojo.xmods.xinspect import signature_profiler
+
+
+def sample_resource(session_resource, constraints=None):
+    return None
+
+
+def replacement_resource(other_resource):
+    return None
+
+
+def sample_injectable(sample_resource):
+    return
+
+
+class TestSourceSignature(unittest.TestCase):
+
+    def setUp(self):
+        signature_profiler.reset()
+        signature_profiler.enable()
+        return
+
+    def tearDown(self):
+        signature_profiler.disable()
+        signature_profiler.reset()
+        return
+
+    def test_source_signature_is_cached(self):
+        source = ResourceSource(sample_resource, None, object, None)
+        assert signature_profiler.calls == 1, "The signature should be introspected when the source is registered."
+
+        origin = ParameterOrigin("sample.scope", "sample_resource", ResourceLifespan.Package, source)
+        for _ in range(3):
+            assert origin.source_parameter_names == ("session_resource", "constraints")
+            assert list(origin.source_signature.parameters) == ["session_resource", "constraints"]
+            assert origin.generate_call() == "sample_resource(session_resource)"
+
+        assert signature_profiler.calls == 1, "The cached signature should be reused."
+        assert "calls=1" in signature_profiler.report()
+
+    def test_source_signature_invalidated_on_replace(self):
+        def local_resource(first_resource):
+            return None
+
+        source = ResourceSource(local_resource, None, object, None)
+        assert source.source_parameter_names == ("first_resource",)
+
+        local_resource.__code__ = replacement_resource.__code__
+        assert source.source_parameter_names == ("other_resource",), "Replacing the code should invalidate the signature."
+
+        source._source_func = sample_resource
+        assert source.source_parameter_names == ("session_resource", "constraints")
+        assert signature_profiler.calls == 3
+
+    def test_injectable_parameters_are_cached(self):
+        inj_ref = InjectableRef(sample_injectable)
+        assert signature_profiler.calls == 0, "The injectable signature should be introspected when it is first used."
+
+        assert inj_ref.function_parameter_names == ("sample_resource",)
+        assert list(inj_ref.function_parameters) == ["sample_resource"]
+        assert signature_profiler.calls == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+"""
+    Helpers shared by the tests that build injectable references and register parameter origins.
+"""
+
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.injection.injectionregistry import injection_registry
+
+
+def name_injectable_function(func, module_name, func_name, metadata=None):
+    """
+        Names a function as if it was the injectable function `func_name` declared in the module `module_name`.
+    """
+    func.__name__ = func_name
+    func.__qualname__ = func_name
+    func.__module__ = module_name
+    if metadata is not None:
+        func._metadata_ = metadata
+    return func
+
+
+def create_injectable(module_name, func_name, metadata=None):
+    """
+        Creates a reference to an injectable function without parameters that returns None.
+    """
+    def injectable():
+        return None
+    return InjectableRef(name_injectable_function(injectable, module_name, func_name, metadata))
+
+
+def unregister_origin(origin):
+    """
+        Removes a parameter origin that a test registered from the injection registry.
+    """
+    scope = injection_registry.lookup_resource_scope(origin.originating_scope)
+    del scope.parameter_originations[origin.identifier]
+    return
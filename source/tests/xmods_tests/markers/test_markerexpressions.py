@@ -0,0 +1,84 @@
+
+import unittest
+
+from mojo.errors.exceptions import SemanticError
+
+from mojo.xmods.markers import (
+    MetaFilterAnd,
+    MetaFilterContains,
+    MetaFilterIn,
+    MetaFilterNot,
+    MetaFilterOr,
+    MetadataIndex,
+    parse_marker_expression
+)
+
+from .test_metadataindex import create_members
+
+
+EXPRESSIONS = [
+    "categories ~= smoke and priority == 1",
+    "categories ~= smoke or keywords ~= wifi",
+    "not (categories ~= regression or priority in [2, 3])",
+    "+categories ~= stress and -keywords ~= audio",
+    "priority not in [1]",
+    "keywords in [audio, wifi] and not name =~ '^alpha'",
+    "name =~ 'play(er)?$' or (priority != 2 and not categories in [nightly])",
+    "categories =~ 'smo|night' and (keywords ~= audio or missing == x)",
+    "-name ~= 'gamma' and (priority == 1 or priority == 3)",
+    "not not categories ~= smoke"
+]
+
+
+class TestMarkerExpressions(unittest.TestCase):
+
+    def test_parse_tree(self):
+        metafilter = parse_marker_expression("(categories ~= smoke or keywords in [wifi, 'audio player']) and not priority == 3")
+
+        assert isinstance(metafilter, MetaFilterAnd)
+        either, negated = metafilter.metafilters
+        assert isinstance(either, MetaFilterOr) and isinstance(negated, MetaFilterNot)
+        assert isinstance(either.metafilters[1], MetaFilterIn)
+        assert either.metafilters[1].values == ("wifi", "audio player")
+
+        single = parse_marker_expression("-categories~=smoke")
+        assert isinstance(single, MetaFilterContains) and not single.include and single.group == "categories"
+
+    def test_evaluation_is_consistent(self):
+        members = create_members(400)
+        index = MetadataIndex(members)
+
+        for expression in EXPRESSIONS:
+            metafilter = parse_marker_expression(expression)
+            predicate = metafilter.create_predicate()
+
+            expected = [name for name, metadata in members if metafilter.should_include(metadata)]
+            assert [name for name, metadata in members if predicate(metadata)] == expected, expression
+            assert index.select([metafilter]) == expected, expression
+
+        selected = index.select([parse_marker_expression("categories ~= smoke and priority == 1")])
+        assert len(selected) > 0
+
+    def test_invalid_expressions(self):
+        invalid = [
+            "",
+            "categories",
+            "categories ~= smoke and",
+            "(categories ~= smoke",
+            "categories in [smoke",
+            "categories not smoke",
+            "categories =~ '('",
+            "categories ~= smoke )",
+            "categories == @ !"
+        ]
+
+        for expression in invalid:
+            try:
+                parse_marker_expression(expression)
+                assert False, "The expression should be invalid. expression={}".format(expression)
+            except SemanticError:
+                pass
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+
+import sys
+import types
+import unittest
+
+from mojo.xmods.injection.injectablegroup import InjectableGroup
+from mojo.xmods.markers import MetadataChain, MetadataIndex, chain_metadata, parse_marker_expression
+
+from ..injectionhelpers import create_injectable
+
+
+class TestMetadataChain(unittest.TestCase):
+
+    def test_chain_lookup(self):
+        root = {"categories": ["smoke"], "priority": "1"}
+        chain = MetadataChain({"priority": "2", "keywords": ["wifi"]}, root)
+
+        assert chain["priority"] == "2" and chain["categories"] == ["smoke"]
+        assert "keywords" in chain and "missing" not in chain
+        assert chain.get("missing", "default") == "default"
+        assert sorted(chain) == ["categories", "keywords", "priority"] and len(chain) == 3
+        assert chain == {"categories": ["smoke"], "priority": "2", "keywords": ["wifi"]}
+
+        with self.assertRaises(KeyError):
+            chain["missing"]
+
+        derived = chain.derive({"categories": ["stress"]})
+        assert derived["categories"] == ["stress"] and derived["priority"] == "2"
+        assert chain["categories"] == ["smoke"], "Deriving a chain must not modify the chain."
+        assert derived.flatten() == {"categories": ["stress"], "priority": "2", "keywords": ["wifi"]}
+
+    def test_chain_metadata(self):
+        parent = {"priority": "1"}
+        assert chain_metadata(None, parent) is parent
+        assert chain_metadata({}, parent) is parent
+        assert chain_metadata({"priority": "2"}, None) == {"priority": "2"}
+        assert chain_metadata(None, None) is None
+        assert isinstance(chain_metadata({"priority": "2"}, parent), MetadataChain)
+
+    def test_resolve_metadata_shares_parent(self):
+        module_name = "chainpkg.tests"
+        module = types.ModuleType(module_name)
+        module._metadata_ = {"categories": ["smoke"], "priority": "1"}
+        sys.modules[module_name] = module
+
+        try:
+            root = InjectableGroup("root")
+            plain = create_injectable(module_name, "test_plain")
+            marked = create_injectable(module_name, "test_marked", {"priority": "2"})
+            root.add_descendent(plain)
+            root.add_descendent(marked)
+            root.resolve_metadata()
+        finally:
+            del sys.modules[module_name]
+
+        module_group = root["chainpkg"]["tests"]
+        assert plain.metadata is module_group.metadata, "A reference without metadata should share the group metadata."
+        assert marked.metadata["priority"] == "2" and marked.metadata["categories"] == ["smoke"]
+
+        assert not hasattr(plain, "__dict__") and not hasattr(module_group, "__dict__")
+
+        metafilters = [parse_marker_expression("priority == 2 and categories ~= smoke")]
+        assert [inj_ref.base_name for inj_ref in root.iterate_injectables() if inj_ref.is_member_of_metaset(metafilters)] == ["test_marked"]
+
+        index = MetadataIndex((inj_ref, inj_ref.metadata) for inj_ref in root.iterate_injectables())
+        assert index.select(metafilters) == [marked]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+
+import random
+import unittest
+
+from mojo.xmods.injection.injectablegroup import InjectableGroup
+from mojo.xmods.injection.injectableref import InjectableRef
+from mojo.xmods.markers import MetaFilter, MetadataIndex, parse_marker_expression
+
+GROUP_VALUES = {
+    "categories": [["smoke"], ["smoke", "regression"], ["regression"], ["stress", "nightly"]],
+    "keywords": [["wifi"], ["audio", "wifi"], ["audio"], []],
+    "priority": ["1", "2", "3"],
+    "name": ["alpha-player", "beta-player", "gamma-speaker"]
+}
+
+EXPRESSIONS = [
+    "+categories~=smoke",
+    "-categories~=regression",
+    "+keywords~=wifi",
+    "+priority==1",
+    "-priority==3",
+    "+priority!=2",
+    "+name~=player",
+    "-name~=gamma",
+    "+missing==1",
+    "-missing~=x"
+]
+
+
+class PriorityAbove(MetaFilter):
+    """
+        A filter without an index implementation which is evaluated by scanning the metadata.
+    """
+
+    def __init__(self, priority):
+        super().__init__(True, "priority")
+        self._priority = priority
+        return
+
+    def should_include(self, metadata):
+        return metadata is not None and int(metadata.get("priority", "0")) > self._priority
+
+
+def create_members(count, seed=7):
+    rand = random.Random(seed)
+
+    shared = [None, {"priority": "2"}]
+    members = []
+    for mindex in range(count):
+        if mindex % 5 == 0:
+            metadata = shared[mindex % 2]
+        else:
+            metadata = {group: rand.choice(values) for group, values in GROUP_VALUES.items() if rand.random() < 0.8}
+        members.append(("member{}".format(mindex), metadata))
+
+    return members
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    def test_selection_matches_filter_evaluation(self):
+        members = create_members(300)
+        index = MetadataIndex(members)
+        assert len(index) == 300
+
+        rand = random.Random(11)
+        for _ in range(200):
+            expressions = rand.sample(EXPRESSIONS, rand.randint(1, 3))
+            metafilters = [parse_marker_expression(expr) for expr in expressions]
+            if rand.random() < 0.2:
+                metafilters.append(PriorityAbove(1))
+
+            expected = [name for name, metadata in members if all(mf.should_include(metadata) for mf in metafilters)]
+            assert index.select(metafilters) == expected, expressions
+
+    def test_group_index(self):
+        root = InjectableGroup("root")
+        for func_name, metadata in [("test_a", {"categories": ["smoke"]}), ("test_b", {"categories": ["regression"]}), ("test_c", None)]:
+            def injectable():
+                return None
+            injectable.__name__ = func_name
+            injectable.__module__ = "indexpkg.tests"
+            if metadata is not None:
+                injectable._metadata_ = metadata
+            root.add_descendent(InjectableRef(injectable))
+
+        root.resolve_metadata()
+        index = root.create_metadata_index()
+
+        selected = index.select([parse_marker_expression("+categories~=smoke")])
+        assert [inj_ref.base_name for inj_ref in selected] == ["test_a"]
+
+        selected = index.select([parse_marker_expression("-categories~=smoke")])
+        assert [inj_ref.base_name for inj_ref in selected] == ["test_b", "test_c"]
+        assert all(inj_ref.is_member_of_metaset([parse_marker_expression("-categories~=smoke")]) for inj_ref in selected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from datetime import timedelta
+
+from mojo.waiting import TimeoutContext
+
+from mojo.xmods.xlogging.scopemonitoring import (
+    format_collapsed_coroutine_stack,
+    format_collapsed_stack,
+    format_coroutine_stack,
+    MonitoredScope,
+    ScopeMonitor,
+    ScopeSamplingProfiler
+)
+
+# The longest time to wait for the monitor thread to notice an expired scope, the monitor
+# thread might be in the middle of a sleep with the default interval
+SCOPE_TRIGGER_TIMEOUT = ScopeMonitor.SCOPE_MONITOR_INTERVAL + 5
+
+DEFAULT_SCOPE_MONITOR_INTERVAL = ScopeMonitor.SCOPE_MONITOR_INTERVAL
+
+
+def setUpModule():
+    # Check for expired scopes often so the tests do not wait on the monitor thread
+    ScopeMonitor.SCOPE_MONITOR_INTERVAL = 0.05
+    return
+
+
+def tearDownModule():
+    ScopeMonitor.SCOPE_MONITOR_INTERVAL = DEFAULT_SCOPE_MONITOR_INTERVAL
+    return
+
+
+def busy_leaf_function(stop_gate: threading.Event):
+    while not stop_gate.is_set():
+        time.sleep(0.001)
+    return
+
+
+class TestScopeSamplingProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self._output_dir = tempfile.mkdtemp(prefix="mojo_xmods_tests")
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._output_dir, ignore_errors=True)
+        return
+
+    def test_format_collapsed_stack(self):
+        frame = sys._getframe()
+        stack = format_collapsed_stack(frame)
+
+        leaf = stack.split(";")[-1]
+        assert leaf.endswith(":test_format_collapsed_stack"), f"The leaf frame should be the current function. stack={stack}"
+
+    def test_profiler_samples_thread(self):
+        stop_gate = threading.Event()
+
+        worker = threading.Thread(target=busy_leaf_function, args=(stop_gate,), daemon=True)
+        worker.start()
+
+        profiler = ScopeSamplingProfiler(worker.ident, interval=0.005)
+        profiler.start()
+        time.sleep(0.2)
+        profiler.stop()
+
+        stop_gate.set()
+        worker.join()
+
+        assert profiler.sample_count > 0, "The profiler should have collected samples."
+
+        found_leaf = False
+        for stack in profiler.stack_counts:
+            if stack.find(":busy_leaf_function") > -1:
+                found_leaf = True
+                break
+        assert found_leaf, f"The sampled stacks should include the worker function. stacks={profiler.stack_counts}"
+
+        profile_file = os.path.join(self._output_dir, "profile.folded")
+        profiler.write_collapsed_stacks(profile_file)
+
+        with open(profile_file, 'r') as pf:
+            lines = pf.read().splitlines()
+
+        total = 0
+        for line in lines:
+            _, count = line.rsplit(" ", 1)
+            total += int(count)
+
+        assert total == profiler.sample_count, f"The file sample total should match. total={total} sample_count={profiler.sample_count}"
+
+
+def blocking_leaf_function(release_gate: threading.Event):
+    while not release_gate.is_set():
+        time.sleep(0.001)
+    return
+
+
+def wait_for_trigger(mscope: MonitoredScope) -> bool:
+    end_time = time.time() + SCOPE_TRIGGER_TIMEOUT
+    while not mscope.triggered and time.time() < end_time:
+        time.sleep(0.01)
+    return mscope.triggered
+
+
+class TestMonitoredScopeProfile(unittest.TestCase):
+
+    def setUp(self):
+        self._output_dir = tempfile.mkdtemp(prefix="mojo_xmods_tests")
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._output_dir, ignore_errors=True)
+        return
+
+    def test_expired_scope_writes_profile(self):
+        release_gate = threading.Event()
+
+        mscope = MonitoredScope("ExpiringScope", "Running a blocking function", TimeoutContext(0),
+                                notify_delay=timedelta(seconds=0), profile=True, profile_interval=0.005,
+                                profile_directory=self._output_dir)
+
+        def run_scope():
+            with mscope:
+                blocking_leaf_function(release_gate)
+            return
+
+        worker = threading.Thread(target=run_scope, daemon=True)
+        worker.start()
+
+        try:
+            assert wait_for_trigger(mscope), "The monitor should have noticed the expired scope."
+            time.sleep(0.2)
+        finally:
+            release_gate.set()
+            worker.join()
+
+        profile_filename = mscope.profile_filename
+        assert profile_filename is not None, "A profile should have been written when the scope exited."
+        assert os.path.dirname(profile_filename) == self._output_dir and profile_filename.endswith(".folded")
+
+        with open(profile_filename, 'r') as pf:
+            lines = pf.read().splitlines()
+
+        assert len(lines) > 0, "The profile should contain sampled stacks."
+        assert any(line.find(":blocking_leaf_function") > -1 for line in lines), \
+            f"The sampled stacks should include the blocking function. lines={lines}"
+
+
+async def stuck_leaf_coroutine(delay: float):
+    await asyncio.sleep(delay)
+    return
+
+
+async def stuck_inner_coroutine(stop_gate: asyncio.Event):
+    await stop_gate.wait()
+    return
+
+
+async def stuck_outer_coroutine(stop_gate: asyncio.Event):
+    await stuck_inner_coroutine(stop_gate)
+    return
+
+
+class TestAsyncMonitoredScope(unittest.TestCase):
+
+    def test_async_scope_tracks_task(self):
+
+        async def run_scope():
+            mscope = MonitoredScope("AsyncScope", "Running async scope", TimeoutContext(60), notify_delay=timedelta(seconds=0))
+            async with mscope:
+                assert mscope.task is asyncio.current_task(), "The scope should track the current task."
+                assert not mscope.exited, "The scope should not be exited inside the scope."
+            return mscope
+
+        mscope = asyncio.run(run_scope())
+        assert mscope.exited, "The scope should be exited after the 'async with'."
+
+    def test_format_coroutine_stack(self):
+
+        async def inspect_stuck_task():
+            stop_gate = asyncio.Event()
+            stuck_task = asyncio.create_task(stuck_outer_coroutine(stop_gate))
+            await asyncio.sleep(0.01)
+
+            stack_lines = format_coroutine_stack(stuck_task)
+
+            stop_gate.set()
+            await stuck_task
+            return stack_lines
+
+        stack_lines = asyncio.run(inspect_stuck_task())
+        stack_text = "\n".join(stack_lines)
+
+        assert stack_text.find("in stuck_outer_coroutine") > -1, f"The outer coroutine should be in the stack. stack={stack_text}"
+        assert stack_text.find("in stuck_inner_coroutine") > -1, f"The inner coroutine should be in the stack. stack={stack_text}"
+
+    def test_format_collapsed_coroutine_stack(self):
+
+        async def inspect_stuck_task():
+            stop_gate = asyncio.Event()
+            stuck_task = asyncio.create_task(stuck_outer_coroutine(stop_gate))
+            await asyncio.sleep(0.01)
+
+            stack = format_collapsed_coroutine_stack(stuck_task)
+
+            stop_gate.set()
+            await stuck_task
+            return stack
+
+        stack = asyncio.run(inspect_stuck_task())
+        labels = stack.split(";")
+
+        assert labels[0].endswith(":stuck_outer_coroutine"), f"The task coroutine should be the root. stack={stack}"
+        assert labels[1].endswith(":stuck_inner_coroutine"), f"The awaited coroutine should follow. stack={stack}"
+
+    def test_expired_async_scope_profiles_task(self):
+        output_dir = tempfile.mkdtemp(prefix="mojo_xmods_tests")
+
+        async def run_scope():
+            mscope = MonitoredScope("ExpiringAsyncScope", "Running a stuck coroutine", TimeoutContext(0),
+                                    notify_delay=timedelta(seconds=0), profile=True, profile_interval=0.005,
+                                    profile_directory=output_dir)
+            async with mscope:
+                end_time = time.time() + SCOPE_TRIGGER_TIMEOUT
+                while not mscope.triggered and time.time() < end_time:
+                    await stuck_leaf_coroutine(0.01)
+                for _ in range(20):
+                    await stuck_leaf_coroutine(0.01)
+            return mscope
+
+        try:
+            mscope = asyncio.run(run_scope())
+
+            assert mscope.triggered, "The monitor should have noticed the expired scope."
+            assert mscope.profile_filename is not None, "A profile should have been written when the scope exited."
+
+            with open(mscope.profile_filename, 'r') as pf:
+                lines = pf.read().splitlines()
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+
+        assert len(lines) > 0, "The profile should contain sampled stacks."
+        for line in lines:
+            # Each line is a collapsed stack followed by its sample count
+            stack, _, _ = line.rpartition(" ")
+            assert stack.split(";")[0].endswith(":run_scope"), f"The stacks should be the stacks of the task. line={line}"
+        assert any(line.find(":stuck_leaf_coroutine") > -1 for line in lines), \
+            f"The sampled stacks should include the stuck coroutine. lines={lines}"
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from datetime import timedelta
+
+from mojo.waiting import TimeoutContext
+
+from mojo.xmods.xlogging.scopemonitoring import MonitoredScope
+from mojo.xmods.xlogging.scopestatistics import ScopeDurationHistogram, ScopeStatistics
+
+
+class TestScopeDurationHistogram(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = ScopeDurationHistogram("percentiles")
+
+        # Record 1ms to 1000ms in 1ms steps
+        for millis in range(1, 1001):
+            histogram.record(millis / 1000)
+
+        assert histogram.count == 1000, f"The histogram count should be 1000. count={histogram.count}"
+
+        for pct, expected in [(50, 0.5), (95, 0.95), (99, 0.99)]:
+            found = histogram.percentile(pct)
+            error = abs(found - expected) / expected
+            assert error < 0.01, f"The p{pct} should be within 1%. expected={expected} found={found}"
+
+        assert histogram.min == 0.001, f"The min should be 0.001. min={histogram.min}"
+        assert histogram.max == 1.0, f"The max should be 1.0. max={histogram.max}"
+
+    def test_fixed_memory(self):
+        histogram = ScopeDurationHistogram("fixed")
+        bucket_count = len(histogram._buckets)
+
+        histogram.record(0.000001)
+        histogram.record(3600 * 24 * 365)
+
+        assert len(histogram._buckets) == bucket_count, "The histogram bucket count should not grow."
+        assert histogram.percentile(100) == histogram.max, "The p100 should be clamped to the max."
+
+    def test_timeout_count(self):
+        histogram = ScopeDurationHistogram("timeouts")
+
+        histogram.record(0.1)
+        histogram.record(2.0, timed_out=True)
+
+        summary = histogram.summary()
+        assert summary["count"] == 2, f"The summary count should be 2. summary={summary}"
+        assert summary["timeouts"] == 1, f"The summary timeouts should be 1. summary={summary}"
+
+
+class TestScopeStatistics(unittest.TestCase):
+
+    def setUp(self):
+        self._output_dir = tempfile.mkdtemp(prefix="mojo_xmods_tests")
+        ScopeStatistics().reset()
+        return
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self._output_dir, ignore_errors=True)
+        ScopeStatistics().reset()
+        return
+
+    def test_monitored_scope_records_duration(self):
+
+        for _ in range(3):
+            with MonitoredScope("RecordDuration", "Recording duration", TimeoutContext(60), notify_delay=timedelta(seconds=0)):
+                pass
+
+        histogram = ScopeStatistics().get_histogram("RecordDuration")
+        assert histogram is not None, "A histogram should have been created for the scope label."
+        assert histogram.count == 3, f"The histogram count should be 3. count={histogram.count}"
+        assert histogram.timeout_count == 0, f"The timeout count should be 0. timeout_count={histogram.timeout_count}"
+
+        stats_file = os.path.join(self._output_dir, "stats.json")
+        ScopeStatistics().write_report(stats_file)
+
+        with open(stats_file, 'r') as sf:
+            summaries = json.load(sf)
+
+        assert "RecordDuration" in summaries, f"The report should contain the scope label. summaries={summaries}"
+
+
+if __name__ == '__main__':
+    unittest.main()